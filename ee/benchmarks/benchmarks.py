@@ -23,6 +23,7 @@ from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.filters.filter import Filter
 from posthog.models.property import PropertyName, TableWithProperties
 from posthog.constants import FunnelCorrelationType
+from posthog.hogql.parser import clear_parse_cache, parse_expr, parse_select
 
 MATERIALIZED_PROPERTIES: List[Tuple[TableWithProperties, PropertyName]] = [
     ("events", "$host"),
@@ -654,3 +655,35 @@ class QuerySuite:
             )
             cohort.calculate_people_ch(pending_version=0)
         self.cohort = cohort
+
+
+HOGQL_SELECT = """
+    select event, properties.$browser, person.properties.email, count()
+    from events
+    where timestamp > '2021-01-01' and properties.$current_url like '%/signup%' and event != '$feature_flag_called'
+    group by event, properties.$browser, person.properties.email
+    order by count() desc
+    limit 100
+"""
+HOGQL_EXPR = "if(properties.$browser = 'Chrome', concat(person.properties.email, '-', event), 'other')"
+
+
+class HogQLParserSuite:
+    version = "v001"
+
+    def setup(self):
+        clear_parse_cache()
+
+    def time_parse_select_uncached(self):
+        clear_parse_cache()
+        parse_select(HOGQL_SELECT)
+
+    def time_parse_select_cached(self):
+        parse_select(HOGQL_SELECT)
+
+    def time_parse_expr_uncached(self):
+        clear_parse_cache()
+        parse_expr(HOGQL_EXPR)
+
+    def time_parse_expr_cached(self):
+        parse_expr(HOGQL_EXPR)
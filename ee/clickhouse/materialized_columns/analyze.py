@@ -1,12 +1,16 @@
+import math
 import re
-from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import Dict, Generator, List, Optional, Set, Tuple
+from typing import Dict, Generator, List, Optional, Set, Tuple, cast
 
 import structlog
+from sentry_sdk import capture_exception
 
+from ee.clickhouse.materialized_columns.benchmark import benchmark_materialized_column
 from ee.clickhouse.materialized_columns.columns import (
     DEFAULT_TABLE_COLUMN,
+    TRIM_AND_EXTRACT_PROPERTY,
     backfill_materialized_columns,
     get_materialized_columns,
     materialize,
@@ -14,8 +18,11 @@ from ee.clickhouse.materialized_columns.columns import (
 from ee.settings import (
     MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS,
     MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS,
+    MATERIALIZE_COLUMNS_BENCHMARK_QUERIES,
+    MATERIALIZE_COLUMNS_BENCHMARK_SAMPLE_ROWS,
     MATERIALIZE_COLUMNS_MAX_AT_ONCE,
     MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
+    MATERIALIZE_COLUMNS_MINIMUM_SPEEDUP,
 )
 from posthog.cache_utils import instance_memoize
 from posthog.client import sync_execute
@@ -27,6 +34,12 @@ from posthog.models.team import Team
 
 Suggestion = Tuple[TableWithProperties, TableColumn, PropertyName, int]
 
+# How many rows to look at when estimating how long a property's values are compared to the JSON they're in
+VALUE_RATIO_SAMPLE_ROWS = 100_000
+# How many suggestions are evaluated at most per column that can be materialized in a run
+EVALUATED_SUGGESTIONS_PER_COLUMN = 2
+ESCAPE_SEQUENCES = {"b": "\b", "f": "\f", "r": "\r", "n": "\n", "t": "\t", "0": "\0", "a": "\a", "v": "\v"}
+
 logger = structlog.get_logger(__name__)
 
 
@@ -59,27 +72,41 @@ class TeamManager:
 
 
 class Query:
-    def __init__(self, query_string: str, query_time_ms: float, min_query_time=MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME):
+    def __init__(
+        self,
+        query_string: str,
+        query_time_ms: float,
+        min_query_time=MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
+        read_bytes: int = 0,
+        read_rows: int = 0,
+        tagged_team_id: Optional[int] = None,
+    ):
         self.query_string = query_string
         self.query_time_ms = query_time_ms
         self.min_query_time = min_query_time
+        self.read_bytes = read_bytes
+        self.read_rows = read_rows
+        self.tagged_team_id = tagged_team_id
 
     @property
     def cost(self) -> int:
         return int((self.query_time_ms - self.min_query_time) / 1000) + 1
 
-    @cached_property
-    def is_valid(self):
-        return self.team_id is not None and Team.objects.filter(pk=self.team_id).exists()
-
     @cached_property
     def team_id(self) -> Optional[str]:
+        # Queries are tagged with their team, but not all of them, e.g. those run by celery tasks
+        if self.tagged_team_id:
+            return str(self.tagged_team_id)
         matches = re.findall(r"team_id = (\d+)", self.query_string)
         return matches[0] if matches else None
 
     @cached_property
     def _all_properties(self) -> List[Tuple[str, PropertyName]]:
-        return re.findall(r"JSONExtract\w+\((\S+), '([^']+)'\)", self.query_string)
+        # Property names are escaped the way clickhouse-driver substitutes query parameters
+        return [
+            (table_column, _unescape(property))
+            for table_column, property in re.findall(r"JSONExtract\w+\((\S+), '((?:[^'\\]|\\.)+)'\)", self.query_string)
+        ]
 
     def properties(
         self, team_manager: TeamManager
@@ -123,7 +150,10 @@ def _get_queries(since_hours_ago: int, min_query_time: int) -> List[Query]:
         f"""
         SELECT
             query,
-            query_duration_ms
+            query_duration_ms,
+            read_bytes,
+            read_rows,
+            JSONExtractInt(log_comment, 'team_id')
         FROM system.query_log
         WHERE
             query NOT LIKE '%%query_log%%'
@@ -136,30 +166,158 @@ def _get_queries(since_hours_ago: int, min_query_time: int) -> List[Query]:
         """,
         {"since": since_hours_ago, "min_query_time": min_query_time},
     )
-    return [Query(query, query_duration_ms, min_query_time) for query, query_duration_ms in raw_queries]
+    return [
+        Query(query, query_duration_ms, min_query_time, read_bytes, read_rows, team_id)
+        for query, query_duration_ms, read_bytes, read_rows, team_id in raw_queries
+    ]
+
+
+@dataclass
+class ColumnSuggestion:
+    table: TableWithProperties
+    table_column: TableColumn
+    property_name: PropertyName
+    # Sum of `Query.cost` of the queries using the property
+    cost: int = 0
+    # Bytes read by the queries using the property, split evenly between the properties each query uses
+    read_bytes: int = 0
+    queries: List[Query] = field(default_factory=list)
+    # How long the property's values are compared to the JSON they're extracted from, see `_estimate_value_ratio`
+    value_ratio: Optional[float] = None
+    # How many times faster queries got with the property materialized, see `_benchmark`
+    speedup: Optional[float] = None
+
+    @property
+    def saved_bytes(self) -> Optional[int]:
+        "Estimate of how many fewer bytes the queries would have read with the property materialized"
+        if self.value_ratio is None:
+            return None
+        return int(self.read_bytes * max(1 - self.value_ratio, 0))
 
+    def as_suggestion(self) -> Suggestion:
+        return self.table, self.table_column, self.property_name, self.cost
 
-def _analyze(queries: List[Query]) -> List[Suggestion]:
+
+def _analyze(queries: List[Query]) -> List[ColumnSuggestion]:
     """
     Analyzes query history to find which properties could get materialized.
 
-    Returns an ordered list of suggestions by cost.
+    Returns suggestions ordered by how much data the queries using them read, or by cost for queries logged without it.
     """
 
     team_manager = TeamManager()
-    costs: defaultdict = defaultdict(int)
+    valid_team_ids = {
+        str(team_id)
+        for team_id in Team.objects.filter(
+            pk__in={int(query.team_id) for query in queries if query.team_id is not None}
+        ).values_list("pk", flat=True)
+    }
+    suggestions: Dict[Tuple[TableWithProperties, TableColumn, PropertyName], ColumnSuggestion] = {}
 
     for query in queries:
-        if not query.is_valid:
+        if query.team_id not in valid_team_ids:
             continue
 
-        for table, table_column, property in query.properties(team_manager):
-            costs[(table, table_column, property)] += query.cost
+        properties = list(dict.fromkeys(query.properties(team_manager)))
+        for table, table_column, property in properties:
+            suggestion = suggestions.setdefault(
+                (table, table_column, property), ColumnSuggestion(table, table_column, property)
+            )
+            suggestion.cost += query.cost
+            suggestion.read_bytes += query.read_bytes // len(properties)
+            suggestion.queries.append(query)
+
+    return sorted(suggestions.values(), key=lambda suggestion: (suggestion.read_bytes, suggestion.cost), reverse=True)
 
-    return [
-        (table, table_column, property_name, cost)
-        for (table, table_column, property_name), cost in sorted(costs.items(), key=lambda kv: -kv[1])
+
+def _estimate_value_ratio(suggestion: ColumnSuggestion) -> None:
+    "Estimates how long the property's values are compared to the JSON they're extracted from, on a table sample."
+    recent_rows_only = "WHERE timestamp > now() - toIntervalDay(1)" if suggestion.table == "events" else ""
+    rows = sync_execute(
+        f"""
+        SELECT avg(length({TRIM_AND_EXTRACT_PROPERTY.format(table_column=suggestion.table_column)}))
+            / avg(length({suggestion.table_column}))
+        FROM (
+            SELECT {suggestion.table_column}
+            FROM {suggestion.table}
+            {recent_rows_only}
+            LIMIT %(limit)s
+        )
+        """,
+        {"property": suggestion.property_name, "limit": VALUE_RATIO_SAMPLE_ROWS},
+    )
+    value_ratio = rows[0][0] if rows else None
+    if value_ratio is not None and not math.isnan(value_ratio):
+        suggestion.value_ratio = value_ratio
+
+
+def _benchmark(suggestion: ColumnSuggestion, query_count: int, sample_rows: int) -> None:
+    # Only properties of events are benchmarked, as persons can't be copied a sample at a time
+    if suggestion.table != "events":
+        return
+
+    queries = sorted(suggestion.queries, key=lambda query: (query.read_bytes, query.query_time_ms), reverse=True)
+    queries = queries[:query_count]
+    try:
+        suggestion.speedup = benchmark_materialized_column(
+            team_ids=list({int(cast(str, query.team_id)) for query in queries}),
+            table_column=suggestion.table_column,
+            property=suggestion.property_name,
+            queries=[query.query_string for query in queries],
+            sample_rows=sample_rows,
+        )
+    except Exception as err:
+        logger.warn(f"Failed to benchmark materializing column. property_name={suggestion.property_name}")
+        capture_exception(err)
+
+
+def _evaluate(
+    suggestions: List[ColumnSuggestion], maximum: int, benchmark_queries: int, minimum_speedup: float
+) -> List[ColumnSuggestion]:
+    """
+    Estimates the savings of and benchmarks suggestions in order, until `maximum` of them are found worth
+    materializing or `EVALUATED_SUGGESTIONS_PER_COLUMN` times as many have been evaluated, as each benchmark copies
+    a sample of the table. Logs a report of all evaluated suggestions and returns those worth materializing.
+    """
+    evaluated: List[ColumnSuggestion] = []
+    worth_materializing: List[ColumnSuggestion] = []
+    for suggestion in suggestions[: EVALUATED_SUGGESTIONS_PER_COLUMN * maximum]:
+        if len(worth_materializing) >= maximum:
+            break
+
+        _estimate_value_ratio(suggestion)
+        if benchmark_queries > 0:
+            _benchmark(suggestion, benchmark_queries, MATERIALIZE_COLUMNS_BENCHMARK_SAMPLE_ROWS)
+        evaluated.append(suggestion)
+
+        if suggestion.speedup is None or suggestion.speedup >= minimum_speedup:
+            worth_materializing.append(suggestion)
+
+    if evaluated:
+        logger.info(f"Evaluated columns that could be materialized:\n{format_report(evaluated)}")
+    return worth_materializing
+
+
+def format_report(suggestions: List[ColumnSuggestion]) -> str:
+    lines = [
+        f"{'table':<8} {'table_column':<18} {'property':<32} {'queries':>8} {'cost':>8} "
+        f"{'read_bytes':>16} {'saved_bytes':>16} {'speedup':>8}"
     ]
+    for suggestion in suggestions:
+        lines.append(
+            f"{suggestion.table:<8} {suggestion.table_column:<18} {suggestion.property_name[:32]:<32} "
+            f"{len(suggestion.queries):>8} {suggestion.cost:>8} {suggestion.read_bytes:>16,} "
+            f"{_format_optional(suggestion.saved_bytes, ',')} {_format_optional(suggestion.speedup, '.2f', width=8)}"
+        )
+    return "\n".join(lines)
+
+
+def _format_optional(value, format_spec: str, width: int = 16) -> str:
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}{format_spec}}"
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda match: ESCAPE_SEQUENCES.get(match.group(1), match.group(1)), value)
 
 
 def materialize_properties_task(
@@ -169,13 +327,23 @@ def materialize_properties_task(
     min_query_time: int = MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
     backfill_period_days: int = MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS,
     dry_run: bool = False,
+    benchmark_queries: int = MATERIALIZE_COLUMNS_BENCHMARK_QUERIES,
+    minimum_speedup: float = MATERIALIZE_COLUMNS_MINIMUM_SPEEDUP,
 ) -> None:
     """
     Creates materialized columns for event and person properties based off of slow queries
     """
 
     if columns_to_materialize is None:
-        columns_to_materialize = _analyze(_get_queries(time_to_analyze_hours, min_query_time))
+        suggestions = [
+            suggestion
+            for suggestion in _analyze(_get_queries(time_to_analyze_hours, min_query_time))
+            if (suggestion.property_name, suggestion.table_column) not in get_materialized_columns(suggestion.table)
+        ]
+        columns_to_materialize = [
+            suggestion.as_suggestion()
+            for suggestion in _evaluate(suggestions, maximum, benchmark_queries, minimum_speedup)
+        ]
     result = []
     for suggestion in columns_to_materialize:
         table, table_column, property_name, _ = suggestion
@@ -0,0 +1,145 @@
+import re
+from time import perf_counter
+from typing import List, Optional
+
+import structlog
+
+from ee.clickhouse.materialized_columns.columns import TRIM_AND_EXTRACT_PROPERTY
+from posthog.clickhouse.client.escape import escape_param_for_clickhouse
+from posthog.client import sync_execute
+from posthog.models.property import PropertyName, TableColumn
+from posthog.models.utils import generate_random_short_suffix
+
+logger = structlog.get_logger(__name__)
+
+# Each query is run this many times against each table, keeping the fastest run
+BENCHMARK_RUNS = 3
+BENCHMARK_QUERY_SETTINGS = {"max_execution_time": 60}
+# Data is copied from this far back, as that's what most queries look at
+SAMPLE_PERIOD_DAYS = 30
+
+BENCHMARK_COLUMN = "benchmarked_property"
+
+SQL_KEYWORDS = {
+    "ALL",
+    "ANY",
+    "ARRAY",
+    "AS",
+    "CROSS",
+    "FINAL",
+    "FORMAT",
+    "FULL",
+    "GLOBAL",
+    "GROUP",
+    "HAVING",
+    "INNER",
+    "JOIN",
+    "LEFT",
+    "LIMIT",
+    "ON",
+    "ORDER",
+    "PREWHERE",
+    "RIGHT",
+    "SAMPLE",
+    "SETTINGS",
+    "UNION",
+    "USING",
+    "WHERE",
+}
+
+
+def benchmark_materialized_column(
+    team_ids: List[int], table_column: TableColumn, property: PropertyName, queries: List[str], sample_rows: int
+) -> Optional[float]:
+    """
+    Measures how much faster `queries` (as found in the query log) get with `property` of the events table materialized.
+
+    A sample of the teams' recent events is copied into two temporary tables, the second of which also has the
+    property materialized. The queries are re-run against both, after rewriting them to read the materialized column
+    on the second. Returns how many times faster they were on the second, or None if none of them could be run.
+    """
+    suffix = generate_random_short_suffix().lower()
+    without_column = f"materialized_column_benchmark_{suffix}_a"
+    with_column = f"materialized_column_benchmark_{suffix}_b"
+
+    try:
+        for table_name in (without_column, with_column):
+            sync_execute(
+                f"""
+                CREATE TABLE {table_name} AS events
+                ENGINE = MergeTree()
+                ORDER BY (team_id, toDate(timestamp), event, cityHash64(distinct_id), cityHash64(uuid))
+                """
+            )
+        sync_execute(
+            f"""
+            ALTER TABLE {with_column}
+            ADD COLUMN {BENCHMARK_COLUMN} VARCHAR MATERIALIZED {TRIM_AND_EXTRACT_PROPERTY.format(table_column=table_column)}
+            """,
+            {"property": property},
+        )
+        sync_execute(
+            f"""
+            INSERT INTO {without_column}
+            SELECT * FROM events
+            WHERE team_id IN %(team_ids)s AND timestamp > now() - toIntervalDay(%(days)s)
+            LIMIT %(limit)s
+            """,
+            {"team_ids": team_ids, "days": SAMPLE_PERIOD_DAYS, "limit": sample_rows},
+        )
+        sync_execute(f"INSERT INTO {with_column} SELECT * FROM {without_column}")
+
+        time_without_column = 0.0
+        time_with_column = 0.0
+        for query in queries:
+            query_with_column = use_materialized_column(query, table_column, property, BENCHMARK_COLUMN)
+            if query_with_column is None:
+                continue
+            try:
+                duration_without_column = _time_query(use_table(query, without_column))
+                duration_with_column = _time_query(use_table(query_with_column, with_column))
+            except Exception as err:
+                logger.warn("materialized_column_benchmark_query_failed", property=property, error=str(err))
+                continue
+            time_without_column += duration_without_column
+            time_with_column += duration_with_column
+
+        if time_with_column == 0:
+            return None
+        return time_without_column / time_with_column
+    finally:
+        for table_name in (without_column, with_column):
+            sync_execute(f"DROP TABLE IF EXISTS {table_name}")
+
+
+def use_table(query: str, table_name: str) -> str:
+    "Rewrites `query` to read `table_name` wherever it reads the events table"
+
+    def replace(match: re.Match) -> str:
+        alias = match.group(3)
+        if alias is not None and alias.upper() not in SQL_KEYWORDS:
+            return f"{match.group(1)} {table_name}{match.group(2)}{alias}"
+        return f"{match.group(1)} {table_name} AS events{match.group(2) or ''}{alias or ''}"
+
+    return re.sub(r"\b(FROM|JOIN)\s+events\b(?!\.)(\s+(?:AS\s+)?)?(\w+)?", replace, query, flags=re.IGNORECASE)
+
+
+def use_materialized_column(
+    query: str, table_column: TableColumn, property: PropertyName, column_name: str
+) -> Optional[str]:
+    "Rewrites `query` to read `column_name` instead of extracting `property`. Returns None if it doesn't extract it."
+    extract_property = TRIM_AND_EXTRACT_PROPERTY.format(table_column=f"{{table_alias}}{table_column}") % {
+        "property": escape_param_for_clickhouse(property)
+    }
+    pattern = re.escape(extract_property).replace(re.escape("{table_alias}"), r"((?:\w+\.)?)")
+    rewritten, count = re.subn(pattern, lambda match: f"{match.group(1)}{column_name}", query)
+    return rewritten if count > 0 else None
+
+
+def _time_query(query: str) -> float:
+    fastest = float("inf")
+    for _ in range(BENCHMARK_RUNS):
+        start_time = perf_counter()
+        sync_execute(query, settings=BENCHMARK_QUERY_SETTINGS)
+        fastest = min(fastest, perf_counter() - start_time)
+    return fastest
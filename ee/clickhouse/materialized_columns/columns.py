@@ -1,8 +1,20 @@
 import re
 from datetime import timedelta
-from typing import Dict, List, Literal, Tuple, Union, cast
-
+from time import monotonic, sleep
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
+
+import structlog
 from clickhouse_driver.errors import ServerException
+from django.conf import settings
 from django.utils.timezone import now
 
 from posthog.cache_utils import cache_for
@@ -11,11 +23,19 @@ from posthog.client import sync_execute
 from posthog.models.instance_setting import get_instance_setting
 from posthog.models.property import PropertyName, TableColumn, TableWithProperties
 from posthog.models.utils import generate_random_short_suffix
+from posthog.redis import get_client
 from posthog.settings import CLICKHOUSE_CLUSTER, CLICKHOUSE_DATABASE, TEST
 
 ColumnName = str
 DEFAULT_TABLE_COLUMN: Literal["properties"] = "properties"
 
+BACKFILL_PROGRESS_KEY_PREFIX = "materialized_column_backfill"
+# Progress of backfills not run again within this time is forgotten
+BACKFILL_PROGRESS_TTL_SECONDS = 7 * 24 * 60 * 60
+BACKFILL_POLL_INTERVAL_SECONDS = 0.5
+
+logger = structlog.get_logger(__name__)
+
 
 TablesWithMaterializedColumns = Union[TableWithProperties, Literal["session_recording_events"]]
 
@@ -144,11 +164,15 @@ def backfill_materialized_columns(
     properties: List[Tuple[PropertyName, TableColumn]],
     backfill_period: timedelta,
     test_settings=None,
+    newest_first: bool = True,
 ) -> None:
     """
     Backfills the materialized column after its creation.
 
-    This will require reading and writing a lot of data on clickhouse disk.
+    This will require reading and writing a lot of data on clickhouse disk, so it's done one partition at a time,
+    waiting for each partition's mutation to finish and for ClickHouse to keep up with merges before moving on.
+    Finished partitions are remembered, so that a backfill that was interrupted continues where it left off when
+    run again.
     """
 
     if len(properties) == 0:
@@ -175,22 +199,117 @@ def backfill_materialized_columns(
             settings=test_settings,
         )
 
-    # Kick off mutations which will update clickhouse partitions in the background. This will return immediately
-    assignments = ", ".join(
-        f"{materialized_columns[property_and_column]} = {materialized_columns[property_and_column]}"
-        for property_and_column in properties
+    columns = [materialized_columns[property_and_column] for property_and_column in properties]
+    assignments = ", ".join(f"{column} = {column}" for column in columns)
+    cutoff = (now() - backfill_period).strftime("%Y-%m-%d")
+    progress_key = f"{BACKFILL_PROGRESS_KEY_PREFIX}:{updated_table}:{','.join(sorted(columns))}"
+    redis_client = get_client()
+    finished_partitions = {partition.decode() for partition in redis_client.smembers(progress_key)}
+
+    partitions = _get_partitions(updated_table, cutoff if table == "events" else None)
+    if newest_first:
+        partitions.reverse()
+
+    for partition in partitions:
+        if partition in finished_partitions:
+            continue
+
+        _wait_for_capacity(updated_table)
+        logger.info(f"Backfilling materialized columns. table={updated_table}, partition={partition}")
+        # Mutations are run in the background, so wait for it to finish before moving on to the next partition
+        sync_execute(
+            f"""
+            ALTER TABLE {updated_table}
+            {execute_on_cluster}
+            UPDATE {assignments}
+            IN PARTITION ID %(partition)s
+            WHERE {"timestamp > %(cutoff)s" if table == "events" else "1 = 1"}
+            """,
+            {"partition": partition, "cutoff": cutoff},
+            settings=test_settings,
+        )
+        _wait_for_mutation(updated_table, f"{columns[0]} = {columns[0]}")
+
+        redis_client.sadd(progress_key, partition)
+        redis_client.expire(progress_key, BACKFILL_PROGRESS_TTL_SECONDS)
+
+    redis_client.delete(progress_key)
+
+
+def _get_partitions(table: str, cutoff: Optional[str]) -> List[str]:
+    "Returns IDs of the table's partitions holding data after `cutoff`, oldest first. Events are partitioned by month"
+    rows = sync_execute(
+        f"""
+        SELECT DISTINCT partition_id
+        FROM clusterAllReplicas(%(cluster)s, system, 'parts')
+        WHERE database = %(database)s
+          AND table = %(table)s
+          AND active
+          {"AND partition_id >= %(cutoff_partition)s" if cutoff is not None else ""}
+        ORDER BY partition_id
+        """,
+        {
+            "cluster": CLICKHOUSE_CLUSTER,
+            "database": CLICKHOUSE_DATABASE,
+            "table": table,
+            "cutoff_partition": cutoff.replace("-", "")[:6] if cutoff is not None else None,
+        },
     )
+    return [partition for (partition,) in rows]
 
-    sync_execute(
+
+def _wait_for_capacity(table: str) -> None:
+    """
+    Waits for every replica of the table to have no more than MATERIALIZE_COLUMNS_BACKFILL_MAX_PARTS parts and
+    MATERIALIZE_COLUMNS_BACKFILL_MAX_MUTATIONS unfinished mutations, counted the same way as the
+    clickhouse_part_count and clickhouse_mutation_count metrics, to not compete with merges of ingested data.
+    """
+    _wait_until(
+        lambda: _max_count_per_replica("parts", table) <= settings.MATERIALIZE_COLUMNS_BACKFILL_MAX_PARTS
+        and _max_count_per_replica("mutations", table, "is_done = 0")
+        <= settings.MATERIALIZE_COLUMNS_BACKFILL_MAX_MUTATIONS,
+        f"Timed out waiting for {table} to have fewer parts and mutations",
+    )
+
+
+def _max_count_per_replica(system_table: str, table: str, condition: str = "1 = 1") -> int:
+    rows = sync_execute(
         f"""
-        ALTER TABLE {updated_table}
-        {execute_on_cluster}
-        UPDATE {assignments}
-        WHERE {"timestamp > %(cutoff)s" if table == "events" else "1 = 1"}
+        SELECT max(rows_count)
+        FROM (
+            SELECT hostName() AS host, count(1) AS rows_count
+            FROM clusterAllReplicas(%(cluster)s, system, '{system_table}')
+            WHERE database = %(database)s AND table = %(table)s AND {condition}
+            GROUP BY host
+        )
         """,
-        {"cutoff": (now() - backfill_period).strftime("%Y-%m-%d")},
-        settings=test_settings,
+        {"cluster": CLICKHOUSE_CLUSTER, "database": CLICKHOUSE_DATABASE, "table": table},
     )
+    return rows[0][0] if rows else 0
+
+
+def _wait_for_mutation(table: str, command: str) -> None:
+    "Waits for the mutation to be done on every replica, as mutations ON CLUSTER run on each shard independently"
+    _wait_until(
+        lambda: sync_execute(
+            """
+            SELECT count(1)
+            FROM clusterAllReplicas(%(cluster)s, system, 'mutations')
+            WHERE database = %(database)s AND table = %(table)s AND is_done = 0 AND position(command, %(command)s) > 0
+            """,
+            {"cluster": CLICKHOUSE_CLUSTER, "database": CLICKHOUSE_DATABASE, "table": table, "command": command},
+        )[0][0]
+        == 0,
+        f"Timed out waiting for mutation of {table} to finish",
+    )
+
+
+def _wait_until(condition: Callable[[], bool], timeout_message: str) -> None:
+    deadline = monotonic() + settings.MATERIALIZE_COLUMNS_BACKFILL_WAIT_TIMEOUT_SECONDS
+    while not condition():
+        if monotonic() > deadline:
+            raise TimeoutError(timeout_message)
+        sleep(BACKFILL_POLL_INTERVAL_SECONDS)
 
 
 def _materialized_column_name(
@@ -1,4 +1,18 @@
-from ee.clickhouse.materialized_columns.analyze import Query, TeamManager
+from unittest.mock import patch
+
+from ee.clickhouse.materialized_columns.analyze import (
+    ColumnSuggestion,
+    Query,
+    TeamManager,
+    _analyze,
+    _estimate_value_ratio,
+    _evaluate,
+)
+from ee.clickhouse.materialized_columns.benchmark import (
+    benchmark_materialized_column,
+    use_materialized_column,
+    use_table,
+)
 from posthog.clickhouse.kafka_engine import trim_quotes_expr
 from posthog.models import Person, PropertyDefinition
 from posthog.models.event.util import bulk_create_events
@@ -70,11 +84,6 @@ class TestMaterializedColumnsAnalyze(ClickhouseTestMixin, BaseTest):
             person_on_events_query = Query(*self.DUMMY_QUERIES[2])
             group_on_events_query = Query(*self.DUMMY_QUERIES[3])
 
-            self.assertTrue(event_query.is_valid)
-            self.assertTrue(person_query.is_valid)
-            self.assertTrue(person_on_events_query.is_valid)
-            self.assertTrue(group_on_events_query.is_valid)
-
             self.assertEqual(event_query.team_id, str(self.team.pk))
             self.assertEqual(person_query.team_id, str(self.team.pk))
             self.assertEqual(person_on_events_query.team_id, str(self.team.pk))
@@ -106,7 +115,6 @@ class TestMaterializedColumnsAnalyze(ClickhouseTestMixin, BaseTest):
 
     def test_query_class_edge_cases(self):
         invalid_query = Query("SELECT * FROM events WHERE team_id = -1", 100)
-        self.assertFalse(invalid_query.is_valid)
         self.assertIsNone(invalid_query.team_id)
 
         query_with_unknown_property = Query(
@@ -121,3 +129,101 @@ class TestMaterializedColumnsAnalyze(ClickhouseTestMixin, BaseTest):
             f"SELECT JSONExtractString(, 'prop') FROM events WHERE team_id = {self.team.pk}", 3340
         )
         self.assertEqual(list(query_with_invalid_column.properties(TeamManager())), [])
+
+    def test_query_class_reads_tags_and_escaped_properties(self):
+        query = Query(
+            "SELECT JSONExtractString(properties, 'it\\'s') FROM events WHERE team_id = 99999",
+            3400,
+            read_bytes=1000,
+            tagged_team_id=self.team.pk,
+        )
+
+        self.assertEqual(query.team_id, str(self.team.pk))
+        self.assertEqual(query._all_properties, [("properties", "it's")])
+
+    def test_analyze_ranks_by_read_bytes(self):
+        queries = [
+            Query(*self.DUMMY_QUERIES[0], read_bytes=1000),
+            Query(*self.DUMMY_QUERIES[1], read_bytes=300),
+            Query("SELECT JSONExtractString(properties, 'event_prop') FROM events WHERE team_id = 99999", 9000),
+        ]
+
+        with self.settings(MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME=3000):
+            suggestions = _analyze(queries)
+
+        self.assertEqual(
+            [
+                (suggestion.table, suggestion.property_name, suggestion.read_bytes, suggestion.cost)
+                for suggestion in suggestions
+            ],
+            [("events", "event_prop", 500, 4), ("events", "another_prop", 500, 4), ("person", "person_prop", 300, 7)],
+        )
+
+    def test_estimate_value_ratio(self):
+        self._create_recent_events()
+        suggestion = _analyze([Query(*self.DUMMY_QUERIES[0], read_bytes=1000)])[0]
+
+        _estimate_value_ratio(suggestion)
+
+        assert suggestion.value_ratio is not None and suggestion.saved_bytes is not None
+        self.assertTrue(0 < suggestion.value_ratio < 1)
+        self.assertTrue(0 < suggestion.saved_bytes < 1000)
+
+    @patch("ee.clickhouse.materialized_columns.analyze._estimate_value_ratio")
+    @patch("ee.clickhouse.materialized_columns.analyze._benchmark")
+    def test_evaluate_stops_once_budget_is_spent(self, mock_benchmark, mock_estimate_value_ratio):
+        def benchmark(suggestion, query_count, sample_rows):
+            suggestion.speedup = 1.0
+
+        mock_benchmark.side_effect = benchmark
+        suggestions = [ColumnSuggestion("events", "properties", f"prop_{index}") for index in range(10)]
+
+        self.assertEqual(_evaluate(suggestions, maximum=2, benchmark_queries=1, minimum_speedup=1.1), [])
+        self.assertEqual(mock_benchmark.call_count, 4)
+        self.assertEqual(mock_estimate_value_ratio.call_count, 4)
+
+    def test_benchmark_materialized_column(self):
+        self._create_recent_events()
+        extract_property = trim_quotes_expr("JSONExtractRaw(e.properties, 'event_prop')")
+        query = f"SELECT {extract_property} AS v, count() FROM events e WHERE team_id = {self.team.pk} GROUP BY v"
+
+        speedup = benchmark_materialized_column(
+            team_ids=[self.team.pk],
+            table_column="properties",
+            property="event_prop",
+            queries=[query],
+            sample_rows=1000,
+        )
+
+        self.assertIsNotNone(speedup)
+
+    def test_benchmark_query_rewriting(self):
+        self.assertEqual(
+            use_table("SELECT count() FROM events e JOIN (SELECT 1 FROM events WHERE 1) USING x", "sample"),
+            "SELECT count() FROM sample e JOIN (SELECT 1 FROM sample AS events WHERE 1) USING x",
+        )
+        self.assertEqual(
+            use_table("SELECT events.event FROM events", "sample"), "SELECT events.event FROM sample AS events"
+        )
+
+        extract_property = trim_quotes_expr("JSONExtractRaw(e.person_properties, 'it\\'s')")
+        self.assertEqual(
+            use_materialized_column(f"SELECT {extract_property} FROM events e", "person_properties", "it's", "mat_its"),
+            "SELECT e.mat_its FROM events e",
+        )
+        self.assertIsNone(
+            use_materialized_column(f"SELECT {extract_property} FROM events e", "properties", "it's", "mat_its")
+        )
+
+    def _create_recent_events(self):
+        bulk_create_events(
+            [
+                {
+                    "event": "$pageview",
+                    "distinct_id": "user_id",
+                    "team": self.team,
+                    "properties": {"event_prop": f"value {index % 10}", "$current_url": "https://posthog.com/"},
+                }
+                for index in range(100)
+            ]
+        )
@@ -5,6 +5,7 @@ from time import sleep
 from freezegun import freeze_time
 
 from ee.clickhouse.materialized_columns.columns import (
+    BACKFILL_PROGRESS_KEY_PREFIX,
     backfill_materialized_columns,
     get_materialized_columns,
     materialize,
@@ -13,6 +14,7 @@ from posthog.client import sync_execute
 from posthog.conftest import create_clickhouse_tables
 from posthog.constants import GROUP_TYPES_LIMIT
 from posthog.models.event.sql import EVENTS_DATA_TABLE
+from posthog.redis import get_client
 from posthog.settings import CLICKHOUSE_DATABASE
 from posthog.test.base import BaseTest, ClickhouseTestMixin, _create_event
 
@@ -168,6 +170,23 @@ class TestMaterializedColumns(ClickhouseTestMixin, BaseTest):
             [("1", ""), ("2", "5"), ("3", ""), ("", ""), ("4", ""), ("", "6"), ("", "7")],
         )
 
+    def test_backfill_continues_where_it_left_off(self):
+        for timestamp in ["2021-04-02 00:00:00", "2021-05-02 00:00:00"]:
+            _create_event(
+                event="some_event", distinct_id="1", team=self.team, timestamp=timestamp, properties={"prop": 1}
+            )
+        materialize("events", "prop", create_minmax_index=True)
+
+        progress_key = f"{BACKFILL_PROGRESS_KEY_PREFIX}:{EVENTS_DATA_TABLE()}:mat_prop"
+        get_client().sadd(progress_key, "202104")
+
+        with freeze_time("2021-05-10T14:00:01Z"):
+            backfill_materialized_columns("events", [("prop", "properties")], timedelta(days=50))
+
+        self.assertEqual(self._count_materialized_rows("mat_prop", partition="202104"), 0)
+        self.assertEqual(self._count_materialized_rows("mat_prop", partition="202105"), 1)
+        self.assertFalse(get_client().exists(progress_key))
+
     def test_column_types(self):
         materialize("events", "myprop", create_minmax_index=True)
 
@@ -185,16 +204,18 @@ class TestMaterializedColumns(ClickhouseTestMixin, BaseTest):
             mark_all_materialized()
             self.assertEqual(("MATERIALIZED", expr), self._get_column_types("mat_myprop"))
 
-    def _count_materialized_rows(self, column):
+    def _count_materialized_rows(self, column, partition=None):
         return sync_execute(
-            """
+            f"""
             SELECT sum(rows)
             FROM system.parts_columns
             WHERE database = %(database)s
               AND table = %(table)s
               AND column = %(column)s
+              AND active
+              {"AND partition_id = %(partition)s" if partition else ""}
         """,
-            {"database": CLICKHOUSE_DATABASE, "table": EVENTS_DATA_TABLE(), "column": column},
+            {"database": CLICKHOUSE_DATABASE, "table": EVENTS_DATA_TABLE(), "column": column, "partition": partition},
         )[0][0]
 
     def _get_count_of_mutations_running(self) -> int:
@@ -300,6 +300,24 @@ class TestCohort(ClickhouseTestMixin, BaseTest):
         self.assertIn(str(user1.uuid), results)
         self.assertIn(str(user3.uuid), results)
 
+    def test_clickhouse_persons_query_yields_persons_in_batches(self):
+        user1 = _create_person(distinct_ids=["user1"], team_id=self.team.pk, properties={"$some_prop": "something"})
+        _create_person(distinct_ids=["user2"], team_id=self.team.pk, properties={"$some_prop": "another"})
+        user3 = _create_person(distinct_ids=["user3"], team_id=self.team.pk, properties={"$some_prop": "something"})
+        user4 = _create_person(distinct_ids=["user4"], team_id=self.team.pk, properties={"$some_prop": "something"})
+        cohort = Cohort.objects.create(
+            team=self.team,
+            groups=[{"properties": [{"key": "$some_prop", "value": "something", "type": "person"}]}],
+            name="cohort1",
+        )
+
+        batches = [list(persons) for persons in cohort._clickhouse_persons_query(batch_size=2)]
+        self.assertEqual([len(persons) for persons in batches], [2, 1])
+        self.assertEqual(
+            {str(person.uuid) for persons in batches for person in persons},
+            {str(user1.uuid), str(user3.uuid), str(user4.uuid)},
+        )
+
     def test_insert_by_distinct_id_or_email(self):
         Person.objects.create(team_id=self.team.pk, distinct_ids=["1"])
         Person.objects.create(team_id=self.team.pk, distinct_ids=["123"])
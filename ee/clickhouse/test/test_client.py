@@ -5,7 +5,8 @@ from clickhouse_driver.errors import ServerException
 from django.test import TestCase
 
 from posthog.clickhouse.client import execute_async as client
-from posthog.client import sync_execute
+from posthog.clickhouse.client.connection import Workload, get_pool
+from posthog.client import stream_execute, sync_execute
 from posthog.test.base import ClickhouseTestMixin
 
 
@@ -127,3 +128,35 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
             # Make sure it still includes the "annotation" comment that includes
             # request routing information for debugging purposes
             self.assertIn("/* request:1 */", first_query)
+
+    def test_stream_execute(self):
+        progress = []
+        with self.capture_select_queries() as sqls:
+            rows = stream_execute(
+                "SELECT number FROM numbers(%(count)s)",
+                {"count": 25},
+                with_column_types=True,
+                progress_interval=10,
+                on_progress=progress.append,
+            )
+
+            self.assertEqual(next(rows), [("number", "UInt64")])
+            self.assertEqual(list(rows), [(number,) for number in range(25)])
+            self.assertEqual(len(sqls), 1)
+            self.assertIn("SELECT number FROM numbers(25)", sqls[0])
+        self.assertEqual([update.rows_streamed for update in progress], [10, 20, 25])
+
+    def test_stream_execute_stopped_early_does_not_reuse_connection(self):
+        rows = stream_execute("SELECT number FROM numbers(1000000)", settings={"max_block_size": 10})
+        self.assertEqual(next(rows), (0,))
+        rows.close()
+
+        # The connection with the rest of the result on the wire was dropped, so the next query works
+        self.assertEqual(sync_execute("SELECT 1"), [(1,)])
+        self.assertEqual(len(get_pool(Workload.DEFAULT)._used), 0)
+
+    def test_stream_execute_wraps_errors(self):
+        with self.assertRaises(ServerException) as error:
+            list(stream_execute("SELECT WOW SUCH DATA FROM NOWHERE"))
+
+        self.assertEqual(type(error.exception).__name__, "CHQueryErrorSyntaxError")
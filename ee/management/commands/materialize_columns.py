@@ -7,6 +7,7 @@ from ee.clickhouse.materialized_columns.columns import DEFAULT_TABLE_COLUMN
 from posthog.settings import (
     MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS,
     MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS,
+    MATERIALIZE_COLUMNS_BENCHMARK_QUERIES,
     MATERIALIZE_COLUMNS_MAX_AT_ONCE,
     MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
 )
@@ -52,6 +53,12 @@ class Command(BaseCommand):
             default=MATERIALIZE_COLUMNS_MAX_AT_ONCE,
             help="Max number of columns to materialize via single invocation. Same as MATERIALIZE_COLUMNS_MAX_AT_ONCE env variable.",
         )
+        parser.add_argument(
+            "--benchmark-queries",
+            type=int,
+            default=MATERIALIZE_COLUMNS_BENCHMARK_QUERIES,
+            help="How many slow queries to benchmark per column before materializing it. 0 to disable. Same as MATERIALIZE_COLUMNS_BENCHMARK_QUERIES env variable.",
+        )
 
     def handle(self, *args, **options):
         logger.setLevel(logging.INFO)
@@ -74,4 +81,5 @@ class Command(BaseCommand):
                 min_query_time=options["min_query_time"],
                 backfill_period_days=options["backfill_period"],
                 dry_run=options["dry_run"],
+                benchmark_queries=options["benchmark_queries"],
             )
@@ -55,7 +55,25 @@ MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS = get_from_env(
 )
 # How big of a timeframe to backfill when materializing event properties. 0 for no backfilling
 MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS = get_from_env("MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS", 90, type_cast=int)
+# Backfills of materialized columns wait for tables to have at most this many parts and unfinished mutations before
+# moving on to the next partition, and give up if that or a partition's mutation takes longer than the timeout
+MATERIALIZE_COLUMNS_BACKFILL_MAX_PARTS = get_from_env("MATERIALIZE_COLUMNS_BACKFILL_MAX_PARTS", 3000, type_cast=int)
+MATERIALIZE_COLUMNS_BACKFILL_MAX_MUTATIONS = get_from_env(
+    "MATERIALIZE_COLUMNS_BACKFILL_MAX_MUTATIONS", 1, type_cast=int
+)
+MATERIALIZE_COLUMNS_BACKFILL_WAIT_TIMEOUT_SECONDS = get_from_env(
+    "MATERIALIZE_COLUMNS_BACKFILL_WAIT_TIMEOUT_SECONDS", 6 * 60 * 60, type_cast=int
+)
 # Maximum number of columns to materialize at once. Avoids running into resource bottlenecks (storage + ingest + backfilling).
 MATERIALIZE_COLUMNS_MAX_AT_ONCE = get_from_env("MATERIALIZE_COLUMNS_MAX_AT_ONCE", 10, type_cast=int)
+# How many of the slow queries using a property to re-run against a sample of events with and without the property
+# materialized, before materializing it. 0 to materialize without benchmarking
+MATERIALIZE_COLUMNS_BENCHMARK_QUERIES = get_from_env("MATERIALIZE_COLUMNS_BENCHMARK_QUERIES", 3, type_cast=int)
+# How many events to copy into the temporary tables the benchmark runs against
+MATERIALIZE_COLUMNS_BENCHMARK_SAMPLE_ROWS = get_from_env(
+    "MATERIALIZE_COLUMNS_BENCHMARK_SAMPLE_ROWS", 1_000_000, type_cast=int
+)
+# How much faster benchmarked queries need to get for a property to be materialized
+MATERIALIZE_COLUMNS_MINIMUM_SPEEDUP = get_from_env("MATERIALIZE_COLUMNS_MINIMUM_SPEEDUP", 1.1, type_cast=float)
 
 BILLING_SERVICE_URL = get_from_env("BILLING_SERVICE_URL", "https://billing.posthog.com")
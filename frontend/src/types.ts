@@ -2628,6 +2628,7 @@ export interface ExportedAssetType {
     export_context?: ExportContext
     has_content: boolean
     filename: string
+    export_progress?: { rows_exported: number; completion: number | null } | null
 }
 
 export enum FeatureFlagReleaseType {
@@ -3,7 +3,7 @@ import json
 import re
 import time
 from datetime import datetime
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import structlog
 from dateutil import parser
@@ -12,7 +12,6 @@ from django.http import JsonResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from kafka.errors import KafkaError
-from kafka.producer.future import FutureRecordMetadata
 from prometheus_client import Counter
 from rest_framework import status
 from sentry_sdk import configure_scope
@@ -28,14 +27,17 @@ from posthog.api.utils import (
     safe_clickhouse_string,
 )
 from posthog.exceptions import generate_exception_response
-from posthog.kafka_client.client import KafkaProducer
+from posthog.kafka_client.client import KafkaMessage, KafkaProducer, ProduceBatchFuture
 from posthog.kafka_client.topics import KAFKA_DEAD_LETTER_QUEUE, KAFKA_SESSION_RECORDING_EVENTS
 from posthog.logging.timing import timed
 from posthog.metrics import LABEL_RESOURCE_TYPE, LABEL_TEAM_ID
 from posthog.models.feature_flag import get_all_feature_flags
 from posthog.models.utils import UUIDT
-from posthog.session_recordings.session_recording_helpers import preprocess_session_recording_events_for_clickhouse
-from posthog.utils import cors_response, get_ip_address
+from posthog.session_recordings.session_recording_helpers import (
+    iter_preprocessed_session_recording_events,
+    preprocess_session_recording_events_for_clickhouse,
+)
+from posthog.utils import JSONArrayStream, cors_response, get_ip_address
 
 logger = structlog.get_logger(__name__)
 
@@ -67,6 +69,10 @@ PARTITION_KEY_CAPACITY_EXCEEDED_COUNTER = Counter(
     labelnames=["partition_key"],
 )
 
+# Number of events produced to Kafka per `produce_batch` call. Bounds how many serialized events are held in
+# memory at once when streaming a batch.
+PRODUCE_BATCH_SIZE = 100
+
 TOKEN_SHAPE_INVALID_COUNTER = Counter(
     "capture_token_shape_invalid_total",
     "Events dropped due to an invalid token shape, per reason.",
@@ -99,16 +105,20 @@ def parse_kafka_event_data(
     }
 
 
-def log_event(data: Dict, event_name: str, partition_key: Optional[str]):
+def _get_kafka_topic(event_name: str) -> str:
     # To allow for different quality of service on session recordings and
     # `$performance_event` and other events, we push to a different topic.
     # TODO: split `$performance_event` out to it's own topic.
-    kafka_topic = (
+    return (
         KAFKA_SESSION_RECORDING_EVENTS
         if event_name in SESSION_RECORDING_EVENT_NAMES
         else settings.KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC
     )
 
+
+def log_event(data: Dict, event_name: str, partition_key: Optional[str]):
+    kafka_topic = _get_kafka_topic(event_name)
+
     logger.debug("logging_event", event_name=event_name, kafka_topic=kafka_topic)
 
     # TODO: Handle Kafka being unavailable with exponential backoff retries
@@ -122,6 +132,18 @@ def log_event(data: Dict, event_name: str, partition_key: Optional[str]):
         raise e
 
 
+def log_events_batch(messages: List[KafkaMessage]) -> ProduceBatchFuture:
+    """Produces a batch of events built by `build_kafka_message` with a single aggregate delivery future."""
+    try:
+        future = KafkaProducer().produce_batch(messages)
+        statsd.incr("posthog_cloud_plugin_server_ingestion", count=len(messages))
+        return future
+    except Exception as e:
+        statsd.incr("capture_endpoint_log_event_error")
+        logger.exception("Failed to produce batch of %s events to Kafka with error", len(messages))
+        raise e
+
+
 def log_event_to_dead_letter_queue(
     raw_payload: Dict,
     event_name: str,
@@ -247,33 +269,35 @@ def _ensure_web_feature_flags_in_properties(
 
 
 def drop_events_over_quota(
-    token: str, events: List[Any], ingestion_context: Optional[EventIngestionContext]
-) -> List[Any]:
+    token: str, events: Iterable[Any], ingestion_context: Optional[EventIngestionContext]
+) -> Iterable[Any]:
+    """
+    Filters out events of quota-limited teams. Lists are filtered eagerly, any other iterable (e.g. a streamed
+    batch) is filtered lazily.
+    """
     if not settings.EE_AVAILABLE:
         return events
 
     from ee.billing.quota_limiting import QuotaResource, list_limited_team_tokens
 
-    results = []
     limited_tokens_events = list_limited_team_tokens(QuotaResource.EVENTS)
     limited_tokens_recordings = list_limited_team_tokens(QuotaResource.RECORDINGS)
     team_id = ingestion_context.team_id if ingestion_context else None
 
-    for event in events:
+    def is_over_quota(event: Any) -> bool:
         if event.get("event") in SESSION_RECORDING_EVENT_NAMES:
             if token in limited_tokens_recordings:
                 EVENTS_DROPPED_OVER_QUOTA_COUNTER.labels(resource_type="recordings", team_id=team_id, token=token).inc()
-                if settings.QUOTA_LIMITING_ENABLED:
-                    continue
+                return settings.QUOTA_LIMITING_ENABLED
 
         elif token in limited_tokens_events:
             EVENTS_DROPPED_OVER_QUOTA_COUNTER.labels(resource_type="events", team_id=team_id, token=token).inc()
-            if settings.QUOTA_LIMITING_ENABLED:
-                continue
+            return settings.QUOTA_LIMITING_ENABLED
 
-        results.append(event)
+        return False
 
-    return results
+    results = (event for event in events if not is_over_quota(event))
+    return list(results) if isinstance(events, list) else results
 
 
 @csrf_exempt
@@ -288,7 +312,7 @@ def get_event(request):
 
     now = timezone.now()
 
-    data, error_response = get_data(request)
+    data, error_response = get_data(request, stream_batch=settings.CAPTURE_STREAMING_BATCH_ENABLED)
 
     if error_response:
         return error_response
@@ -359,11 +383,20 @@ def get_event(request):
             elif "engage" in request.path_info:  # JS identify call
                 data["event"] = "$identify"  # make sure it has an event name
 
-        if isinstance(data, list):
+        events: Iterable[Any]
+        if isinstance(data, (list, JSONArrayStream)):
             events = data
         else:
             events = [data]
 
+        if isinstance(events, JSONArrayStream) and send_events_to_dead_letter_queue:
+            # The dead letter queue keeps the raw payload, so it needs the materialized batch
+            events = data = list(events)
+
+        # A streamed batch is decoded, validated and produced one event at a time. Validation errors are then
+        # raised while iterating in the produce loop below, after earlier events have already been produced.
+        streaming = isinstance(events, JSONArrayStream)
+
         try:
             events = drop_events_over_quota(token, events, ingestion_context)
         except Exception as e:
@@ -371,7 +404,10 @@ def get_event(request):
             capture_exception(e)
 
         try:
-            events = preprocess_session_recording_events_for_clickhouse(events)
+            if streaming:
+                events = iter_preprocessed_session_recording_events(events)
+            else:
+                events = preprocess_session_recording_events_for_clickhouse(events)  # type: ignore
         except ValueError as e:
             return cors_response(
                 request, generate_exception_response("capture", f"Invalid payload: {e}", code="invalid_payload")
@@ -381,60 +417,77 @@ def get_event(request):
 
         ip = None if ingestion_context and ingestion_context.anonymize_ips else get_ip_address(request)
 
+        processed_events: Iterable[Tuple[Dict[str, Any], UUIDT, str]]
         try:
-            processed_events = list(validate_events(events, ingestion_context))
+            processed_events = validate_events(events, ingestion_context)
+            if not streaming:
+                processed_events = list(processed_events)
         except ValueError as e:
             return cors_response(
                 request, generate_exception_response("capture", f"Invalid payload: {e}", code="invalid_payload")
             )
 
-    futures: List[FutureRecordMetadata] = []
+    futures: List[ProduceBatchFuture] = []
+    messages: List[KafkaMessage] = []
+    event_count = 0
+    produce_start_time = time.monotonic()
 
     with start_span(op="kafka.produce") as span:
-        span.set_tag("event.count", len(processed_events))
-        for event, event_uuid, distinct_id in processed_events:
-            if send_events_to_dead_letter_queue:
-                kafka_event = parse_kafka_event_data(
-                    distinct_id=distinct_id,
-                    ip=None,
-                    site_url=site_url,
-                    team_id=None,
-                    now=now,
-                    event_uuid=event_uuid,
-                    data=event,
-                    sent_at=sent_at,
-                    token=token,
-                )
+        try:
+            for event, event_uuid, distinct_id in processed_events:
+                if send_events_to_dead_letter_queue:
+                    kafka_event = parse_kafka_event_data(
+                        distinct_id=distinct_id,
+                        ip=None,
+                        site_url=site_url,
+                        team_id=None,
+                        now=now,
+                        event_uuid=event_uuid,
+                        data=event,
+                        sent_at=sent_at,
+                        token=token,
+                    )
+
+                    log_event_to_dead_letter_queue(
+                        data,
+                        event["event"],
+                        kafka_event,
+                        f"Unable to fetch team from Postgres. Error: {db_error}",
+                        "django_server_capture_endpoint",
+                    )
+                    continue
 
-                log_event_to_dead_letter_queue(
-                    data,
-                    event["event"],
-                    kafka_event,
-                    f"Unable to fetch team from Postgres. Error: {db_error}",
-                    "django_server_capture_endpoint",
-                )
-                continue
-
-            try:
-                futures.append(
-                    capture_internal(
-                        event, distinct_id, ip, site_url, now, sent_at, team_id, event_uuid, token
-                    )  # type: ignore
-                )
-            except Exception as exc:
-                capture_exception(exc, {"data": data})
-                statsd.incr("posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture"})
-                logger.error("kafka_produce_failure", exc_info=exc)
-                return cors_response(
-                    request,
-                    generate_exception_response(
-                        "capture",
-                        "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
-                        code="server_error",
-                        type="server_error",
-                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    ),
+                messages.append(
+                    build_kafka_message(event, distinct_id, ip, site_url, now, sent_at, team_id, event_uuid, token)
                 )
+                if len(messages) >= PRODUCE_BATCH_SIZE:
+                    futures.append(log_events_batch(messages))
+                    event_count += len(messages)
+                    messages = []
+
+            if messages:
+                futures.append(log_events_batch(messages))
+                event_count += len(messages)
+        except ValueError as e:
+            # Only reachable when streaming a batch, validation happens while iterating
+            return cors_response(
+                request, generate_exception_response("capture", f"Invalid payload: {e}", code="invalid_payload")
+            )
+        except Exception as exc:
+            capture_exception(exc, {"data": data})
+            statsd.incr("posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture"})
+            logger.error("kafka_produce_failure", exc_info=exc)
+            return cors_response(
+                request,
+                generate_exception_response(
+                    "capture",
+                    "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
+                    code="server_error",
+                    type="server_error",
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                ),
+            )
+        span.set_tag("event.count", event_count)
 
     with start_span(op="kafka.wait"):
         span.set_tag("future.count", len(futures))
@@ -459,13 +512,17 @@ def get_event(request):
                     ),
                 )
 
+    if event_count:
+        # Time from the first produce until every event of the request is acknowledged by Kafka
+        statsd.timing("capture_endpoint_produce_latency", (time.monotonic() - produce_start_time) * 1000.0)
+
     statsd.incr("posthog_cloud_raw_endpoint_success", tags={"endpoint": "capture"})
     return cors_response(request, JsonResponse({"status": 1}))
 
 
 # TODO: Rename this function - it doesn't just validate events, it also processes them
 def validate_events(
-    events: List[Dict[str, Any]], ingestion_context: Optional[EventIngestionContext]
+    events: Iterable[Dict[str, Any]], ingestion_context: Optional[EventIngestionContext]
 ) -> Iterator[Tuple[Dict[str, Any], UUIDT, str]]:
     for event in events:
         event_uuid = UUIDT()
@@ -504,7 +561,14 @@ def parse_event(event):
     return event
 
 
-def capture_internal(event, distinct_id, ip, site_url, now, sent_at, team_id, event_uuid=None, token=None) -> None:
+def capture_internal(event, distinct_id, ip, site_url, now, sent_at, team_id, event_uuid=None, token=None):
+    message = build_kafka_message(event, distinct_id, ip, site_url, now, sent_at, team_id, event_uuid, token)
+    return log_event(message.data, event["event"], partition_key=message.key)
+
+
+def build_kafka_message(
+    event, distinct_id, ip, site_url, now, sent_at, team_id, event_uuid=None, token=None
+) -> KafkaMessage:
     if event_uuid is None:
         event_uuid = UUIDT()
 
@@ -526,7 +590,7 @@ def capture_internal(event, distinct_id, ip, site_url, now, sent_at, team_id, ev
     kafka_partition_key = None
 
     if event["event"] in ("$snapshot", "$performance_event"):
-        return log_event(parsed_event, event["event"], partition_key=kafka_partition_key)
+        return KafkaMessage(topic=_get_kafka_topic(event["event"]), data=parsed_event, key=kafka_partition_key)
 
     if team_id:
         candidate_partition_key = f"{team_id}:{distinct_id}"
@@ -536,7 +600,7 @@ def capture_internal(event, distinct_id, ip, site_url, now, sent_at, team_id, ev
     if is_randomly_partitioned(candidate_partition_key) is False:
         kafka_partition_key = hashlib.sha256(candidate_partition_key.encode()).hexdigest()
 
-    return log_event(parsed_event, event["event"], partition_key=kafka_partition_key)
+    return KafkaMessage(topic=_get_kafka_topic(event["event"]), data=parsed_event, key=kafka_partition_key)
 
 
 def is_randomly_partitioned(candidate_partition_key: str) -> bool:
@@ -1,8 +1,9 @@
 import re
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import structlog
+from django.conf import settings
 from django.http import HttpRequest, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
@@ -15,6 +16,7 @@ from posthog.exceptions import RequestParsingError, generate_exception_response
 from posthog.logging.timing import timed
 from posthog.models import Team, User
 from posthog.models.feature_flag import get_all_feature_flags
+from posthog.models.feature_flag.flag_matching import FlagsEvaluationRequest, get_all_feature_flags_for_distinct_ids
 from posthog.plugins.site import get_decide_site_apps
 from posthog.utils import cors_response, get_ip_address, load_data_from_request
 
@@ -53,6 +55,41 @@ def parse_domain(url: Any) -> Optional[str]:
     return urlparse(url).hostname
 
 
+def get_team_for_decide_request(
+    data: Dict[str, Any], request: HttpRequest, endpoint: str = "decide"
+) -> Tuple[Optional[Team], Optional[JsonResponse]]:
+    """
+    Resolves the team from a project API key, or from a personal API key and project ID.
+    Returns the error response to send instead if the keys are invalid.
+    """
+    token = get_token(data, request)
+    team = Team.objects.get_team_from_cache_or_token(token)
+    if team is None and token:
+        project_id = get_project_id(data, request)
+
+        if not project_id:
+            return None, generate_exception_response(
+                endpoint,
+                "Project API key invalid. You can find your project API key in PostHog project settings.",
+                code="invalid_api_key",
+                type="authentication_error",
+                status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        user = User.objects.get_from_personal_api_key(token)
+        if user is None:
+            return None, generate_exception_response(
+                endpoint,
+                "Invalid Personal API key.",
+                code="invalid_personal_key",
+                type="authentication_error",
+                status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+        team = user.teams.get(id=project_id)
+
+    return team, None
+
+
 @csrf_exempt
 @timed("posthog_cloud_decide_endpoint")
 def get_decide(request: HttpRequest):
@@ -94,36 +131,9 @@ def get_decide(request: HttpRequest):
                 generate_exception_response("decide", f"Malformed request data: {error}", code="malformed_data"),
             )
 
-        token = get_token(data, request)
-        team = Team.objects.get_team_from_cache_or_token(token)
-        if team is None and token:
-            project_id = get_project_id(data, request)
-
-            if not project_id:
-                return cors_response(
-                    request,
-                    generate_exception_response(
-                        "decide",
-                        "Project API key invalid. You can find your project API key in PostHog project settings.",
-                        code="invalid_api_key",
-                        type="authentication_error",
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                    ),
-                )
-
-            user = User.objects.get_from_personal_api_key(token)
-            if user is None:
-                return cors_response(
-                    request,
-                    generate_exception_response(
-                        "decide",
-                        "Invalid Personal API key.",
-                        code="invalid_personal_key",
-                        type="authentication_error",
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                    ),
-                )
-            team = user.teams.get(id=project_id)
+        team, error_response = get_team_for_decide_request(data, request)
+        if error_response is not None:
+            return cors_response(request, error_response)
 
         if team:
             structlog.contextvars.bind_contextvars(team_id=team.id)
@@ -196,3 +206,123 @@ def get_decide(request: HttpRequest):
 
     statsd.incr(f"posthog_cloud_raw_endpoint_success", tags={"endpoint": "decide"})
     return cors_response(request, JsonResponse(response))
+
+
+def _is_valid_batch_request(raw_request: Any) -> bool:
+    return (
+        isinstance(raw_request, dict)
+        and raw_request.get("distinct_id") is not None
+        and all(
+            isinstance(raw_request.get(key) or {}, dict) for key in ("groups", "person_properties", "group_properties")
+        )
+        # Group keys are looked up as strings, nested values can't be
+        and all(isinstance(group_key, (str, int, float)) for group_key in (raw_request.get("groups") or {}).values())
+    )
+
+
+@csrf_exempt
+@timed("posthog_cloud_decide_batch_endpoint")
+def get_decide_batch(request: HttpRequest):
+    """
+    Evaluates feature flags for many distinct_ids in one request, for server-side SDKs and backend jobs.
+
+    Expects `{"api_key": ..., "requests": [{"distinct_id": ..., "groups": ..., "person_properties": ...,
+    "group_properties": ...}, ...]}` and responds with one result per request, in the same order, shaped like
+    the v3 `/decide` response. No GeoIP properties are added, as the caller's IP isn't the users'.
+    """
+    if request.method == "OPTIONS":
+        return cors_response(request, JsonResponse({"status": 1}))
+
+    if request.method != "POST":
+        return cors_response(
+            request,
+            generate_exception_response(
+                "decide_batch",
+                "Only POST requests are supported.",
+                code="method_not_allowed",
+                type="validation_error",
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+            ),
+        )
+
+    try:
+        data = load_data_from_request(request)
+    except RequestParsingError as error:
+        capture_exception(error)
+        return cors_response(
+            request,
+            generate_exception_response("decide_batch", f"Malformed request data: {error}", code="malformed_data"),
+        )
+
+    if not isinstance(data, dict):
+        data = {}
+
+    team, error_response = get_team_for_decide_request(data, request, endpoint="decide_batch")
+    if error_response is not None:
+        return cors_response(request, error_response)
+    if team is None:
+        return cors_response(
+            request,
+            generate_exception_response(
+                "decide_batch",
+                "Project API key invalid. You can find your project API key in PostHog project settings.",
+                code="invalid_api_key",
+                type="authentication_error",
+                status_code=status.HTTP_401_UNAUTHORIZED,
+            ),
+        )
+    structlog.contextvars.bind_contextvars(team_id=team.id)
+
+    raw_requests = data.get("requests")
+    if not isinstance(raw_requests, list) or not all(
+        _is_valid_batch_request(raw_request) for raw_request in raw_requests
+    ):
+        return cors_response(
+            request,
+            generate_exception_response(
+                "decide_batch",
+                "Batch decide requires a list of requests, each with a distinct_id, "
+                "groups mapping group types to keys, and object properties.",
+                code="invalid_requests",
+                type="validation_error",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            ),
+        )
+    if len(raw_requests) > settings.DECIDE_BATCH_MAX_REQUESTS:
+        return cors_response(
+            request,
+            generate_exception_response(
+                "decide_batch",
+                f"Batch decide accepts at most {settings.DECIDE_BATCH_MAX_REQUESTS} requests at a time.",
+                code="too_many_requests",
+                type="validation_error",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            ),
+        )
+
+    flags_requests = [
+        FlagsEvaluationRequest(
+            distinct_id=str(raw_request["distinct_id"]),
+            groups=raw_request.get("groups") or {},
+            property_value_overrides=raw_request.get("person_properties") or {},
+            group_property_value_overrides=raw_request.get("group_properties") or {},
+        )
+        for raw_request in raw_requests
+    ]
+    statsd.gauge("posthog_cloud_decide_batch_size", len(flags_requests))
+
+    results = []
+    for flags_request, (feature_flags, _, feature_flag_payloads, errors) in zip(
+        flags_requests, get_all_feature_flags_for_distinct_ids(team.pk, flags_requests)
+    ):
+        results.append(
+            {
+                "distinct_id": flags_request.distinct_id,
+                "featureFlags": feature_flags,
+                "featureFlagPayloads": feature_flag_payloads,
+                "errorsWhileComputingFlags": errors,
+            }
+        )
+
+    statsd.incr(f"posthog_cloud_raw_endpoint_success", tags={"endpoint": "decide_batch"})
+    return cors_response(request, JsonResponse({"results": results}))
@@ -1,14 +1,13 @@
 import json
 import urllib
-from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
+from uuid import UUID
 
-from django.db.models.query import Prefetch
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter
 from rest_framework import mixins, request, response, serializers, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.settings import api_settings
 from rest_framework_csv import renderers as csvrenderers
@@ -17,12 +16,12 @@ from sentry_sdk import capture_exception
 from posthog.api.documentation import PropertiesSerializer, extend_schema
 from posthog.api.routing import StructuredViewSetMixin
 from posthog.client import query_with_columns, sync_execute
-from posthog.models import Element, Filter, Person
+from posthog.models import Element, Filter
 from posthog.models.event.events_query import QUERY_DEFAULT_EXPORT_LIMIT, QUERY_DEFAULT_LIMIT, QUERY_MAXIMUM_LIMIT
 from posthog.models.event.query_event_list import query_events_list
 from posthog.models.event.sql import GET_CUSTOM_EVENTS, SELECT_ONE_EVENT_SQL
 from posthog.models.event.util import ClickhouseEventSerializer
-from posthog.models.person.util import get_persons_by_distinct_ids
+from posthog.models.person.lookup import PersonSummary, get_person_lookup
 from posthog.models.team import Team
 from posthog.models.utils import UUIDT
 from posthog.permissions import ProjectMembershipNecessaryPermissions, TeamMemberAccessPermission
@@ -56,14 +55,17 @@ class EventViewSet(StructuredViewSetMixin, mixins.RetrieveModelMixin, mixins.Lis
     permission_classes = [IsAuthenticated, ProjectMembershipNecessaryPermissions, TeamMemberAccessPermission]
     throttle_classes = [ClickHouseBurstRateThrottle, ClickHouseSustainedRateThrottle]
 
-    def _build_next_url(self, request: request.Request, last_event_timestamp: datetime, order_by: List[str]) -> str:
+    def _build_next_url(self, request: request.Request, last_event: Dict, order_by: List[str]) -> str:
         params = request.GET.dict()
+        # The next page continues from the last event, rather than from an offset that has to be scanned again
+        params.pop("offset", None)
         reverse = "-timestamp" in order_by
-        timestamp = last_event_timestamp.astimezone().isoformat()
+        timestamp = last_event["timestamp"].astimezone().isoformat()
         if reverse:
             params["before"] = timestamp
         else:
             params["after"] = timestamp
+        params["last_uuid"] = str(last_event["uuid"])
         return request.build_absolute_uri(f"{request.path}?{urllib.parse.urlencode(params)}")
 
     @extend_schema(
@@ -93,11 +95,22 @@ class EventViewSet(StructuredViewSetMixin, mixins.RetrieveModelMixin, mixins.Lis
             OpenApiParameter(
                 "after", OpenApiTypes.DATETIME, description="Only return events with a timestamp after this time."
             ),
+            OpenApiParameter(
+                "last_uuid",
+                OpenApiTypes.UUID,
+                description="With `before` (or `after`), continue right after this event. Set in `next` URLs.",
+            ),
             OpenApiParameter("limit", OpenApiTypes.INT, description="The maximum number of results to return"),
             PropertiesSerializer(required=False),
         ]
     )
     def list(self, request: request.Request, *args: Any, **kwargs: Any) -> response.Response:
+        if request.GET.get("last_uuid"):
+            try:
+                UUID(request.GET["last_uuid"])
+            except ValueError:
+                raise ValidationError({"last_uuid": "Must be a valid UUID."})
+
         try:
             is_csv_request = self.request.accepted_renderer.format == "csv"
 
@@ -131,41 +144,21 @@ class EventViewSet(StructuredViewSetMixin, mixins.RetrieveModelMixin, mixins.Lis
                 action_id=request.GET.get("action_id"),
             )
 
-            # Retry the query without the 1 day optimization
-            if len(query_result) < limit and not request.GET.get("after"):
-                query_result = query_events_list(
-                    unbounded_date_from=True,  # only this changed from the query above
-                    filter=filter,
-                    team=team,
-                    limit=limit,
-                    offset=offset,
-                    request_get_query_dict=request.GET.dict(),
-                    order_by=order_by,
-                    action_id=request.GET.get("action_id"),
-                )
-
             result = ClickhouseEventSerializer(
                 query_result[0:limit], many=True, context={"people": self._get_people(query_result, team)}
             ).data
 
             next_url: Optional[str] = None
             if not is_csv_request and len(query_result) > limit:
-                next_url = self._build_next_url(request, query_result[limit - 1]["timestamp"], order_by)
+                next_url = self._build_next_url(request, query_result[limit - 1], order_by)
             return response.Response({"next": next_url, "results": result})
 
         except Exception as ex:
             capture_exception(ex)
             raise ex
 
-    def _get_people(self, query_result: List[Dict], team: Team) -> Dict[str, Any]:
-        distinct_ids = [event["distinct_id"] for event in query_result]
-        persons = get_persons_by_distinct_ids(team.pk, distinct_ids)
-        persons = persons.prefetch_related(Prefetch("persondistinctid_set", to_attr="distinct_ids_cache"))
-        distinct_to_person: Dict[str, Person] = {}
-        for person in persons:
-            for distinct_id in person.distinct_ids:
-                distinct_to_person[distinct_id] = person
-        return distinct_to_person
+    def _get_people(self, query_result: List[Dict], team: Team) -> Dict[str, PersonSummary]:
+        return get_person_lookup(self.request, team.pk).get_persons(event["distinct_id"] for event in query_result)
 
     def retrieve(
         self, request: request.Request, pk: Optional[Union[int, str]] = None, *args: Any, **kwargs: Any
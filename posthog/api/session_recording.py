@@ -8,9 +8,7 @@ from django.http import JsonResponse
 from rest_framework import exceptions, request, serializers, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from sentry_sdk import capture_exception
 
 from posthog.api.person import PersonSerializer
 from posthog.api.routing import StructuredViewSetMixin
@@ -161,27 +159,19 @@ class SessionRecordingViewSet(StructuredViewSetMixin, viewsets.ViewSet):
         else:
             next_url = None
 
-        res = {
-            "next": next_url,
-            "snapshot_data_by_window_id": recording.snapshot_data_by_window_id,
-            # TODO: Remove this once the frontend is migrated to use the above values
-            "result": {
+        # Rendered once, by Django's JsonResponse rather than DRF's renderer, as it copes with invalid lone surrogates
+        # in recorded text (see #13272)
+        return JsonResponse(
+            {
                 "next": next_url,
                 "snapshot_data_by_window_id": recording.snapshot_data_by_window_id,
-            },
-        }
-
-        # NOTE: We have seen some issues with encoding of emojis, specifically when there is a lone "surrogate pair". See #13272 for more details
-        # The Django JsonResponse handles this case, but the DRF Response does not. So we fall back to the Django JsonResponse if we encounter an error
-        try:
-            JSONRenderer().render(data=res)
-        except Exception:
-            capture_exception(
-                Exception("DRF Json encoding failed, falling back to Django JsonResponse"), {"response_data": res}
-            )
-            return JsonResponse(res)
-
-        return Response(res)
+                # TODO: Remove this once the frontend is migrated to use the above values
+                "result": {
+                    "next": next_url,
+                    "snapshot_data_by_window_id": recording.snapshot_data_by_window_id,
+                },
+            }
+        )
 
     # Returns properties given a list of session recording ids
     @action(methods=["GET"], detail=False)
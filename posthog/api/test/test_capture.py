@@ -714,6 +714,55 @@ class TestCapture(BaseTest):
         )
         self.assertEqual(kafka_produce.call_count, 0)
 
+    @override_settings(CAPTURE_STREAMING_BATCH_ENABLED=True)
+    @patch("posthog.kafka_client.client._KafkaProducer.produce")
+    def test_batch_streaming(self, kafka_produce):
+        data = {
+            "batch": [
+                {"type": "capture", "event": "event1", "distinct_id": "2"},
+                {"type": "capture", "event": "event2", "distinct_id": "3", "properties": {"a": "]}"}},
+            ],
+            # the token is read even when it comes after the batch
+            "api_key": self.team.api_token,
+        }
+
+        response = self.client.generic(
+            "POST",
+            "/batch/",
+            data=gzip.compress(json.dumps(data).encode()),
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(kafka_produce.call_count, 2)
+        arguments = self._to_arguments(kafka_produce)
+        self.assertEqual(arguments["distinct_id"], "3")
+        self.assertEqual(arguments["data"], data["batch"][1])  # type: ignore
+        self.assertEqual(arguments["team_id"], self.team.pk)
+
+    @override_settings(CAPTURE_STREAMING_BATCH_ENABLED=True)
+    @patch("posthog.kafka_client.client._KafkaProducer.produce")
+    def test_batch_streaming_with_invalid_event(self, kafka_produce):
+        data = [
+            {"type": "capture", "event": "event1", "distinct_id": "2"},
+            {"type": "capture", "event": "event2"},  # invalid
+            {"type": "capture", "event": "event3", "distinct_id": "2"},
+        ]
+        response = self.client.post(
+            "/batch/", data={"api_key": self.team.api_token, "batch": data}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            self.validation_error_response(
+                'Invalid payload: All events must have the event field "distinct_id"!', code="invalid_payload"
+            ),
+        )
+        # events before the invalid one have already been produced when streaming
+        self.assertEqual(kafka_produce.call_count, 1)
+
     @patch("posthog.kafka_client.client._KafkaProducer.produce")
     def test_batch_gzip_header(self, kafka_produce):
         data = {
@@ -1431,3 +1431,90 @@ class TestDecide(BaseTest, QueryMatchingTest):
             self.assertEqual(response["siteApps"], [])
             self.assertEqual(response["capturePerformance"], True)
             self.assertEqual(response["featureFlags"], {})
+
+
+class TestDecideBatch(BaseTest):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.client = Client(enforce_csrf_checks=True)
+
+    def _post_decide_batch(self, data):
+        return self.client.post("/decide/batch/", json.dumps(data), content_type="application/json")
+
+    def test_evaluates_flags_for_each_request_in_order(self):
+        Person.objects.create(team=self.team, distinct_ids=["beta-user"], properties={"email": "tim@posthog.com"})
+        Person.objects.create(team=self.team, distinct_ids=["other-user"], properties={"email": "tim@example.com"})
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="beta-feature",
+            created_by=self.user,
+            filters={
+                "groups": [
+                    {"properties": [{"key": "email", "value": "posthog", "operator": "icontains", "type": "person"}]}
+                ]
+            },
+        )
+        FeatureFlag.objects.create(
+            team=self.team, key="default-flag", created_by=self.user, filters={"groups": [{"rollout_percentage": 100}]}
+        )
+
+        response = self._post_decide_batch(
+            {
+                "api_key": self.team.api_token,
+                "requests": [
+                    {"distinct_id": "other-user"},
+                    {"distinct_id": "beta-user"},
+                    {"distinct_id": "unknown-user", "person_properties": {"email": "new@posthog.com"}},
+                ],
+            }
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (result["distinct_id"], result["featureFlags"], result["errorsWhileComputingFlags"])
+                for result in response.json()["results"]
+            ],
+            [
+                ("other-user", {"beta-feature": False, "default-flag": True}, False),
+                ("beta-user", {"beta-feature": True, "default-flag": True}, False),
+                ("unknown-user", {"beta-feature": True, "default-flag": True}, False),
+            ],
+        )
+
+    def test_invalid_requests(self):
+        response = self._post_decide_batch({"api_key": "invalid", "requests": [{"distinct_id": "a"}]})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self._post_decide_batch({"api_key": self.team.api_token, "requests": [{"groups": {}}]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_requests")
+
+        response = self._post_decide_batch(
+            {"api_key": self.team.api_token, "requests": [{"distinct_id": "a", "groups": ["organization"]}]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_requests")
+
+        response = self._post_decide_batch(
+            {"api_key": self.team.api_token, "requests": [{"distinct_id": "a", "person_properties": "email"}]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_requests")
+
+        response = self._post_decide_batch(
+            {"api_key": self.team.api_token, "requests": [{"distinct_id": "a", "groups": {"company": {"id": 1}}}]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_requests")
+
+        with self.settings(DECIDE_BATCH_MAX_REQUESTS=1):
+            response = self._post_decide_batch(
+                {"api_key": self.team.api_token, "requests": [{"distinct_id": "a"}, {"distinct_id": "b"}]}
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "too_many_requests")
+
+        response = self.client.get("/decide/batch/")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -12,6 +12,7 @@ from rest_framework import status
 
 from posthog.models import Action, ActionStep, Element, Organization, Person, User
 from posthog.models.cohort import Cohort
+from posthog.models.event.query_event_list import EVENTS_LIST_MAX_WINDOWS
 from posthog.test.base import (
     APIBaseTest,
     ClickhouseTestMixin,
@@ -46,7 +47,7 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
         _create_event(event="$pageview", team=self.team, distinct_id="some-other-one", properties={"$ip": "8.8.8.8"})
         flush_persons_and_events()
 
-        with self.assertNumQueries(9):
+        with self.assertNumQueries(8):
             response = self.client.get(f"/api/projects/{self.team.id}/events/?distinct_id=2").json()
         self.assertEqual(
             response["results"][0]["person"],
@@ -61,7 +62,7 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
         _create_event(event="event_name", team=self.team, distinct_id="2", properties={"$ip": "8.8.8.8"})
         _create_event(event="another event", team=self.team, distinct_id="2", properties={"$ip": "8.8.8.8"})
         flush_persons_and_events()
-        expected_queries = 9  # Django session, PostHog user, PostHog team, PostHog org membership, person and distinct id, 3x PoE check
+        expected_queries = 8  # Django session, user, team, org membership, persons, 3x PoE check
 
         with self.assertNumQueries(expected_queries):
             response = self.client.get(f"/api/projects/{self.team.id}/events/?event=event_name").json()
@@ -75,8 +76,8 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
         )
         flush_persons_and_events()
 
-        expected_queries = 12  # Django session, PostHog user, PostHog team, PostHog org membership,
-        # look up if rate limit is enabled (cached after first lookup), 2x non-cached instance setting (MATERIALIZED_COLUMNS_ENABLED), person and distinct id
+        expected_queries = 11  # Django session, PostHog user, PostHog team, PostHog org membership,
+        # rate limit lookup (cached after first lookup), 2x non-cached MATERIALIZED_COLUMNS_ENABLED setting, persons
 
         with self.assertNumQueries(expected_queries):
             response = self.client.get(
@@ -330,13 +331,44 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
             self.assertEqual(len(page2["results"]), 100)
             self.assertEqual(
                 unquote(page2["next"]),
-                f"http://testserver/api/projects/{self.team.id}/events/?distinct_id=1&before=2020-12-30T12:03:53.829294+00:00",
+                f"http://testserver/api/projects/{self.team.id}/events/?distinct_id=1&before=2020-12-30T12:03:53.829294+00:00&last_uuid={page2['results'][-1]['id']}",
             )
 
             page3 = self.client.get(page2["next"]).json()
             self.assertEqual(len(page3["results"]), 50)
             self.assertIsNone(page3["next"])
 
+    def test_pagination_continues_after_events_at_the_same_time(self):
+        with freeze_time("2021-10-10T12:03:03.829294Z"):
+            _create_person(team=self.team, distinct_ids=["1"])
+            event_ids = set()
+            for timestamp in [
+                timezone.now() - relativedelta(hours=1),
+                timezone.now() - relativedelta(days=3),
+                timezone.now() - relativedelta(months=5),
+            ]:
+                for _ in range(3):
+                    event_ids.add(
+                        _create_event(team=self.team, event="some event", distinct_id="1", timestamp=timestamp)
+                    )
+
+            listed_event_ids = []
+            next_url = f"/api/projects/{self.team.id}/events/?distinct_id=1&limit=2&offset=1"
+            while next_url:
+                response = self.client.get(next_url).json()
+                listed_event_ids.extend(event["id"] for event in response["results"])
+                next_url = response["next"]
+                self.assertLessEqual(len(listed_event_ids), 9)
+
+            # Only the first page is offset
+            self.assertEqual(len(listed_event_ids), 8)
+            self.assertEqual(len(set(listed_event_ids)), 8)
+            self.assertTrue(set(listed_event_ids).issubset(event_ids))
+
+    def test_pagination_rejects_invalid_last_uuid(self):
+        response = self.client.get(f"/api/projects/{self.team.id}/events/?before=2021-10-10&last_uuid=abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_pagination_bounded_date_range(self):
         with freeze_time("2021-10-10T12:03:03.829294Z"):
             _create_person(team=self.team, distinct_ids=["1"])
@@ -549,21 +581,11 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
     @patch("posthog.models.event.query_event_list.insight_query_with_columns")
     def test_optimize_query(self, patch_query_with_columns):
         #  For ClickHouse we normally only query the last day,
-        # but if a user doesn't have many events we still want to return events that are older
-        patch_query_with_columns.return_value = [
-            {
-                "uuid": "event",
-                "event": "d",
-                "properties": "{}",
-                "timestamp": timezone.now(),
-                "team_id": "d",
-                "distinct_id": "d",
-                "elements_chain": "d",
-            }
-        ]
+        # but if a user doesn't have many events we look further and further back for older ones
+        patch_query_with_columns.return_value = []
         response = self.client.get(f"/api/projects/{self.team.id}/events/").json()
-        self.assertEqual(len(response["results"]), 1)
-        self.assertEqual(patch_query_with_columns.call_count, 2)
+        self.assertEqual(len(response["results"]), 0)
+        self.assertEqual(patch_query_with_columns.call_count, EVENTS_LIST_MAX_WINDOWS)
 
         patch_query_with_columns.return_value = [
             {
@@ -575,10 +597,11 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
                 "distinct_id": "d",
                 "elements_chain": "d",
             }
-            for _ in range(0, 100)
+            for _ in range(0, 101)
         ]
         response = self.client.get(f"/api/projects/{self.team.id}/events/").json()
-        self.assertEqual(patch_query_with_columns.call_count, 3)
+        self.assertEqual(len(response["results"]), 100)
+        self.assertEqual(patch_query_with_columns.call_count, EVENTS_LIST_MAX_WINDOWS + 1)
 
     def test_filter_events_by_being_after_properties_with_date_type(self):
         journeys_for(
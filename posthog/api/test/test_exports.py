@@ -79,6 +79,7 @@ class TestExports(APIBaseTest):
                 "has_content": False,
                 "insight": None,
                 "export_context": None,
+                "export_progress": None,
             },
         )
 
@@ -122,6 +123,7 @@ class TestExports(APIBaseTest):
                 "has_content": False,
                 "dashboard": None,
                 "export_context": None,
+                "export_progress": None,
             },
         )
 
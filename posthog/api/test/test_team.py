@@ -11,6 +11,7 @@ from posthog.models.organization import Organization, OrganizationMembership
 from posthog.models.team import Team
 from posthog.models.team.team import get_team_in_cache
 from posthog.test.base import APIBaseTest
+from posthog.utils import get_safe_cache
 
 
 class TestTeamAPI(APIBaseTest):
@@ -249,7 +250,7 @@ class TestTeamAPI(APIBaseTest):
             f"/api/projects/{self.team.id}/insights/trend/", data={"events": json.dumps([{"id": "user signed up"}])}
         )
 
-        self.assertEqual(cache.get(response["filters_hash"])["result"][0]["count"], 0)
+        self.assertEqual(get_safe_cache(response["filters_hash"])["result"][0]["count"], 0)
         self.client.patch(f"/api/projects/{self.team.id}/", {"timezone": "US/Pacific"})
         # Verify cache was deleted
         self.assertEqual(cache.get(response["filters_hash"]), None)
@@ -20,6 +20,12 @@ from posthog.models.entity import MathType
 from posthog.models.filters.filter import Filter
 from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.team import Team
+from posthog.models.team.team_caching import (
+    ensure_team_cache_invalidation_listener,
+    local_cache_ttl,
+    local_ingestion_context_cache,
+    local_team_cache_enabled,
+)
 from posthog.models.user import User
 from posthog.utils import cors_response, load_data_from_request
 
@@ -162,10 +168,10 @@ def get_project_id(data, request) -> Optional[int]:
     return None
 
 
-def get_data(request):
+def get_data(request, stream_batch: bool = False):
     data = None
     try:
-        data = load_data_from_request(request)
+        data = load_data_from_request(request, stream_batch=stream_batch)
     except RequestParsingError as error:
         statsd.incr("capture_endpoint_invalid_payload")
         logger.exception(f"Invalid payload", error=error)
@@ -316,15 +322,24 @@ def get_event_ingestion_context_for_token(
     Based on a token associated with a Team, retrieve the context that is
     required to ingest events.
     """
+    if local_team_cache_enabled():
+        ensure_team_cache_invalidation_listener()
+        found, ingestion_context = local_ingestion_context_cache.get(token)
+        if found:
+            return ingestion_context
+
     try:
         team_id, anonymize_ips = Team.objects.values_list("id", "anonymize_ips").get(api_token=token)
         # NOTE: Not sure why, but I needed to do this cast otherwise I got
         # `Optional[bool]` instead of `bool` from mypy, even though
         # anonymize_ips is non-null in the model
         anonymize_ips = cast(bool, anonymize_ips)
-        return EventIngestionContext(team_id=team_id, anonymize_ips=anonymize_ips)
+        ingestion_context = EventIngestionContext(team_id=team_id, anonymize_ips=anonymize_ips)
     except Team.DoesNotExist:
-        return None
+        ingestion_context = None
+
+    local_ingestion_context_cache.set(token, ingestion_context, local_cache_ttl(ingestion_context))
+    return ingestion_context
 
 
 def get_event_ingestion_context_for_personal_api_key(
@@ -26,6 +26,7 @@ from posthog.queries.funnels.utils import get_funnel_order_class
 from posthog.queries.paths import Paths
 from posthog.queries.retention import Retention
 from posthog.queries.stickiness import Stickiness
+from posthog.queries.trends.incremental import calculate_trends_incrementally
 from posthog.queries.trends.trends import Trends
 from posthog.types import FilterType
 
@@ -96,7 +97,7 @@ def get_cache_type(cacheable: Optional[FilterType] | Optional[Dict]) -> CacheTyp
 
 
 def calculate_result_by_insight(
-    team: Team, insight: Insight, dashboard: Optional[Dashboard]
+    team: Team, insight: Insight, dashboard: Optional[Dashboard], incremental: bool = False
 ) -> Tuple[str, str, List | Dict]:
     """
     Calculates the result for an insight. If the insight is query based,
@@ -104,11 +105,13 @@ def calculate_result_by_insight(
 
     Eventually there will be no filter-based insights left and calculate_for_query_based_insight will be
     in-lined into this function
+
+    With `incremental`, filter-based trends reuse the intervals stored by their previous calculation
     """
     if insight.query is not None:
         return calculate_for_query_based_insight(team, insight, dashboard)
     else:
-        return calculate_for_filter_based_insight(team, insight, dashboard)
+        return calculate_for_filter_based_insight(team, insight, dashboard, incremental=incremental)
 
 
 def calculate_for_query_based_insight(
@@ -132,7 +135,7 @@ def calculate_for_query_based_insight(
 
 
 def calculate_for_filter_based_insight(
-    team: Team, insight: Insight, dashboard: Optional[Dashboard]
+    team: Team, insight: Insight, dashboard: Optional[Dashboard], incremental: bool = False
 ) -> Tuple[str, str, List | Dict]:
     filter = get_filter(data=insight.dashboard_filters(dashboard), team=team)
     cache_key = generate_insight_cache_key(insight, dashboard)
@@ -145,6 +148,9 @@ def calculate_for_filter_based_insight(
         cache_key=cache_key,
     )
 
+    if incremental and cache_type == CacheType.TRENDS:
+        return cache_key, cache_type, _calculate_trends_incrementally(filter, team, cache_key)
+
     return cache_key, cache_type, calculate_result_by_cache_type(cache_type, filter, team)
 
 
@@ -166,6 +172,11 @@ def _calculate_by_filter(filter: FilterType, team: Team, cache_type: CacheType)
     return result
 
 
+@timed("update_cache_item_timer.calculate_trends_incrementally")
+def _calculate_trends_incrementally(filter: Filter, team: Team, cache_key: str) -> List[Dict[str, Any]]:
+    return calculate_trends_incrementally(filter, team, cache_key)
+
+
 @timed("update_cache_item_timer.calculate_funnel")
 def _calculate_funnel(filter: Filter, team: Team) -> List[Dict[str, Any]]:
     if filter.funnel_viz_type == FunnelVizType.TRENDS:
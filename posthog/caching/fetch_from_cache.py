@@ -1,14 +1,17 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from time import perf_counter
+from typing import Any, Dict, Optional, Union
 
 from django.utils.timezone import now
 from statshog.defaults.django import statsd
 
 from posthog.caching.calculate_results import calculate_cache_key, calculate_result_by_insight
 from posthog.caching.insight_cache import update_cached_state
+from posthog.caching.single_flight import calculate_once
 from posthog.models import DashboardTile, Insight
 from posthog.models.dashboard import Dashboard
+from posthog.models.insight import generate_insight_cache_key
 from posthog.utils import get_safe_cache
 
 
@@ -70,25 +73,33 @@ def fetch_cached_insight_result(target: Union[Insight, DashboardTile], refresh_f
 def synchronously_update_cache(
     insight: Insight, dashboard: Optional[Dashboard], refresh_frequency: Optional[timedelta] = None
 ) -> InsightResult:
-    cache_key, cache_type, result = calculate_result_by_insight(team=insight.team, insight=insight, dashboard=dashboard)
-    timestamp = now()
-
-    next_allowed_client_refresh = timestamp + refresh_frequency if refresh_frequency else None
-    update_cached_state(
-        insight.team_id,
-        cache_key,
-        timestamp,
-        {
+    def _calculate() -> Dict[str, Any]:
+        start_time = perf_counter()
+        cache_key, cache_type, result = calculate_result_by_insight(
+            team=insight.team, insight=insight, dashboard=dashboard
+        )
+        timestamp = now()
+        payload = {
             "result": result,
             "type": cache_type,
             "last_refresh": timestamp,
-            "next_allowed_client_refresh": next_allowed_client_refresh,
-        },
+            "next_allowed_client_refresh": timestamp + refresh_frequency if refresh_frequency else None,
+        }
+        update_cached_state(insight.team_id, cache_key, timestamp, payload, duration=perf_counter() - start_time)
+        return payload
+
+    # Identical insights requested at the same time (e.g. the same dashboard open in several tabs) share one calculation
+    cache_key = generate_insight_cache_key(insight, dashboard)
+    payload = calculate_once(cache_key, _calculate)
+
+    last_refresh = payload["last_refresh"]
+    next_allowed_client_refresh = payload.get("next_allowed_client_refresh") or (
+        last_refresh + refresh_frequency if refresh_frequency else None
     )
 
     return InsightResult(
-        result=result,
-        last_refresh=timestamp,
+        result=payload["result"],
+        last_refresh=last_refresh,
         cache_key=cache_key,
         is_cached=False,
         timezone=insight.team.timezone,
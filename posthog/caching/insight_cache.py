@@ -1,6 +1,8 @@
+import math
+from collections import defaultdict
 from datetime import datetime, timedelta
 from time import perf_counter
-from typing import Any, List, Optional, Tuple, cast
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 from uuid import UUID
 
 import structlog
@@ -8,11 +10,17 @@ from django.conf import settings
 from django.core.cache import cache
 from django.db import connection
 from django.utils.timezone import now
+from prometheus_client import Gauge
 from sentry_sdk.api import capture_exception
 from statshog.defaults.django import statsd
 
 from posthog.caching.calculate_results import calculate_result_by_insight
+from posthog.caching.insight_caching_state import TargetCacheAge
+from posthog.caching.insight_result_codec import encode_insight_result
+from posthog.caching.single_flight import calculate_once
+from posthog.metrics import pushed_metrics_registry
 from posthog.models import Dashboard, Insight, InsightCachingState, Team
+from posthog.models.insight import generate_insight_cache_key
 from posthog.models.instance_setting import get_instance_setting
 
 logger = structlog.get_logger(__name__)
@@ -20,11 +28,32 @@ logger = structlog.get_logger(__name__)
 REQUEUE_DELAY = timedelta(hours=2)
 MAX_ATTEMPTS = 3
 
+# How many stale caches are considered for each one that can be scheduled, when weighing which go first
+CANDIDATES_PER_SLOT = 3
+# Caches this many times past their target age are all as urgent as never refreshed ones
+MAX_STALENESS_RATIO = 10.0
+RECENT_VIEWS_PERIOD = timedelta(days=7)
+# Calculations taking this long count as half as urgent as ones that are instant
+REFERENCE_REFRESH_DURATION_SECONDS = 10.0
+
+TIER_BY_TARGET_CACHE_AGE_SECONDS = {
+    age.value.total_seconds(): age.name.lower() for age in TargetCacheAge if age.value is not None
+}
+
+
+class RefreshCandidate(NamedTuple):
+    team_id: int
+    cache_key: str
+    caching_state_id: UUID
+    target_cache_age_seconds: int
+    last_refresh: Optional[datetime]
+    refresh_duration_seconds: Optional[float]
+    recent_viewers: int
+
 
 def schedule_cache_updates():
     from posthog.celery import update_cache_task
 
-    # :TODO: Separate celery queue for updates rather than limiting via this method
     PARALLEL_INSIGHT_CACHE = get_instance_setting("PARALLEL_DASHBOARD_ITEM_CACHE")
 
     to_update = fetch_states_in_need_of_updating(limit=PARALLEL_INSIGHT_CACHE)
@@ -44,24 +73,91 @@ def schedule_cache_updates():
     else:
         logger.info("No caches were found to be updated")
 
+    report_refresh_backlog()
+
 
 def fetch_states_in_need_of_updating(limit: int) -> List[Tuple[int, str, UUID]]:
+    """
+    Returns up to `limit` caching states to refresh, most important first.
+
+    Each team gets at most its quota (`INSIGHT_CACHE_REFRESH_TEAM_SHARE` of `limit`) while other teams have caches
+    waiting, so a team with thousands of stale tiles can't hold everyone else's refreshes back.
+    """
     current_time = now()
+    team_quota = max(1, math.ceil(limit * settings.INSIGHT_CACHE_REFRESH_TEAM_SHARE))
+    candidates = _fetch_refresh_candidates(
+        current_time, limit=limit * CANDIDATES_PER_SLOT, per_team_limit=team_quota * CANDIDATES_PER_SLOT
+    )
+    candidates.sort(key=lambda candidate: refresh_priority(candidate, current_time), reverse=True)
+
+    selected: List[RefreshCandidate] = []
+    passed_over: List[RefreshCandidate] = []
+    selected_by_team: Dict[int, int] = defaultdict(int)
+    for candidate in candidates:
+        if len(selected) >= limit:
+            break
+        if selected_by_team[candidate.team_id] < team_quota:
+            selected_by_team[candidate.team_id] += 1
+            selected.append(candidate)
+        else:
+            passed_over.append(candidate)
+
+    # Capacity that no other team needed this time goes to whoever is over quota, rather than staying unused
+    selected.extend(passed_over[: max(0, limit - len(selected))])
+    return [(candidate.team_id, candidate.cache_key, candidate.caching_state_id) for candidate in selected]
+
+
+def refresh_priority(candidate: RefreshCandidate, current_time: datetime) -> float:
+    """
+    How urgently a stale cache should be refreshed: the more overdue relative to its target age (so tiers with
+    short target ages go first) and the more people recently viewed it the higher, the more expensive it is to
+    calculate the lower.
+    """
+    if candidate.last_refresh is None:
+        staleness = MAX_STALENESS_RATIO
+    else:
+        age = (current_time - candidate.last_refresh).total_seconds()
+        staleness = min(age / max(candidate.target_cache_age_seconds, 1), MAX_STALENESS_RATIO)
+
+    popularity = 1 + math.log1p(candidate.recent_viewers)
+    cost = 1 + (candidate.refresh_duration_seconds or 0) / REFERENCE_REFRESH_DURATION_SECONDS
+    return staleness * popularity / cost
+
+
+def _fetch_refresh_candidates(current_time: datetime, limit: int, per_team_limit: int) -> List[RefreshCandidate]:
     with connection.cursor() as cursor:
         cursor.execute(
             """
-            SELECT team_id, cache_key, id
-            FROM posthog_insightcachingstate
-            WHERE target_cache_age_seconds IS NOT NULL
-            AND refresh_attempt < %(max_attempts)s
-            AND (
-                last_refresh IS NULL OR
-                last_refresh < %(current_time)s - target_cache_age_seconds * interval '1' second
-            )
-            AND (
-                last_refresh_queued_at IS NULL OR
-                last_refresh_queued_at < %(last_refresh_queued_at_threshold)s
-            )
+            SELECT
+                team_id,
+                cache_key,
+                id,
+                target_cache_age_seconds,
+                last_refresh,
+                refresh_duration_seconds,
+                (
+                    SELECT COUNT(*)
+                    FROM posthog_insightviewed viewed
+                    WHERE viewed.insight_id = candidate.insight_id
+                    AND viewed.last_viewed_at >= %(viewed_since)s
+                ) AS recent_viewers
+            FROM (
+                SELECT
+                    *,
+                    ROW_NUMBER() OVER (PARTITION BY team_id ORDER BY last_refresh ASC NULLS FIRST) AS team_rank
+                FROM posthog_insightcachingstate
+                WHERE target_cache_age_seconds IS NOT NULL
+                AND refresh_attempt < %(max_attempts)s
+                AND (
+                    last_refresh IS NULL OR
+                    last_refresh < %(current_time)s - target_cache_age_seconds * interval '1' second
+                )
+                AND (
+                    last_refresh_queued_at IS NULL OR
+                    last_refresh_queued_at < %(last_refresh_queued_at_threshold)s
+                )
+            ) candidate
+            WHERE team_rank <= %(per_team_limit)s
             ORDER BY last_refresh ASC NULLS FIRST
             LIMIT %(limit)s
             """,
@@ -69,10 +165,62 @@ def fetch_states_in_need_of_updating(limit: int) -> List[Tuple[int, str, UUID]]:
                 "max_attempts": MAX_ATTEMPTS,
                 "current_time": current_time,
                 "last_refresh_queued_at_threshold": current_time - REQUEUE_DELAY,
+                "viewed_since": current_time - RECENT_VIEWS_PERIOD,
+                "per_team_limit": per_team_limit,
                 "limit": limit,
             },
         )
-        return cursor.fetchall()
+        return [RefreshCandidate(*row) for row in cursor.fetchall()]
+
+
+def report_refresh_backlog():
+    "Reports how many caches are waiting to be refreshed and how far past their target age they are, per tier."
+    current_time = now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT
+                target_cache_age_seconds,
+                COUNT(*),
+                COALESCE(MAX(EXTRACT(EPOCH FROM %(current_time)s - last_refresh) - target_cache_age_seconds), 0)
+            FROM posthog_insightcachingstate
+            WHERE target_cache_age_seconds IS NOT NULL
+            AND refresh_attempt < %(max_attempts)s
+            AND (
+                last_refresh IS NULL OR
+                last_refresh < %(current_time)s - target_cache_age_seconds * interval '1' second
+            )
+            GROUP BY target_cache_age_seconds
+            """,
+            {"max_attempts": MAX_ATTEMPTS, "current_time": current_time},
+        )
+        rows = cursor.fetchall()
+
+    backlog: Dict[str, int] = {tier: 0 for tier in TIER_BY_TARGET_CACHE_AGE_SECONDS.values()}
+    staleness_lag: Dict[str, float] = {tier: 0 for tier in TIER_BY_TARGET_CACHE_AGE_SECONDS.values()}
+    for target_cache_age_seconds, count, lag in rows:
+        tier = TIER_BY_TARGET_CACHE_AGE_SECONDS.get(target_cache_age_seconds, "other")
+        backlog[tier] = backlog.get(tier, 0) + count
+        staleness_lag[tier] = max(staleness_lag.get(tier, 0), float(lag))
+
+    with pushed_metrics_registry("celery_insight_cache_refresh_backlog") as registry:
+        backlog_gauge = Gauge(
+            "posthog_celery_insight_cache_refresh_backlog",
+            "Insight caches past their target age and waiting to be refreshed, per priority tier.",
+            labelnames=["tier"],
+            registry=registry,
+        )
+        lag_gauge = Gauge(
+            "posthog_celery_insight_cache_refresh_lag_seconds",
+            "How long the most overdue insight cache is past its target age, per priority tier.",
+            labelnames=["tier"],
+            registry=registry,
+        )
+        for tier in backlog:
+            backlog_gauge.labels(tier=tier).set(backlog[tier])
+            lag_gauge.labels(tier=tier).set(staleness_lag[tier])
+            statsd.gauge("insight_cache_refresh_backlog", backlog[tier], tags={"tier": tier})
+            statsd.gauge("insight_cache_refresh_lag_seconds", staleness_lag[tier], tags={"tier": tier})
 
 
 def update_cache(caching_state_id: UUID):
@@ -89,7 +237,8 @@ def update_cache(caching_state_id: UUID):
     team: Team = insight.team
     start_time = perf_counter()
 
-    exception = cache_key = cache_type = None
+    exception = None
+    rows_updated = 0
 
     metadata = {
         "team_id": team.pk,
@@ -99,21 +248,28 @@ def update_cache(caching_state_id: UUID):
         "last_refresh_queued_at": caching_state.last_refresh_queued_at,
     }
 
+    def _calculate() -> Dict[str, Any]:
+        nonlocal rows_updated
+        cache_key, cache_type, result = calculate_result_by_insight(
+            team=team, insight=insight, dashboard=dashboard, incremental=settings.TRENDS_INCREMENTAL_REFRESH_ENABLED
+        )
+        timestamp = now()
+        payload = {"result": result, "type": cache_type, "last_refresh": timestamp}
+        rows_updated = update_cached_state(
+            caching_state.team_id, cache_key, timestamp, payload, duration=perf_counter() - start_time
+        )
+        return payload
+
     try:
-        cache_key, cache_type, result = calculate_result_by_insight(team=team, insight=insight, dashboard=dashboard)
+        # If the same insight is already being calculated, e.g. for someone viewing it, that result is used instead.
+        # Whoever calculated it has already updated every caching state with this cache key, including this one.
+        calculate_once(generate_insight_cache_key(insight, dashboard), _calculate)
     except Exception as err:
         capture_exception(err, metadata)
         exception = err
 
     duration = perf_counter() - start_time
     if exception is None:
-        timestamp = now()
-        rows_updated = update_cached_state(
-            caching_state.team_id,
-            cast(str, cache_key),
-            timestamp,
-            {"result": result, "type": cache_type, "last_refresh": timestamp},
-        )
         statsd.incr("caching_state_update_success")
         statsd.incr("caching_state_update_rows_updated", rows_updated)
         statsd.timing("caching_state_update_success_timing", duration)
@@ -138,13 +294,26 @@ def update_cache(caching_state_id: UUID):
         )
 
 
-def update_cached_state(team_id: int, cache_key: str, timestamp: datetime, result: Any):
-    cache.set(cache_key, result, settings.CACHED_RESULTS_TTL)
+def update_cached_state(
+    team_id: int, cache_key: str, timestamp: datetime, result: Any, duration: Optional[float] = None
+):
+    encoded_result = encode_insight_result(result)
+    if len(encoded_result) > settings.INSIGHT_CACHE_MAX_RESULT_BYTES:
+        # Too large to keep in redis, so this insight is calculated whenever it's viewed, as if it weren't cached.
+        # Caching states are still updated below, so it isn't scheduled for refreshes that would go nowhere.
+        logger.warn("Insight result too large to cache", cache_key=cache_key, size=len(encoded_result))
+        statsd.incr("insight_cache_result_too_large")
+        cache.delete(cache_key)
+    else:
+        cache.set(cache_key, encoded_result, settings.CACHED_RESULTS_TTL)
+
+    # How long calculating took, which the scheduler uses to estimate the cost of the next refresh
+    updates: Dict[str, Any] = {} if duration is None else {"refresh_duration_seconds": duration}
 
     # :TRICKY: We update _all_ states with same cache_key to avoid needless re-calculations and
     #   handle race conditions around cache_key changing.
     return InsightCachingState.objects.filter(team_id=team_id, cache_key=cache_key).update(
-        last_refresh=timestamp, refresh_attempt=0
+        last_refresh=timestamp, refresh_attempt=0, **updates
     )
 
 
@@ -0,0 +1,125 @@
+import copy
+import pickle
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Histogram
+
+INSIGHT_RESULT_ENCODED_BYTES = Histogram(
+    "insight_result_cache_encoded_bytes",
+    "Size of insight results as stored in the cache, after encoding and compression.",
+    buckets=(1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000, float("inf")),
+)
+INSIGHT_RESULT_COMPRESSION_RATIO = Histogram(
+    "insight_result_cache_compression_ratio",
+    "Size of encoded insight results before compression, divided by the size after.",
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, float("inf")),
+)
+INSIGHT_RESULT_DECODE_SECONDS = Histogram(
+    "insight_result_cache_decode_seconds",
+    "Time taken to decode insight results read from the cache.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, float("inf")),
+)
+
+MAGIC = b"PHIR"
+VERSION = 1
+# Results are compressed once but read on every dashboard view, so favour fast compression over a better ratio
+COMPRESSION_LEVEL = 3
+
+# Flags
+COLUMNAR_RESULT = 1
+
+
+class InsightResultDecodeError(Exception):
+    pass
+
+
+def encode_insight_result(payload: Any) -> bytes:
+    """
+    Encodes a cached insight result package (`{"result": ..., "last_refresh": ..., ...}`) compactly.
+
+    Results that are lists of series with the same keys (e.g. trends) are stored as one list of values per series,
+    reusing the previous series' value wherever it's equal, so e.g. the `days` and `labels` shared by every
+    breakdown value are stored only once. The whole thing is then pickled and compressed.
+    """
+    flags = 0
+    if isinstance(payload, dict) and _can_store_as_columns(payload.get("result")):
+        payload = {**payload, "result": _to_columns(payload["result"])}
+        flags |= COLUMNAR_RESULT
+
+    pickled = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    encoded = MAGIC + bytes([VERSION, flags]) + zlib.compress(pickled, COMPRESSION_LEVEL)
+
+    INSIGHT_RESULT_ENCODED_BYTES.observe(len(encoded))
+    INSIGHT_RESULT_COMPRESSION_RATIO.observe(len(pickled) / len(encoded))
+    return encoded
+
+
+def is_encoded_insight_result(value: Any) -> bool:
+    return isinstance(value, bytes) and value.startswith(MAGIC)
+
+
+def decode_insight_result(encoded: bytes) -> Any:
+    start_time = time.perf_counter()
+    if not is_encoded_insight_result(encoded) or len(encoded) < len(MAGIC) + 2:
+        raise InsightResultDecodeError("Not an encoded insight result")
+
+    version, flags = encoded[len(MAGIC)], encoded[len(MAGIC) + 1]
+    if version != VERSION:
+        raise InsightResultDecodeError(f"Unknown insight result encoding version {version}")
+
+    payload = pickle.loads(zlib.decompress(encoded[len(MAGIC) + 2 :]))
+    if flags & COLUMNAR_RESULT:
+        payload["result"] = _from_columns(payload["result"])
+
+    INSIGHT_RESULT_DECODE_SECONDS.observe(time.perf_counter() - start_time)
+    return payload
+
+
+def _can_store_as_columns(result: Any) -> bool:
+    if not isinstance(result, list) or len(result) < 2 or not all(isinstance(series, dict) for series in result):
+        return False
+    keys = result[0].keys()
+    return all(series.keys() == keys for series in result)
+
+
+def _to_columns(result: List[Dict[str, Any]]) -> Dict[str, Any]:
+    columns = list(result[0].keys())
+    rows: List[List[Any]] = []
+    previous: Optional[List[Any]] = None
+    for series in result:
+        row = [series[column] for column in columns]
+        if previous is not None:
+            # Pickle stores repeated references to the same object only once
+            row = [
+                previous_value if isinstance(value, (list, dict)) and value == previous_value else value
+                for value, previous_value in zip(row, previous)
+            ]
+        rows.append(row)
+        previous = row
+    return {"columns": columns, "rows": rows}
+
+
+def _from_columns(columnar: Dict[str, Any]) -> List[Dict[str, Any]]:
+    columns = columnar["columns"]
+    result: List[Dict[str, Any]] = []
+    previous: Optional[List[Any]] = None
+    for row in columnar["rows"]:
+        values = row
+        if previous is not None:
+            # Values shared while encoded are copied, so that changing one series doesn't change others
+            values = [
+                _copy(value) if isinstance(value, (list, dict)) and value is previous_value else value
+                for value, previous_value in zip(row, previous)
+            ]
+        result.append(dict(zip(columns, values)))
+        previous = row
+    return result
+
+
+def _copy(value: Any) -> Any:
+    # Most shared values are lists of dates or labels, which are much quicker to copy without `deepcopy`
+    if isinstance(value, list) and not any(isinstance(item, (list, dict)) for item in value):
+        return list(value)
+    return copy.deepcopy(value)
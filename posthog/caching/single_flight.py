@@ -0,0 +1,129 @@
+import secrets
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import redis
+import structlog
+from django.conf import settings
+from django.utils.timezone import now
+from sentry_sdk.api import capture_exception
+from statshog.defaults.django import statsd
+
+from posthog.caching.utils import ensure_is_date
+from posthog.redis import get_client
+from posthog.utils import get_safe_cache
+
+logger = structlog.get_logger(__name__)
+
+INITIAL_POLL_INTERVAL_SECONDS = 0.05
+MAX_POLL_INTERVAL_SECONDS = 1.0
+
+
+class CalculationLock:
+    "Redis lock that can only be released by whoever acquired it, and expires in case they never do."
+
+    def __init__(self, key: str, timeout_seconds: int):
+        self.key = key
+        self.timeout_seconds = timeout_seconds
+        self.token = secrets.token_hex(16).encode("utf-8")
+
+    def acquire(self) -> bool:
+        return bool(get_client().set(self.key, self.token, nx=True, ex=self.timeout_seconds))
+
+    def is_held_by_anyone(self) -> bool:
+        return bool(get_client().exists(self.key))
+
+    def release(self) -> None:
+        with get_client().pipeline() as pipe:
+            try:
+                pipe.watch(self.key)
+                if pipe.get(self.key) == self.token:
+                    pipe.multi()
+                    pipe.delete(self.key)
+                    pipe.execute()
+                else:
+                    # Expired, and possibly taken by someone else since
+                    pipe.unwatch()
+            except redis.WatchError:
+                pass
+
+
+def calculate_once(cache_key: str, calculate: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Single-flight calculation of the insight cached under `cache_key`.
+
+    `calculate` must store its result in the cache under `cache_key` (including `last_refresh`) and return it.
+    Only one calculation per cache key runs at a time: everyone else asking for it in the meantime waits
+    for that calculation and shares its result from the cache, instead of running the same queries again.
+    If it doesn't finish within `INSIGHT_CALCULATION_WAIT_TIMEOUT_SECONDS` or fails, they calculate it themselves.
+    """
+    requested_at = now()
+    lock = CalculationLock(f"insight_calculation_lock_{cache_key}", settings.INSIGHT_CALCULATION_LOCK_TIMEOUT_SECONDS)
+
+    try:
+        acquired = lock.acquire()
+    except Exception as e:
+        # redis is unavailable, so calculate without coordinating
+        capture_exception(e)
+        return calculate()
+
+    if acquired:
+        try:
+            return calculate()
+        finally:
+            try:
+                lock.release()
+            except Exception as e:
+                capture_exception(e)
+
+    start_time = time.perf_counter()
+    shared_result = _wait_for_calculation(cache_key, lock, requested_at)
+    statsd.timing("insight_calculation_single_flight_wait", (time.perf_counter() - start_time) * 1000)
+
+    if shared_result is not None:
+        statsd.incr("insight_calculation_single_flight_shared")
+        return shared_result
+
+    logger.info("insight_calculation_single_flight_fallback", cache_key=cache_key)
+    statsd.incr("insight_calculation_single_flight_fallback")
+    return calculate()
+
+
+def _wait_for_calculation(cache_key: str, lock: CalculationLock, requested_at: datetime) -> Optional[Dict[str, Any]]:
+    waited = 0.0
+    poll_interval = INITIAL_POLL_INTERVAL_SECONDS
+
+    while True:
+        result = _result_calculated_since(cache_key, requested_at)
+        if result is not None:
+            return result
+
+        try:
+            calculating = lock.is_held_by_anyone()
+        except Exception as e:
+            capture_exception(e)
+            return None
+
+        if not calculating:
+            # Finished (or failed) between checking the cache and the lock
+            return _result_calculated_since(cache_key, requested_at)
+
+        if waited >= settings.INSIGHT_CALCULATION_WAIT_TIMEOUT_SECONDS:
+            return None
+
+        time.sleep(poll_interval)
+        waited += poll_interval
+        poll_interval = min(poll_interval * 2, MAX_POLL_INTERVAL_SECONDS)
+
+
+def _result_calculated_since(cache_key: str, requested_at: datetime) -> Optional[Dict[str, Any]]:
+    cached = get_safe_cache(cache_key)
+    if not isinstance(cached, dict):
+        return None
+
+    last_refresh = ensure_is_date(cached.get("last_refresh"))
+    # Results from before the request may predate whatever prompted it, e.g. a user pressing refresh
+    if last_refresh is None or last_refresh < requested_at:
+        return None
+    return cached
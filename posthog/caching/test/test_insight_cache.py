@@ -1,13 +1,20 @@
 from datetime import timedelta
 from typing import Callable, Optional
 from unittest.mock import call, patch
+from uuid import UUID
 
 import pytest
 from django.utils.timezone import now
 from freezegun import freeze_time
 
 from posthog.caching.calculate_results import get_cache_type
-from posthog.caching.insight_cache import fetch_states_in_need_of_updating, schedule_cache_updates, update_cache
+from posthog.caching.insight_cache import (
+    RefreshCandidate,
+    fetch_states_in_need_of_updating,
+    refresh_priority,
+    schedule_cache_updates,
+    update_cache,
+)
 from posthog.caching.insight_caching_state import upsert
 from posthog.caching.test.test_insight_caching_state import create_insight, filter_dict
 from posthog.constants import INSIGHT_PATHS, INSIGHT_RETENTION, INSIGHT_STICKINESS, INSIGHT_TRENDS
@@ -96,6 +103,57 @@ def test_fetch_states_in_need_of_updating(team: Team, user: User, params, expect
     assert len(results) == expected_matches
 
 
+@pytest.mark.django_db
+def test_fetch_states_in_need_of_updating_limits_each_team(team: Team, user: User, settings):
+    settings.INSIGHT_CACHE_REFRESH_TEAM_SHARE = 0.5
+    other_team = Team.objects.create(organization=team.organization)
+    for _ in range(4):
+        create_insight_caching_state(team, user, last_refresh=None)
+    other_state = create_insight_caching_state(other_team, user, last_refresh=timedelta(days=2))
+
+    results = fetch_states_in_need_of_updating(4)
+
+    assert len(results) == 4
+    assert [team_id for team_id, _, _ in results].count(team.pk) == 3
+    assert (other_team.pk, other_state.cache_key, other_state.pk) in results
+
+
+@pytest.mark.django_db
+def test_fetch_states_in_need_of_updating_uses_spare_capacity(team: Team, user: User, settings):
+    settings.INSIGHT_CACHE_REFRESH_TEAM_SHARE = 0.5
+    for _ in range(4):
+        create_insight_caching_state(team, user)
+
+    assert len(fetch_states_in_need_of_updating(4)) == 4
+
+
+def _candidate(**kwargs) -> RefreshCandidate:
+    return RefreshCandidate(
+        **{
+            "team_id": 1,
+            "cache_key": "cache_key",
+            "caching_state_id": UUID(int=0),
+            "target_cache_age_seconds": int(timedelta(days=1).total_seconds()),
+            "last_refresh": now() - timedelta(days=2),
+            "refresh_duration_seconds": 1.0,
+            "recent_viewers": 0,
+            **kwargs,
+        }
+    )
+
+
+@freeze_time("2020-01-04T13:01:01Z")
+def test_refresh_priority():
+    current_time = now()
+    stale = refresh_priority(_candidate(), current_time)
+
+    assert refresh_priority(_candidate(last_refresh=None), current_time) > stale
+    assert refresh_priority(_candidate(recent_viewers=5), current_time) > stale
+    assert refresh_priority(_candidate(refresh_duration_seconds=60.0), current_time) < stale
+    # Two days old is more overdue for a cache that should be at most 12 hours old
+    assert refresh_priority(_candidate(target_cache_age_seconds=12 * 60 * 60), current_time) > stale
+
+
 @pytest.mark.django_db
 @freeze_time("2020-01-04T13:01:01Z")
 def test_update_cache(team: Team, user: User, cache):
@@ -112,6 +170,7 @@ def test_update_cache(team: Team, user: User, cache):
     updated_caching_state = InsightCachingState.objects.get(team=team)
     assert updated_caching_state.last_refresh == now()
     assert updated_caching_state.refresh_attempt == 0
+    assert updated_caching_state.refresh_duration_seconds is not None
 
 
 @pytest.mark.django_db
@@ -0,0 +1,85 @@
+import pickle
+from datetime import datetime
+
+import pytz
+from django.core.cache import cache
+
+from posthog.caching.insight_cache import update_cached_state
+from posthog.caching.insight_result_codec import (
+    InsightResultDecodeError,
+    decode_insight_result,
+    encode_insight_result,
+    is_encoded_insight_result,
+)
+from posthog.test.base import BaseTest
+from posthog.utils import get_safe_cache
+
+DAYS = [f"2020-01-{day:02d}" for day in range(1, 31)]
+
+
+def _series(breakdown_value: str):
+    return {
+        "action": {"id": "$pageview", "type": "events", "math": None},
+        "label": f"$pageview - {breakdown_value}",
+        "count": 30.0,
+        "data": [float(day % 7) for day in range(30)],
+        "labels": [f"{day}-Jan-2020" for day in range(1, 31)],
+        "days": list(DAYS),
+        "breakdown_value": breakdown_value,
+        "persons_urls": [{"url": f"api/projects/1/actions/people/?date_from={day}", "filter": {}} for day in DAYS],
+    }
+
+
+TRENDS_PAYLOAD = {
+    "result": [_series(f"value {index}") for index in range(20)],
+    "type": "Trends",
+    "last_refresh": datetime(2020, 1, 31, 12, tzinfo=pytz.UTC),
+    "next_allowed_client_refresh": None,
+}
+
+
+class TestInsightResultCodec(BaseTest):
+    def test_round_trips_series_results(self):
+        encoded = encode_insight_result(TRENDS_PAYLOAD)
+
+        self.assertTrue(is_encoded_insight_result(encoded))
+        self.assertEqual(decode_insight_result(encoded), TRENDS_PAYLOAD)
+        self.assertLess(len(encoded) * 10, len(pickle.dumps(TRENDS_PAYLOAD)))
+
+    def test_round_trips_other_results(self):
+        for payload in [
+            {"result": {"bins": [[1, 2]], "average_conversion_time": 1.5}, "type": "Funnel"},
+            {"result": [{"source": "1_/", "target": "2_/pricing"}, {"source": "1_/"}], "type": "Path"},
+            {"result": [], "type": "Trends"},
+            [{"result": "not a result package"}],
+        ]:
+            self.assertEqual(decode_insight_result(encode_insight_result(payload)), payload)
+
+    def test_decoded_series_do_not_share_values(self):
+        decoded = decode_insight_result(encode_insight_result(TRENDS_PAYLOAD))
+
+        decoded["result"][0]["days"].append("2020-01-31")
+        decoded["result"][1]["action"]["math"] = "dau"
+
+        self.assertEqual(decoded["result"][2]["days"], DAYS)
+        self.assertIsNone(decoded["result"][2]["action"]["math"])
+
+    def test_rejects_unknown_versions(self):
+        encoded = encode_insight_result(TRENDS_PAYLOAD)
+
+        with self.assertRaises(InsightResultDecodeError):
+            decode_insight_result(encoded[:4] + bytes([99]) + encoded[5:])
+
+    def test_cached_results_are_encoded(self):
+        update_cached_state(self.team.pk, "codec_test", TRENDS_PAYLOAD["last_refresh"], TRENDS_PAYLOAD)
+
+        self.assertTrue(is_encoded_insight_result(cache.get("codec_test")))
+        self.assertEqual(get_safe_cache("codec_test"), TRENDS_PAYLOAD)
+
+    def test_results_too_large_are_not_cached(self):
+        cache.set("codec_test", encode_insight_result({"result": [], "type": "Trends"}))
+
+        with self.settings(INSIGHT_CACHE_MAX_RESULT_BYTES=100):
+            update_cached_state(self.team.pk, "codec_test", TRENDS_PAYLOAD["last_refresh"], TRENDS_PAYLOAD)
+
+        self.assertIsNone(get_safe_cache("codec_test"))
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from posthog.caching.single_flight import CalculationLock, calculate_once
+from posthog.redis import get_client
+from posthog.test.base import BaseTest
+
+CACHE_KEY = "single_flight_test"
+LOCK_KEY = f"insight_calculation_lock_{CACHE_KEY}"
+
+
+class TestCalculateOnce(BaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        get_client().delete(LOCK_KEY)
+
+    def _calculate(self) -> MagicMock:
+        def _store():
+            payload = {"result": [1, 2, 3], "last_refresh": now()}
+            cache.set(CACHE_KEY, payload)
+            return payload
+
+        return MagicMock(side_effect=_store)
+
+    def test_calculates_and_releases_lock(self):
+        calculate = self._calculate()
+
+        result = calculate_once(CACHE_KEY, calculate)
+
+        self.assertEqual(result["result"], [1, 2, 3])
+        calculate.assert_called_once()
+        self.assertFalse(get_client().exists(LOCK_KEY))
+
+    def test_releases_lock_when_calculation_fails(self):
+        with self.assertRaises(ValueError):
+            calculate_once(CACHE_KEY, MagicMock(side_effect=ValueError("query failed")))
+
+        self.assertFalse(get_client().exists(LOCK_KEY))
+
+    def test_shares_result_of_calculation_in_progress(self):
+        CalculationLock(LOCK_KEY, 60).acquire()
+        in_progress = self._calculate()
+        calculate = self._calculate()
+
+        # The other calculation finishes while this one waits
+        with patch("posthog.caching.single_flight.time.sleep", side_effect=lambda _: in_progress()):
+            result = calculate_once(CACHE_KEY, calculate)
+
+        self.assertEqual(result, cache.get(CACHE_KEY))
+        calculate.assert_not_called()
+
+    def test_calculates_itself_after_waiting_too_long(self):
+        CalculationLock(LOCK_KEY, 60).acquire()
+        calculate = self._calculate()
+
+        with self.settings(INSIGHT_CALCULATION_WAIT_TIMEOUT_SECONDS=0.1), patch(
+            "posthog.caching.single_flight.time.sleep"
+        ) as sleep:
+            calculate_once(CACHE_KEY, calculate)
+
+        self.assertEqual(sleep.call_count, 2)
+        calculate.assert_called_once()
+
+    def test_ignores_results_from_before_the_request(self):
+        cache.set(CACHE_KEY, {"result": [0], "last_refresh": now() - timedelta(minutes=1)})
+        lock = CalculationLock(LOCK_KEY, 60)
+        lock.acquire()
+        calculate = self._calculate()
+
+        # The other calculation failed, so nothing newer shows up
+        with patch("posthog.caching.single_flight.time.sleep", side_effect=lambda _: lock.release()):
+            result = calculate_once(CACHE_KEY, calculate)
+
+        self.assertEqual(result["result"], [1, 2, 3])
+        calculate.assert_called_once()
+
+    def test_lock_is_only_released_by_its_holder(self):
+        lock = CalculationLock(LOCK_KEY, 60)
+        self.assertTrue(lock.acquire())
+        other = CalculationLock(LOCK_KEY, 60)
+        self.assertFalse(other.acquire())
+
+        other.release()
+        self.assertTrue(lock.is_held_by_anyone())
+
+        lock.release()
+        self.assertFalse(lock.is_held_by_anyone())
@@ -135,6 +135,12 @@ def setup_periodic_tasks(sender: Celery, **kwargs):
 
     sender.add_periodic_task(120, calculate_cohort.s(), name="recalculate cohorts")
 
+    sender.add_periodic_task(
+        settings.RECORDING_METADATA_CALCULATION_INTERVAL_SECONDS,
+        calculate_recording_metadata.s(),
+        name="calculate idle recordings metadata",
+    )
+
     if settings.ASYNC_EVENT_PROPERTY_USAGE:
         sender.add_periodic_task(
             get_crontab(settings.EVENT_PROPERTY_USAGE_INTERVAL_CRON),
@@ -633,6 +639,13 @@ def calculate_cohort():
     calculate_cohorts()
 
 
+@app.task(ignore_result=True)
+def calculate_recording_metadata():
+    from posthog.tasks.calculate_recording_metadata import calculate_idle_recordings_metadata
+
+    calculate_idle_recordings_metadata()
+
+
 @app.task(ignore_result=True)
 def sync_insight_cache_states_task():
     from posthog.caching.insight_caching_state import sync_insight_cache_states
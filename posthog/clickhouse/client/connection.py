@@ -1,10 +1,46 @@
+import os
+import threading
+import time
 from contextlib import contextmanager
 from enum import Enum
 from functools import lru_cache
+from typing import Generator, Optional
 
+import structlog
 from clickhouse_driver import Client as SyncClient
 from clickhouse_pool import ChPool
 from django.conf import settings
+from prometheus_client import Counter, Gauge, Histogram
+
+from posthog.exceptions import ClickHouseConnectionPoolTimeout
+
+logger = structlog.get_logger(__name__)
+
+CLICKHOUSE_POOL_CONNECTIONS_IN_USE_GAUGE = Gauge(
+    "clickhouse_pool_connections_in_use",
+    "ClickHouse connections currently handed out by the pool.",
+    labelnames=["workload", "host"],
+)
+CLICKHOUSE_POOL_CONNECTIONS_IDLE_GAUGE = Gauge(
+    "clickhouse_pool_connections_idle",
+    "ClickHouse connections kept open in the pool, waiting to be used.",
+    labelnames=["workload", "host"],
+)
+CLICKHOUSE_POOL_ACQUIRE_LATENCY = Histogram(
+    "clickhouse_pool_acquire_seconds",
+    "Time spent waiting for a ClickHouse connection from the pool.",
+    labelnames=["workload", "host"],
+)
+CLICKHOUSE_POOL_ACQUIRE_TIMEOUT_COUNTER = Counter(
+    "clickhouse_pool_acquire_timeouts_total",
+    "Times no ClickHouse connection freed up within the acquire timeout.",
+    labelnames=["workload", "host"],
+)
+CLICKHOUSE_POOL_DEAD_CONNECTIONS_COUNTER = Counter(
+    "clickhouse_pool_dead_connections_total",
+    "Idle ClickHouse connections that failed the health check and were reset.",
+    labelnames=["workload", "host"],
+)
 
 
 class Workload(Enum):
@@ -25,10 +61,13 @@ def get_pool(workload: Workload):
 
     Note that the same pool should be returned every call.
     """
-    if (
-        workload == Workload.OFFLINE or workload == Workload.DEFAULT and _default_workload == Workload.OFFLINE
-    ) and settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST is not None:
-        return make_ch_pool(host=settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST)
+    if workload == Workload.DEFAULT:
+        workload = _default_workload
+
+    if workload == Workload.OFFLINE:
+        if settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST is not None:
+            return make_ch_pool(workload=Workload.OFFLINE, host=settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST)
+        return make_ch_pool(workload=Workload.OFFLINE)
 
     return make_ch_pool()
 
@@ -55,8 +94,123 @@ def default_client():
     )
 
 
+class WorkloadPool(ChPool):
+    """
+    A `ChPool` for a single workload, which:
+    - waits up to `acquire_timeout` seconds for a connection to free up once `connections_max` are in use,
+      instead of failing right away
+    - reports connections in use, idle connections and time waited to Prometheus
+    - pings idle connections in the background every `health_check_interval` seconds, resetting dead ones so
+      they reconnect on next use instead of failing a query
+    """
+
+    def __init__(self, workload: Workload, acquire_timeout: float, health_check_interval: int, **kwargs):
+        super().__init__(**kwargs)
+        self.workload = workload
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._available = threading.BoundedSemaphore(self.connections_max)
+        self._health_check_pid: Optional[int] = None
+        self._metric_labels = {"workload": workload.value, "host": self.connection_args["host"]}
+        self._update_gauges()
+
+    @contextmanager
+    def get_client(self, key: Optional[str] = None) -> Generator[SyncClient, None, None]:
+        self._ensure_health_checks()
+
+        start_time = time.monotonic()
+        if not self._available.acquire(timeout=self.acquire_timeout):
+            CLICKHOUSE_POOL_ACQUIRE_TIMEOUT_COUNTER.labels(**self._metric_labels).inc()
+            raise ClickHouseConnectionPoolTimeout(
+                f"Timed out after {self.acquire_timeout}s waiting for a ClickHouse connection: all "
+                f"{self.connections_max} connections of the {self.workload.value} pool are in use"
+            )
+        CLICKHOUSE_POOL_ACQUIRE_LATENCY.labels(**self._metric_labels).observe(time.monotonic() - start_time)
+
+        try:
+            client = self.pull(key)
+            self._update_gauges()
+            try:
+                yield client
+            finally:
+                self.push(client=client)
+                self._update_gauges()
+        finally:
+            self._available.release()
+
+    def check_idle_connections(self) -> int:
+        """
+        Pings connected idle clients one at a time, so the pool is never locked during a ping.
+        Returns how many were dead, and reset.
+        """
+        with self._lock:
+            idle_clients = list(self._pool)
+
+        dead_connections = 0
+        for client in idle_clients:
+            with self._lock:
+                if self.closed or client not in self._pool:
+                    # Handed out in the meantime, so it will be checked when pushed back
+                    continue
+                self._pool.remove(client)
+
+            if client.connection.connected and not self._ping(client):
+                client.disconnect()
+                dead_connections += 1
+                CLICKHOUSE_POOL_DEAD_CONNECTIONS_COUNTER.labels(**self._metric_labels).inc()
+
+            with self._lock:
+                if self.closed:
+                    client.disconnect()
+                else:
+                    self._pool.append(client)
+
+        return dead_connections
+
+    def _ping(self, client: SyncClient) -> bool:
+        try:
+            return client.connection.ping()
+        except Exception:
+            return False
+
+    def _ensure_health_checks(self) -> None:
+        # Started lazily, and once per process: threads don't survive forking into web or celery workers
+        if self.health_check_interval <= 0 or self._health_check_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._health_check_pid == os.getpid():
+                return
+            self._health_check_pid = os.getpid()
+
+        threading.Thread(
+            target=self._run_health_checks, name=f"clickhouse-pool-{self.workload.value.lower()}", daemon=True
+        ).start()
+
+    def _run_health_checks(self) -> None:
+        while not self.closed:
+            time.sleep(self.health_check_interval)
+            try:
+                self.check_idle_connections()
+                self._update_gauges()
+            except Exception as e:
+                logger.warning("clickhouse_pool_health_check_failed", workload=self.workload.value, exc_info=e)
+
+    def _update_gauges(self) -> None:
+        CLICKHOUSE_POOL_CONNECTIONS_IN_USE_GAUGE.labels(**self._metric_labels).set(len(self._used))
+        CLICKHOUSE_POOL_CONNECTIONS_IDLE_GAUGE.labels(**self._metric_labels).set(len(self._pool))
+
+
 @lru_cache(maxsize=None)
-def make_ch_pool(**overrides) -> ChPool:
+def make_ch_pool(workload: Workload = Workload.ONLINE, **overrides) -> WorkloadPool:
+    if workload == Workload.OFFLINE:
+        connections_min, connections_max = (
+            settings.CLICKHOUSE_OFFLINE_CONN_POOL_MIN,
+            settings.CLICKHOUSE_OFFLINE_CONN_POOL_MAX,
+        )
+    else:
+        connections_min, connections_max = settings.CLICKHOUSE_CONN_POOL_MIN, settings.CLICKHOUSE_CONN_POOL_MAX
+
     kwargs = {
         "host": settings.CLICKHOUSE_HOST,
         "database": settings.CLICKHOUSE_DATABASE,
@@ -65,15 +219,20 @@ def make_ch_pool(**overrides) -> ChPool:
         "password": settings.CLICKHOUSE_PASSWORD,
         "ca_certs": settings.CLICKHOUSE_CA,
         "verify": settings.CLICKHOUSE_VERIFY,
-        "connections_min": settings.CLICKHOUSE_CONN_POOL_MIN,
-        "connections_max": settings.CLICKHOUSE_CONN_POOL_MAX,
+        "connections_min": connections_min,
+        "connections_max": connections_max,
         "settings": {"mutations_sync": "1"} if settings.TEST else {},
         # Without this, OPTIMIZE table and other queries will regularly run into timeouts
         "send_receive_timeout": 30 if settings.TEST else 999_999_999,
         **overrides,
     }
 
-    return ChPool(**kwargs)
+    return WorkloadPool(
+        workload=workload,
+        acquire_timeout=settings.CLICKHOUSE_CONN_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        health_check_interval=settings.CLICKHOUSE_CONN_POOL_HEALTH_CHECK_INTERVAL_SECONDS,
+        **kwargs,
+    )
 
 
 @contextmanager
@@ -4,7 +4,17 @@ import types
 from contextlib import contextmanager
 from functools import lru_cache
 from time import perf_counter
-from typing import Any, Dict, List, Optional, Sequence, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
 
 import sqlparse
 from clickhouse_driver import Client as SyncClient
@@ -38,6 +48,15 @@ CLICKHOUSE_SUPPORTED_JOIN_ALGORITHMS = [
 is_invalid_algorithm = lambda algo: algo not in CLICKHOUSE_SUPPORTED_JOIN_ALGORITHMS
 
 
+class StreamProgress(NamedTuple):
+    # Rows yielded to the caller so far
+    rows_streamed: int
+    # As reported by ClickHouse: rows and bytes read so far, and approximately how many rows it will read in total
+    rows_read: int
+    bytes_read: int
+    total_rows_approx: int
+
+
 @lru_cache(maxsize=1)
 def default_settings() -> Dict:
     # On CH 22.3 we need to disable optimize_move_to_prewhere due to a bug. This is verified fixed on 22.8 (LTS),
@@ -81,12 +100,7 @@ def sync_execute(
     workload: Workload = Workload.DEFAULT,
 ):
     if TEST and flush:
-        try:
-            from posthog.test.base import flush_persons_and_events
-
-            flush_persons_and_events()
-        except ModuleNotFoundError:  # when we run plugin server tests it tries to run above, ignore
-            pass
+        _flush_test_data()
 
     with get_pool(workload).get_client() as client:
         start_time = perf_counter()
@@ -94,9 +108,7 @@ def sync_execute(
         prepared_sql, prepared_args, tags = _prepare_query(client=client, query=query, args=args, workload=workload)
 
         query_id = validated_client_query_id()
-        core_settings = {**default_settings(), **(settings or {})}
-        tags["query_settings"] = core_settings
-        settings = {**core_settings, "log_comment": json.dumps(tags, separators=(",", ":"))}
+        settings = _query_settings(tags, settings)
         try:
             result = client.execute(
                 prepared_sql,
@@ -123,6 +135,103 @@ def sync_execute(
     return result
 
 
+def stream_execute(
+    query,
+    args=None,
+    settings=None,
+    with_column_types=False,
+    flush=True,
+    *,
+    workload: Workload = Workload.DEFAULT,
+    progress_interval: int = 10_000,
+    on_progress: Optional[Callable[[StreamProgress], None]] = None,
+) -> Iterator:
+    """
+    Same as `sync_execute`, but yields rows as ClickHouse sends them block by block, instead of returning a list,
+    so that results of any size are processed at constant memory.
+    If `with_column_types`, the first item yielded is the list of (name, type) tuples of the columns.
+
+    `on_progress` is called every `progress_interval` rows, and once the result is exhausted.
+
+    A pool connection is held until the generator is exhausted or closed, so consume it promptly.
+    """
+    if TEST and flush:
+        _flush_test_data()
+
+    with get_pool(workload).get_client() as client:
+        start_time = perf_counter()
+
+        prepared_sql, prepared_args, tags = _prepare_query(client=client, query=query, args=args, workload=workload)
+
+        query_id = validated_client_query_id()
+        settings = _query_settings(tags, settings)
+        rows_streamed = 0
+        exhausted = False
+
+        def report_progress():
+            if on_progress is not None:
+                progress = client.last_query.progress if client.last_query else None
+                on_progress(
+                    StreamProgress(
+                        rows_streamed=rows_streamed,
+                        rows_read=progress.rows if progress else 0,
+                        bytes_read=progress.bytes if progress else 0,
+                        total_rows_approx=progress.total_rows if progress else 0,
+                    )
+                )
+
+        try:
+            rows = client.execute_iter(
+                prepared_sql,
+                params=prepared_args,
+                settings=settings,
+                with_column_types=with_column_types,
+                query_id=query_id,
+            )
+            if with_column_types:
+                columns = next(rows, None)
+                if columns is not None:
+                    yield columns
+            for row in rows:
+                yield row
+                rows_streamed += 1
+                if rows_streamed % progress_interval == 0:
+                    report_progress()
+            exhausted = True
+            report_progress()
+        except Exception as err:
+            err = wrap_query_error(err)
+            statsd.incr("clickhouse_sync_execution_failure", tags={"failed": True, "reason": type(err).__name__})
+
+            raise err
+        finally:
+            if not exhausted:
+                # The rest of the result is still on its way, so the connection can't be reused for another query
+                client.disconnect()
+
+            execution_time = perf_counter() - start_time
+
+            statsd.timing("clickhouse_stream_execution_time", execution_time * 1000.0)
+
+            if query_counter := getattr(thread_local_storage, "query_counter", None):
+                query_counter.total_query_time += execution_time
+
+
+def _flush_test_data():
+    try:
+        from posthog.test.base import flush_persons_and_events
+
+        flush_persons_and_events()
+    except ModuleNotFoundError:  # when we run plugin server tests it tries to run above, ignore
+        pass
+
+
+def _query_settings(tags: Dict[str, Any], settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    core_settings = {**default_settings(), **(settings or {})}
+    tags["query_settings"] = core_settings
+    return {**core_settings, "log_comment": json.dumps(tags, separators=(",", ":"))}
+
+
 def query_with_columns(
     query: str,
     args: Optional[QueryArgs] = None,
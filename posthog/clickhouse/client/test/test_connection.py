@@ -1,16 +1,31 @@
+from unittest.mock import patch
+
 import pytest
 
-from posthog.clickhouse.client.connection import Workload, get_pool, make_ch_pool, set_default_clickhouse_workload_type
+from posthog.clickhouse.client.connection import (
+    Workload,
+    WorkloadPool,
+    get_pool,
+    make_ch_pool,
+    set_default_clickhouse_workload_type,
+)
+from posthog.exceptions import ClickHouseConnectionPoolTimeout
 
 
 def test_connection_pool_creation_without_offline_cluster(settings):
     settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST = None
 
     online_pool = get_pool(Workload.ONLINE)
+    offline_pool = get_pool(Workload.OFFLINE)
     assert get_pool(Workload.ONLINE) is online_pool
-    assert get_pool(Workload.OFFLINE) is online_pool
     assert get_pool(Workload.DEFAULT) is online_pool
 
+    # Same host, but separate connections
+    assert get_pool(Workload.OFFLINE) is offline_pool
+    assert offline_pool is not online_pool
+    assert offline_pool.connection_args["host"] == online_pool.connection_args["host"]
+    assert offline_pool.workload == Workload.OFFLINE
+
 
 def test_connection_pool_creation_with_offline_cluster(settings):
     settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST = "ch-offline.example.com"
@@ -27,6 +42,58 @@ def test_connection_pool_creation_with_offline_cluster(settings):
     assert get_pool(Workload.DEFAULT) is offline_pool
 
 
+def test_connection_pool_sizes_per_workload(settings):
+    settings.CLICKHOUSE_CONN_POOL_MAX = 30
+    settings.CLICKHOUSE_OFFLINE_CONN_POOL_MAX = 3
+
+    assert get_pool(Workload.ONLINE).connections_max == 30
+    assert get_pool(Workload.OFFLINE).connections_max == 3
+
+
+def _make_pool(**kwargs) -> WorkloadPool:
+    return WorkloadPool(
+        **{
+            "workload": Workload.ONLINE,
+            "acquire_timeout": 0.05,
+            "health_check_interval": 0,
+            "connections_min": 1,
+            "connections_max": 1,
+            **kwargs,
+        }
+    )
+
+
+def test_connection_pool_waits_for_a_connection_up_to_the_timeout():
+    pool = _make_pool()
+
+    with pool.get_client() as client:
+        with pytest.raises(ClickHouseConnectionPoolTimeout):
+            with pool.get_client():
+                pass
+
+    # The connection is available again
+    with pool.get_client() as next_client:
+        assert next_client is client
+
+
+def test_connection_pool_resets_dead_idle_connections():
+    pool = _make_pool(connections_min=2, connections_max=2)
+    dead_client, alive_client = pool._pool
+    for client in pool._pool:
+        client.connection.connected = True
+
+    with patch.object(dead_client.connection, "ping", return_value=False), patch.object(
+        alive_client.connection, "ping", return_value=True
+    ), patch.object(dead_client, "disconnect") as dead_disconnect, patch.object(
+        alive_client, "disconnect"
+    ) as alive_disconnect:
+        assert pool.check_idle_connections() == 1
+
+    dead_disconnect.assert_called_once()
+    alive_disconnect.assert_not_called()
+    assert set(pool._pool) == {dead_client, alive_client}
+
+
 @pytest.fixture(autouse=True)
 def reset_state():
     make_ch_pool.cache_clear()
@@ -0,0 +1,4 @@
+from posthog.clickhouse.client.migration_tools import run_sql_with_exceptions
+from posthog.models.session_recording_event.sql import SESSION_RECORDING_METADATA_TABLE_SQL
+
+operations = [run_sql_with_exceptions(SESSION_RECORDING_METADATA_TABLE_SQL())]
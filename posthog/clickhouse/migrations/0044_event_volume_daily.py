@@ -0,0 +1,4 @@
+from posthog.clickhouse.client.migration_tools import run_sql_with_exceptions
+from posthog.models.event.sql import EVENT_VOLUME_DAILY_TABLE_SQL
+
+operations = [run_sql_with_exceptions(EVENT_VOLUME_DAILY_TABLE_SQL())]
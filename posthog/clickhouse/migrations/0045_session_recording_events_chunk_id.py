@@ -0,0 +1,37 @@
+from infi.clickhouse_orm import migrations
+
+from posthog.client import sync_execute
+from posthog.models.session_recording_event.sql import MATERIALIZED_COLUMNS
+from posthog.settings import CLICKHOUSE_CLUSTER
+
+
+def create_chunk_id_materialized_column(database):
+    data = MATERIALIZED_COLUMNS["chunk_id"]
+
+    sync_execute(
+        f"""
+        ALTER TABLE sharded_session_recording_events
+        ON CLUSTER '{CLICKHOUSE_CLUSTER}'
+        ADD COLUMN IF NOT EXISTS
+        chunk_id {data["schema"]} {data["materializer"]}
+    """
+    )
+    sync_execute(
+        f"""
+        ALTER TABLE session_recording_events
+        ON CLUSTER '{CLICKHOUSE_CLUSTER}'
+        ADD COLUMN IF NOT EXISTS
+        chunk_id {data["schema"]}
+    """
+    )
+
+    sync_execute(
+        f"""
+        ALTER TABLE session_recording_events
+        ON CLUSTER '{CLICKHOUSE_CLUSTER}'
+        COMMENT COLUMN chunk_id 'column_materializer::chunk_id'
+    """
+    )
+
+
+operations = [migrations.RunPython(create_chunk_id_materialized_column)]
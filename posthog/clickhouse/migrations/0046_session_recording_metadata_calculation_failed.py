@@ -0,0 +1,10 @@
+from posthog.clickhouse.client.migration_tools import run_sql_with_exceptions
+from posthog.models.session_recording_event.sql import SESSION_RECORDING_METADATA_TABLE
+from posthog.settings import CLICKHOUSE_CLUSTER
+
+operations = [
+    run_sql_with_exceptions(
+        f"ALTER TABLE {SESSION_RECORDING_METADATA_TABLE} ON CLUSTER '{CLICKHOUSE_CLUSTER}' "
+        "ADD COLUMN IF NOT EXISTS calculation_failed UInt8"
+    )
+]
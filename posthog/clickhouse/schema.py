@@ -44,6 +44,8 @@ CREATE_MERGETREE_TABLE_QUERIES = (
     INGESTION_WARNINGS_DATA_TABLE_SQL,
     APP_METRICS_DATA_TABLE_SQL,
     PERFORMANCE_EVENTS_TABLE_SQL,
+    SESSION_RECORDING_METADATA_TABLE_SQL,
+    EVENT_VOLUME_DAILY_TABLE_SQL,
 )
 CREATE_DISTRIBUTED_TABLE_QUERIES = (
     WRITABLE_EVENTS_TABLE_SQL,
@@ -38,6 +38,12 @@ class EstimatedQueryExecutionTimeTooLong(APIException):
     default_detail = "Estimated query execution time is too long"
 
 
+class ClickHouseConnectionPoolTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many queries are running at the moment, please try again shortly"
+    default_code = "clickhouse_connection_pool_timeout"
+
+
 class ExceptionContext(TypedDict):
     request: HttpRequest
 
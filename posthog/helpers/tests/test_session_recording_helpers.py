@@ -4,7 +4,9 @@ from typing import cast
 import pytest
 from pytest_mock import MockerFixture
 
+from posthog.session_recordings import session_recording_helpers
 from posthog.session_recordings.session_recording_helpers import (
+    DecompressedChunkCache,
     PaginatedList,
     RecordingSegment,
     SessionRecordingEventSummary,
@@ -263,6 +265,39 @@ def test_decompress_data_returning_only_activity_info(chunked_and_compressed_sna
     }
 
 
+def test_decompress_reuses_decompressed_chunks(chunked_and_compressed_snapshot_events, mocker: MockerFixture):
+    snapshot_data = [
+        SnapshotDataTaggedWithWindowId(
+            snapshot_data=event["properties"]["$snapshot_data"], window_id=event["properties"].get("$window_id")
+        )
+        for event in chunked_and_compressed_snapshot_events
+    ]
+    first = decompress_chunked_snapshot_data(1, "someid", snapshot_data)
+
+    spy_decompress = mocker.spy(session_recording_helpers, "decompress")
+    second = decompress_chunked_snapshot_data(1, "someid", snapshot_data)
+
+    assert spy_decompress.call_count == 0
+    assert second == first
+
+
+def test_decompressed_chunk_cache_evicts_least_recently_used():
+    cache = DecompressedChunkCache(max_bytes=10)
+    cache.set((1, "session", "a"), b"[1,2]")
+    cache.set((1, "session", "b"), b"[3,4]")
+    assert cache.get((1, "session", "a")) == b"[1,2]"
+
+    cache.set((1, "session", "c"), b"[5]")
+    # Too large to ever fit
+    cache.set((1, "session", "d"), b"[6,7,8,9,0]")
+
+    assert cache.get((1, "session", "a")) == b"[1,2]"
+    assert cache.get((1, "session", "b")) is None
+    assert cache.get((1, "session", "c")) == b"[5]"
+    assert cache.get((1, "session", "d")) is None
+    assert cache.size == 8
+
+
 def test_get_active_segments_from_event_list():
     base_time = datetime(2019, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
     events = [
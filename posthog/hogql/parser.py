@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Dict, List, Literal, Optional, cast
 
 from antlr4 import CommonTokenStream, InputStream, ParseTreeVisitor
@@ -9,44 +10,56 @@ from posthog.hogql.grammar.HogQLLexer import HogQLLexer
 from posthog.hogql.grammar.HogQLParser import HogQLParser
 from posthog.hogql.parse_string import parse_string, parse_string_literal
 from posthog.hogql.placeholders import assert_no_placeholders, replace_placeholders
+from posthog.hogql.visitor import clone_expr
 
+# Number of parsed expressions and queries kept in memory
+PARSE_CACHE_SIZE = 1024
 
-def parse_expr(expr: str, placeholders: Optional[Dict[str, ast.Expr]] = None, no_placeholders=False) -> ast.Expr:
-    parse_tree = get_parser(expr).expr()
-    node = HogQLParseTreeConverter().visit(parse_tree)
-    if placeholders:
-        return replace_placeholders(node, placeholders)
-    elif no_placeholders:
-        assert_no_placeholders(node)
+RULE_EXPR = "expr"
+RULE_ORDER_EXPR = "orderExpr"
+RULE_SELECT = "select"
 
-    return node
+
+def parse_expr(expr: str, placeholders: Optional[Dict[str, ast.Expr]] = None, no_placeholders=False) -> ast.Expr:
+    return _parse(RULE_EXPR, expr, placeholders, no_placeholders)
 
 
 def parse_order_expr(
     order_expr: str, placeholders: Optional[Dict[str, ast.Expr]] = None, no_placeholders=False
 ) -> ast.Expr:
-    parse_tree = get_parser(order_expr).orderExpr()
-    node = HogQLParseTreeConverter().visit(parse_tree)
-    if placeholders:
-        return replace_placeholders(node, placeholders)
-    elif no_placeholders:
-        assert_no_placeholders(node)
-
-    return node
+    return _parse(RULE_ORDER_EXPR, order_expr, placeholders, no_placeholders)
 
 
 def parse_select(
     statement: str, placeholders: Optional[Dict[str, ast.Expr]] = None, no_placeholders=False
 ) -> ast.SelectQuery | ast.SelectUnionQuery:
-    parse_tree = get_parser(statement).select()
-    node = HogQLParseTreeConverter().visit(parse_tree)
+    return cast(ast.SelectQuery | ast.SelectUnionQuery, _parse(RULE_SELECT, statement, placeholders, no_placeholders))
+
+
+def _parse(rule: str, text: str, placeholders: Optional[Dict[str, ast.Expr]], no_placeholders: bool) -> ast.Expr:
+    # Placeholders are substituted after parsing, so the cached tree only depends on whether they're allowed
+    node = _parse_cached(rule, text, no_placeholders and not placeholders)
     if placeholders:
-        node = replace_placeholders(node, placeholders)
-    elif no_placeholders:
+        # Clones the tree
+        return replace_placeholders(node, placeholders)
+    # Callers resolve and transform the tree in place, so they must never get the cached one
+    return clone_expr(node)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(rule: str, text: str, no_placeholders: bool) -> ast.Expr:
+    parse_tree = getattr(get_parser(text), rule)()
+    node = HogQLParseTreeConverter().visit(parse_tree)
+    if no_placeholders:
         assert_no_placeholders(node)
     return node
 
 
+def clear_parse_cache() -> None:
+    """Mostly for benchmarks and tests."""
+    _parse_cached.cache_clear()
+
+
 def get_parser(query: str) -> HogQLParser:
     input_stream = InputStream(data=query)
     lexer = HogQLLexer(input_stream)
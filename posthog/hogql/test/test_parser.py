@@ -1,5 +1,7 @@
+from typing import cast
+
 from posthog.hogql import ast
-from posthog.hogql.parser import parse_expr, parse_order_expr, parse_select
+from posthog.hogql.parser import _parse_cached, clear_parse_cache, parse_expr, parse_order_expr, parse_select
 from posthog.test.base import BaseTest
 
 
@@ -723,3 +725,28 @@ class TestParser(BaseTest):
                 ]
             ),
         )
+
+    def test_parse_cache_returns_fresh_trees(self):
+        clear_parse_cache()
+        query = "select event, properties.$browser from events where timestamp > {date}"
+        first = parse_select(query, {"date": ast.Constant(value="2023-01-01")})
+        self.assertEqual(_parse_cached.cache_info().misses, 1)
+
+        # Resolving sets refs on the tree in place, which must not leak into later parses of the same query
+        first.select[0].ref = ast.ConstantRef(value="event")
+        cast(ast.Field, first.select[1]).chain.append("mutated")
+
+        second = parse_select(query, {"date": ast.Constant(value="2023-01-02")})
+        self.assertEqual(_parse_cached.cache_info().hits, 1)
+        self.assertEqual(second.select, [ast.Field(chain=["event"]), ast.Field(chain=["properties", "$browser"])])
+        self.assertIsNone(second.select[0].ref)
+        self.assertEqual(cast(ast.CompareOperation, second.where).right, ast.Constant(value="2023-01-02"))
+        self.assertIsNot(parse_expr("1 + 1"), parse_expr("1 + 1"))
+
+    def test_parse_cache_keeps_placeholder_checks(self):
+        clear_parse_cache()
+        self.assertEqual(parse_expr("{foo}"), ast.Placeholder(field="foo"))
+        with self.assertRaises(ValueError):
+            parse_expr("{foo}", no_placeholders=True)
+        with self.assertRaises(ValueError):
+            parse_expr("{foo}", no_placeholders=True)
@@ -176,13 +176,13 @@ class CloningVisitor(Visitor):
         )
 
     def visit_constant(self, node: ast.Constant):
-        return node
+        return ast.Constant(value=node.value)
 
     def visit_field(self, node: ast.Field):
-        return node
+        return ast.Field(chain=list(node.chain))
 
     def visit_placeholder(self, node: ast.Placeholder):
-        return node
+        return ast.Placeholder(field=node.field)
 
     def visit_call(self, node: ast.Call):
         return ast.Call(
@@ -1,6 +1,16 @@
 import json
+import time
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
 import kafka.errors
 from kafka import KafkaConsumer as KC
@@ -15,6 +25,8 @@ from posthog.kafka_client import helper
 from posthog.settings import (
     KAFKA_BASE64_KEYS,
     KAFKA_HOSTS,
+    KAFKA_PRODUCER_BATCH_SIZE,
+    KAFKA_PRODUCER_LINGER_MS,
     KAFKA_SASL_MECHANISM,
     KAFKA_SASL_PASSWORD,
     KAFKA_SASL_USER,
@@ -81,6 +93,34 @@ class KafkaConsumerForTests:
         return
 
 
+class KafkaMessage(NamedTuple):
+    topic: str
+    data: Any
+    key: Optional[str] = None
+
+
+class ProduceBatchFuture:
+    """
+    Groups the delivery futures of a batch of produced messages, so callers can wait for all of them under one
+    shared timeout. Each message is still serialized, sent and acknowledged on its own.
+    """
+
+    def __init__(self, futures: List[Any]):
+        self.futures = futures
+
+    def __len__(self) -> int:
+        return len(self.futures)
+
+    def get(self, timeout: Optional[float] = None) -> List[Any]:
+        """Waits for all messages to be acknowledged, sharing `timeout` across the batch. Raises the first error."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        results = []
+        for future in self.futures:
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            results.append(future.get(timeout=remaining))
+        return results
+
+
 class _KafkaSecurityProtocol(str, Enum):
     PLAINTEXT = "PLAINTEXT"
     SSL = "SSL"
@@ -103,10 +143,17 @@ class _KafkaProducer:
         if test:
             self.producer = KafkaProducerForTests()
         elif KAFKA_BASE64_KEYS:
-            self.producer = helper.get_kafka_producer(retries=KAFKA_PRODUCER_RETRIES, value_serializer=lambda d: d)
+            self.producer = helper.get_kafka_producer(
+                retries=KAFKA_PRODUCER_RETRIES,
+                value_serializer=lambda d: d,
+                linger_ms=KAFKA_PRODUCER_LINGER_MS,
+                batch_size=KAFKA_PRODUCER_BATCH_SIZE,
+            )
         else:
             self.producer = KP(
                 retries=KAFKA_PRODUCER_RETRIES,
+                linger_ms=KAFKA_PRODUCER_LINGER_MS,
+                batch_size=KAFKA_PRODUCER_BATCH_SIZE,
                 bootstrap_servers=KAFKA_HOSTS,
                 security_protocol=KAFKA_SECURITY_PROTOCOL or _KafkaSecurityProtocol.PLAINTEXT,
                 **_sasl_params(),
@@ -144,6 +191,21 @@ class _KafkaProducer:
         future.add_callback(self.on_send_success).add_errback(lambda exc: self.on_send_failure(topic=topic, exc=exc))
         return future
 
+    def produce_batch(
+        self, messages: Iterable[KafkaMessage], value_serializer: Optional[Callable[[Any], Any]] = None
+    ) -> ProduceBatchFuture:
+        """
+        Produces all `messages` back to back and returns a future grouping their delivery futures.
+
+        The underlying producer sends messages for the same partition together, if they're produced within
+        KAFKA_PRODUCER_LINGER_MS of each other and fit into KAFKA_PRODUCER_BATCH_SIZE.
+        """
+        futures = [
+            self.produce(topic=message.topic, data=message.data, key=message.key, value_serializer=value_serializer)
+            for message in messages
+        ]
+        return ProduceBatchFuture(futures)
+
     def close(self):
         self.producer.flush()
 
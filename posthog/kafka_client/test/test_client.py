@@ -3,7 +3,7 @@ from unittest.mock import patch
 import kafka
 from django.test import TestCase
 
-from posthog.kafka_client.client import _KafkaProducer, build_kafka_consumer
+from posthog.kafka_client.client import KafkaMessage, _KafkaProducer, build_kafka_consumer
 
 
 class KafkaClientTestCase(TestCase):
@@ -20,6 +20,16 @@ class KafkaClientTestCase(TestCase):
         msg = next(consumer)
         self.assertEqual(msg, "message 1 from test_topic topic")
 
+    def test_kafka_produce_batch(self):
+        producer = _KafkaProducer(test=True)
+
+        future = producer.produce_batch(
+            [KafkaMessage(topic=self.topic, data=self.payload, key=str(i)) for i in range(3)]
+        )
+
+        self.assertEqual(len(future), 3)
+        self.assertEqual(future.get(timeout=1), [None, None, None])
+
     def test_kafka_produce(self):
         producer = _KafkaProducer(test=False)
         producer.produce(topic=self.topic, data=self.payload)
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2023-03-06 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posthog", "0308_add_indirect_person_override_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="insightcachingstate",
+            name="refresh_duration_seconds",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2023-03-08 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posthog", "0309_insightcachingstate_refresh_duration_seconds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exportedasset",
+            name="export_progress",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,13 +1,15 @@
 import time
 from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional, cast
+from typing import Any, Dict, Iterator, List, Literal, Optional, cast
 
 import structlog
 from django.conf import settings
 from django.db import connection, models
 from django.db.models import Case, Q, When
 from django.db.models.expressions import F
+from django.db.models.query import QuerySet
 from django.utils import timezone
+from more_itertools import chunked
 from sentry_sdk import capture_exception
 
 from posthog.constants import PropertyOperatorType
@@ -308,11 +310,15 @@ class Cohort(models.Model):
     def __str__(self):
         return self.name
 
-    def _clickhouse_persons_query(self, batch_size=10000, offset=0):
-        from posthog.models.cohort.util import get_person_ids_by_cohort_id
+    def _clickhouse_persons_query(self, batch_size=10000) -> Iterator[QuerySet]:
+        """
+        Yields the persons in the cohort as of ClickHouse, `batch_size` at a time. The ClickHouse query runs once
+        and is streamed, so its connection is held until all batches have been consumed.
+        """
+        from posthog.models.cohort.util import iter_person_ids_by_cohort_id
 
-        uuids = get_person_ids_by_cohort_id(team=self.team, cohort_id=self.pk, limit=batch_size, offset=offset)
-        return Person.objects.filter(uuid__in=uuids, team=self.team)
+        for uuids in chunked(iter_person_ids_by_cohort_id(team=self.team, cohort_id=self.pk), batch_size):
+            yield Person.objects.filter(uuid__in=uuids, team=self.team)
 
     __repr__ = sane_repr("id", "name", "last_calculation")
 
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import structlog
 from dateutil import parser
@@ -31,7 +31,7 @@ from posthog.models.person.sql import (
     PERSON_STATIC_COHORT_TABLE,
 )
 from posthog.models.property import Property, PropertyGroup
-from posthog.queries.insight import insight_sync_execute
+from posthog.queries.insight import insight_stream_execute
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
 
 # temporary marker to denote when cohortpeople table started being populated
@@ -188,6 +188,13 @@ def format_cohort_subquery(
 
 
 def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int] = None, offset: Optional[int] = None):
+    return list(iter_person_ids_by_cohort_id(team, cohort_id, limit, offset))
+
+
+def iter_person_ids_by_cohort_id(
+    team: Team, cohort_id: int, limit: Optional[int] = None, offset: Optional[int] = None
+) -> Iterator[str]:
+    """Streams ids of persons in the cohort, so cohorts of any size can be processed without paging."""
     from posthog.models.property.util import parse_prop_grouped_clauses
 
     filter = Filter(data={"properties": [{"key": "id", "value": cohort_id, "type": "cohort"}]})
@@ -198,7 +205,7 @@ def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int]
         hogql_context=filter.hogql_context,
     )
 
-    results = insight_sync_execute(
+    rows = insight_stream_execute(
         GET_PERSON_IDS_BY_FILTER.format(
             person_query=GET_LATEST_PERSON_SQL,
             distinct_query=filter_query,
@@ -211,7 +218,8 @@ def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int]
         query_type="get_person_ids_by_cohort_id",
     )
 
-    return [str(row[0]) for row in results]
+    for row in rows:
+        yield str(row[0])
 
 
 def insert_static_cohort(person_uuids: List[Optional[uuid.UUID]], cohort_id: int, team: Team):
@@ -1,9 +1,8 @@
 import json
 from datetime import timedelta
-from typing import Dict, List, Optional
+from typing import List, Optional
 
 from dateutil.parser import isoparse
-from django.db.models import Prefetch
 from django.utils.timezone import now
 
 from posthog.api.element import ElementSerializer
@@ -15,7 +14,7 @@ from posthog.hogql.property import action_to_expr, has_aggregation, property_to_
 from posthog.hogql.query import execute_hogql_query
 from posthog.models import Action, Person, Team
 from posthog.models.element import chain_to_elements
-from posthog.models.person.util import get_persons_by_distinct_ids
+from posthog.models.person.lookup import PersonLookup
 from posthog.schema import EventsQuery, EventsQueryResponse
 from posthog.utils import relative_date_parse
 
@@ -155,14 +154,7 @@ def run_events_query(
     if "person" in select_input_raw and len(query_result.results) > 0:
         # Make a query into postgres to fetch person
         person_idx = select_input_raw.index("person")
-        distinct_ids = list(set(event[person_idx] for event in query_result.results))
-        persons = get_persons_by_distinct_ids(team.pk, distinct_ids)
-        persons = persons.prefetch_related(Prefetch("persondistinctid_set", to_attr="distinct_ids_cache"))
-        distinct_to_person: Dict[str, Person] = {}
-        for person in persons:
-            if person:
-                for person_distinct_id in person.distinct_ids:
-                    distinct_to_person[person_distinct_id] = person
+        distinct_to_person = PersonLookup(team.pk).get_persons(event[person_idx] for event in query_result.results)
 
         # Loop over all columns in case there is more than one "person" column
         for column_index, column in enumerate(select_input_raw):
@@ -173,11 +165,10 @@ def run_events_query(
                 query_result.results[index] = list(result)
                 if distinct_to_person.get(distinct_id):
                     person = distinct_to_person[distinct_id]
-                    properties = person.properties or {}
                     query_result.results[index][column_index] = {
                         "uuid": person.uuid,
                         "created_at": person.created_at,
-                        "properties": {"name": properties.get("name"), "email": properties.get("email")},
+                        "properties": {"name": person.properties.get("name"), "email": person.properties.get("email")},
                         "distinct_id": distinct_id,
                     }
                 else:
@@ -1,11 +1,22 @@
-from datetime import timedelta
-from typing import Dict, List, Optional, Tuple, Union
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+import pytz
 from dateutil.parser import isoparse
 from django.utils.timezone import now
 
 from posthog.api.utils import get_pk_or_uuid
 from posthog.clickhouse.client.connection import Workload
+from posthog.clickhouse.client.execute import StreamProgress
 from posthog.hogql.context import HogQLContext
 from posthog.models import Action, Filter, Person, Team
 from posthog.models.action.util import format_action_filter
@@ -15,29 +26,65 @@ from posthog.models.event.sql import (
     SELECT_EVENT_BY_TEAM_AND_CONDITIONS_SQL,
 )
 from posthog.models.property.util import parse_prop_grouped_clauses
-from posthog.queries.insight import insight_query_with_columns
+from posthog.queries.insight import insight_query_with_columns, insight_stream_execute
 from posthog.utils import relative_date_parse
 
+# Events are looked for in consecutive time windows going back from `before`, starting with the most recent day and
+# growing each time a window doesn't have enough events to fill the page, so that teams with few events get their
+# page in a handful of bounded queries rather than one scan of all their events
+EVENTS_LIST_INITIAL_WINDOW = timedelta(days=1)
+EVENTS_LIST_WINDOW_GROWTH = 4
+# The last window reaches all the way back to `after`, or the first event
+EVENTS_LIST_MAX_WINDOWS = 5
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def parse_timestamp(value: str) -> datetime:
+    try:
+        timestamp = isoparse(value)
+    except ValueError:
+        timestamp = relative_date_parse(value)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=pytz.utc)
+
 
-def determine_event_conditions(conditions: Dict[str, Union[None, str, List[str]]]) -> Tuple[str, Dict]:
+def format_timestamp(timestamp: datetime) -> str:
+    return timestamp.astimezone(pytz.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def determine_event_conditions(
+    conditions: Dict[str, Union[None, str, List[str]]], order: str = "DESC"
+) -> Tuple[str, Dict]:
+    """
+    Builds the conditions for listing events filtered by `conditions`, i.e. request parameters.
+
+    Pages after the first are requested with the `timestamp` and `uuid` of the last event of the previous page,
+    as `before` (or `after`, when listing in ascending order) and `last_uuid`. That page then continues right after
+    that event, including any other events at the same timestamp.
+    """
     result = ""
     params: Dict[str, Union[str, List[str]]] = {}
+    last_uuid = conditions.get("last_uuid")
     for (k, v) in conditions.items():
         if not isinstance(v, str):
             continue
         if k == "after":
-            try:
-                timestamp = isoparse(v).strftime("%Y-%m-%d %H:%M:%S.%f")
-            except ValueError:
-                timestamp = relative_date_parse(v).strftime("%Y-%m-%d %H:%M:%S.%f")
-            result += "AND timestamp > %(after)s "
+            timestamp = format_timestamp(parse_timestamp(v))
+            if isinstance(last_uuid, str) and order == "ASC":
+                result += "AND timestamp >= %(after)s "
+                result += "AND (timestamp, uuid) > (toDateTime64(%(after)s, 6, 'UTC'), toUUID(%(last_uuid)s)) "
+                params.update({"last_uuid": last_uuid})
+            else:
+                result += "AND timestamp > %(after)s "
             params.update({"after": timestamp})
         elif k == "before":
-            try:
-                timestamp = isoparse(v).strftime("%Y-%m-%d %H:%M:%S.%f")
-            except ValueError:
-                timestamp = relative_date_parse(v).strftime("%Y-%m-%d %H:%M:%S.%f")
-            result += "AND timestamp < %(before)s "
+            timestamp = format_timestamp(parse_timestamp(v))
+            if isinstance(last_uuid, str) and order == "DESC":
+                result += "AND timestamp <= %(before)s "
+                result += "AND (timestamp, uuid) < (toDateTime64(%(before)s, 6, 'UTC'), toUUID(%(last_uuid)s)) "
+                params.update({"last_uuid": last_uuid})
+            else:
+                result += "AND timestamp < %(before)s "
             params.update({"before": timestamp})
         elif k == "person_id":
             result += """AND distinct_id IN (%(distinct_ids)s) """
@@ -59,27 +106,128 @@ def query_events_list(
     request_get_query_dict: Dict,
     order_by: List[str],
     action_id: Optional[str],
-    unbounded_date_from: bool = False,
     limit: int = QUERY_DEFAULT_LIMIT,
     offset: int = 0,
 ) -> List:
+    """
+    Returns up to `limit + 1` events, the extra one showing whether there's another page.
+
+    Pages are best requested by keyset (see `determine_event_conditions`), which is roughly one bounded scan per page
+    however deep. `offset` is still supported, but has to scan every event before the page.
+    """
     # Note: This code is inefficient and problematic, see https://github.com/PostHog/posthog/issues/13485 for details.
     # To isolate its impact from rest of the queries its queries are run on different nodes as part of "offline" workloads.
     hogql_context = HogQLContext(within_non_hogql_query=True)
 
     limit += 1
-    limit_sql = "LIMIT %(limit)s"
+    order = "DESC" if len(order_by) == 1 and order_by[0] == "-timestamp" else "ASC"
+    query_dict = {"before": (now() + timedelta(seconds=5)).isoformat(), **request_get_query_dict}
+
+    conditions, condition_params = determine_event_conditions(query_dict, order)
+    filters = _get_filters(filter, team, action_id, hogql_context)
+    if filters is None:
+        return []
+    prop_filters, prop_filter_params = filters
+
+    def _query(window_start: Optional[datetime], window_end: Optional[datetime], limit: int, offset: int = 0) -> List:
+        window_conditions = conditions
+        window_params: Dict[str, Any] = {}
+        if window_start is not None:
+            window_conditions += "AND timestamp >= %(window_start)s "
+            window_params["window_start"] = format_timestamp(window_start)
+        if window_end is not None:
+            window_conditions += "AND timestamp < %(window_end)s "
+            window_params["window_end"] = format_timestamp(window_end)
+
+        limit_sql = "LIMIT %(limit)s"
+        if offset > 0:
+            limit_sql += " OFFSET %(offset)s"
+
+        return insight_query_with_columns(
+            _get_query(window_conditions, prop_filters, order, limit_sql),
+            {
+                "team_id": team.pk,
+                "limit": limit,
+                "offset": offset,
+                **condition_params,
+                **window_params,
+                **prop_filter_params,
+                **hogql_context.values,
+            },
+            query_type="events_list",
+            workload=Workload.OFFLINE,
+        )
 
+    after = parse_timestamp(query_dict["after"]) if isinstance(query_dict.get("after"), str) else None
     if offset > 0:
-        limit_sql += " OFFSET %(offset)s"
-
-    conditions, condition_params = determine_event_conditions(
-        {
-            "after": None if unbounded_date_from else (now() - timedelta(days=1)).isoformat(),
-            "before": (now() + timedelta(seconds=5)).isoformat(),
-            **request_get_query_dict,
-        }
+        return _query(None, None, limit, offset)
+
+    if order == "ASC":
+        if after is not None:
+            return _query(None, None, limit)
+        # Without a starting point, the oldest events of the last day are listed if there are enough of them
+        result = _query(now() - EVENTS_LIST_INITIAL_WINDOW, None, limit)
+        return result if len(result) >= limit else _query(None, None, limit)
+
+    result: List = []
+    window_end: Optional[datetime] = None
+    window_start = parse_timestamp(query_dict["before"])
+    window = EVENTS_LIST_INITIAL_WINDOW
+    for index in range(EVENTS_LIST_MAX_WINDOWS):
+        window_start = window_start - window
+        is_last_window = index == EVENTS_LIST_MAX_WINDOWS - 1 or (after is not None and window_start <= after)
+        result += _query(None if is_last_window else window_start, window_end, limit - len(result))
+        if len(result) >= limit or is_last_window:
+            break
+        window_end = window_start
+        window *= EVENTS_LIST_WINDOW_GROWTH
+    return result
+
+
+def stream_events_list(
+    filter: Filter,
+    team: Team,
+    request_get_query_dict: Dict,
+    order_by: List[str],
+    action_id: Optional[str],
+    limit: int,
+    on_progress: Optional[Callable[[StreamProgress], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields up to `limit` of the events `query_events_list` would list, from a single query whose results are streamed
+    block by block instead of paged through, so that any number of events can be exported at constant memory.
+    """
+    hogql_context = HogQLContext(within_non_hogql_query=True)
+
+    order = "DESC" if len(order_by) == 1 and order_by[0] == "-timestamp" else "ASC"
+    query_dict = {"before": (now() + timedelta(seconds=5)).isoformat(), **request_get_query_dict}
+
+    conditions, condition_params = determine_event_conditions(query_dict, order)
+    filters = _get_filters(filter, team, action_id, hogql_context)
+    if filters is None:
+        return
+    prop_filters, prop_filter_params = filters
+
+    rows = insight_stream_execute(
+        _get_query(conditions, prop_filters, order, "LIMIT %(limit)s"),
+        {"team_id": team.pk, "limit": limit, **condition_params, **prop_filter_params, **hogql_context.values},
+        query_type="events_list_export",
+        workload=Workload.OFFLINE,
+        with_column_types=True,
+        on_progress=on_progress,
     )
+    columns = next(rows, None)
+    if columns is None:
+        return
+    column_names = [name for name, _ in columns]
+    for row in rows:
+        yield dict(zip(column_names, row))
+
+
+def _get_filters(
+    filter: Filter, team: Team, action_id: Optional[str], hogql_context: HogQLContext
+) -> Optional[Tuple[str, Dict]]:
+    "Returns property and action filters of the events list, or None if the action can't match any events."
     prop_filters, prop_filter_params = parse_prop_grouped_clauses(
         team_id=team.pk, property_group=filter.property_groups, has_person_id_joined=False, hogql_context=hogql_context
     )
@@ -88,41 +236,20 @@ def query_events_list(
         try:
             action = Action.objects.get(pk=action_id, team_id=team.pk)
         except Action.DoesNotExist:
-            return []
+            return None
         if action.steps.count() == 0:
-            return []
+            return None
 
         action_query, params = format_action_filter(team_id=team.pk, action=action, hogql_context=hogql_context)
         prop_filters += " AND {}".format(action_query)
         prop_filter_params = {**prop_filter_params, **params}
 
-    order = "DESC" if len(order_by) == 1 and order_by[0] == "-timestamp" else "ASC"
+    return prop_filters, prop_filter_params
+
+
+def _get_query(conditions: str, prop_filters: str, order: str, limit_sql: str) -> str:
     if prop_filters != "":
-        return insight_query_with_columns(
-            SELECT_EVENT_BY_TEAM_AND_CONDITIONS_FILTERS_SQL.format(
-                conditions=conditions, limit=limit_sql, filters=prop_filters, order=order
-            ),
-            {
-                "team_id": team.pk,
-                "limit": limit,
-                "offset": offset,
-                **condition_params,
-                **prop_filter_params,
-                **hogql_context.values,
-            },
-            query_type="events_list",
-            workload=Workload.OFFLINE,
-        )
-    else:
-        return insight_query_with_columns(
-            SELECT_EVENT_BY_TEAM_AND_CONDITIONS_SQL.format(conditions=conditions, limit=limit_sql, order=order),
-            {
-                "team_id": team.pk,
-                "limit": limit,
-                "offset": offset,
-                **condition_params,
-                **hogql_context.values,
-            },
-            query_type="events_list",
-            workload=Workload.OFFLINE,
+        return SELECT_EVENT_BY_TEAM_AND_CONDITIONS_FILTERS_SQL.format(
+            conditions=conditions, limit=limit_sql, filters=prop_filters, order=order
         )
+    return SELECT_EVENT_BY_TEAM_AND_CONDITIONS_SQL.format(conditions=conditions, limit=limit_sql, order=order)
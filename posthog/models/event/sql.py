@@ -2,7 +2,7 @@ from django.conf import settings
 
 from posthog.clickhouse.base_sql import COPY_ROWS_BETWEEN_TEAMS_BASE_SQL
 from posthog.clickhouse.indexes import index_by_kafka_timestamp, projection_for_max_kafka_timestamp
-from posthog.clickhouse.kafka_engine import KAFKA_COLUMNS, STORAGE_POLICY, kafka_engine, trim_quotes_expr
+from posthog.clickhouse.kafka_engine import KAFKA_COLUMNS, STORAGE_POLICY, kafka_engine, trim_quotes_expr, ttl_period
 from posthog.clickhouse.table_engines import Distributed, ReplacingMergeTree, ReplicationScheme
 from posthog.kafka_client.topics import KAFKA_EVENTS_JSON
 
@@ -289,7 +289,7 @@ FROM
     events
 where team_id = %(team_id)s
 {conditions}
-ORDER BY timestamp {order} {limit}
+ORDER BY timestamp {order}, uuid {order} {limit}
 """
 
 SELECT_EVENT_BY_TEAM_AND_CONDITIONS_FILTERS_SQL = """
@@ -307,7 +307,7 @@ WHERE
 team_id = %(team_id)s
 {conditions}
 {filters}
-ORDER BY timestamp {order} {limit}
+ORDER BY timestamp {order}, uuid {order} {limit}
 """
 
 SELECT_ONE_EVENT_SQL = """
@@ -392,6 +392,55 @@ AND timestamp > %(timestamp)s
 GROUP BY event ORDER BY count DESC
 """
 
+EVENT_VOLUME_DAILY_TABLE = "event_volume_daily"
+
+# How many of each event each team received per day, and when they were last seen. Event definitions' 30 day volumes
+# are summed from this, so that only the days since it was last updated have to be read from the events table.
+EVENT_VOLUME_DAILY_TABLE_ENGINE = lambda: ReplacingMergeTree(EVENT_VOLUME_DAILY_TABLE, ver="calculated_at")
+EVENT_VOLUME_DAILY_TABLE_SQL = lambda: """
+CREATE TABLE IF NOT EXISTS {table_name} ON CLUSTER '{cluster}'
+(
+    team_id Int64,
+    day Date,
+    event VARCHAR,
+    count UInt64,
+    last_seen_at DateTime64(6, 'UTC'),
+    calculated_at DateTime64(6, 'UTC')
+) ENGINE = {engine}
+PARTITION BY toYYYYMM(day)
+ORDER BY (team_id, day, event)
+{ttl_period}
+{storage_policy}
+""".format(
+    table_name=EVENT_VOLUME_DAILY_TABLE,
+    cluster=settings.CLICKHOUSE_CLUSTER,
+    engine=EVENT_VOLUME_DAILY_TABLE_ENGINE(),
+    ttl_period=ttl_period("day", weeks=8),
+    storage_policy=STORAGE_POLICY(),
+)
+
+TRUNCATE_EVENT_VOLUME_DAILY_TABLE_SQL = (
+    f"TRUNCATE TABLE IF EXISTS {EVENT_VOLUME_DAILY_TABLE} ON CLUSTER '{settings.CLICKHOUSE_CLUSTER}'"
+)
+
+GET_LATEST_EVENT_VOLUME_DAY = f"SELECT max(day) FROM {EVENT_VOLUME_DAILY_TABLE}"
+
+# Volumes of all teams' events on one day, in a single pass over that day of the events table
+INSERT_EVENT_VOLUME_DAILY = f"""
+INSERT INTO {EVENT_VOLUME_DAILY_TABLE} (team_id, day, event, count, last_seen_at, calculated_at)
+SELECT team_id, toDate(%(day)s), event, count(), max(timestamp), now64(6, 'UTC')
+FROM events
+WHERE timestamp >= %(day_start)s AND timestamp < %(day_end)s
+GROUP BY team_id, event
+"""
+
+GET_EVENTS_VOLUME_FOR_TEAMS = f"""
+SELECT team_id, event, sum(count) AS volume, max(last_seen_at) AS latest_seen_at
+FROM {EVENT_VOLUME_DAILY_TABLE} FINAL
+WHERE team_id IN %(team_ids)s AND day >= %(since)s
+GROUP BY team_id, event
+"""
+
 
 GET_EVENT_PROPERTY_SAMPLE_JSON_VALUES = """
     WITH property_tuples AS (
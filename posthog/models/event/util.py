@@ -15,6 +15,7 @@ from posthog.models import Group
 from posthog.models.element.element import Element, chain_to_elements, elements_to_string
 from posthog.models.event.sql import BULK_INSERT_EVENT_SQL, INSERT_EVENT_SQL
 from posthog.models.person import Person
+from posthog.models.person.lookup import PersonSummary
 from posthog.models.team import Team
 from posthog.settings import TEST
 
@@ -301,13 +302,11 @@ class ClickhouseEventSerializer(serializers.Serializer):
         if not self.context.get("people") or event["distinct_id"] not in self.context["people"]:
             return None
 
-        person = self.context["people"][event["distinct_id"]]
+        person: PersonSummary = self.context["people"][event["distinct_id"]]
         return {
             "is_identified": person.is_identified,
-            "distinct_ids": person.distinct_ids[:1],  # only send the first one to avoid a payload bloat
-            "properties": {
-                key: person.properties[key] for key in ["email", "name", "username"] if key in person.properties
-            },
+            "distinct_ids": [person.distinct_id],  # only send the first one to avoid a payload bloat
+            "properties": person.properties,
         }
 
     def get_elements(self, event):
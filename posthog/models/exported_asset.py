@@ -1,6 +1,6 @@
 import secrets
 from datetime import timedelta
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
 import structlog
 from django.conf import settings
@@ -48,6 +48,8 @@ class ExportedAsset(models.Model):
     # path in object storage or some other location identifier for the asset
     # 1000 characters would hold a 20 UUID forward slash separated path with space to spare
     content_location: models.TextField = models.TextField(null=True, blank=True, max_length=1000)
+    # for exports that take a while, e.g. {"rows_exported": 20000, "completion": 0.4}
+    export_progress: models.JSONField = models.JSONField(null=True, blank=True)
 
     # DEPRECATED: We now use JWT for accessing assets
     access_token: models.CharField = models.CharField(
@@ -137,6 +139,30 @@ def save_content_to_exported_asset(exported_asset: ExportedAsset, content: bytes
 
 
 def save_content_to_object_storage(exported_asset: ExportedAsset, content: bytes) -> None:
+    object_path = _get_object_storage_path(exported_asset)
+    object_storage.write(object_path, content)
+    exported_asset.content_location = object_path
+    exported_asset.save(update_fields=["content_location"])
+
+
+def save_content_stream(exported_asset: ExportedAsset, chunks: Iterable[bytes]) -> None:
+    """
+    Saves content as `chunks` produces it, streaming it to object storage if enabled.
+
+    Unlike `save_content`, there's no falling back to saving to the asset if writing to object storage fails,
+    as the content has been consumed by then. Without object storage, all content is held in memory to be saved to
+    the asset, so `chunks` must be bounded by the caller.
+    """
+    if settings.OBJECT_STORAGE_ENABLED:
+        object_path = _get_object_storage_path(exported_asset)
+        object_storage.write_stream(object_path, chunks)
+        exported_asset.content_location = object_path
+        exported_asset.save(update_fields=["content_location"])
+    else:
+        save_content_to_exported_asset(exported_asset, b"".join(chunks))
+
+
+def _get_object_storage_path(exported_asset: ExportedAsset) -> str:
     path_parts: List[str] = [
         settings.OBJECT_STORAGE_EXPORTS_FOLDER,
         exported_asset.export_format.split("/")[1],
@@ -144,7 +170,4 @@ def save_content_to_object_storage(exported_asset: ExportedAsset, content: bytes
         f"task-{exported_asset.id}",
         str(UUIDT()),
     ]
-    object_path = f'/{"/".join(path_parts)}'
-    object_storage.write(object_path, content)
-    exported_asset.content_location = object_path
-    exported_asset.save(update_fields=["content_location"])
+    return f'/{"/".join(path_parts)}'
@@ -1,5 +1,6 @@
+import hashlib
 import json
-from typing import Dict, List, Optional, cast
+from typing import TYPE_CHECKING, Dict, List, Optional, cast
 
 from django.core.cache import cache
 from django.db import models
@@ -14,6 +15,9 @@ from posthog.models.property import GroupTypeIndex
 from posthog.models.property.property import Property, PropertyGroup
 from posthog.models.signals import mutable_receiver
 
+if TYPE_CHECKING:
+    from posthog.models.feature_flag.flag_evaluation_plan import TeamFlagsEvaluationPlan
+
 FIVE_DAYS = 60 * 60 * 24 * 5  # 5 days in seconds
 
 
@@ -279,6 +283,23 @@ def set_feature_flags_for_team_in_cache(
 
 
 def get_feature_flags_for_team_in_cache(team_id: int) -> Optional[List[FeatureFlag]]:
+    evaluation_plan = get_flags_evaluation_plan_for_team_in_cache(team_id)
+    return evaluation_plan.feature_flags if evaluation_plan is not None else None
+
+
+def get_flags_evaluation_plan_for_team_in_cache(team_id: int) -> Optional["TeamFlagsEvaluationPlan"]:
+    """
+    Returns the compiled evaluation plan for the team's cached flags.
+
+    Plans are kept in process memory keyed by a hash of the cached flag definitions, so conditions are only parsed
+    again when flags change. Every call gets its own flag instances.
+    """
+    from posthog.models.feature_flag.flag_evaluation_plan import (
+        cache_team_flags,
+        compile_team_flags,
+        get_cached_team_flags,
+    )
+
     try:
         flag_data = cache.get(f"team_feature_flags_{team_id}")
     except Exception:
@@ -287,8 +308,12 @@ def get_feature_flags_for_team_in_cache(team_id: int) -> Optional[List[FeatureFl
 
     if flag_data is not None:
         try:
-            parsed_data = json.loads(flag_data)
-            return [FeatureFlag(**flag) for flag in parsed_data]
+            version = hashlib.sha1(flag_data.encode("utf-8")).hexdigest()
+            compiled_flags = get_cached_team_flags(team_id, version)
+            if compiled_flags is None:
+                compiled_flags = compile_team_flags(flag_data, version)
+                cache_team_flags(team_id, compiled_flags)
+            return compiled_flags.instantiate()
         except Exception as e:
             capture_exception(e)
             return None
@@ -0,0 +1,143 @@
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter
+
+from posthog.models.filters import Filter
+from posthog.models.property.property import Property
+
+from .feature_flag import FeatureFlag
+
+# Number of teams whose plans are kept in process memory
+MAX_CACHED_TEAM_PLANS = 1000
+
+FLAG_EVALUATION_PLAN_CACHE_COUNTER = Counter(
+    "flag_evaluation_plan_cache_requests_total",
+    "Lookups of compiled feature flag evaluation plans in process memory, per result (hit or miss).",
+    labelnames=["result"],
+)
+
+
+@dataclass(frozen=True)
+class FlagEvaluationPlan:
+    """
+    Everything needed to evaluate a feature flag that doesn't depend on who it's evaluated for,
+    parsed once instead of on every /decide request.
+    """
+
+    # Parsed properties of each condition, by condition index
+    condition_properties: List[List[Property]]
+    variant_lookup_table: List[Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class TeamFlagsEvaluationPlan:
+    """The team's flags along with their evaluation plans, for use by a single caller."""
+
+    feature_flags: List[FeatureFlag]
+    # By `id()` of the flag instance, which `feature_flags` keeps alive
+    flag_plans: Dict[int, FlagEvaluationPlan]
+
+    def for_flag(self, feature_flag: FeatureFlag) -> Optional[FlagEvaluationPlan]:
+        # Only use a plan for the exact instance it was compiled for, never for a flag loaded elsewhere
+        return self.flag_plans.get(id(feature_flag))
+
+
+@dataclass(frozen=True)
+class CompiledTeamFlags:
+    """
+    The team's cached flag definitions with their evaluation plans, as kept in process memory.
+
+    Only plain data is kept, as model instances aren't safe to share across threads: every caller gets its own
+    `FeatureFlag` instances from `instantiate`. The parsed properties and lookup tables are shared, they're only
+    ever read.
+    """
+
+    # Hash of the cached flag definitions this was compiled from
+    version: str
+    serialized_flags: str
+    flag_plans: Dict[str, FlagEvaluationPlan]
+
+    def instantiate(self) -> TeamFlagsEvaluationPlan:
+        feature_flags = [FeatureFlag(**flag) for flag in json.loads(self.serialized_flags)]
+        return TeamFlagsEvaluationPlan(
+            feature_flags=feature_flags,
+            flag_plans={id(feature_flag): self.flag_plans[feature_flag.key] for feature_flag in feature_flags},
+        )
+
+
+def build_variant_lookup_table(feature_flag: FeatureFlag) -> List[Dict[str, Any]]:
+    # Define contiguous sub-domains within [0, 1].
+    # By looking up a random hash value, you can find the associated variant key.
+    # e.g. the first of two variants with 50% rollout percentage will have value_max: 0.5
+    # and the second will have value_min: 0.5 and value_max: 1.0
+    lookup_table = []
+    value_min = 0
+    for variant in feature_flag.variants:
+        value_max = value_min + variant["rollout_percentage"] / 100
+        lookup_table.append({"value_min": value_min, "value_max": value_max, "key": variant["key"]})
+        value_min = value_max
+    return lookup_table
+
+
+def build_flag_evaluation_plan(feature_flag: FeatureFlag) -> FlagEvaluationPlan:
+    condition_properties = []
+    for condition in feature_flag.conditions:
+        if len(condition.get("properties", [])) > 0:
+            condition_properties.append(Filter(data=condition).property_groups.flat)
+        else:
+            condition_properties.append([])
+
+    return FlagEvaluationPlan(
+        condition_properties=condition_properties,
+        variant_lookup_table=build_variant_lookup_table(feature_flag),
+    )
+
+
+def build_team_flags_evaluation_plan(feature_flags: List[FeatureFlag]) -> TeamFlagsEvaluationPlan:
+    return TeamFlagsEvaluationPlan(
+        feature_flags=feature_flags,
+        flag_plans={id(feature_flag): build_flag_evaluation_plan(feature_flag) for feature_flag in feature_flags},
+    )
+
+
+def compile_team_flags(serialized_flags: str, version: str) -> CompiledTeamFlags:
+    return CompiledTeamFlags(
+        version=version,
+        serialized_flags=serialized_flags,
+        flag_plans={
+            flag["key"]: build_flag_evaluation_plan(FeatureFlag(**flag)) for flag in json.loads(serialized_flags)
+        },
+    )
+
+
+_team_plans: "OrderedDict[int, CompiledTeamFlags]" = OrderedDict()
+_team_plans_lock = threading.Lock()
+
+
+def get_cached_team_flags(team_id: int, version: str) -> Optional[CompiledTeamFlags]:
+    with _team_plans_lock:
+        compiled_flags = _team_plans.get(team_id)
+        if compiled_flags is not None and compiled_flags.version == version:
+            _team_plans.move_to_end(team_id)
+            FLAG_EVALUATION_PLAN_CACHE_COUNTER.labels(result="hit").inc()
+            return compiled_flags
+
+    FLAG_EVALUATION_PLAN_CACHE_COUNTER.labels(result="miss").inc()
+    return None
+
+
+def cache_team_flags(team_id: int, compiled_flags: CompiledTeamFlags) -> None:
+    with _team_plans_lock:
+        _team_plans[team_id] = compiled_flags
+        _team_plans.move_to_end(team_id)
+        while len(_team_plans) > MAX_CACHED_TEAM_PLANS:
+            _team_plans.popitem(last=False)
+
+
+def clear_team_flags_evaluation_plans() -> None:
+    with _team_plans_lock:
+        _team_plans.clear()
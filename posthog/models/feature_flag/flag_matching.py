@@ -1,13 +1,18 @@
 import hashlib
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import reduce
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+from django.conf import settings
 from django.db import DatabaseError
+from django.db.models import Q
 from django.db.models.expressions import ExpressionWrapper, RawSQL
 from django.db.models.fields import BooleanField
 from django.db.models.query import QuerySet
 from sentry_sdk.api import capture_exception
+from statshog.defaults.django import statsd
 
 from posthog.models.filters import Filter
 from posthog.models.filters.mixins.utils import cached_property
@@ -17,14 +22,22 @@ from posthog.models.person import Person, PersonDistinctId
 from posthog.models.property import GroupTypeIndex, GroupTypeName
 from posthog.models.property.property import Property
 from posthog.models.utils import execute_with_timeout
-from posthog.queries.base import match_property, properties_to_Q
+from posthog.queries.base import PropertyNotLocallyEvaluable, match_properties_like_Q, match_property, properties_to_Q
 
 from .feature_flag import (
     FeatureFlag,
     FeatureFlagHashKeyOverride,
-    get_feature_flags_for_team_in_cache,
+    get_flags_evaluation_plan_for_team_in_cache,
     set_feature_flags_for_team_in_cache,
 )
+from .flag_evaluation_plan import TeamFlagsEvaluationPlan, build_team_flags_evaluation_plan, build_variant_lookup_table
+from .person_caching import (
+    delete_person_id_from_cache,
+    get_hash_key_overrides_from_cache,
+    get_person_id_from_cache,
+    set_hash_key_overrides_in_cache,
+    set_person_id_in_cache,
+)
 
 __LONG_SCALE__ = float(0xFFFFFFFFFFFFFFF)
 
@@ -65,6 +78,25 @@ class FeatureFlagMatch:
     payload: Optional[object] = None
 
 
+@dataclass(frozen=True)
+class FlagsEvaluationRequest:
+    """One distinct_id to evaluate flags for in `get_all_feature_flags_for_distinct_ids`."""
+
+    distinct_id: str
+    groups: Dict[GroupTypeName, str] = field(default_factory=dict)
+    property_value_overrides: Dict[str, Union[str, int]] = field(default_factory=dict)
+    group_property_value_overrides: Dict[str, Dict[str, Union[str, int]]] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class PropertiesSnapshot:
+    """Properties of a person and their groups, fetched ahead of evaluating flags for them."""
+
+    # None if the person doesn't exist
+    person_properties: Optional[Dict[str, Any]] = None
+    group_properties: Dict[GroupTypeIndex, Dict[str, Any]] = field(default_factory=dict)
+
+
 class FlagsMatcherCache:
     def __init__(self, team_id: int):
         self.team_id = team_id
@@ -96,6 +128,8 @@ class FeatureFlagMatcher:
         property_value_overrides: Dict[str, Union[str, int]] = {},
         group_property_value_overrides: Dict[str, Dict[str, Union[str, int]]] = {},
         skip_experience_continuity_flags: bool = False,
+        evaluation_plan: Optional[TeamFlagsEvaluationPlan] = None,
+        properties_snapshot: Optional[PropertiesSnapshot] = None,
     ):
         self.feature_flags = feature_flags
         self.distinct_id = distinct_id
@@ -105,6 +139,8 @@ class FeatureFlagMatcher:
         self.property_value_overrides = property_value_overrides
         self.group_property_value_overrides = group_property_value_overrides
         self.skip_experience_continuity_flags = skip_experience_continuity_flags
+        self.evaluation_plan = evaluation_plan
+        self.properties_snapshot = properties_snapshot
 
     def get_match(self, feature_flag: FeatureFlag) -> FeatureFlagMatch:
         # If aggregating flag by groups and relevant group type is not passed - flag is off!
@@ -203,7 +239,7 @@ class FeatureFlagMatcher:
     ) -> Tuple[bool, FeatureFlagMatchReason]:
         rollout_percentage = condition.get("rollout_percentage")
         if len(condition.get("properties", [])) > 0:
-            properties = Filter(data=condition).property_groups.flat
+            properties = self.condition_properties(feature_flag, condition, condition_index)
             if self.can_compute_locally(properties, feature_flag.aggregation_group_type_index):
                 # :TRICKY: If overrides are enough to determine if a condition is a match,
                 # we can skip checking the query.
@@ -230,21 +266,92 @@ class FeatureFlagMatcher:
     def _condition_matches(self, feature_flag: FeatureFlag, condition_index: int) -> bool:
         return self.query_conditions.get(f"flag_{feature_flag.pk}_condition_{condition_index}", False)
 
-    # Define contiguous sub-domains within [0, 1].
-    # By looking up a random hash value, you can find the associated variant key.
-    # e.g. the first of two variants with 50% rollout percentage will have value_max: 0.5
-    # and the second will have value_min: 0.5 and value_max: 1.0
+    def condition_properties(self, feature_flag: FeatureFlag, condition: Dict, condition_index: int) -> List[Property]:
+        flag_plan = self.evaluation_plan.for_flag(feature_flag) if self.evaluation_plan else None
+        if flag_plan is not None:
+            return flag_plan.condition_properties[condition_index]
+        return Filter(data=condition).property_groups.flat
+
     def variant_lookup_table(self, feature_flag: FeatureFlag):
-        lookup_table = []
-        value_min = 0
-        for variant in feature_flag.variants:
-            value_max = value_min + variant["rollout_percentage"] / 100
-            lookup_table.append({"value_min": value_min, "value_max": value_max, "key": variant["key"]})
-            value_min = value_max
-        return lookup_table
+        flag_plan = self.evaluation_plan.for_flag(feature_flag) if self.evaluation_plan else None
+        if flag_plan is not None:
+            return flag_plan.variant_lookup_table
+        return build_variant_lookup_table(feature_flag)
 
     @cached_property
     def query_conditions(self) -> Dict[str, bool]:
+        if self.properties_snapshot is not None or settings.DECIDE_LOCAL_FLAG_EVALUATION_ENABLED:
+            try:
+                return self._evaluate_conditions_locally()
+            except PropertyNotLocallyEvaluable:
+                statsd.incr("feature_flag_local_evaluation_fallback")
+        return self._query_conditions_in_postgres()
+
+    def _evaluate_conditions_locally(self) -> Dict[str, bool]:
+        """
+        Same result as `_query_conditions_in_postgres`, but fetches the person's and groups' properties once
+        (or uses the snapshot passed in) and matches every condition in Python.
+        """
+        conditions_to_evaluate: List[Tuple[str, FeatureFlag, List[Property]]] = []
+        needs_person = False
+        for feature_flag in self.feature_flags:
+            for index, condition in enumerate(feature_flag.conditions):
+                if len(condition.get("properties", {})) == 0:
+                    continue
+                properties = self.condition_properties(feature_flag, condition, index)
+                if any(property.type not in ("person", "group") for property in properties):
+                    raise PropertyNotLocallyEvaluable("Only person and group properties can be evaluated locally")
+                conditions_to_evaluate.append((f"flag_{feature_flag.pk}_condition_{index}", feature_flag, properties))
+                needs_person = needs_person or feature_flag.aggregation_group_type_index is None
+
+        if not conditions_to_evaluate:
+            return {}
+
+        snapshot = self.properties_snapshot or self._fetch_properties_snapshot(needs_person)
+
+        all_conditions = {}
+        for key, feature_flag, properties in conditions_to_evaluate:
+            if feature_flag.aggregation_group_type_index is None:
+                target_properties = snapshot.person_properties
+                override_properties = self.property_value_overrides
+            else:
+                target_properties = snapshot.group_properties.get(feature_flag.aggregation_group_type_index)
+                override_properties = self.group_property_value_overrides.get(
+                    self.cache.group_type_index_to_name[feature_flag.aggregation_group_type_index], {}
+                )
+
+            # Like the query, conditions of persons or groups that don't exist never match
+            if target_properties is not None:
+                all_conditions[key] = match_properties_like_Q(properties, target_properties, override_properties)
+
+        return all_conditions
+
+    def _fetch_properties_snapshot(self, needs_person: bool) -> PropertiesSnapshot:
+        team_id = self.feature_flags[0].team_id
+        person_properties: Optional[Dict[str, Any]] = None
+        group_properties: Dict[GroupTypeIndex, Dict[str, Any]] = {}
+        with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
+            if needs_person:
+                person_rows = Person.objects.filter(
+                    team_id=team_id, persondistinctid__distinct_id=self.distinct_id, persondistinctid__team_id=team_id
+                ).values_list("properties", flat=True)[:1]
+                person_properties = person_rows[0] if len(person_rows) > 0 else None
+
+            group_filters = [
+                Q(group_type_index=self.cache.group_types_to_indexes[group_type], group_key=group_key)
+                for group_type, group_key in self.groups.items()
+                if group_type in self.cache.group_types_to_indexes
+            ]
+            if group_filters:
+                group_properties = dict(
+                    Group.objects.filter(team_id=team_id)
+                    .filter(reduce(lambda left, right: left | right, group_filters))
+                    .values_list("group_type_index", "group_properties")
+                )
+
+        return PropertiesSnapshot(person_properties=person_properties, group_properties=group_properties)
+
+    def _query_conditions_in_postgres(self) -> Dict[str, bool]:
         with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
             team_id = self.feature_flags[0].team_id
             person_query: QuerySet = Person.objects.filter(
@@ -278,7 +385,7 @@ class FeatureFlagMatcher:
                                 self.cache.group_type_index_to_name[feature_flag.aggregation_group_type_index], {}
                             )
                         expr = properties_to_Q(
-                            Filter(data=condition).property_groups.flat,
+                            self.condition_properties(feature_flag, condition, index),
                             override_property_values=target_properties,
                         )
 
@@ -393,6 +500,47 @@ def hash_key_overrides(team_id: int, person_id: int) -> Dict[str, str]:
     return feature_flag_to_key_overrides
 
 
+def get_hash_key_overrides(team_id: int, person_id: int) -> Dict[str, str]:
+    """Same as `hash_key_overrides`, going through the cache first."""
+    overrides = get_hash_key_overrides_from_cache(team_id, person_id)
+    if overrides is None:
+        overrides = hash_key_overrides(team_id, person_id)
+        set_hash_key_overrides_in_cache(team_id, person_id, overrides)
+    return overrides
+
+
+def _get_person_id(team_id: int, distinct_id: str) -> Tuple[Optional[int], str]:
+    """Returns the person the distinct_id belongs to, and whether it came from the "cache" or "postgres"."""
+    person_id = get_person_id_from_cache(team_id, distinct_id)
+    if person_id is not None:
+        return person_id, "cache"
+
+    with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
+        person_id = (
+            PersonDistinctId.objects.filter(distinct_id=distinct_id, team_id=team_id)
+            .values_list("person_id", flat=True)
+            .first()
+        )
+    if person_id is not None:
+        set_person_id_in_cache(team_id, distinct_id, person_id)
+    return person_id, "postgres"
+
+
+def hash_key_overrides_for_persons(team_id: int, person_ids: List[int]) -> Dict[int, Dict[str, str]]:
+    """Same as `hash_key_overrides`, for many persons in one query."""
+    overrides_by_person: Dict[int, Dict[str, str]] = {}
+    if not person_ids:
+        return overrides_by_person
+
+    with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
+        for person_id, feature_flag, override in FeatureFlagHashKeyOverride.objects.filter(
+            person_id__in=person_ids, team=team_id
+        ).values_list("person_id", "feature_flag_key", "hash_key"):
+            overrides_by_person.setdefault(person_id, {})[feature_flag] = override
+
+    return overrides_by_person
+
+
 # Return a Dict with all flags and their values
 def _get_all_feature_flags(
     feature_flags: List[FeatureFlag],
@@ -403,11 +551,16 @@ def _get_all_feature_flags(
     property_value_overrides: Dict[str, Union[str, int]] = {},
     group_property_value_overrides: Dict[str, Dict[str, Union[str, int]]] = {},
     skip_experience_continuity_flags: bool = False,
+    evaluation_plan: Optional[TeamFlagsEvaluationPlan] = None,
+    person_overrides: Optional[Dict[str, str]] = None,
 ) -> Tuple[Dict[str, Union[str, bool]], Dict[str, dict], Dict[str, object], bool]:
     cache = FlagsMatcherCache(team_id)
 
-    if person_id is not None:
-        overrides = hash_key_overrides(team_id, person_id)
+    if person_overrides is not None:
+        # already read earlier in this request
+        overrides = person_overrides
+    elif person_id is not None:
+        overrides = get_hash_key_overrides(team_id, person_id)
     else:
         overrides = {}
 
@@ -421,11 +574,19 @@ def _get_all_feature_flags(
             property_value_overrides,
             group_property_value_overrides,
             skip_experience_continuity_flags,
+            evaluation_plan,
         ).get_matches()
 
     return {}, {}, {}, False
 
 
+def _get_flags_evaluation_plan(team_id: int) -> TeamFlagsEvaluationPlan:
+    evaluation_plan = get_flags_evaluation_plan_for_team_in_cache(team_id)
+    if evaluation_plan is None:
+        evaluation_plan = build_team_flags_evaluation_plan(set_feature_flags_for_team_in_cache(team_id))
+    return evaluation_plan
+
+
 # Return feature flags
 def get_all_feature_flags(
     team_id: int,
@@ -436,9 +597,8 @@ def get_all_feature_flags(
     group_property_value_overrides: Dict[str, Dict[str, Union[str, int]]] = {},
 ) -> Tuple[Dict[str, Union[str, bool]], Dict[str, dict], Dict[str, object], bool]:
 
-    all_feature_flags = get_feature_flags_for_team_in_cache(team_id)
-    if all_feature_flags is None:
-        all_feature_flags = set_feature_flags_for_team_in_cache(team_id)
+    evaluation_plan = _get_flags_evaluation_plan(team_id)
+    all_feature_flags = evaluation_plan.feature_flags
 
     flags_have_experience_continuity_enabled = any(
         feature_flag.ensure_experience_continuity for feature_flag in all_feature_flags
@@ -452,15 +612,12 @@ def get_all_feature_flags(
             groups=groups,
             property_value_overrides=property_value_overrides,
             group_property_value_overrides=group_property_value_overrides,
+            evaluation_plan=evaluation_plan,
         )
 
+    start_time = time.monotonic()
     try:
-        with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
-            person_id = (
-                PersonDistinctId.objects.filter(distinct_id=distinct_id, team_id=team_id)
-                .values_list("person_id", flat=True)
-                .first()
-            )
+        person_id, person_source = _get_person_id(team_id, distinct_id)
     except DatabaseError:
         # database is down, we can't handle experience continuity flags.
         # Treat this same as if there are no experience continuity flags.
@@ -473,8 +630,10 @@ def get_all_feature_flags(
             property_value_overrides=property_value_overrides,
             group_property_value_overrides=group_property_value_overrides,
             skip_experience_continuity_flags=True,
+            evaluation_plan=evaluation_plan,
         )
 
+    person_overrides: Optional[Dict[str, str]] = None
     if hash_key_override is not None:
         # setting overrides only when we get an override
         if person_id is None:
@@ -485,29 +644,29 @@ def get_all_feature_flags(
             # existing person. If, because of race conditions, a person merge is called for later,
             # then https://github.com/PostHog/posthog/blob/master/plugin-server/src/worker/ingestion/person-state.ts#L421
             # will take care of it^.
-            with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
-                person_id = (
-                    PersonDistinctId.objects.filter(distinct_id=hash_key_override, team_id=team_id)
-                    .values_list("person_id", flat=True)
-                    .first()
-                )
+            person_id, person_source = _get_person_id(team_id, hash_key_override)
             # If even this old person doesn't exist yet, we're facing severe ingestion delays
             # and there's not much we can do, since all person properties based feature flags
             # would fail server side anyway.
 
         if person_id is not None:
             try:
-                set_feature_flag_hash_key_overrides(all_feature_flags, team_id, person_id, hash_key_override)
+                person_overrides = set_feature_flag_hash_key_overrides(
+                    all_feature_flags, team_id, person_id, hash_key_override
+                )
             except Exception as e:
                 # If the database is in read-only mode, we can't handle experience continuity flags.
                 # Do not error on decide for this case.
                 capture_exception(e)
+                # The cached person may have been merged into another one since
+                delete_person_id_from_cache(team_id, distinct_id)
+                delete_person_id_from_cache(team_id, hash_key_override)
 
     # :TRICKY: Consistency matters only when personIDs exist
     # as overrides are stored on personIDs.
     # We can optimise by not going down this path when person_id doesn't exist, or
     # no flags have experience continuity enabled
-    return _get_all_feature_flags(
+    all_flags = _get_all_feature_flags(
         all_feature_flags,
         team_id,
         distinct_id,
@@ -515,17 +674,132 @@ def get_all_feature_flags(
         groups=groups,
         property_value_overrides=property_value_overrides,
         group_property_value_overrides=group_property_value_overrides,
+        evaluation_plan=evaluation_plan,
+        person_overrides=person_overrides,
+    )
+    # Compares persons resolved from the cache with those resolved from Postgres
+    statsd.timing(
+        "feature_flag_experience_continuity_latency",
+        (time.monotonic() - start_time) * 1000.0,
+        tags={"person_source": person_source},
     )
+    return all_flags
+
+
+def get_all_feature_flags_for_distinct_ids(
+    team_id: int, requests: List[FlagsEvaluationRequest]
+) -> List[Tuple[Dict[str, Union[str, bool]], Dict[str, dict], Dict[str, object], bool]]:
+    """
+    Same as `get_all_feature_flags` for many distinct_ids at once, returning results in the order of `requests`.
+
+    Persons, hash key overrides and groups for all requests are each fetched with a single query, and conditions
+    are then matched in Python. Unlike `/decide`, no new hash key overrides are written.
+    """
+    evaluation_plan = _get_flags_evaluation_plan(team_id)
+    all_feature_flags = evaluation_plan.feature_flags
+    if not all_feature_flags:
+        return [({}, {}, {}, False) for _ in requests]
+
+    cache = FlagsMatcherCache(team_id)
+    person_ids: Dict[str, int] = {}
+    person_properties: Dict[int, Dict[str, Any]] = {}
+    overrides_by_person: Dict[int, Dict[str, str]] = {}
+    group_properties: Dict[Tuple[GroupTypeIndex, str], Dict[str, Any]] = {}
+    fetched_properties = True
+    skip_experience_continuity_flags = False
+    try:
+        with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
+            for distinct_id, person_id, properties in PersonDistinctId.objects.filter(
+                team_id=team_id, distinct_id__in={request.distinct_id for request in requests}
+            ).values_list("distinct_id", "person_id", "person__properties"):
+                person_ids[distinct_id] = person_id
+                person_properties[person_id] = properties
+
+        if any(feature_flag.ensure_experience_continuity for feature_flag in all_feature_flags):
+            overrides_by_person = hash_key_overrides_for_persons(team_id, list(person_properties.keys()))
+
+        group_keys = {
+            (cache.group_types_to_indexes[group_type], group_key)
+            for request in requests
+            for group_type, group_key in request.groups.items()
+            if group_type in cache.group_types_to_indexes
+        }
+        flags_aggregate_by_groups = any(
+            feature_flag.aggregation_group_type_index is not None for feature_flag in all_feature_flags
+        )
+        if group_keys and flags_aggregate_by_groups:
+            with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
+                for group_type_index, group_key, properties in (
+                    Group.objects.filter(team_id=team_id)
+                    .filter(
+                        reduce(
+                            lambda left, right: left | right,
+                            [
+                                Q(group_type_index=group_type_index, group_key=group_key)
+                                for group_type_index, group_key in group_keys
+                            ],
+                        )
+                    )
+                    .values_list("group_type_index", "group_key", "group_properties")
+                ):
+                    group_properties[(group_type_index, group_key)] = properties
+    except DatabaseError as err:
+        # Leave it to each matcher to query (and flag errors), same as `/decide` when the database is down
+        capture_exception(err)
+        fetched_properties = False
+        skip_experience_continuity_flags = True
+
+    results = []
+    for request in requests:
+        person_id = person_ids.get(request.distinct_id)
+        snapshot: Optional[PropertiesSnapshot] = None
+        if fetched_properties:
+            snapshot = PropertiesSnapshot(
+                person_properties=person_properties.get(person_id) if person_id is not None else None,
+                group_properties={
+                    cache.group_types_to_indexes[group_type]: group_properties[
+                        (cache.group_types_to_indexes[group_type], group_key)
+                    ]
+                    for group_type, group_key in request.groups.items()
+                    if (cache.group_types_to_indexes.get(group_type), group_key) in group_properties
+                },
+            )
+        flags = FeatureFlagMatcher(
+            all_feature_flags,
+            request.distinct_id,
+            request.groups,
+            cache,
+            overrides_by_person.get(person_id, {}) if person_id is not None else {},
+            request.property_value_overrides,
+            request.group_property_value_overrides,
+            skip_experience_continuity_flags,
+            evaluation_plan,
+            snapshot,
+        ).get_matches()
+        results.append(flags)
+
+    return results
 
 
 def set_feature_flag_hash_key_overrides(
     feature_flags: List[FeatureFlag], team_id: int, person_id: int, hash_key_override: str
-) -> None:
+) -> Dict[str, str]:
+    """
+    Adds overrides for the experience continuity flags the person has none for yet, and returns all of the
+    person's overrides, so flags can be matched without reading them again. These are written through to the cache.
+    """
+    continuity_flag_keys = {
+        feature_flag.key for feature_flag in feature_flags if feature_flag.ensure_experience_continuity
+    }
+    cached_overrides = get_hash_key_overrides_from_cache(team_id, person_id)
+    if cached_overrides is not None and continuity_flag_keys.issubset(cached_overrides):
+        # Overrides aren't changed once set, so there's nothing to write
+        return cached_overrides
 
     with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS):
-        existing_flag_overrides = set(
+        existing_flag_overrides = dict(
             FeatureFlagHashKeyOverride.objects.filter(team_id=team_id, person_id=person_id).values_list(
-                "feature_flag_key", flat=True
+                "feature_flag_key", "hash_key"
             )
         )
         new_overrides = []
@@ -547,3 +821,10 @@ def set_feature_flag_hash_key_overrides(
             # at the same time. In this case, we can safely ignore the error.
             # We don't want to return an error response for `/decide` just because of this.
             FeatureFlagHashKeyOverride.objects.bulk_create(new_overrides, ignore_conflicts=True)
+
+    if new_overrides:
+        # A concurrent request may have won the conflict with another hash key, so read back what was stored
+        existing_flag_overrides = hash_key_overrides(team_id, person_id)
+
+    set_hash_key_overrides_in_cache(team_id, person_id, existing_flag_overrides)
+    return existing_flag_overrides
@@ -0,0 +1,107 @@
+import hashlib
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from sentry_sdk.api import capture_exception
+
+from posthog.models.person import Person, PersonDistinctId
+from posthog.models.signals import mutable_receiver
+
+from .feature_flag import FeatureFlagHashKeyOverride
+
+# Caches backing experience continuity flags on /decide, so that identified users resolve to their person
+# and hash key overrides without going to Postgres.
+#
+# Distinct ids not (yet) tied to a person are never cached: `$identify` may create the person any moment.
+# Neither are empty overrides, as the person may be about to get their first ones.
+#
+# Entries are invalidated when persons, distinct ids or overrides are changed through Django. The plugin server
+# writes to Postgres directly when merging persons, which moves distinct ids and overrides to another person,
+# so entries are also only kept for a short DECIDE_PERSON_CACHE_TTL_SECONDS.
+
+
+def _person_id_key(team_id: int, distinct_id: str) -> str:
+    # distinct_ids are user-supplied, so hash them to keep keys short and safe
+    return f"decide_person_id_{team_id}_{hashlib.sha1(distinct_id.encode('utf-8')).hexdigest()}"
+
+
+def _hash_key_overrides_key(team_id: int, person_id: int) -> str:
+    return f"decide_hash_key_overrides_{team_id}_{person_id}"
+
+
+def person_caching_enabled() -> bool:
+    return settings.DECIDE_PERSON_CACHE_TTL_SECONDS > 0
+
+
+def get_person_id_from_cache(team_id: int, distinct_id: str) -> Optional[int]:
+    if not person_caching_enabled():
+        return None
+    try:
+        return cache.get(_person_id_key(team_id, distinct_id))
+    except Exception as e:
+        # redis is unavailable
+        capture_exception(e)
+        return None
+
+
+def set_person_id_in_cache(team_id: int, distinct_id: str, person_id: int) -> None:
+    if not person_caching_enabled():
+        return
+    try:
+        cache.set(_person_id_key(team_id, distinct_id), person_id, settings.DECIDE_PERSON_CACHE_TTL_SECONDS)
+    except Exception as e:
+        capture_exception(e)
+
+
+def delete_person_id_from_cache(team_id: int, distinct_id: str) -> None:
+    if not person_caching_enabled():
+        return
+    try:
+        cache.delete(_person_id_key(team_id, distinct_id))
+    except Exception as e:
+        capture_exception(e)
+
+
+def get_hash_key_overrides_from_cache(team_id: int, person_id: int) -> Optional[Dict[str, str]]:
+    if not person_caching_enabled():
+        return None
+    try:
+        return cache.get(_hash_key_overrides_key(team_id, person_id))
+    except Exception as e:
+        capture_exception(e)
+        return None
+
+
+def set_hash_key_overrides_in_cache(team_id: int, person_id: int, overrides: Dict[str, str]) -> None:
+    if not person_caching_enabled() or not overrides:
+        return
+    try:
+        cache.set(_hash_key_overrides_key(team_id, person_id), overrides, settings.DECIDE_PERSON_CACHE_TTL_SECONDS)
+    except Exception as e:
+        capture_exception(e)
+
+
+def delete_hash_key_overrides_from_cache(team_id: int, person_id: int) -> None:
+    if not person_caching_enabled():
+        return
+    try:
+        cache.delete(_hash_key_overrides_key(team_id, person_id))
+    except Exception as e:
+        capture_exception(e)
+
+
+@mutable_receiver([post_save, post_delete], sender=PersonDistinctId)
+def invalidate_person_id_on_updates(sender, instance: PersonDistinctId, **kwargs):
+    delete_person_id_from_cache(instance.team_id, instance.distinct_id)
+
+
+@mutable_receiver(post_delete, sender=Person)
+def invalidate_hash_key_overrides_on_person_delete(sender, instance: Person, **kwargs):
+    delete_hash_key_overrides_from_cache(instance.team_id, instance.pk)
+
+
+@mutable_receiver([post_save, post_delete], sender=FeatureFlagHashKeyOverride)
+def invalidate_hash_key_overrides_on_updates(sender, instance: FeatureFlagHashKeyOverride, **kwargs):
+    delete_hash_key_overrides_from_cache(instance.team_id, instance.person_id)
@@ -32,6 +32,7 @@ class InsightCachingState(UUIDModel):
     last_refresh: models.DateTimeField = models.DateTimeField(blank=True, null=True)
     last_refresh_queued_at: models.DateTimeField = models.DateTimeField(blank=True, null=True)
     refresh_attempt: models.IntegerField = models.IntegerField(null=False, default=0)
+    refresh_duration_seconds: models.FloatField = models.FloatField(blank=True, null=True)
 
     created_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
     updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
@@ -0,0 +1,127 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.db.models.fields.json import KeyTransform
+from statshog.defaults.django import statsd
+
+from posthog.models.person.person import PersonDistinctId
+
+# Person properties shown wherever persons are summarised, e.g. next to their events
+SUMMARY_PROPERTIES = ("email", "name", "username")
+
+
+class PersonSummary(NamedTuple):
+    id: int
+    uuid: UUID
+    is_identified: bool
+    created_at: datetime
+    # The person's first distinct id
+    distinct_id: str
+    # Only `SUMMARY_PROPERTIES`, those the person has
+    properties: Dict[str, Any]
+
+
+class PersonLookup:
+    """
+    Resolves distinct ids to summaries of their persons, for showing persons next to lists of events and such.
+
+    Only the columns needed for a summary are loaded, rather than every property and distinct id of each person,
+    and each distinct id is only looked up once for the lifetime of the lookup, which is usually a request
+    (see `get_person_lookup`). With `PERSON_LOOKUP_CACHE_TTL_SECONDS` set, summaries are also cached for that long.
+    """
+
+    def __init__(self, team_id: int):
+        self.team_id = team_id
+        self._summaries: Dict[str, Optional[PersonSummary]] = {}
+
+    def get_persons(self, distinct_ids: Iterable[str]) -> Dict[str, PersonSummary]:
+        distinct_ids = list(dict.fromkeys(distinct_ids))
+        missing = [distinct_id for distinct_id in distinct_ids if distinct_id not in self._summaries]
+        if missing:
+            self._summaries.update(self._load(missing))
+
+        return {
+            distinct_id: summary
+            for distinct_id in distinct_ids
+            if (summary := self._summaries.get(distinct_id)) is not None
+        }
+
+    def _load(self, distinct_ids: List[str]) -> Dict[str, Optional[PersonSummary]]:
+        summaries: Dict[str, Optional[PersonSummary]] = {}
+        if settings.PERSON_LOOKUP_CACHE_TTL_SECONDS > 0:
+            cached = cache.get_many([self._cache_key(distinct_id) for distinct_id in distinct_ids])
+            for distinct_id in distinct_ids:
+                summary = cached.get(self._cache_key(distinct_id))
+                if summary is not None:
+                    summaries[distinct_id] = PersonSummary(*summary)
+            statsd.incr("person_lookup_cache_hits", len(summaries))
+
+        fetched = self._fetch([distinct_id for distinct_id in distinct_ids if distinct_id not in summaries])
+        statsd.incr("person_lookup_fetched", len(fetched))
+        if fetched and settings.PERSON_LOOKUP_CACHE_TTL_SECONDS > 0:
+            cache.set_many(
+                {
+                    self._cache_key(distinct_id): tuple(summary)
+                    for distinct_id, summary in fetched.items()
+                    if summary is not None
+                },
+                settings.PERSON_LOOKUP_CACHE_TTL_SECONDS,
+            )
+
+        return {**fetched, **summaries}
+
+    def _fetch(self, distinct_ids: List[str]) -> Dict[str, Optional[PersonSummary]]:
+        if not distinct_ids:
+            return {}
+
+        first_distinct_id = (
+            PersonDistinctId.objects.filter(team_id=self.team_id, person_id=OuterRef("person_id"))
+            .order_by("id")
+            .values("distinct_id")[:1]
+        )
+        rows = (
+            PersonDistinctId.objects.filter(team_id=self.team_id, distinct_id__in=distinct_ids)
+            .annotate(
+                first_distinct_id=Subquery(first_distinct_id),
+                **{f"property_{key}": KeyTransform(key, "person__properties") for key in SUMMARY_PROPERTIES},
+            )
+            .values_list(
+                "distinct_id",
+                "person_id",
+                "person__uuid",
+                "person__is_identified",
+                "person__created_at",
+                "first_distinct_id",
+                *(f"property_{key}" for key in SUMMARY_PROPERTIES),
+            )
+        )
+
+        summaries: Dict[str, Optional[PersonSummary]] = {distinct_id: None for distinct_id in distinct_ids}
+        for distinct_id, person_id, uuid, is_identified, created_at, first_distinct_id, *property_values in rows:
+            summaries[distinct_id] = PersonSummary(
+                id=person_id,
+                uuid=uuid,
+                is_identified=is_identified,
+                created_at=created_at,
+                distinct_id=first_distinct_id,
+                properties={key: value for key, value in zip(SUMMARY_PROPERTIES, property_values) if value is not None},
+            )
+        return summaries
+
+    def _cache_key(self, distinct_id: str) -> str:
+        return f"person_summary_{self.team_id}_{distinct_id}"
+
+
+def get_person_lookup(request: Any, team_id: int) -> PersonLookup:
+    "Returns the lookup shared by everything resolving persons of the team while handling `request`."
+    lookups: Optional[Dict[int, PersonLookup]] = getattr(request, "_person_lookups", None)
+    if lookups is None:
+        lookups = {}
+        request._person_lookups = lookups
+    if team_id not in lookups:
+        lookups[team_id] = PersonLookup(team_id)
+    return lookups[team_id]
@@ -1,7 +1,7 @@
 from django.conf import settings
 
 from posthog.clickhouse.indexes import index_by_kafka_timestamp
-from posthog.clickhouse.kafka_engine import KAFKA_COLUMNS, kafka_engine, ttl_period
+from posthog.clickhouse.kafka_engine import KAFKA_COLUMNS, STORAGE_POLICY, kafka_engine, ttl_period
 from posthog.clickhouse.table_engines import Distributed, ReplacingMergeTree, ReplicationScheme
 from posthog.kafka_client.topics import KAFKA_CLICKHOUSE_SESSION_RECORDING_EVENTS
 
@@ -56,6 +56,10 @@ MATERIALIZED_COLUMNS = {
         "schema": "Array(String)",
         "materializer": "MATERIALIZED arrayFilter(x -> x != '', arrayMap((x) -> JSONExtractString(x, 'data', 'href'), events_summary))",
     },
+    "chunk_id": {
+        "schema": "VARCHAR",
+        "materializer": "MATERIALIZED JSONExtractString(snapshot_data, 'chunk_id')",
+    },
 }
 
 
@@ -163,3 +167,95 @@ DROP_SESSION_RECORDING_EVENTS_TABLE_SQL = lambda: (
 UPDATE_RECORDINGS_TABLE_TTL_SQL = lambda: (
     f"ALTER TABLE {SESSION_RECORDING_EVENTS_DATA_TABLE()} ON CLUSTER '{settings.CLICKHOUSE_CLUSTER}' MODIFY TTL toDate(created_at) + toIntervalWeek(%(weeks)s)"
 )
+
+
+SESSION_RECORDING_METADATA_TABLE = "session_recording_metadata"
+
+# Metadata of recordings that have gone idle, calculated once from their events summaries so it doesn't have to be
+# for every request. Windows and segments are stored as parallel arrays, segments referring to windows by index.
+# Recordings whose metadata couldn't be calculated get a row with `calculation_failed` set and no metadata, so they
+# aren't picked up again until they receive new events.
+SESSION_RECORDING_METADATA_TABLE_ENGINE = lambda: ReplacingMergeTree(
+    SESSION_RECORDING_METADATA_TABLE, ver="calculated_at"
+)
+SESSION_RECORDING_METADATA_TABLE_SQL = lambda: """
+CREATE TABLE IF NOT EXISTS {table_name} ON CLUSTER '{cluster}'
+(
+    team_id Int64,
+    session_id VARCHAR,
+    distinct_id VARCHAR,
+    start_time DateTime64(3, 'UTC'),
+    end_time DateTime64(3, 'UTC'),
+    duration Int64,
+    click_count Int64,
+    keypress_count Int64,
+    urls Array(String),
+    window_ids Array(Nullable(String)),
+    window_start_times Array(DateTime64(3, 'UTC')),
+    window_end_times Array(DateTime64(3, 'UTC')),
+    segment_window_indexes Array(UInt16),
+    segment_start_times Array(DateTime64(3, 'UTC')),
+    segment_end_times Array(DateTime64(3, 'UTC')),
+    segment_is_active Array(UInt8),
+    last_event_timestamp DateTime64(6, 'UTC'),
+    calculated_at DateTime64(6, 'UTC'),
+    calculation_failed UInt8
+) ENGINE = {engine}
+ORDER BY (team_id, session_id)
+{ttl_period}
+{storage_policy}
+""".format(
+    table_name=SESSION_RECORDING_METADATA_TABLE,
+    cluster=settings.CLICKHOUSE_CLUSTER,
+    engine=SESSION_RECORDING_METADATA_TABLE_ENGINE(),
+    ttl_period=ttl_period("end_time"),
+    storage_policy=STORAGE_POLICY(),
+)
+
+INSERT_SESSION_RECORDING_METADATA_SQL = f"""
+INSERT INTO {SESSION_RECORDING_METADATA_TABLE} (
+    team_id, session_id, distinct_id, start_time, end_time, duration, click_count, keypress_count, urls,
+    window_ids, window_start_times, window_end_times,
+    segment_window_indexes, segment_start_times, segment_end_times, segment_is_active,
+    last_event_timestamp, calculated_at, calculation_failed
+) VALUES
+"""
+
+GET_SESSION_RECORDING_METADATA_SQL = f"""
+SELECT
+    distinct_id, start_time, end_time, duration, click_count, keypress_count, urls,
+    window_ids, window_start_times, window_end_times,
+    segment_window_indexes, segment_start_times, segment_end_times, segment_is_active,
+    last_event_timestamp, calculation_failed
+FROM {SESSION_RECORDING_METADATA_TABLE} FINAL
+WHERE team_id = %(team_id)s AND session_id = %(session_id)s
+LIMIT 1
+"""
+
+# Recordings whose last event was received between `idle_since` and `idle_before`, and whose metadata hasn't been
+# calculated (or failed to be) since. A recording that picks up again after going idle is calculated again when it
+# next goes idle.
+GET_IDLE_SESSION_RECORDINGS_WITHOUT_METADATA_SQL = f"""
+SELECT recordings.team_id, recordings.session_id, recordings.last_event_timestamp
+FROM (
+    SELECT team_id, session_id, max(timestamp) AS last_event_timestamp
+    FROM session_recording_events
+    WHERE timestamp >= %(idle_since)s
+    GROUP BY team_id, session_id
+    HAVING last_event_timestamp < %(idle_before)s
+) AS recordings
+LEFT JOIN (
+    SELECT team_id, session_id, max(last_event_timestamp) AS calculated_until
+    FROM {SESSION_RECORDING_METADATA_TABLE}
+    WHERE end_time >= %(idle_since)s - INTERVAL 1 DAY
+    GROUP BY team_id, session_id
+) AS calculated
+ON recordings.team_id = calculated.team_id AND recordings.session_id = calculated.session_id
+WHERE calculated.calculated_until < recordings.last_event_timestamp
+ORDER BY recordings.last_event_timestamp
+LIMIT %(limit)s
+"""
+
+TRUNCATE_SESSION_RECORDING_METADATA_TABLE_SQL = (
+    f"TRUNCATE TABLE IF EXISTS {SESSION_RECORDING_METADATA_TABLE} ON CLUSTER '{settings.CLICKHOUSE_CLUSTER}'"
+)
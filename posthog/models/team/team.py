@@ -24,7 +24,7 @@ from posthog.models.utils import UUIDClassicModel, generate_random_token_project
 from posthog.settings.utils import get_list
 from posthog.utils import GenericEmails
 
-from .team_caching import get_team_in_cache, set_team_in_cache
+from .team_caching import get_team_in_cache, get_team_in_local_cache, set_team_in_cache, set_team_in_local_cache
 
 TIMEZONES = [(tz, tz) for tz in pytz.common_timezones]
 
@@ -93,16 +93,24 @@ class TeamManager(models.Manager):
     def get_team_from_cache_or_token(self, token: Optional[str]) -> Optional["Team"]:
         if not token:
             return None
+
+        found, team = get_team_in_local_cache(token)
+        if found:
+            return team
+
         try:
             team = get_team_in_cache(token)
             if team:
+                set_team_in_local_cache(token, team)
                 return team
 
             team = Team.objects.get(api_token=token)
-            set_team_in_cache(token, team)
+            set_team_in_cache(token, team, changed=False)
+            set_team_in_local_cache(token, team)
             return team
 
         except Team.DoesNotExist:
+            set_team_in_local_cache(token, None)
             return None
 
 
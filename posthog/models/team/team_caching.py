@@ -1,16 +1,157 @@
 import json
-from typing import TYPE_CHECKING, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Optional, Tuple
 
+import structlog
+from django.conf import settings
 from django.core.cache import cache
+from prometheus_client import Counter
 from sentry_sdk import capture_exception
 
+from posthog.redis import get_client
+
 if TYPE_CHECKING:
     from posthog.models.team import Team
 
+logger = structlog.get_logger(__name__)
+
 FIVE_DAYS = 60 * 60 * 24 * 5  # 5 days in seconds
 
+TEAM_CACHE_INVALIDATION_CHANNEL = "reset-team-token-cache"
+
+LOCAL_TEAM_CACHE_REQUESTS_COUNTER = Counter(
+    "local_team_cache_requests_total",
+    "Lookups in the per-process team caches, per cache and result (hit, negative_hit or miss).",
+    labelnames=["cache", "result"],
+)
+
+
+class LocalTTLCache:
+    """
+    A small thread-safe, size-bounded LRU cache living in process memory, with a TTL per entry.
+
+    `None` is a valid value, used to negatively cache lookups that found nothing.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns whether the key was found, and its value."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    result = "hit" if value is not None else "negative_hit"
+                    LOCAL_TEAM_CACHE_REQUESTS_COUNTER.labels(cache=self.name, result=result).inc()
+                    return True, value
+                del self._entries[key]
+
+        LOCAL_TEAM_CACHE_REQUESTS_COUNTER.labels(cache=self.name, result="miss").inc()
+        return False, None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TEAM_LOCAL_CACHE_MAX_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Serialized teams (as cached in Redis), keyed by api token
+local_team_cache = LocalTTLCache("team")
+# `EventIngestionContext`s used by capture, keyed by api token
+local_ingestion_context_cache = LocalTTLCache("ingestion_context")
+
+_invalidation_listener_lock = threading.Lock()
+_invalidation_listener_started = False
+
+
+def local_team_cache_enabled() -> bool:
+    return settings.TEAM_LOCAL_CACHE_TTL_SECONDS > 0
+
+
+def local_cache_ttl(value: Any) -> float:
+    """TTL for a local cache entry, 0 (i.e. don't cache) when the local cache is disabled."""
+    if not local_team_cache_enabled():
+        return 0
+    return (
+        settings.TEAM_LOCAL_CACHE_TTL_SECONDS if value is not None else settings.TEAM_LOCAL_CACHE_NEGATIVE_TTL_SECONDS
+    )
+
+
+def invalidate_local_team_caches(token: str) -> None:
+    local_team_cache.delete(token)
+    local_ingestion_context_cache.delete(token)
+
 
-def set_team_in_cache(token: str, team: Optional["Team"] = None) -> None:
+def ensure_team_cache_invalidation_listener() -> None:
+    """
+    Starts (once per process) a daemon thread listening for team changes made by other processes, so entries in
+    the local caches don't outlive a token reset or a team update by more than a pub/sub round trip.
+    """
+    global _invalidation_listener_started
+
+    if _invalidation_listener_started or not local_team_cache_enabled():
+        return
+
+    with _invalidation_listener_lock:
+        if _invalidation_listener_started:
+            return
+        _invalidation_listener_started = True
+
+    threading.Thread(target=_listen_for_team_cache_invalidations, name="team-cache-invalidation", daemon=True).start()
+
+
+def _listen_for_team_cache_invalidations() -> None:
+    while True:
+        try:
+            pubsub = get_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(TEAM_CACHE_INVALIDATION_CHANNEL)
+            for message in pubsub.listen():
+                token = message["data"]
+                invalidate_local_team_caches(token.decode("utf-8") if isinstance(token, bytes) else token)
+        except Exception as e:
+            logger.warning("team_cache_invalidation_listener_failed", exc_info=e)
+            # We may have missed invalidations while disconnected
+            local_team_cache.clear()
+            local_ingestion_context_cache.clear()
+            time.sleep(5)
+
+
+def _publish_team_cache_invalidation(token: str) -> None:
+    invalidate_local_team_caches(token)
+    try:
+        get_client().publish(TEAM_CACHE_INVALIDATION_CHANNEL, token)
+    except Exception as e:
+        # Other processes fall back to the local cache TTL
+        capture_exception(e)
+
+
+def set_team_in_cache(token: str, team: Optional["Team"] = None, *, changed: bool = True) -> None:
+    """
+    Caches the team of the token in Redis, or removes it from the cache if there's none.
+
+    If the team `changed`, the local caches of all processes are told to drop it once Redis has been updated.
+    Refilling Redis with a team that hasn't changed leaves them be.
+    """
     from posthog.api.team import CachingTeamSerializer
     from posthog.models.team import Team
 
@@ -19,11 +160,15 @@ def set_team_in_cache(token: str, team: Optional["Team"] = None) -> None:
             team = Team.objects.get(api_token=token)
         except (Team.DoesNotExist, Team.MultipleObjectsReturned):
             cache.delete(f"team_token:{token}")
+            if changed:
+                _publish_team_cache_invalidation(token)
             return
 
     serialized_team = CachingTeamSerializer(team).data
 
     cache.set(f"team_token:{token}", json.dumps(serialized_team), FIVE_DAYS)
+    if changed:
+        _publish_team_cache_invalidation(token)
 
 
 def get_team_in_cache(token: str) -> Optional["Team"]:
@@ -44,3 +189,29 @@ def get_team_in_cache(token: str) -> Optional["Team"]:
             return None
 
     return None
+
+
+def get_team_in_local_cache(token: str) -> Tuple[bool, Optional["Team"]]:
+    """
+    Looks up the team in the per-process cache in front of `get_team_in_cache`.
+    Returns whether the token was found (including negatively cached invalid tokens), and the team.
+    """
+    from posthog.models.team import Team
+
+    if not local_team_cache_enabled():
+        return False, None
+
+    ensure_team_cache_invalidation_listener()
+    found, team_data = local_team_cache.get(token)
+    # Every caller gets its own instance, teams aren't safe to share across threads
+    return found, Team(**team_data) if team_data is not None else None
+
+
+def set_team_in_local_cache(token: str, team: Optional["Team"]) -> None:
+    from posthog.api.team import CachingTeamSerializer
+
+    if not local_team_cache_enabled():
+        return
+
+    team_data = dict(CachingTeamSerializer(team).data) if team is not None else None
+    local_team_cache.set(token, team_data, local_cache_ttl(team_data))
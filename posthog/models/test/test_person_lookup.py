@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.http import HttpRequest
+
+from posthog.models import Person
+from posthog.models.person.lookup import PersonLookup, get_person_lookup
+from posthog.test.base import BaseTest
+
+
+class TestPersonLookup(BaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.person = Person.objects.create(
+            team=self.team,
+            distinct_ids=["first", "second"],
+            is_identified=True,
+            properties={"email": "tim@posthog.com", "name": "Tim", "plan": "scale"},
+        )
+
+    def test_summarises_persons_of_distinct_ids(self):
+        with self.assertNumQueries(1):
+            persons = PersonLookup(self.team.pk).get_persons(["second", "first", "second", "unknown"])
+
+        self.assertEqual(set(persons.keys()), {"first", "second"})
+        self.assertEqual(persons["first"], persons["second"])
+        self.assertEqual(persons["second"].uuid, self.person.uuid)
+        self.assertEqual(persons["second"].distinct_id, "first")
+        self.assertTrue(persons["second"].is_identified)
+        self.assertEqual(persons["second"].properties, {"email": "tim@posthog.com", "name": "Tim"})
+
+    def test_keeps_types_of_property_values(self):
+        Person.objects.create(
+            team=self.team, distinct_ids=["typed"], properties={"email": None, "name": 42, "username": ["tim", True]}
+        )
+
+        persons = PersonLookup(self.team.pk).get_persons(["typed"])
+
+        self.assertEqual(persons["typed"].properties, {"name": 42, "username": ["tim", True]})
+
+    def test_does_not_look_up_distinct_ids_again(self):
+        lookup = PersonLookup(self.team.pk)
+        lookup.get_persons(["first", "unknown"])
+
+        with self.assertNumQueries(0):
+            persons = lookup.get_persons(["unknown", "first"])
+        self.assertEqual(list(persons.keys()), ["first"])
+
+        with self.assertNumQueries(1):
+            lookup.get_persons(["first", "second"])
+
+    def test_caches_summaries_across_lookups(self):
+        with self.settings(PERSON_LOOKUP_CACHE_TTL_SECONDS=60):
+            persons = PersonLookup(self.team.pk).get_persons(["first"])
+
+            with self.assertNumQueries(0):
+                self.assertEqual(PersonLookup(self.team.pk).get_persons(["first"]), persons)
+
+    def test_lookup_is_shared_within_a_request(self):
+        request = HttpRequest()
+
+        self.assertIs(get_person_lookup(request, self.team.pk), get_person_lookup(request, self.team.pk))
+        self.assertIsNot(get_person_lookup(request, self.team.pk), get_person_lookup(request, self.team.pk + 1))
@@ -1,3 +1,4 @@
+import dataclasses
 import datetime
 import re
 from typing import (
@@ -22,6 +23,7 @@ from posthog.models.filters.path_filter import PathFilter
 from posthog.models.property import CLICKHOUSE_ONLY_PROPERTY_TYPES, Property, PropertyGroup
 from posthog.models.property.property import OperatorType, ValueT
 from posthog.models.team import Team
+from posthog.queries.insight_executor import get_insight_query_executor
 from posthog.queries.util import convert_to_datetime_aware
 from posthog.utils import get_compare_period_dates, is_valid_regex
 
@@ -69,17 +71,24 @@ def convert_to_comparison(trend_entities: List[Dict[str, Any]], filter, label: s
 
 def handle_compare(filter, func: Callable, team: Team, **kwargs) -> List:
     all_entities = []
-    base_entitites = func(filter=filter, team=team, **kwargs)
     if filter.compare:
+        compared_filter = determine_compared_filter(filter)
+        # Both periods are queried concurrently, so each needs its own context to collect HogQL values into
+        compared_filter = type(compared_filter)(
+            data=compared_filter._data,
+            **{**compared_filter.kwargs, "hogql_context": dataclasses.replace(filter.hogql_context, values={})},
+        )
+        base_entitites, comparison_entities = get_insight_query_executor().map(
+            team.pk, lambda period_filter: func(filter=period_filter, team=team, **kwargs), [filter, compared_filter]
+        )
+
         base_entitites = convert_to_comparison(base_entitites, filter, "current")
         all_entities.extend(base_entitites)
 
-        compared_filter = determine_compared_filter(filter)
-        comparison_entities = func(filter=compared_filter, team=team, **kwargs)
         comparison_entities = convert_to_comparison(comparison_entities, compared_filter, "previous")
         all_entities.extend(comparison_entities)
     else:
-        all_entities.extend(base_entitites)
+        all_entities.extend(func(filter=filter, team=team, **kwargs))
     return all_entities
 
 
@@ -310,3 +319,136 @@ def properties_to_Q(
     return property_group_to_Q(
         PropertyGroup(type=PropertyOperatorType.AND, values=properties), override_property_values
     )
+
+
+class PropertyNotLocallyEvaluable(Exception):
+    """Raised when a property can't be matched in Python with the exact semantics `property_to_Q` has in Postgres."""
+
+
+# Order of JSON types in Postgres jsonb comparisons, see https://www.postgresql.org/docs/current/datatype-json.html
+_JSONB_TYPE_ORDER = {type(None): 0, str: 1, int: 2, float: 2, bool: 3, list: 4, dict: 5}
+
+
+def _jsonb_equal(left: Any, right: Any) -> bool:
+    # Like `==`, but booleans are never equal to numbers, as in jsonb
+    if isinstance(left, bool) or isinstance(right, bool):
+        return type(left) == type(right) and left == right
+    if isinstance(left, list) and isinstance(right, list):
+        return len(left) == len(right) and all(_jsonb_equal(a, b) for a, b in zip(left, right))
+    if isinstance(left, dict) and isinstance(right, dict):
+        return left.keys() == right.keys() and all(_jsonb_equal(left[key], right[key]) for key in left)
+    if _JSONB_TYPE_ORDER.get(type(left)) != _JSONB_TYPE_ORDER.get(type(right)):
+        return False
+    return left == right
+
+
+def _jsonb_lookup_equal(person_value: Any, value: Any) -> bool:
+    # exact and is_not operators can pass lists as arguments, see `lookup_q`
+    if isinstance(value, list):
+        return any(_jsonb_equal(person_value, v) for v in value)
+    return _jsonb_equal(person_value, value)
+
+
+def _jsonb_compare(person_value: Any, value: Any) -> int:
+    person_rank, value_rank = _JSONB_TYPE_ORDER.get(type(person_value)), _JSONB_TYPE_ORDER.get(type(value))
+    if person_rank is None or value_rank is None:
+        raise PropertyNotLocallyEvaluable(f"Unexpected JSON value types {type(person_value)}, {type(value)}")
+    if person_rank != value_rank:
+        return -1 if person_rank < value_rank else 1
+    if isinstance(person_value, (int, float, bool)):
+        return (person_value > value) - (person_value < value)
+    # Strings compare with the database collation, containers element-wise
+    raise PropertyNotLocallyEvaluable(f"Can't compare {type(person_value)} values in Python like Postgres does")
+
+
+def _jsonb_text(person_value: Any) -> str:
+    # The `->>` text representation of a jsonb value
+    if isinstance(person_value, str):
+        return person_value
+    if isinstance(person_value, bool):
+        return "true" if person_value else "false"
+    if isinstance(person_value, int):
+        return str(person_value)
+    # Floats keep their original textual representation in jsonb, which is lost once loaded in Python
+    raise PropertyNotLocallyEvaluable(f"Can't get the jsonb text of {type(person_value)} values in Python")
+
+
+def _match_empty_or_null_with_value(
+    property_values: Dict[str, Any], key: str, operator: Optional[OperatorType], value: ValueT
+) -> bool:
+    # Mirrors `empty_or_null_with_value_q`, without the negation
+    if key not in property_values or property_values[key] is None:
+        return False
+
+    person_value = property_values[key]
+    if operator == "exact" or operator is None:
+        return _jsonb_lookup_equal(person_value, Property._parse_value(value)) or _jsonb_lookup_equal(
+            person_value, Property._parse_value(value, convert_to_number=True)
+        )
+    if isinstance(value, list):
+        raise PropertyNotLocallyEvaluable(f"Operator {operator} doesn't support list values")
+    if operator == "icontains":
+        return str(value).upper() in _jsonb_text(person_value).upper()
+    if operator in ("gt", "gte", "lt", "lte"):
+        comparison = _jsonb_compare(person_value, value)
+        return {"gt": comparison > 0, "gte": comparison >= 0, "lt": comparison < 0, "lte": comparison <= 0}[operator]
+
+    raise PropertyNotLocallyEvaluable(f"Operator {operator} isn't supported")
+
+
+def match_property_like_Q(
+    property: Property, property_values: Dict[str, Any], override_property_values: Dict[str, Any] = {}
+) -> bool:
+    """
+    Matches a person or group property in Python, with the semantics `property_to_Q` has against the
+    `properties`/`group_properties` column, so that flags can be evaluated from a snapshot of the properties
+    without a query per condition. `property.negation` is not applied here, see `match_properties_like_Q`.
+
+    Raises PropertyNotLocallyEvaluable whenever the Postgres behaviour can't be reproduced exactly.
+    """
+    if property.type not in ("person", "group"):
+        raise PropertyNotLocallyEvaluable(f"Property type {property.type} can't be evaluated locally")
+    if "__" in property.key or property.key.lstrip("-").isdigit():
+        # Django turns these into nested or array lookups
+        raise PropertyNotLocallyEvaluable(f"Property key {property.key} can't be evaluated locally")
+
+    if property.key in override_property_values and property.operator != "is_not_set":
+        return match_property(property, override_property_values)
+
+    key = property.key
+    value = property._parse_value(property.value)
+
+    if property.operator == "is_not":
+        return not (key in property_values and _jsonb_lookup_equal(property_values[key], value))
+    if property.operator == "is_set":
+        return key in property_values
+    if property.operator == "is_not_set":
+        return key not in property_values
+    if property.operator in ("regex", "not_regex"):
+        if not is_valid_regex(value):
+            # Return no data for invalid regexes
+            return False
+        # Postgres regexes aren't Python regexes
+        raise PropertyNotLocallyEvaluable("Regex operators can't be evaluated locally")
+    if isinstance(property.operator, str) and property.operator.startswith("not_"):
+        return not _match_empty_or_null_with_value(
+            property_values, key, cast(OperatorType, property.operator[4:]), value
+        )
+    if property.operator in ("is_date_after", "is_date_before"):
+        # No existence clause here, so a JSON null compares as the smallest value
+        if key not in property_values:
+            return False
+        comparison = _jsonb_compare(property_values[key], value)
+        return comparison > 0 if property.operator == "is_date_after" else comparison < 0
+
+    return _match_empty_or_null_with_value(property_values, key, property.operator, property.value)
+
+
+def match_properties_like_Q(
+    properties: List[Property], property_values: Dict[str, Any], override_property_values: Dict[str, Any] = {}
+) -> bool:
+    """Python counterpart of filtering with `properties_to_Q(properties, override_property_values)`."""
+    return all(
+        match_property_like_Q(property, property_values, override_property_values) != bool(property.negation)
+        for property in properties
+    )
@@ -1,7 +1,7 @@
-from typing import Optional
+from typing import Iterator, Optional
 
 from posthog.clickhouse.query_tagging import tag_queries
-from posthog.client import query_with_columns, sync_execute
+from posthog.client import query_with_columns, stream_execute, sync_execute
 from posthog.types import FilterType
 
 
@@ -12,6 +12,15 @@ def insight_sync_execute(query, args=None, *, query_type: str, filter: Optional[
     return sync_execute(query, args=args, **kwargs)
 
 
+# Wrapper around `stream_execute`. Tags are read once the query runs, on first iteration, so only tag then
+def insight_stream_execute(
+    query, args=None, *, query_type: str, filter: Optional["FilterType"] = None, **kwargs
+) -> Iterator:
+    _tag_query(query, query_type, filter)
+
+    yield from stream_execute(query, args=args, **kwargs)
+
+
 # Wrapper around `query_with_columns`
 def insight_query_with_columns(
     query,
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from django.conf import settings
+from django.db import close_old_connections
+from prometheus_client import Counter, Gauge, Histogram
+
+from posthog.clickhouse.query_tagging import get_query_tags, reset_query_tags, tag_queries
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+INSIGHT_QUERY_EXECUTOR_QUEUED = Gauge(
+    "insight_query_executor_queued",
+    "Insight sub-queries submitted to the executor that haven't started running yet.",
+)
+INSIGHT_QUERY_EXECUTOR_RUNNING = Gauge(
+    "insight_query_executor_running",
+    "Insight sub-queries currently running on the executor.",
+)
+INSIGHT_QUERY_EXECUTOR_QUEUE_SECONDS = Histogram(
+    "insight_query_executor_queue_seconds",
+    "Time insight sub-queries waited for a worker thread, after being submitted.",
+)
+INSIGHT_QUERY_EXECUTOR_TEAM_LIMIT_WAITS = Counter(
+    "insight_query_executor_team_limit_waits_total",
+    "Times submitting an insight sub-query waited because its team was already using all the workers it may.",
+)
+
+_worker_state = threading.local()
+
+
+class InsightQueryExecutor:
+    """
+    Runs the independent sub-queries of an insight (one per series, or per compared period) concurrently on
+    a thread pool shared by the whole process.
+
+    Concurrency is bounded by the number of worker threads overall, and by `max_workers_per_team` for each team:
+    submitting another sub-query for a team that's at its limit blocks the submitting thread until one finishes,
+    so a single large insight can't take up all the workers. Sub-queries submitted from within a worker run in
+    that worker, one by one, which keeps nested calls from waiting on themselves.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_team: int):
+        self.max_workers = max_workers
+        self.max_workers_per_team = max(max_workers_per_team, 1)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insight-query") if max_workers > 0 else None
+        )
+        self._running_by_team: Dict[int, int] = {}
+        self._team_slots = threading.Condition()
+
+    def map(self, team_id: int, func: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        "Returns `func` applied to each of `items`, in order. Raises the first exception from any of them."
+        items = list(items)
+        if self._executor is None or len(items) < 2 or getattr(_worker_state, "running", False):
+            return [func(item) for item in items]
+
+        query_tags = dict(get_query_tags())
+        futures = [self._submit(team_id, func, item, query_tags) for item in items]
+        return [future.result() for future in futures]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _submit(self, team_id: int, func: Callable[[T], R], item: T, query_tags: Dict) -> "Future[R]":
+        self._acquire_team_slot(team_id)
+        INSIGHT_QUERY_EXECUTOR_QUEUED.inc()
+        try:
+            assert self._executor is not None
+            return self._executor.submit(self._run, team_id, func, item, query_tags, time.perf_counter())
+        except Exception:
+            INSIGHT_QUERY_EXECUTOR_QUEUED.dec()
+            self._release_team_slot(team_id)
+            raise
+
+    def _run(self, team_id: int, func: Callable[[T], R], item: T, query_tags: Dict, submitted_at: float) -> R:
+        INSIGHT_QUERY_EXECUTOR_QUEUE_SECONDS.observe(time.perf_counter() - submitted_at)
+        INSIGHT_QUERY_EXECUTOR_QUEUED.dec()
+        INSIGHT_QUERY_EXECUTOR_RUNNING.inc()
+        _worker_state.running = True
+        # Worker threads are reused, so they carry the tags of whoever submitted the query and nothing else
+        reset_query_tags()
+        tag_queries(**query_tags)
+        try:
+            return func(item)
+        finally:
+            reset_query_tags()
+            _worker_state.running = False
+            INSIGHT_QUERY_EXECUTOR_RUNNING.dec()
+            self._release_team_slot(team_id)
+            # Like at the end of a request, don't keep hold of broken or expired Postgres connections
+            close_old_connections()
+
+    def _acquire_team_slot(self, team_id: int) -> None:
+        with self._team_slots:
+            if self._running_by_team.get(team_id, 0) >= self.max_workers_per_team:
+                INSIGHT_QUERY_EXECUTOR_TEAM_LIMIT_WAITS.inc()
+                self._team_slots.wait_for(lambda: self._running_by_team.get(team_id, 0) < self.max_workers_per_team)
+            self._running_by_team[team_id] = self._running_by_team.get(team_id, 0) + 1
+
+    def _release_team_slot(self, team_id: int) -> None:
+        with self._team_slots:
+            self._running_by_team[team_id] -= 1
+            if self._running_by_team[team_id] == 0:
+                del self._running_by_team[team_id]
+            self._team_slots.notify_all()
+
+
+_executor: Optional[InsightQueryExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def get_insight_query_executor() -> InsightQueryExecutor:
+    global _executor, _executor_pid
+
+    # Threads don't survive forking, so each process (e.g. gunicorn worker) creates its own pool
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = InsightQueryExecutor(
+                max_workers=settings.INSIGHT_QUERY_EXECUTOR_MAX_WORKERS,
+                max_workers_per_team=settings.INSIGHT_QUERY_EXECUTOR_MAX_WORKERS_PER_TEAM,
+            )
+            _executor_pid = os.getpid()
+        return _executor
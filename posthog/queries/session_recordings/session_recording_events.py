@@ -1,7 +1,8 @@
 import json
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple, cast
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, cast
 
+from django.core.cache import cache
 from statshog.defaults.django import statsd
 
 from posthog.client import sync_execute
@@ -15,14 +16,32 @@ from posthog.models.session_recording.metadata import (
     SnapshotDataTaggedWithWindowId,
     WindowId,
 )
+from posthog.models.session_recording_event.sql import (
+    GET_SESSION_RECORDING_METADATA_SQL,
+    INSERT_SESSION_RECORDING_METADATA_SQL,
+)
 from posthog.session_recordings.session_recording_helpers import (
     decompress_chunked_snapshot_data,
     generate_inactive_segments_for_range,
     get_active_segments_from_event_list,
+    paginate_list,
     parse_snapshot_timestamp,
 )
 from posthog.utils import flatten
 
+# Recordings in progress keep getting new chunks, so the list of chunks is only reused for a short while
+CHUNK_MANIFEST_CACHE_TTL_SECONDS = 60
+# Cached instead of a manifest for recordings from before snapshots were chunked
+UNCHUNKED_RECORDING = "unchunked"
+
+
+class RecordingChunk(NamedTuple):
+    chunk_id: str
+    window_id: WindowId
+    # Timestamps of the chunk's rows, in microseconds, to narrow down queries for them by the sorting key
+    first_timestamp: int
+    last_timestamp: int
+
 
 class SessionRecordingEvents:
     _session_recording_id: str
@@ -45,6 +64,34 @@ class SessionRecordingEvents:
         {limit_param}
     """
 
+    # Only reads the materialized `chunk_id` column besides the sorting key, never `snapshot_data`
+    _recording_chunk_manifest_query = """
+        SELECT
+            chunk_id,
+            any(window_id),
+            toUnixTimestamp64Micro(min(timestamp)) AS first_timestamp,
+            toUnixTimestamp64Micro(max(timestamp))
+        FROM session_recording_events
+        PREWHERE
+            team_id = %(team_id)s
+            AND session_id = %(session_id)s
+            {date_clause}
+        GROUP BY chunk_id
+        ORDER BY first_timestamp, chunk_id
+    """
+
+    _recording_chunks_query = """
+        SELECT window_id, snapshot_data
+        FROM session_recording_events
+        PREWHERE
+            team_id = %(team_id)s
+            AND session_id = %(session_id)s
+            AND timestamp >= fromUnixTimestamp64Micro(%(first_timestamp)s)
+            AND timestamp <= fromUnixTimestamp64Micro(%(last_timestamp)s)
+        WHERE chunk_id IN %(chunk_ids)s
+        ORDER BY timestamp
+    """
+
     def get_recording_snapshot_date_clause(self) -> Tuple[str, Dict]:
         if self._recording_start_time:
             # If we can, we want to limit the time range being queried.
@@ -95,6 +142,67 @@ class SessionRecordingEvents:
         return bool(response)
 
     def get_snapshots(self, limit, offset) -> Optional[DecompressedRecordingData]:
+        """
+        Returns a page of `limit` chunks of the recording, starting from the `offset`th one.
+
+        Only the chunks on the page are loaded from ClickHouse. Which chunks there are comes from a manifest of the
+        recording's chunks, which is cached for the following pages while the recording is played back.
+        """
+        # Playback starts from the first page, which is also when the recording may have changed the most
+        manifest = self._get_chunk_manifest(use_cache=offset > 0)
+        if manifest is None:
+            return self._get_snapshots_without_manifest(limit, offset)
+
+        decompressed = self._get_snapshots_from_manifest(manifest, limit, offset)
+        # A cached manifest may be missing chunks that arrived since (or be for data that's since been deleted)
+        if decompressed is None or (not decompressed["has_next"] and offset > 0):
+            fresh_manifest = self._get_chunk_manifest(use_cache=False)
+            if fresh_manifest is None:
+                return self._get_snapshots_without_manifest(limit, offset)
+            if decompressed is None or fresh_manifest != manifest:
+                statsd.incr("session_recordings.chunk_manifest_outdated")
+                decompressed = self._get_snapshots_from_manifest(fresh_manifest, limit, offset)
+
+        if decompressed is None or decompressed["snapshot_data_by_window_id"] == {}:
+            return None
+        return decompressed
+
+    def _get_snapshots_from_manifest(
+        self, manifest: List[RecordingChunk], limit, offset
+    ) -> Optional[DecompressedRecordingData]:
+        paginated_chunks = paginate_list(manifest, limit, offset)
+        page: List[RecordingChunk] = paginated_chunks.paginated_list
+        if len(page) == 0:
+            return DecompressedRecordingData(has_next=False, snapshot_data_by_window_id={})
+
+        response = sync_execute(
+            self._recording_chunks_query,
+            {
+                "team_id": self._team.id,
+                "session_id": self._session_recording_id,
+                "first_timestamp": min(chunk.first_timestamp for chunk in page),
+                "last_timestamp": max(chunk.last_timestamp for chunk in page),
+                "chunk_ids": [chunk.chunk_id for chunk in page],
+            },
+        )
+        snapshots_by_chunk_id: Dict[str, List[SnapshotDataTaggedWithWindowId]] = {}
+        for window_id, snapshot_data in response:
+            snapshot = SnapshotDataTaggedWithWindowId(window_id=window_id, snapshot_data=json.loads(snapshot_data))
+            snapshots_by_chunk_id.setdefault(snapshot["snapshot_data"]["chunk_id"], []).append(snapshot)
+
+        if len(snapshots_by_chunk_id) != len(page):
+            return None
+
+        decompressed = decompress_chunked_snapshot_data(
+            self._team.pk,
+            self._session_recording_id,
+            # In the same order as the manifest, which chunks on the same timestamp are returned in
+            [snapshot for chunk in page for snapshot in snapshots_by_chunk_id[chunk.chunk_id]],
+        )
+        decompressed["has_next"] = paginated_chunks.has_next
+        return decompressed
+
+    def _get_snapshots_without_manifest(self, limit, offset) -> Optional[DecompressedRecordingData]:
         all_snapshots = [
             SnapshotDataTaggedWithWindowId(
                 window_id=recording_snapshot["window_id"], snapshot_data=recording_snapshot["snapshot_data"]
@@ -109,7 +217,61 @@ class SessionRecordingEvents:
             return None
         return decompressed
 
+    def _get_chunk_manifest(self, use_cache: bool) -> Optional[List[RecordingChunk]]:
+        """
+        Lists the chunks of the recording, in the order they were recorded. Returns None for recordings from before
+        snapshots were chunked, which are paginated by snapshot instead.
+        """
+        cache_key = f"recording_chunk_manifest_{self._team.pk}_{self._session_recording_id}"
+        if use_cache:
+            cached_manifest = cache.get(cache_key)
+            if cached_manifest == UNCHUNKED_RECORDING:
+                return None
+            if cached_manifest is not None:
+                return [RecordingChunk(*chunk) for chunk in cached_manifest]
+
+        date_clause, date_clause_params = self.get_recording_snapshot_date_clause()
+        response = sync_execute(
+            self._recording_chunk_manifest_query.format(date_clause=date_clause),
+            {"team_id": self._team.id, "session_id": self._session_recording_id, **date_clause_params},
+        )
+        manifest = [RecordingChunk(*row) for row in response]
+        if any(chunk.chunk_id == "" for chunk in manifest):
+            # Recordings don't start being chunked later on, so the following pages can skip the manifest
+            cache.set(cache_key, UNCHUNKED_RECORDING, CHUNK_MANIFEST_CACHE_TTL_SECONDS)
+            return None
+
+        cache.set(cache_key, [tuple(chunk) for chunk in manifest], CHUNK_MANIFEST_CACHE_TTL_SECONDS)
+        return manifest
+
     def get_metadata(self) -> Optional[RecordingMetadata]:
+        """
+        Returns the metadata of the recording, as stored once it went idle or, for recordings in progress
+        (or not yet processed, or that received events since), calculated from its events.
+        """
+        response = sync_execute(
+            GET_SESSION_RECORDING_METADATA_SQL, {"team_id": self._team.id, "session_id": self._session_recording_id}
+        )
+        if response:
+            *metadata_row, last_event_timestamp, calculation_failed = response[0]
+            if not calculation_failed and not self._has_events_since(last_event_timestamp):
+                statsd.incr("session_recordings.metadata_loaded_from_table")
+                return recording_metadata_from_row(tuple(metadata_row))
+            statsd.incr("session_recordings.metadata_in_table_outdated")
+
+        return self.calculate_metadata()
+
+    def _has_events_since(self, timestamp: datetime) -> bool:
+        # Bounded by the timestamp, which is part of the sorting key, so only the newest parts are read
+        query = self._recording_snapshot_query.format(
+            date_clause="AND timestamp > %(since)s", fields="session_id", limit_param="LIMIT 1"
+        )
+        response = sync_execute(
+            query, {"team_id": self._team.id, "session_id": self._session_recording_id, "since": timestamp}
+        )
+        return bool(response)
+
+    def calculate_metadata(self) -> Optional[RecordingMetadata]:
         snapshots = self._query_recording_snapshots(include_snapshots=False)
 
         if len(snapshots) == 0:
@@ -290,3 +452,124 @@ class SessionRecordingEvents:
             keypress_count=keypress_count,
             urls=urls,
         )
+
+
+def store_recording_metadata(rows: List[Tuple]) -> None:
+    "Stores rows from `recording_metadata_to_row`, replacing the recordings' previously stored metadata."
+    if rows:
+        sync_execute(INSERT_SESSION_RECORDING_METADATA_SQL, rows)
+
+
+def recording_metadata_to_row(
+    team_id: int,
+    session_id: str,
+    metadata: RecordingMetadata,
+    last_event_timestamp: datetime,
+    calculated_at: datetime,
+) -> Tuple:
+    window_ids = list(metadata["start_and_end_times_by_window_id"].keys())
+    window_index = {window_id: index for index, window_id in enumerate(window_ids)}
+    windows = [metadata["start_and_end_times_by_window_id"][window_id] for window_id in window_ids]
+    segments = metadata["segments"]
+
+    return (
+        team_id,
+        session_id,
+        metadata["distinct_id"],
+        metadata["start_time"],
+        metadata["end_time"],
+        metadata["duration"],
+        metadata["click_count"],
+        metadata["keypress_count"],
+        metadata["urls"],
+        window_ids,
+        [window["start_time"] for window in windows],
+        [window["end_time"] for window in windows],
+        [window_index[segment["window_id"]] for segment in segments],
+        [segment["start_time"] for segment in segments],
+        [segment["end_time"] for segment in segments],
+        [int(segment["is_active"]) for segment in segments],
+        last_event_timestamp,
+        calculated_at,
+        0,
+    )
+
+
+def failed_recording_metadata_row(
+    team_id: int, session_id: str, last_event_timestamp: datetime, calculated_at: datetime
+) -> Tuple:
+    "A row marking that the metadata of the recording up to `last_event_timestamp` couldn't be calculated."
+    return (
+        team_id,
+        session_id,
+        "",
+        last_event_timestamp,
+        last_event_timestamp,
+        0,
+        0,
+        0,
+        [],
+        [],
+        [],
+        [],
+        [],
+        [],
+        [],
+        [],
+        last_event_timestamp,
+        calculated_at,
+        1,
+    )
+
+
+def recording_metadata_from_row(row: Tuple[Any, ...]) -> RecordingMetadata:
+    (
+        distinct_id,
+        start_time,
+        end_time,
+        duration,
+        click_count,
+        keypress_count,
+        urls,
+        window_ids,
+        window_start_times,
+        window_end_times,
+        segment_window_indexes,
+        segment_start_times,
+        segment_end_times,
+        segment_is_active,
+    ) = row
+
+    return RecordingMetadata(
+        distinct_id=distinct_id,
+        segments=[
+            RecordingSegment(
+                window_id=window_ids[window_index],
+                start_time=_as_utc(segment_start_time),
+                end_time=_as_utc(segment_end_time),
+                is_active=bool(is_active),
+            )
+            for window_index, segment_start_time, segment_end_time, is_active in zip(
+                segment_window_indexes, segment_start_times, segment_end_times, segment_is_active
+            )
+        ],
+        start_and_end_times_by_window_id={
+            window_id: RecordingSegment(
+                window_id=window_id,
+                start_time=_as_utc(window_start_time),
+                end_time=_as_utc(window_end_time),
+                is_active=False,
+            )
+            for window_id, window_start_time, window_end_time in zip(window_ids, window_start_times, window_end_times)
+        },
+        start_time=_as_utc(start_time),
+        end_time=_as_utc(end_time),
+        duration=duration,
+        click_count=click_count,
+        keypress_count=keypress_count,
+        urls=urls,
+    )
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
@@ -10,6 +10,7 @@ from django.utils.timezone import now
 from freezegun import freeze_time
 from rest_framework.request import Request
 
+from posthog.client import sync_execute
 from posthog.models import Filter
 from posthog.models.session_recording.metadata import SessionRecordingEvent
 from posthog.models.team import Team
@@ -86,6 +87,33 @@ class TestClickhouseSessionRecording(ClickhouseTestMixin, APIBaseTest):
             )
             self.assertEqual(recording["has_next"], False)
 
+    def test_get_unchunked_snapshots_page_by_page_skips_chunk_manifest(self):
+        with freeze_time("2020-09-13T12:26:40.000Z"):
+            for index in range(3):
+                create_snapshot(
+                    has_full_snapshot=False,
+                    distinct_id="user",
+                    session_id="unchunked",
+                    timestamp=now() + relativedelta(seconds=index),
+                    team_id=self.team.id,
+                )
+
+            recording_events = SessionRecordingEvents(team=self.team, session_recording_id="unchunked")
+            first_page = recording_events.get_snapshots(2, 0)
+            assert first_page is not None
+            self.assertTrue(first_page["has_next"])
+
+            with patch(
+                "posthog.queries.session_recordings.session_recording_events.sync_execute", wraps=sync_execute
+            ) as sync_execute_mock:
+                second_page = recording_events.get_snapshots(2, 2)
+
+            assert second_page is not None
+            self.assertEqual(len(second_page["snapshot_data_by_window_id"][""]), 1)
+            self.assertFalse(second_page["has_next"])
+            self.assertEqual(sync_execute_mock.call_count, 1)
+            self.assertNotIn("GROUP BY chunk_id", sync_execute_mock.call_args[0][0])
+
     def test_get_snapshots_does_not_leak_teams(self):
         with freeze_time("2020-09-13T12:26:40.000Z"):
             another_team = Team.objects.create(organization=self.organization)
@@ -168,6 +196,37 @@ class TestClickhouseSessionRecording(ClickhouseTestMixin, APIBaseTest):
             self.assertEqual(recording["snapshot_data_by_window_id"][""][0]["timestamp"], 1_600_000_300_000)
             self.assertTrue(recording["has_next"])
 
+    def test_get_chunked_snapshots_page_by_page(self):
+        with freeze_time("2020-09-13T12:26:40.000Z"):
+            for index in range(4):
+                create_chunked_snapshots(
+                    snapshot_count=1,
+                    distinct_id="user",
+                    session_id="7",
+                    timestamp=now() + relativedelta(minutes=index),
+                    team_id=self.team.id,
+                )
+
+            def get_page(offset):
+                recording = SessionRecordingEvents(team=self.team, session_recording_id="7").get_snapshots(2, offset)
+                assert recording is not None
+                timestamps = [snapshot["timestamp"] for snapshot in recording["snapshot_data_by_window_id"][""]]
+                return timestamps, recording["has_next"]
+
+            self.assertEqual(get_page(0), ([1_600_000_000_000, 1_600_000_060_000], True))
+
+            # Still being recorded
+            create_chunked_snapshots(
+                snapshot_count=1,
+                distinct_id="user",
+                session_id="7",
+                timestamp=now() + relativedelta(minutes=4),
+                team_id=self.team.id,
+            )
+
+            self.assertEqual(get_page(2), ([1_600_000_120_000, 1_600_000_180_000], True))
+            self.assertEqual(get_page(4), ([1_600_000_240_000], False))
+
     def test_get_metadata(self):
         with freeze_time("2020-09-13T12:26:40.000Z"):
             timestamp = now()
@@ -0,0 +1,83 @@
+import threading
+import time
+from unittest import TestCase
+
+from posthog.clickhouse.query_tagging import get_query_tags, reset_query_tags, tag_queries
+from posthog.queries.insight_executor import InsightQueryExecutor
+
+
+class TestInsightQueryExecutor(TestCase):
+    def setUp(self):
+        self.executor = InsightQueryExecutor(max_workers=4, max_workers_per_team=2)
+        self.lock = threading.Lock()
+        self.running = {1: 0, 2: 0}
+        self.max_running = {1: 0, 2: 0}
+
+    def tearDown(self):
+        self.executor.shutdown()
+        reset_query_tags()
+
+    def _track(self, team_id: int):
+        def _run(value: int) -> int:
+            with self.lock:
+                self.running[team_id] += 1
+                self.max_running[team_id] = max(self.max_running[team_id], self.running[team_id])
+            time.sleep(0.05)
+            with self.lock:
+                self.running[team_id] -= 1
+            return value * 2
+
+        return _run
+
+    def test_map_returns_results_in_order(self):
+        self.assertEqual(self.executor.map(1, self._track(1), range(6)), [0, 2, 4, 6, 8, 10])
+
+    def test_limits_concurrency_per_team(self):
+        threads = [
+            threading.Thread(target=self.executor.map, args=(team_id, self._track(team_id), range(4)))
+            for team_id in (1, 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.max_running, {1: 2, 2: 2})
+
+    def test_runs_inline_without_workers(self):
+        executor = InsightQueryExecutor(max_workers=0, max_workers_per_team=2)
+
+        threads = executor.map(1, lambda _: threading.current_thread(), range(2))
+
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+
+    def test_propagates_query_tags(self):
+        tag_queries(team_id=1, kind="request")
+
+        tags = self.executor.map(1, lambda value: {**get_query_tags(), "value": value}, range(2))
+
+        self.assertEqual(
+            tags, [{"team_id": 1, "kind": "request", "value": 0}, {"team_id": 1, "kind": "request", "value": 1}]
+        )
+        # Workers don't keep tags around for whatever runs on them next
+        reset_query_tags()
+        self.assertEqual(self.executor.map(2, lambda _: get_query_tags(), range(2)), [{}, {}])
+
+    def test_nested_map_runs_in_worker(self):
+        executor = InsightQueryExecutor(max_workers=1, max_workers_per_team=1)
+
+        result = executor.map(1, lambda value: executor.map(1, lambda inner: value + inner, range(2)), range(2))
+
+        self.assertEqual(result, [[0, 1], [1, 2]])
+        executor.shutdown()
+
+    def test_raises_exceptions_and_frees_slots(self):
+        def _fail(value: int) -> int:
+            if value == 1:
+                raise ValueError("query failed")
+            return value
+
+        with self.assertRaises(ValueError):
+            self.executor.map(1, _fail, range(3))
+
+        self.assertEqual(self.executor.map(1, self._track(1), range(2)), [0, 2])
@@ -0,0 +1,288 @@
+import copy
+import json
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+from sentry_sdk.api import capture_exception
+from statshog.defaults.django import statsd
+
+from posthog.constants import (
+    MONTHLY_ACTIVE,
+    NON_BREAKDOWN_DISPLAY_TYPES,
+    NON_TIME_SERIES_DISPLAY_TYPES,
+    TREND_FILTER_TYPE_ACTIONS,
+    TRENDS_CUMULATIVE,
+    TRENDS_LIFECYCLE,
+    UNIQUE_GROUPS,
+    UNIQUE_USERS,
+    WEEKLY_ACTIVE,
+)
+from posthog.models.filters import Filter
+from posthog.models.team import Team
+from posthog.queries.query_date_range import QueryDateRange
+from posthog.queries.trends.trends import Trends
+from posthog.utils import encode_get_request_params
+
+# Bump when the shape of stored intervals changes, so that older entries are ignored
+STORED_INTERVALS_VERSION = 2
+
+# Properties of events never change once ingested, unlike those of persons, groups, cohorts or sessions
+APPEND_ONLY_PROPERTY_TYPES = ("event", "element")
+
+
+def can_calculate_incrementally(filter: Filter) -> bool:
+    """
+    Whether each interval of the trend only depends on events within that interval, so that the trend
+    can be calculated by reusing stored intervals and querying only the newest ones.
+
+    Expects a simplified filter, with test account filters and cohorts expanded into properties.
+    """
+    if (
+        _is_breakdown(filter)
+        or filter.filter_test_accounts
+        or filter.formula
+        or filter.compare
+        or filter.shown_as == TRENDS_LIFECYCLE
+        or filter.display in NON_TIME_SERIES_DISPLAY_TYPES
+        or filter.smoothing_intervals > 1
+        or filter.use_explicit_dates
+        or filter.interval not in ("hour", "day", "week", "month")
+        # All-time ranges start at the earliest event, which can move with backfills
+        or filter._date_from == "all"
+    ):
+        return False
+
+    if any(prop.type not in APPEND_ONLY_PROPERTY_TYPES for prop in filter.property_groups.flat):
+        return False
+
+    for entity in filter.entities:
+        if any(prop.type not in APPEND_ONLY_PROPERTY_TYPES for prop in entity.property_groups.flat):
+            return False
+        if entity.type == TREND_FILTER_TYPE_ACTIONS and any(
+            prop.get("type", "event") not in APPEND_ONLY_PROPERTY_TYPES
+            for step in entity.get_action().steps.all()
+            for prop in step.properties or []
+        ):
+            return False
+        # Active users are counted over a trailing window of intervals
+        if entity.math in (WEEKLY_ACTIVE, MONTHLY_ACTIVE):
+            return False
+        # Cumulative unique actors are counted from when each was first seen in the whole date range
+        if filter.display == TRENDS_CUMULATIVE and entity.math in (UNIQUE_USERS, UNIQUE_GROUPS):
+            return False
+
+    return True
+
+
+def calculate_trends_incrementally(filter: Filter, team: Team, cache_key: str) -> List[Dict[str, Any]]:
+    if not can_calculate_incrementally(filter.simplify(team)):
+        return Trends().run(filter, team)
+    return IncrementalTrends(filter, team, cache_key).run()
+
+
+class IntervalTrends(Trends):
+    "Trends returning the value of each interval on its own, never accumulated."
+
+    def get_cached_result(self, filter: Filter, team: Team) -> Optional[List[Dict[str, Any]]]:
+        # Stored intervals replace strict caching, which only ever reuses the last interval
+        return None
+
+    def _handle_cumulative(self, entity_metrics: List) -> List[Dict[str, Any]]:
+        # Accumulated once intervals have been merged
+        return entity_metrics
+
+
+class IncrementalTrends:
+    """
+    Calculates a trend by keeping the values of each interval in the cache. Intervals that ended more than
+    `TRENDS_INCREMENTAL_REFRESH_LAG_SECONDS` ago are considered stable: the first interval after those is the
+    watermark, and on the next calculation only intervals from the watermark on are queried and merged into the
+    stored ones.
+    """
+
+    def __init__(self, filter: Filter, team: Team, cache_key: str):
+        self.filter = filter
+        self.team = team
+        self.cache_key = cache_key
+
+    def run(self) -> List[Dict[str, Any]]:
+        stored = self._get_stored_intervals()
+        series: Optional[List[Dict[str, Any]]] = None
+        calculated_at = time.time()
+
+        if stored is not None:
+            tail_filter = self.filter.shallow_clone({"date_from": stored["watermark"]})
+            tail = IntervalTrends().run(tail_filter, self.team)
+            series = self._merge(stored["series"], stored["watermark"], tail)
+            if series is not None:
+                calculated_at = stored["calculated_at"]
+            statsd.incr("trends_incremental_refresh", tags={"result": "merged" if series is not None else "mismatch"})
+        else:
+            statsd.incr("trends_incremental_refresh", tags={"result": "full"})
+
+        if series is None:
+            series = IntervalTrends().run(self.filter, self.team)
+
+        self._store_intervals(series, calculated_at)
+        return self._finalize(series)
+
+    @property
+    def _storage_key(self) -> str:
+        return f"trends_intervals_{self.cache_key}"
+
+    def _get_stored_intervals(self) -> Optional[Dict[str, Any]]:
+        try:
+            stored = cache.get(self._storage_key)
+        except Exception as e:
+            capture_exception(e)
+            return None
+
+        if (
+            not isinstance(stored, dict)
+            or stored.get("version") != STORED_INTERVALS_VERSION
+            or stored.get("timezone") != self.team.timezone
+            or time.time() - stored["calculated_at"] > settings.TRENDS_INCREMENTAL_FULL_REFRESH_SECONDS
+        ):
+            return None
+
+        # The date range has moved past everything stored, so there's nothing to reuse
+        if _parse_interval_start(stored["watermark"]) <= self._first_interval_start():
+            return None
+
+        return stored
+
+    def _store_intervals(self, series: List[Dict[str, Any]], calculated_at: float) -> None:
+        watermark = self._stable_watermark(series)
+        if watermark is None:
+            return
+
+        try:
+            cache.set(
+                self._storage_key,
+                {
+                    "version": STORED_INTERVALS_VERSION,
+                    "timezone": self.team.timezone,
+                    "calculated_at": calculated_at,
+                    "watermark": watermark,
+                    "series": series,
+                },
+                settings.CACHED_RESULTS_TTL,
+            )
+        except Exception as e:
+            capture_exception(e)
+
+    def _stable_watermark(self, series: List[Dict[str, Any]]) -> Optional[str]:
+        "Start of the earliest interval that may still change, which is never later than the last interval."
+        if len(series) == 0 or any(item["days"] != series[0]["days"] for item in series):
+            return None
+
+        days = series[0]["days"]
+        if len(days) == 0:
+            return None
+
+        stable_until = self._now() - timedelta(seconds=settings.TRENDS_INCREMENTAL_REFRESH_LAG_SECONDS)
+        for index, day in enumerate(days[:-1]):
+            # An interval ends where the next one starts
+            if _parse_interval_start(days[index + 1]) > stable_until:
+                return day
+        return days[-1]
+
+    def _merge(
+        self, stored_series: List[Dict[str, Any]], watermark: str, tail: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Replaces stored intervals from the watermark on with freshly queried ones, dropping intervals that are no
+        longer in the date range. Returns None if the two don't line up, in which case the trend is recalculated.
+        """
+        if len(tail) == 0:
+            return None
+
+        tail_days = tail[0]["days"]
+        if len(tail_days) == 0 or tail_days[0] != watermark or any(item["days"] != tail_days for item in tail):
+            return None
+
+        stored_by_key = {_series_key(item): item for item in stored_series}
+        tail_by_key = {_series_key(item): item for item in tail}
+        # New entities can't be backfilled from stored intervals
+        if len(stored_by_key) != len(stored_series) or set(tail_by_key) != set(stored_by_key):
+            return None
+
+        first_interval_start = self._first_interval_start()
+        merged = []
+        for key, stored in stored_by_key.items():
+            kept = [
+                index
+                for index, day in enumerate(stored["days"])
+                if first_interval_start <= _parse_interval_start(day) < _parse_interval_start(watermark)
+            ]
+            if len(kept) == 0 or _parse_interval_start(stored["days"][kept[0]]) != first_interval_start:
+                return None
+
+            new = tail_by_key[key]
+            item = {**stored, **{k: v for k, v in new.items() if k not in ("data", "labels", "days", "persons_urls")}}
+            for field in ("data", "labels", "days", "persons_urls"):
+                if field in stored:
+                    item[field] = [stored[field][index] for index in kept] + list(new.get(field, []))
+            merged.append(item)
+
+        return merged
+
+    def _finalize(self, series: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        result = copy.deepcopy(series)
+        for item in result:
+            item["count"] = float(sum(item["data"]))
+            item["filter"] = self.filter.to_dict()
+            if self.filter.display == TRENDS_CUMULATIVE:
+                item["data"] = list(accumulate(item["data"]))
+                self._rebase_persons_urls(item)
+
+        return result
+
+    def _rebase_persons_urls(self, item: Dict[str, Any]) -> None:
+        # Cumulative data points cover the whole date range, not just the range intervals were queried for
+        date_from = self.filter.date_from
+        encoded = encode_get_request_params({"date_from": date_from})
+        for persons_url in item.get("persons_urls", []):
+            path, _, query = persons_url["url"].partition("?")
+            params = {**dict(urllib.parse.parse_qsl(query, keep_blank_values=True)), **encoded}
+            persons_url["filter"]["date_from"] = date_from
+            persons_url["url"] = f"{path}?{urllib.parse.urlencode(params)}"
+
+    def _first_interval_start(self) -> datetime:
+        date_from = QueryDateRange(filter=self.filter, team=self.team).date_from_param.replace(tzinfo=None)
+        return _truncate_to_interval(date_from, self.filter.interval)
+
+    def _now(self) -> datetime:
+        return datetime.now(pytz.timezone(self.team.timezone)).replace(tzinfo=None)
+
+
+def _is_breakdown(filter: Filter) -> bool:
+    return bool(filter.breakdown) and filter.display not in NON_BREAKDOWN_DISPLAY_TYPES
+
+
+def _series_key(item: Dict[str, Any]) -> str:
+    return json.dumps(item["action"], sort_keys=True, default=str)
+
+
+def _parse_interval_start(day: str) -> datetime:
+    # Intervals are labelled in the project timezone, as `%Y-%m-%d` or `%Y-%m-%d %H:%M:%S` for hours
+    return datetime.fromisoformat(day)
+
+
+def _truncate_to_interval(value: datetime, interval: str) -> datetime:
+    if interval == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        # Mirrors ClickHouse's toStartOfWeek, with weeks starting on Sunday
+        return value - timedelta(days=(value.weekday() + 1) % 7)
+    elif interval == "month":
+        return value.replace(day=1)
+    return value
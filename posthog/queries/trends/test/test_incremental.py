@@ -0,0 +1,122 @@
+from typing import Any, Dict, List
+
+from django.core.cache import cache
+from freezegun.api import freeze_time
+
+from posthog.constants import TRENDS_CUMULATIVE
+from posthog.models import Person
+from posthog.models.filters.filter import Filter
+from posthog.queries.trends.incremental import (
+    IncrementalTrends,
+    calculate_trends_incrementally,
+    can_calculate_incrementally,
+)
+from posthog.queries.trends.trends import Trends
+from posthog.test.base import APIBaseTest, ClickhouseTestMixin, _create_event
+
+COMPARED_FIELDS = ("label", "breakdown_value", "count", "data", "days", "labels")
+
+
+class TestIncrementalTrends(ClickhouseTestMixin, APIBaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Person.objects.create(team_id=self.team.pk, distinct_ids=["person1"])
+        Person.objects.create(team_id=self.team.pk, distinct_ids=["person2"])
+
+        for timestamp, distinct_id, browser in [
+            ("2020-01-01T12:00:00Z", "person1", "Chrome"),
+            ("2020-01-02T12:00:00Z", "person1", "Chrome"),
+            ("2020-01-02T13:00:00Z", "person2", "Safari"),
+            ("2020-01-04T08:00:00Z", "person2", "Chrome"),
+        ]:
+            self._create_pageview(timestamp, distinct_id, browser)
+
+    def _create_pageview(self, timestamp: str, distinct_id: str, browser: str):
+        _create_event(
+            team=self.team,
+            event="$pageview",
+            distinct_id=distinct_id,
+            timestamp=timestamp,
+            properties={"$browser": browser},
+        )
+
+    def _filter(self, **extra) -> Filter:
+        return Filter(data={"events": [{"id": "$pageview"}], "date_from": "-7d", **extra}, team=self.team)
+
+    def _run(self, **extra) -> List[Dict[str, Any]]:
+        return IncrementalTrends(self._filter(**extra), self.team, "incremental_test").run()
+
+    def _assert_same_results(self, result: List[Dict[str, Any]], expected: List[Dict[str, Any]]):
+        self.assertEqual(
+            [{field: series.get(field) for field in COMPARED_FIELDS} for series in result],
+            [{field: series.get(field) for field in COMPARED_FIELDS} for series in expected],
+        )
+
+    def test_merges_newest_intervals_into_stored_ones(self):
+        with freeze_time("2020-01-04T10:00:00Z"):
+            self._assert_same_results(self._run(), Trends().run(self._filter(), self.team))
+
+        self._create_pageview("2020-01-04T20:00:00Z", "person1", "Chrome")
+        self._create_pageview("2020-01-05T01:00:00Z", "person1", "Chrome")
+
+        with freeze_time("2020-01-05T03:00:00Z"):
+            result = self._run()
+            self._assert_same_results(result, Trends().run(self._filter(), self.team))
+
+        self.assertEqual(result[0]["days"][0], "2019-12-29")
+        self.assertEqual(result[0]["data"], [0.0, 0.0, 0.0, 1.0, 2.0, 0.0, 2.0, 1.0])
+
+    def test_stable_intervals_are_not_queried_again(self):
+        with freeze_time("2020-01-04T10:00:00Z"):
+            self._run()
+
+        # Arrives after its interval became stable, so is only picked up by the next full calculation
+        self._create_pageview("2020-01-02T15:00:00Z", "person1", "Chrome")
+
+        with freeze_time("2020-01-04T11:00:00Z"):
+            result = self._run()
+            self.assertEqual(result[0]["data"], [0.0, 0.0, 0.0, 0.0, 1.0, 2.0, 0.0, 1.0])
+
+        with self.settings(TRENDS_INCREMENTAL_FULL_REFRESH_SECONDS=0), freeze_time("2020-01-04T12:00:00Z"):
+            result = self._run()
+            self.assertEqual(result[0]["data"], [0.0, 0.0, 0.0, 0.0, 1.0, 3.0, 0.0, 1.0])
+
+    def test_cumulative_accumulates_merged_intervals(self):
+        with freeze_time("2020-01-04T10:00:00Z"):
+            self._run(display=TRENDS_CUMULATIVE)
+
+        self._create_pageview("2020-01-05T01:00:00Z", "person1", "Chrome")
+
+        with freeze_time("2020-01-05T03:00:00Z"):
+            result = self._run(display=TRENDS_CUMULATIVE)
+            self._assert_same_results(result, Trends().run(self._filter(display=TRENDS_CUMULATIVE), self.team))
+
+        self.assertEqual(result[0]["data"], [0.0, 0.0, 0.0, 1.0, 3.0, 3.0, 4.0, 5.0])
+
+    def test_falls_back_to_full_calculation_for_unsupported_filters(self):
+        self.assertTrue(can_calculate_incrementally(self._filter()))
+        self.assertFalse(can_calculate_incrementally(self._filter(formula="A * 2")))
+        self.assertFalse(can_calculate_incrementally(self._filter(date_from="all")))
+        self.assertFalse(
+            can_calculate_incrementally(
+                Filter(data={"events": [{"id": "$pageview", "math": "weekly_active"}]}, team=self.team)
+            )
+        )
+        self.assertTrue(can_calculate_incrementally(self._filter(properties=[{"key": "$browser", "value": "Chrome"}])))
+        # Persons, cohorts and breakdown values can change for events that were already counted
+        self.assertFalse(can_calculate_incrementally(self._filter(breakdown="$browser", breakdown_type="event")))
+        self.assertFalse(
+            can_calculate_incrementally(self._filter(properties=[{"key": "email", "value": "a", "type": "person"}]))
+        )
+        self.assertFalse(
+            can_calculate_incrementally(self._filter(properties=[{"key": "id", "value": 1, "type": "cohort"}]))
+        )
+        self.assertFalse(can_calculate_incrementally(self._filter(filter_test_accounts=True)))
+
+        with freeze_time("2020-01-04T10:00:00Z"):
+            filter = self._filter(compare=True)
+            self._assert_same_results(
+                calculate_trends_incrementally(filter, self.team, "incremental_test"), Trends().run(filter, self.team)
+            )
+            self.assertIsNone(cache.get("trends_intervals_incremental_test"))
@@ -2,11 +2,27 @@ import base64
 import dataclasses
 import gzip
 import json
-from collections import defaultdict
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, DefaultDict, Dict, Generator, List, Optional
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
+from django.conf import settings
 from sentry_sdk.api import capture_exception, capture_message
+from statshog.defaults.django import statsd
 
 from posthog.models import utils
 from posthog.models.session_recording.metadata import (
@@ -20,6 +36,8 @@ from posthog.models.session_recording.metadata import (
 
 FULL_SNAPSHOT = 2
 
+R = TypeVar("R")
+
 
 # NOTE: For reference here are some helpful enum mappings from rrweb
 # https://github.com/rrweb-io/rrweb/blob/master/packages/rrweb/src/types.ts
@@ -90,7 +108,14 @@ Event = Dict[str, Any]
 
 
 def preprocess_session_recording_events_for_clickhouse(events: List[Event]) -> List[Event]:
-    result = []
+    return list(iter_preprocessed_session_recording_events(events))
+
+
+def iter_preprocessed_session_recording_events(events: Iterable[Event]) -> Generator[Event, None, None]:
+    """
+    Streaming variant of `preprocess_session_recording_events_for_clickhouse`: non-snapshot events are yielded
+    as soon as they are read, snapshots are buffered per session and window and chunked at the end.
+    """
     snapshots_by_session_and_window_id = defaultdict(list)
     for event in events:
         if is_unchunked_snapshot(event):
@@ -98,12 +123,10 @@ def preprocess_session_recording_events_for_clickhouse(events: List[Event]) -> L
             window_id = event["properties"].get("$window_id")
             snapshots_by_session_and_window_id[(session_id, window_id)].append(event)
         else:
-            result.append(event)
+            yield event
 
     for _, snapshots in snapshots_by_session_and_window_id.items():
-        result.extend(list(compress_and_chunk_snapshots(snapshots)))
-
-    return result
+        yield from compress_and_chunk_snapshots(snapshots)
 
 
 def compress_and_chunk_snapshots(events: List[Event], chunk_size=512 * 1024) -> Generator[Event, None, None]:
@@ -217,7 +240,7 @@ def decompress_chunked_snapshot_data(
     has_next = paginated_chunk_list.has_next
     chunk_list: List[List[SnapshotDataTaggedWithWindowId]] = paginated_chunk_list.paginated_list
 
-    # Decompress the chunks and split the resulting events by window_id
+    complete_chunk_list: List[List[SnapshotDataTaggedWithWindowId]] = []
     for chunks in chunk_list:
         if len(chunks) != chunks[0]["snapshot_data"]["chunk_count"]:
             capture_message(
@@ -230,12 +253,13 @@ def decompress_chunked_snapshot_data(
                 )
             )
             continue
+        complete_chunk_list.append(chunks)
 
-        b64_compressed_data = "".join(
-            chunk["snapshot_data"]["data"] for chunk in sorted(chunks, key=lambda c: c["snapshot_data"]["chunk_index"])
-        )
-        decompressed_data = json.loads(decompress(b64_compressed_data))
-
+    # Decompress the chunks and split the resulting events by window_id
+    decompressed_chunk_list = _map_chunks(
+        lambda chunks: _decompress_chunks(team_id, session_recording_id, chunks), complete_chunk_list
+    )
+    for chunks, decompressed_data in zip(complete_chunk_list, decompressed_chunk_list):
         # Decompressed data can be large, and in metadata calculations, we only care if the event is "active"
         # This pares down the data returned, so we're not passing around a massive object
         if return_only_activity_data:
@@ -246,6 +270,97 @@ def decompress_chunked_snapshot_data(
     return DecompressedRecordingData(has_next=has_next, snapshot_data_by_window_id=snapshot_data_by_window_id)
 
 
+class DecompressedChunkCache:
+    """
+    In-memory LRU cache of decompressed recording chunks, bounded by their total size.
+
+    Chunks are kept as UTF-8 encoded JSON rather than parsed, as parsed events take several times the memory of
+    their JSON, which would make the bound meaningless. Chunks are never changed once written, so they can be kept
+    for as long as there's room.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._chunks: "OrderedDict[Tuple[int, str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[int, str, str]) -> Optional[bytes]:
+        with self._lock:
+            chunk_json = self._chunks.get(key)
+            if chunk_json is not None:
+                self._chunks.move_to_end(key)
+            return chunk_json
+
+    def set(self, key: Tuple[int, str, str], chunk_json: bytes) -> None:
+        if len(chunk_json) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._chunks:
+                return
+            self._chunks[key] = chunk_json
+            self.size += len(chunk_json)
+            while self.size > self.max_bytes:
+                _, evicted_json = self._chunks.popitem(last=False)
+                self.size -= len(evicted_json)
+
+
+_decompressed_chunk_cache: Optional[DecompressedChunkCache] = None
+_decompression_executor: Optional[ThreadPoolExecutor] = None
+_decompression_executor_pid: Optional[int] = None
+_decompression_lock = threading.Lock()
+
+
+def get_decompressed_chunk_cache() -> DecompressedChunkCache:
+    global _decompressed_chunk_cache
+
+    with _decompression_lock:
+        if _decompressed_chunk_cache is None:
+            _decompressed_chunk_cache = DecompressedChunkCache(settings.RECORDING_DECOMPRESSED_CHUNK_CACHE_MAX_BYTES)
+        return _decompressed_chunk_cache
+
+
+def _get_decompression_executor() -> Optional[ThreadPoolExecutor]:
+    global _decompression_executor, _decompression_executor_pid
+
+    if settings.RECORDING_DECOMPRESSION_WORKERS <= 0:
+        return None
+    # Threads don't survive forking, so each process (e.g. gunicorn worker) creates its own pool
+    with _decompression_lock:
+        if _decompression_executor is None or _decompression_executor_pid != os.getpid():
+            _decompression_executor = ThreadPoolExecutor(
+                max_workers=settings.RECORDING_DECOMPRESSION_WORKERS, thread_name_prefix="recording-decompression"
+            )
+            _decompression_executor_pid = os.getpid()
+        return _decompression_executor
+
+
+def _map_chunks(func: Callable[[List[SnapshotDataTaggedWithWindowId]], R], chunk_list: List) -> List[R]:
+    executor = _get_decompression_executor()
+    if executor is None or len(chunk_list) < 2:
+        return [func(chunks) for chunks in chunk_list]
+    return list(executor.map(func, chunk_list))
+
+
+def _decompress_chunks(
+    team_id: int, session_recording_id: str, chunks: List[SnapshotDataTaggedWithWindowId]
+) -> List[SnapshotData]:
+    cache = get_decompressed_chunk_cache()
+    cache_key = (team_id, session_recording_id, chunks[0]["snapshot_data"]["chunk_id"])
+    decompressed_json = cache.get(cache_key)
+    if decompressed_json is not None:
+        statsd.incr("session_recordings.decompressed_chunk_cache_hit")
+        return json.loads(decompressed_json)
+
+    statsd.incr("session_recordings.decompressed_chunk_cache_miss")
+    b64_compressed_data = "".join(
+        chunk["snapshot_data"]["data"] for chunk in sorted(chunks, key=lambda c: c["snapshot_data"]["chunk_index"])
+    )
+    decompressed_json = decompress(b64_compressed_data).encode("utf-8", "surrogatepass")
+    cache.set(cache_key, decompressed_json)
+    return json.loads(decompressed_json)
+
+
 def is_active_event(event: SessionRecordingEventSummary) -> bool:
     """
     Determines which rr-web events are "active" - meaning user generated
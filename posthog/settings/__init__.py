@@ -31,6 +31,7 @@ from posthog.settings.feature_flags import *
 from posthog.settings.geoip import *
 from posthog.settings.schedules import *
 from posthog.settings.sentry import *
+from posthog.settings.session_replay import *
 from posthog.settings.shell_plus import *
 from posthog.settings.service_requirements import *
 from posthog.settings.statsd import *
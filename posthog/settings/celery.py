@@ -5,10 +5,18 @@ from kombu import Exchange, Queue
 from posthog.settings.base_variables import TEST
 from posthog.settings.data_stores import REDIS_URL
 from posthog.settings.ee import EE_AVAILABLE
+from posthog.settings.utils import get_from_env
 
-# Only listen to the default queue "celery", unless overridden via the CLI
-CELERY_QUEUES = (Queue("celery", Exchange("celery"), "celery"),)
+# Insight cache refreshes get their own queue, so they can't hold up other tasks and can be given dedicated workers
+CELERY_INSIGHT_REFRESH_QUEUE = get_from_env("CELERY_INSIGHT_REFRESH_QUEUE", "insight_refresh")
+
+# Only listen to the default queues, unless overridden via the CLI (e.g. `-Q insight_refresh` for dedicated workers)
+CELERY_QUEUES = (
+    Queue("celery", Exchange("celery"), "celery"),
+    Queue(CELERY_INSIGHT_REFRESH_QUEUE, Exchange(CELERY_INSIGHT_REFRESH_QUEUE), CELERY_INSIGHT_REFRESH_QUEUE),
+)
 CELERY_DEFAULT_QUEUE = "celery"
+CELERY_ROUTES = {"posthog.celery.update_cache_task": {"queue": CELERY_INSIGHT_REFRESH_QUEUE}}
 CELERY_IMPORTS = ["ee.tasks"] if EE_AVAILABLE else []
 CELERY_BROKER_URL = REDIS_URL  # celery connects to redis
 CELERY_BEAT_MAX_LOOP_INTERVAL = 30  # sleep max 30sec before checking for new periodic events
@@ -97,6 +97,25 @@ CLICKHOUSE_ENABLE_STORAGE_POLICY = get_from_env("CLICKHOUSE_ENABLE_STORAGE_POLIC
 
 CLICKHOUSE_CONN_POOL_MIN = get_from_env("CLICKHOUSE_CONN_POOL_MIN", 20, type_cast=int)
 CLICKHOUSE_CONN_POOL_MAX = get_from_env("CLICKHOUSE_CONN_POOL_MAX", 1000, type_cast=int)
+# Separate pool for the OFFLINE workload (exports, celery tasks), so it can't exhaust connections for ONLINE queries
+CLICKHOUSE_OFFLINE_CONN_POOL_MIN = get_from_env("CLICKHOUSE_OFFLINE_CONN_POOL_MIN", 5, type_cast=int)
+CLICKHOUSE_OFFLINE_CONN_POOL_MAX = get_from_env("CLICKHOUSE_OFFLINE_CONN_POOL_MAX", 1000, type_cast=int)
+# How long to wait for a connection when a pool is exhausted before erroring
+CLICKHOUSE_CONN_POOL_ACQUIRE_TIMEOUT_SECONDS = get_from_env(
+    "CLICKHOUSE_CONN_POOL_ACQUIRE_TIMEOUT_SECONDS", 10.0, type_cast=float
+)
+# How often idle connections are pinged, and dropped if dead. 0 disables the checks.
+CLICKHOUSE_CONN_POOL_HEALTH_CHECK_INTERVAL_SECONDS = get_from_env(
+    "CLICKHOUSE_CONN_POOL_HEALTH_CHECK_INTERVAL_SECONDS", 0 if TEST else 60, type_cast=int
+)
+
+# Threads per process running insight sub-queries (series, compared periods) concurrently. 0 runs them one by one.
+# Disabled in tests, as worker threads can't see data created inside test transactions.
+INSIGHT_QUERY_EXECUTOR_MAX_WORKERS = get_from_env("INSIGHT_QUERY_EXECUTOR_MAX_WORKERS", 0 if TEST else 8, type_cast=int)
+# How many of those a single team can use at once
+INSIGHT_QUERY_EXECUTOR_MAX_WORKERS_PER_TEAM = get_from_env(
+    "INSIGHT_QUERY_EXECUTOR_MAX_WORKERS_PER_TEAM", 4, type_cast=int
+)
 
 CLICKHOUSE_STABLE_HOST = get_from_env("CLICKHOUSE_STABLE_HOST", CLICKHOUSE_HOST)
 # If enabled, some queries will use system.cluster table to query each shard
@@ -136,6 +155,12 @@ KAFKA_SASL_MECHANISM = os.getenv("KAFKA_SASL_MECHANISM", None)
 KAFKA_SASL_USER = os.getenv("KAFKA_SASL_USER", None)
 KAFKA_SASL_PASSWORD = os.getenv("KAFKA_SASL_PASSWORD", None)
 
+# Producer batching, see https://kafka-python.readthedocs.io/en/master/apidoc/KafkaProducer.html
+# kafka-python doesn't linger by default, sending each event of a capture batch in its own request. Lingering a few
+# milliseconds lets the events of a batch share requests to Kafka, at the cost of that much more produce latency.
+KAFKA_PRODUCER_LINGER_MS = get_from_env("KAFKA_PRODUCER_LINGER_MS", 5, type_cast=int)
+KAFKA_PRODUCER_BATCH_SIZE = get_from_env("KAFKA_PRODUCER_BATCH_SIZE", 16384, type_cast=int)
+
 SUFFIX = "_test" if TEST else ""
 
 KAFKA_EVENTS_PLUGIN_INGESTION: str = (
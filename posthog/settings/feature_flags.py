@@ -1,6 +1,7 @@
 import os
 
-from posthog.settings.utils import get_list
+from posthog.settings.base_variables import TEST
+from posthog.settings.utils import get_from_env, get_list, str_to_bool
 
 # These flags will be force-enabled on the frontend
 # The features here are released, but the flags are just not yet removed from the code
@@ -10,3 +11,18 @@ PERSISTED_FEATURE_FLAGS = get_list(os.getenv("PERSISTED_FEATURE_FLAGS", "")) + [
     "ingestion-warnings-enabled",
     "role-based-access",
 ]
+
+# Evaluate feature flag conditions in Python from a single fetch of the person's and groups' properties,
+# instead of one Postgres expression per condition. Falls back to Postgres for conditions that can't be
+# evaluated with identical semantics (cohorts, regexes, string comparisons, ...).
+DECIDE_LOCAL_FLAG_EVALUATION_ENABLED = get_from_env(
+    "DECIDE_LOCAL_FLAG_EVALUATION_ENABLED", False, type_cast=str_to_bool
+)
+
+# Maximum number of distinct_ids the batch /decide endpoint evaluates flags for in one request
+DECIDE_BATCH_MAX_REQUESTS = get_from_env("DECIDE_BATCH_MAX_REQUESTS", 1000, type_cast=int)
+
+# How long /decide caches which person a distinct_id belongs to, and that person's flag hash key overrides. Only used
+# for experience continuity flags. Kept short, as person merges in the plugin server can't invalidate entries.
+# 0 disables the cache.
+DECIDE_PERSON_CACHE_TTL_SECONDS = get_from_env("DECIDE_PERSON_CACHE_TTL_SECONDS", 0 if TEST else 60, type_cast=int)
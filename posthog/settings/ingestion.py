@@ -1,5 +1,6 @@
 import os
 
+from posthog.settings.base_variables import TEST
 from posthog.settings.utils import get_from_env, get_list
 from posthog.utils import str_to_bool
 
@@ -17,6 +18,18 @@ EVENT_PARTITION_KEYS_TO_OVERRIDE = get_list(os.getenv("EVENT_PARTITION_KEYS_TO_O
 LIGHTWEIGHT_CAPTURE_ENDPOINT_ENABLED_TOKENS = get_list(os.getenv("LIGHTWEIGHT_CAPTURE_ENDPOINT_ENABLED_TOKENS", ""))
 LIGHTWEIGHT_CAPTURE_ENDPOINT_ALL = "*" in LIGHTWEIGHT_CAPTURE_ENDPOINT_ENABLED_TOKENS
 
+# Decode the `batch` array of /batch and /capture payloads one event at a time and produce events to Kafka as
+# they are parsed, instead of materializing the whole batch first. Note that an invalid event halfway through a
+# batch is then only detected after the events before it have been produced.
+CAPTURE_STREAMING_BATCH_ENABLED = get_from_env("CAPTURE_STREAMING_BATCH_ENABLED", False, type_cast=str_to_bool)
+
+# Per-process cache of teams by api token in front of Redis/Postgres, used by /capture, /batch and /decide.
+# Entries are invalidated through Redis pub/sub when a team changes, the TTL bounds staleness if a message is missed.
+# Invalid tokens are cached with their own (shorter) TTL. Setting the TTL to 0 disables the cache.
+TEAM_LOCAL_CACHE_TTL_SECONDS = get_from_env("TEAM_LOCAL_CACHE_TTL_SECONDS", 0 if TEST else 30, type_cast=int)
+TEAM_LOCAL_CACHE_NEGATIVE_TTL_SECONDS = get_from_env("TEAM_LOCAL_CACHE_NEGATIVE_TTL_SECONDS", 5, type_cast=int)
+TEAM_LOCAL_CACHE_MAX_SIZE = get_from_env("TEAM_LOCAL_CACHE_MAX_SIZE", 10_000, type_cast=int)
+
 # Keep in sync with plugin-server
 EVENTS_DEAD_LETTER_QUEUE_STATSD_METRIC = "events_added_to_dead_letter_queue"
 
@@ -11,6 +11,12 @@ EVENT_PROPERTY_USAGE_INTERVAL_CRON = get_from_env(
     "ASYNC_EVENT_PROPERTY_USAGE_INTERVAL_CRON",
     "0 */6 * * *",
 )
+# Teams are split into this many shards by id, the usage of each shard being calculated in a task of its own
+EVENT_PROPERTY_USAGE_SHARDS = get_from_env("EVENT_PROPERTY_USAGE_SHARDS", 8, type_cast=int)
+# Teams with more event or property definitions than this get a task of their own, so they don't hold up their shard
+EVENT_PROPERTY_USAGE_LARGE_TAXONOMY_SIZE = get_from_env(
+    "EVENT_PROPERTY_USAGE_LARGE_TAXONOMY_SIZE", 10_000, type_cast=int
+)
 
 # Schedule to syncronize insight cache states on. Follows crontab syntax.
 SYNC_INSIGHT_CACHE_STATES_SCHEDULE = get_from_env(
@@ -23,6 +29,8 @@ SYNC_INSIGHT_CACHE_STATES_SCHEDULE = get_from_env(
 UPDATE_CACHED_DASHBOARD_ITEMS_INTERVAL_SECONDS = get_from_env(
     "UPDATE_CACHED_DASHBOARD_ITEMS_INTERVAL_SECONDS", 90, type_cast=int
 )
+# Most of the insight cache refreshes scheduled at a time that can go to one team, while other teams have some waiting
+INSIGHT_CACHE_REFRESH_TEAM_SHARE = get_from_env("INSIGHT_CACHE_REFRESH_TEAM_SHARE", 0.2, type_cast=float)
 
 COUNT_TILES_WITH_NO_FILTERS_HASH_INTERVAL_SECONDS = get_from_env(
     "COUNT_TILES_WITH_NO_FILTERS_HASH_INTERVAL_SECONDS", 1800, type_cast=int
@@ -30,6 +38,26 @@ COUNT_TILES_WITH_NO_FILTERS_HASH_INTERVAL_SECONDS = get_from_env(
 
 
 CACHED_RESULTS_TTL = 7 * 24 * 60 * 60  # how long to keep cached results for
+# Insight results larger than this (compressed) aren't cached at all
+INSIGHT_CACHE_MAX_RESULT_BYTES = get_from_env("INSIGHT_CACHE_MAX_RESULT_BYTES", 8 * 1024 * 1024, type_cast=int)
+
+# Whether insight cache refreshes only recalculate the newest intervals of trends. Only applies to trends without
+# breakdowns that filter on event properties alone, as their past intervals don't change once events are ingested.
+TRENDS_INCREMENTAL_REFRESH_ENABLED = get_from_env("TRENDS_INCREMENTAL_REFRESH_ENABLED", False, type_cast=str_to_bool)
+# Intervals that ended less than this long ago are still recalculated, as events for them may arrive late
+TRENDS_INCREMENTAL_REFRESH_LAG_SECONDS = get_from_env("TRENDS_INCREMENTAL_REFRESH_LAG_SECONDS", 60 * 60, type_cast=int)
+# How often incrementally refreshed trends are recalculated in full anyway, picking up late events and retroactive
+# changes such as person merges
+TRENDS_INCREMENTAL_FULL_REFRESH_SECONDS = get_from_env(
+    "TRENDS_INCREMENTAL_FULL_REFRESH_SECONDS", 24 * 60 * 60, type_cast=int
+)
+
+# Identical insights requested while one is being calculated wait for that calculation rather than running it again.
+# The lock expires in case whoever holds it dies, and waiters give up and calculate it themselves after the timeout.
+INSIGHT_CALCULATION_LOCK_TIMEOUT_SECONDS = get_from_env(
+    "INSIGHT_CALCULATION_LOCK_TIMEOUT_SECONDS", 10 * 60, type_cast=int
+)
+INSIGHT_CALCULATION_WAIT_TIMEOUT_SECONDS = get_from_env("INSIGHT_CALCULATION_WAIT_TIMEOUT_SECONDS", 60, type_cast=int)
 
 # Schedule to run asynchronous data deletion on. Follows crontab syntax.
 # Use empty string to prevent this
@@ -46,3 +74,6 @@ CLEAR_CLICKHOUSE_DELETED_PERSON_SCHEDULE_CRON = get_from_env(
     # Every third month 5AM UTC on 1st of the month
     "0 5 1 */3 *",
 )
+
+# How many organizations' usage reports are sent off to be captured and billed at once
+USAGE_REPORT_BATCH_SIZE = get_from_env("USAGE_REPORT_BATCH_SIZE", 100, type_cast=int)
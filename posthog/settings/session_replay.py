@@ -0,0 +1,23 @@
+from posthog.settings.utils import get_from_env
+
+# Threads per process decompressing the chunks of recordings being played back
+RECORDING_DECOMPRESSION_WORKERS = get_from_env("RECORDING_DECOMPRESSION_WORKERS", 4, type_cast=int)
+# Decompressed recording chunks are kept in memory as JSON, up to this many bytes per process, as the same
+# recordings tend to be played back repeatedly (e.g. when shared with colleagues)
+RECORDING_DECOMPRESSED_CHUNK_CACHE_MAX_BYTES = get_from_env(
+    "RECORDING_DECOMPRESSED_CHUNK_CACHE_MAX_BYTES", 32 * 1024 * 1024, type_cast=int
+)
+
+# Recordings that haven't received any events for this long have their metadata calculated and stored, so it's
+# not calculated again for every request
+RECORDING_IDLE_THRESHOLD_MINUTES = get_from_env("RECORDING_IDLE_THRESHOLD_MINUTES", 30, type_cast=int)
+RECORDING_METADATA_CALCULATION_INTERVAL_SECONDS = get_from_env(
+    "RECORDING_METADATA_CALCULATION_INTERVAL_SECONDS", 300, type_cast=int
+)
+# How far back to look for recordings that have gone idle, in case calculations fall behind
+RECORDING_METADATA_CALCULATION_LOOKBACK_HOURS = get_from_env(
+    "RECORDING_METADATA_CALCULATION_LOOKBACK_HOURS", 6, type_cast=int
+)
+RECORDING_METADATA_CALCULATION_BATCH_SIZE = get_from_env(
+    "RECORDING_METADATA_CALCULATION_BATCH_SIZE", 1000, type_cast=int
+)
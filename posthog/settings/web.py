@@ -293,3 +293,11 @@ KAFKA_PRODUCE_ACK_TIMEOUT_SECONDS = int(os.getenv("KAFKA_PRODUCE_ACK_TIMEOUT_SEC
 
 # We keep the number of buckets low to reduce resource usage on the Prometheus
 PROMETHEUS_LATENCY_BUCKETS = [0.1, 0.3, 0.9, 2.7, 8.1] + [float("inf")]
+
+# How long summaries of persons shown next to events are cached for, across requests. 0 to only reuse them within
+# a request
+PERSON_LOOKUP_CACHE_TTL_SECONDS = get_from_env("PERSON_LOOKUP_CACHE_TTL_SECONDS", 0, type_cast=int)
+
+# Most events a CSV export of events can have. Those are streamed from ClickHouse rather than paged through the API,
+# so the `max_limit` of their export context only applies when object storage is disabled
+CSV_EXPORT_MAX_EVENTS = get_from_env("CSV_EXPORT_MAX_EVENTS", 1_000_000, type_cast=int)
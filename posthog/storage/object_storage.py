@@ -1,5 +1,5 @@
 import abc
-from typing import Optional, Union
+from typing import Dict, Iterable, List, Optional, Union
 
 import structlog
 from boto3 import client
@@ -9,6 +9,9 @@ from sentry_sdk import capture_exception
 
 logger = structlog.get_logger(__name__)
 
+# Content written as a stream is uploaded in parts of this size. S3 requires all but the last part to be at least 5MB
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
 
 class ObjectStorageError(Exception):
     pass
@@ -33,6 +36,10 @@ class ObjectStorageClient(metaclass=abc.ABCMeta):
     def write(self, bucket: str, key: str, content: Union[str, bytes]) -> None:
         pass
 
+    @abc.abstractmethod
+    def write_stream(self, bucket: str, key: str, chunks: Iterable[bytes]) -> None:
+        pass
+
 
 class UnavailableStorage(ObjectStorageClient):
     def head_bucket(self, bucket: str):
@@ -47,6 +54,9 @@ class UnavailableStorage(ObjectStorageClient):
     def write(self, bucket: str, key: str, content: Union[str, bytes]) -> None:
         pass
 
+    def write_stream(self, bucket: str, key: str, chunks: Iterable[bytes]) -> None:
+        pass
+
 
 class ObjectStorage(ObjectStorageClient):
     def __init__(self, aws_client) -> None:
@@ -85,6 +95,45 @@ class ObjectStorage(ObjectStorageClient):
             capture_exception(e)
             raise ObjectStorageError("write failed") from e
 
+    def write_stream(self, bucket: str, key: str, chunks: Iterable[bytes]) -> None:
+        """
+        Writes content as it's produced by `chunks` with a multipart upload, so that only one part of it has to be
+        held in memory at a time. The upload is aborted if `chunks` or the upload fails, leaving nothing behind.
+        """
+        upload_id = None
+        try:
+            upload_id = self.aws_client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+            parts: List[Dict] = []
+
+            def upload_part(content: bytes) -> None:
+                part_number = len(parts) + 1
+                s3_response = self.aws_client.upload_part(
+                    Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=content
+                )
+                parts.append({"PartNumber": part_number, "ETag": s3_response["ETag"]})
+
+            buffer = bytearray()
+            for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= MULTIPART_PART_SIZE:
+                    upload_part(bytes(buffer))
+                    buffer.clear()
+            if buffer or not parts:
+                upload_part(bytes(buffer))
+
+            self.aws_client.complete_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except Exception as e:
+            logger.error("object_storage.write_stream_failed", bucket=bucket, file_name=key, error=e)
+            capture_exception(e)
+            if upload_id is not None:
+                try:
+                    self.aws_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+                except Exception as abort_error:
+                    logger.error("object_storage.abort_upload_failed", bucket=bucket, file_name=key, error=abort_error)
+            raise ObjectStorageError("write failed") from e
+
 
 _client: ObjectStorageClient = UnavailableStorage()
 
@@ -113,6 +162,10 @@ def write(file_name: str, content: Union[str, bytes]) -> None:
     return object_storage_client().write(bucket=settings.OBJECT_STORAGE_BUCKET, key=file_name, content=content)
 
 
+def write_stream(file_name: str, chunks: Iterable[bytes]) -> None:
+    return object_storage_client().write_stream(bucket=settings.OBJECT_STORAGE_BUCKET, key=file_name, chunks=chunks)
+
+
 def read(file_name: str) -> Optional[str]:
     return object_storage_client().read(bucket=settings.OBJECT_STORAGE_BUCKET, key=file_name)
 
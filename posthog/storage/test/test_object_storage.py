@@ -10,7 +10,7 @@ from posthog.settings import (
     OBJECT_STORAGE_ENDPOINT,
     OBJECT_STORAGE_SECRET_ACCESS_KEY,
 )
-from posthog.storage.object_storage import health_check, read, write
+from posthog.storage.object_storage import ObjectStorageError, health_check, read, write, write_stream
 from posthog.test.base import APIBaseTest
 
 TEST_BUCKET = "test_storage_bucket"
@@ -52,3 +52,21 @@ class TestStorage(APIBaseTest):
             file_name = f"{TEST_BUCKET}/test_write_and_read_works_with_known_content/{name}"
             write(file_name, "my content".encode("utf-8"))
             self.assertEqual(read(file_name), "my content")
+
+    def test_write_stream_writes_all_chunks(self) -> None:
+        with self.settings(OBJECT_STORAGE_ENABLED=True):
+            file_name = f"{TEST_BUCKET}/test_write_stream_writes_all_chunks/{uuid.uuid4()}"
+            write_stream(file_name, (f"chunk {index}\n".encode("utf-8") for index in range(3)))
+            self.assertEqual(read(file_name), "chunk 0\nchunk 1\nchunk 2\n")
+
+    def test_write_stream_leaves_nothing_behind_when_chunks_fail(self) -> None:
+        def failing_chunks():
+            yield b"some content"
+            raise ValueError("no more content")
+
+        with self.settings(OBJECT_STORAGE_ENABLED=True):
+            file_name = f"{TEST_BUCKET}/test_write_stream_leaves_nothing_behind_when_chunks_fail/{uuid.uuid4()}"
+            with self.assertRaises(ObjectStorageError):
+                write_stream(file_name, failing_chunks())
+            with self.assertRaises(ObjectStorageError):
+                read(file_name)
@@ -1,14 +1,19 @@
 import json
 import time
-from collections import Counter
-from datetime import datetime
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
 from typing import Counter as TCounter
 from typing import Dict, List, Optional, Set, Tuple
 
+import pytz
 import structlog
+from celery import group
+from django.conf import settings
+from django.db.models import Count
 from django.utils import timezone
 from statshog.defaults.django import statsd
 
+from posthog.celery import app
 from posthog.logging.timing import timed
 from posthog.models import EventDefinition, EventProperty, Insight, PropertyDefinition, Team
 from posthog.models.filters.filter import Filter
@@ -21,6 +26,11 @@ logger = structlog.get_logger(__name__)
 
 
 CALCULATED_PROPERTIES_FOR_TEAMS_KEY = "CALCULATED_PROPERTIES_FOR_TEAMS_KEY"
+# How many teams of a shard to read event volumes of at once
+TEAM_BATCH_SIZE = 500
+
+# Volume and when last seen, by event name
+EventsVolume = Dict[str, Tuple[int, datetime]]
 
 
 class CountFromZero:
@@ -45,14 +55,59 @@ class CountFromZero:
 
 @timed("calculate_event_property_usage")
 def calculate_event_property_usage() -> None:
+    """
+    Brings the daily event volumes up to date, then calculates usage for all teams in `EVENT_PROPERTY_USAGE_SHARDS`
+    parallel tasks, each taking the teams whose id falls into its shard.
+    """
+    update_daily_event_volumes()
+
+    shard_count = settings.EVENT_PROPERTY_USAGE_SHARDS
+    group(calculate_event_property_usage_for_shard.s(shard, shard_count) for shard in range(shard_count)).apply_async()
+
+
+@app.task(ignore_result=True)
+def calculate_event_property_usage_for_shard(shard: int, shard_count: int) -> None:
+    """
+    Calculates usage for teams of the shard that haven't had it calculated in the last day, a batch at a time.
+
+    Teams with more definitions than `EVENT_PROPERTY_USAGE_LARGE_TAXONOMY_SIZE` are calculated in tasks of their own,
+    so that they don't hold up the rest of the shard.
+    """
     teams_to_exclude = recently_calculated_teams(now_in_seconds_since_epoch=time.time())
+    team_ids = [
+        team_id
+        for team_id in Team.objects.order_by("id").values_list("id", flat=True)
+        if team_id % shard_count == shard and team_id not in teams_to_exclude
+    ]
+    since = _get_volume_since()
 
-    for team_id in Team.objects.values_list("id", flat=True):
-        if team_id not in teams_to_exclude:
-            calculate_event_property_usage_for_team(team_id=team_id)
+    for batch_start in range(0, len(team_ids), TEAM_BATCH_SIZE):
+        batch = team_ids[batch_start : batch_start + TEAM_BATCH_SIZE]
+        large_team_ids = _get_teams_with_large_taxonomies(batch)
+        for team_id in large_team_ids:
+            calculate_event_property_usage_for_large_team.delay(team_id)
+
+        events_volumes = _get_events_volume_for_teams(
+            [team_id for team_id in batch if team_id not in large_team_ids], since
+        )
+        for team_id in batch:
+            if team_id in large_team_ids:
+                continue
+            try:
+                calculate_event_property_usage_for_team(team_id=team_id, events_volume=events_volumes.get(team_id, {}))
+            except Exception:
+                # Already logged, and one team failing shouldn't keep the rest of the shard from being calculated
+                continue
             get_client().zadd(name=CALCULATED_PROPERTIES_FOR_TEAMS_KEY, mapping={str(team_id): time.time()})
 
 
+@app.task(ignore_result=True)
+def calculate_event_property_usage_for_large_team(team_id: int) -> None:
+    events_volume = _get_events_volume_for_teams([team_id], _get_volume_since()).get(team_id, {})
+    calculate_event_property_usage_for_team(team_id=team_id, events_volume=events_volume)
+    get_client().zadd(name=CALCULATED_PROPERTIES_FOR_TEAMS_KEY, mapping={str(team_id): time.time()})
+
+
 def recently_calculated_teams(now_in_seconds_since_epoch: float) -> Set[int]:
     """
     Each time a team has properties calculated it is added to the sorted set with the seconds since epoch as its score.
@@ -72,13 +127,42 @@ def recently_calculated_teams(now_in_seconds_since_epoch: float) -> Set[int]:
     }
 
 
+@timed("calculate_event_property_usage.update_daily_event_volumes")
+def update_daily_event_volumes() -> None:
+    """
+    Counts events of all teams into the daily volumes, one day and one query at a time.
+
+    Only days since the latest day already counted are read from the events table, that latest day being read again as
+    it was most likely still in progress when counted. Days before that are only ever counted once, so events ingested
+    with timestamps that far back aren't reflected in volumes.
+    """
+    from posthog.client import sync_execute
+    from posthog.models.event.sql import GET_LATEST_EVENT_VOLUME_DAY, INSERT_EVENT_VOLUME_DAILY
+
+    today = timezone.now().date()
+    latest_day = sync_execute(GET_LATEST_EVENT_VOLUME_DAY)[0][0]
+    day = min(max(latest_day, _get_volume_since()), today)
+    while day <= today:
+        day_start = datetime.combine(day, datetime.min.time(), tzinfo=pytz.utc)
+        sync_execute(
+            INSERT_EVENT_VOLUME_DAILY,
+            {"day": day, "day_start": day_start, "day_end": day_start + timedelta(days=1)},
+            settings={"max_execution_time": 60 * 60},
+        )
+        day += timedelta(days=1)
+
+
 @timed("calculate_event_property_usage_for_team")
-def calculate_event_property_usage_for_team(team_id: int, *, complete_inference: bool = False) -> None:
+def calculate_event_property_usage_for_team(
+    team_id: int, *, complete_inference: bool = False, events_volume: Optional[EventsVolume] = None
+) -> None:
     """Calculate Data Management stats for a specific team.
 
     The complete_inference flag enables much more extensive inference of event/actor taxonomy based on ClickHouse data.
     This is not needed in production - where the plugin server is responsible for this - but in the demo environment
-    data comes preloaded, necessitating complete inference."""
+    data comes preloaded, necessitating complete inference.
+
+    Event volumes are read from the events table, unless already read from the daily volumes and passed in."""
 
     try:
         count_from_zero = CountFromZero()
@@ -87,17 +171,17 @@ def calculate_event_property_usage_for_team(team_id: int, *, complete_inference:
         altered_events: Set[str] = set()
         altered_properties: Set[str] = set()
 
-        event_definitions: Dict[str, EventDefinition] = {
-            known_event.name: known_event for known_event in EventDefinition.objects.filter(team_id=team_id)
-        }
+        since = timezone.now() - timezone.timedelta(days=30)
 
-        property_definitions: Dict[str, PropertyDefinition] = {
-            known_property.name: known_property
-            for known_property in PropertyDefinition.objects.filter(team_id=team_id, type=PropertyDefinition.Type.EVENT)
-        }
+        insight_series_events, counted_properties = _get_insight_query_usage(team_id, since)
+        if events_volume is None:
+            events_volume = _get_events_volume(team_id, since)
 
-        since = timezone.now() - timezone.timedelta(days=30)
+        # Only definitions that are used or have been seen are loaded, rather than the whole taxonomy of the team
+        event_names = set(insight_series_events) | set(events_volume)
+        property_names = {property_name for property_name, _, _ in counted_properties}
 
+        property_types: Dict[str, Optional[PropertyType]] = {}
         if complete_inference:
             # Infer (event, property) pairs
             event_properties = _get_event_properties(team_id, since)
@@ -108,26 +192,40 @@ def calculate_event_property_usage_for_team(team_id: int, *, complete_inference:
                 ],
                 ignore_conflicts=True,
             )
+            EventDefinition.objects.bulk_create(
+                [EventDefinition(team_id=team_id, name=event) for event in {event for event, _ in event_properties}],
+                ignore_conflicts=True,
+            )
+            event_names.update(event for event, _ in event_properties)
 
-            for event, _ in event_properties:
-                if event not in event_definitions:
-                    event_definitions[event] = EventDefinition.objects.create(team_id=team_id, name=event)
-
-            # Infer property types
             property_types = _get_property_types(team_id, since)
-            for property_key, property_type in property_types.items():
-                if property_key not in property_definitions:
-                    property_definitions[property_key] = PropertyDefinition.objects.create(
-                        team_id=team_id, name=property_key
-                    )
-                if property_definitions[property_key].property_type is not None:
-                    continue  # Don't override property type if it's already set
-
-                property_definitions[property_key].property_type = property_type
-                property_definitions[property_key].is_numerical = property_type == PropertyType.Numeric
-                altered_properties.add(property_key)
+            PropertyDefinition.objects.bulk_create(
+                [PropertyDefinition(team_id=team_id, name=property_key) for property_key in property_types],
+                ignore_conflicts=True,
+            )
+            property_names.update(property_types)
 
-        insight_series_events, counted_properties = _get_insight_query_usage(team_id, since)
+        event_definitions: Dict[str, EventDefinition] = {
+            known_event.name: known_event
+            for known_event in EventDefinition.objects.filter(team_id=team_id, name__in=event_names)
+        }
+
+        property_definitions: Dict[str, PropertyDefinition] = {
+            known_property.name: known_property
+            for known_property in PropertyDefinition.objects.filter(
+                team_id=team_id, type=PropertyDefinition.Type.EVENT, name__in=property_names
+            )
+        }
+
+        # Infer property types
+        for property_key, property_type in property_types.items():
+            property_definition = property_definitions.get(property_key)
+            if property_definition is None or property_definition.property_type is not None:
+                continue  # Don't override property type if it's already set
+
+            property_definition.property_type = property_type
+            property_definition.is_numerical = property_type == PropertyType.Numeric
+            altered_properties.add(property_key)
 
         for series_event in insight_series_events:
             if series_event not in event_definitions:
@@ -156,7 +254,6 @@ def calculate_event_property_usage_for_team(team_id: int, *, complete_inference:
                 property_definition, count_for_property
             )
 
-        events_volume = _get_events_volume(team_id, since)
         for event, (volume, last_seen_at) in events_volume.items():
             if event not in event_definitions:
                 logger.info(
@@ -208,7 +305,7 @@ def calculate_event_property_usage_for_team(team_id: int, *, complete_inference:
         raise exc
 
 
-def _get_events_volume(team_id: int, since: timezone.datetime) -> Dict[str, Tuple[int, timezone.datetime]]:
+def _get_events_volume(team_id: int, since: timezone.datetime) -> EventsVolume:
     from posthog.client import sync_execute
     from posthog.models.event.sql import GET_EVENTS_VOLUME
 
@@ -218,6 +315,39 @@ def _get_events_volume(team_id: int, since: timezone.datetime) -> Dict[str, Tupl
     }
 
 
+def _get_events_volume_for_teams(team_ids: List[int], since: date) -> Dict[int, EventsVolume]:
+    "Sums up daily volumes of the teams' events since the given day."
+    from posthog.client import sync_execute
+    from posthog.models.event.sql import GET_EVENTS_VOLUME_FOR_TEAMS
+
+    if not team_ids:
+        return {}
+
+    events_volumes: Dict[int, EventsVolume] = defaultdict(dict)
+    for team_id, event, volume, last_seen_at in sync_execute(
+        GET_EVENTS_VOLUME_FOR_TEAMS, {"team_ids": team_ids, "since": since}
+    ):
+        events_volumes[team_id][event] = (volume, last_seen_at)
+    return events_volumes
+
+
+def _get_volume_since() -> date:
+    return (timezone.now() - timezone.timedelta(days=30)).date()
+
+
+def _get_teams_with_large_taxonomies(team_ids: List[int]) -> Set[int]:
+    large_team_ids: Set[int] = set()
+    for model in (EventDefinition, PropertyDefinition):
+        large_team_ids.update(
+            model.objects.filter(team_id__in=team_ids)
+            .values("team_id")
+            .annotate(definition_count=Count("id"))
+            .filter(definition_count__gt=settings.EVENT_PROPERTY_USAGE_LARGE_TAXONOMY_SIZE)
+            .values_list("team_id", flat=True)
+        )
+    return large_team_ids
+
+
 def _infer_property_type(sample_json_value: str) -> Optional[PropertyType]:
     """Parse the provided sample value as JSON and return its property type."""
     parsed_value = json.loads(sample_json_value)
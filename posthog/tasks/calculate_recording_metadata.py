@@ -0,0 +1,77 @@
+from datetime import timedelta
+from typing import List, Tuple
+
+import structlog
+from django.conf import settings
+from django.utils import timezone
+from sentry_sdk import capture_exception
+from statshog.defaults.django import statsd
+
+from posthog.client import sync_execute
+from posthog.models import Team
+from posthog.models.session_recording_event.sql import GET_IDLE_SESSION_RECORDINGS_WITHOUT_METADATA_SQL
+from posthog.queries.session_recordings.session_recording_events import (
+    SessionRecordingEvents,
+    failed_recording_metadata_row,
+    recording_metadata_to_row,
+    store_recording_metadata,
+)
+
+logger = structlog.get_logger(__name__)
+
+INSERT_BATCH_SIZE = 100
+
+
+def calculate_idle_recordings_metadata() -> int:
+    """
+    Calculates and stores the metadata of recordings that have gone idle, i.e. haven't received any events for
+    `RECORDING_IDLE_THRESHOLD_MINUTES`. Returns how many recordings' metadata was stored.
+
+    Recordings whose metadata can't be calculated are marked as failed, so they don't hold up newer ones.
+    """
+    now = timezone.now()
+    idle_before = now - timedelta(minutes=settings.RECORDING_IDLE_THRESHOLD_MINUTES)
+    idle_recordings = sync_execute(
+        GET_IDLE_SESSION_RECORDINGS_WITHOUT_METADATA_SQL,
+        {
+            "idle_before": idle_before,
+            "idle_since": idle_before - timedelta(hours=settings.RECORDING_METADATA_CALCULATION_LOOKBACK_HOURS),
+            "limit": settings.RECORDING_METADATA_CALCULATION_BATCH_SIZE,
+        },
+    )
+    teams = Team.objects.in_bulk({team_id for team_id, _, _ in idle_recordings})
+
+    rows: List[Tuple] = []
+    stored = 0
+    failed = 0
+    for team_id, session_id, last_event_timestamp in idle_recordings:
+        team = teams.get(team_id)
+        if team is None:
+            continue
+
+        try:
+            metadata = SessionRecordingEvents(session_recording_id=session_id, team=team).calculate_metadata()
+        except Exception as e:
+            logger.error("calculate_recording_metadata_failed", team_id=team_id, session_id=session_id, exc_info=True)
+            capture_exception(e)
+            metadata = None
+
+        if metadata is None:
+            rows.append(failed_recording_metadata_row(team_id, session_id, last_event_timestamp, now))
+            failed += 1
+        else:
+            rows.append(recording_metadata_to_row(team_id, session_id, metadata, last_event_timestamp, now))
+            stored += 1
+
+        if len(rows) >= INSERT_BATCH_SIZE:
+            store_recording_metadata(rows)
+            rows = []
+
+    store_recording_metadata(rows)
+
+    statsd.incr("session_recordings.metadata_calculated", stored)
+    statsd.incr("session_recordings.metadata_calculation_failed", failed)
+    logger.info(
+        "calculate_idle_recordings_metadata", idle_recordings=len(idle_recordings), stored=stored, failed=failed
+    )
+    return stored
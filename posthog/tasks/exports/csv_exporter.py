@@ -1,18 +1,30 @@
+import csv
 import datetime
-from typing import Any, Dict, List, Optional, Tuple
+import io
+import json
+import re
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import parse_qsl, quote, urlencode, urlparse, urlunparse
 
 import requests
 import structlog
+from django.conf import settings
+from more_itertools import chunked
 from sentry_sdk import capture_exception, push_scope
 from statshog.defaults.django import statsd
 
+from posthog.clickhouse.client.execute import StreamProgress
 from posthog.jwt import PosthogJwtAudience, encode_jwt
 from posthog.logging.timing import timed
-from posthog.models.exported_asset import ExportedAsset, save_content
+from posthog.models.event.query_event_list import stream_events_list
+from posthog.models.event.util import ClickhouseEventSerializer
+from posthog.models.exported_asset import ExportedAsset, save_content, save_content_stream
+from posthog.models.filters.filter import Filter
+from posthog.models.person.lookup import PersonLookup
 from posthog.utils import absolute_uri
 
-from .ordered_csv_renderer import OrderedCsvRenderer
+from .ordered_csv_renderer import OrderedCsvRenderer, order_header
 
 logger = structlog.get_logger(__name__)
 
@@ -40,6 +52,17 @@ logger = structlog.get_logger(__name__)
 # 3. We save the response to a chunk in object storage and then load the `next` page of results
 # 4. Repeat until exhausted or limit reached
 # 5. We save the final blob output and update the ExportedAsset
+#
+# Except for events, which can be exported by the million:
+# 1. We run the query of the events API in-process, streaming events from ClickHouse block by block
+# 2. We resolve their persons and serialize them like the API a batch at a time
+# 3. We write them out as CSV to object storage with a multipart upload as we go, reporting progress on the asset
+
+EVENTS_LIST_PATH = re.compile(r"^/?api/(projects/[^/]+/events|event)/?$")
+# How many events to resolve persons of at once
+EVENTS_BATCH_SIZE = 10_000
+# How much CSV to write out at once
+CSV_CHUNK_SIZE = 1024 * 1024
 
 
 def add_query_params(url: str, params: Dict[str, str]) -> str:
@@ -210,7 +233,7 @@ def _export_to_csv(exported_asset: ExportedAsset, limit: int = 1000, max_limit:
 
         csv_rows = _convert_response_to_csv_data(data)
 
-        all_csv_rows = all_csv_rows + csv_rows
+        all_csv_rows.extend(csv_rows)
 
         if not data.get("next") or not csv_rows:
             break
@@ -234,6 +257,84 @@ def _export_to_csv(exported_asset: ExportedAsset, limit: int = 1000, max_limit:
     save_content(exported_asset, rendered_csv_content)
 
 
+def _export_events_to_csv(exported_asset: ExportedAsset, max_limit: int) -> None:
+    """
+    Exports events straight from ClickHouse at constant memory, however many there are.
+
+    Without columns given, all columns the events have are exported. Those are only known once all events have been
+    read, so events are spooled to a temporary file before any CSV is written.
+
+    Without object storage the CSV ends up in the asset's content, held in memory whole, so at most `max_limit`
+    events are exported then.
+    """
+    resource = exported_asset.export_context
+    columns: List[str] = resource.get("columns", [])
+    team = exported_asset.team
+
+    query_dict = dict(parse_qsl(urlparse(resource["path"]).query, keep_blank_values=True))
+    # The API's pagination doesn't apply, as all events are read at once
+    query_dict.pop("limit", None)
+    query_dict.pop("offset", None)
+    order_by = list(json.loads(query_dict["orderBy"])) if query_dict.get("orderBy") else ["-timestamp"]
+    limit = settings.CSV_EXPORT_MAX_EVENTS
+    if not settings.OBJECT_STORAGE_ENABLED:
+        limit = min(limit, max_limit)
+
+    def report_progress(progress: StreamProgress) -> None:
+        completion = None
+        if progress.total_rows_approx:
+            completion = min(progress.rows_read / progress.total_rows_approx, 1.0)
+        exported_asset.export_progress = {"rows_exported": progress.rows_streamed, "completion": completion}
+        exported_asset.save(update_fields=["export_progress"])
+
+    events = stream_events_list(
+        filter=Filter(data=query_dict, team=team),
+        team=team,
+        request_get_query_dict=query_dict,
+        order_by=order_by,
+        action_id=query_dict.get("action_id"),
+        limit=limit,
+        on_progress=report_progress,
+    )
+    rows = _serialize_events(events, team.pk)
+
+    if columns:
+        save_content_stream(exported_asset, _render_csv(rows, columns))
+    else:
+        with tempfile.TemporaryFile() as spool:
+            keys: Dict[str, None] = {}
+            for row in rows:
+                keys.update(dict.fromkeys(row))
+                spool.write(json.dumps(row).encode("utf-8") + b"\n")
+            spool.seek(0)
+            save_content_stream(exported_asset, _render_csv((json.loads(line) for line in spool), order_header(keys)))
+
+    exported_asset.export_progress = {**(exported_asset.export_progress or {"rows_exported": 0}), "completion": 1.0}
+    exported_asset.save(update_fields=["export_progress"])
+
+
+def _serialize_events(events: Iterable[Dict[str, Any]], team_id: int) -> Iterator[Dict[str, Any]]:
+    "Serializes events like the events API does, flattened into CSV columns."
+    renderer = OrderedCsvRenderer()
+    for batch in chunked(events, EVENTS_BATCH_SIZE):
+        people = PersonLookup(team_id).get_persons(event["distinct_id"] for event in batch)
+        for event in ClickhouseEventSerializer(batch, many=True, context={"people": people}).data:
+            yield renderer.flatten_item(event)
+
+
+def _render_csv(rows: Iterable[Dict[str, Any]], header: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([row.get(key) for key in header])
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
 def make_api_call(
     access_token: str, body: Any, limit: int, method: str, next_url: Optional[str], path: str
 ) -> requests.models.Response:
@@ -264,7 +365,10 @@ def export_csv(exported_asset: ExportedAsset, limit: Optional[int] = None, max_l
 
     try:
         if exported_asset.export_format == "text/csv":
-            _export_to_csv(exported_asset, limit, max_limit)
+            if EVENTS_LIST_PATH.match(urlparse(exported_asset.export_context["path"]).path):
+                _export_events_to_csv(exported_asset, max_limit)
+            else:
+                _export_to_csv(exported_asset, limit, max_limit)
             statsd.incr("csv_exporter.succeeded", tags={"team_id": exported_asset.team.id})
         else:
             statsd.incr("csv_exporter.unknown_asset", tags={"team_id": exported_asset.team.id})
@@ -1,5 +1,5 @@
 from collections import OrderedDict
-from typing import Any, Dict, Generator
+from typing import Any, Dict, Generator, Iterable, List
 
 from more_itertools import unique_everseen
 from rest_framework_csv.renderers import CSVRenderer
@@ -30,21 +30,7 @@ class OrderedCsvRenderer(
                 for item in data:
                     headers.extend(item.keys())
 
-                unique_fields = list(unique_everseen(headers))
-
-                ordered_fields: Dict[str, Any] = OrderedDict()
-                for item in unique_fields:
-                    field = item.split(".")
-                    field = field[0]
-                    if field in ordered_fields:
-                        ordered_fields[field].append(item)
-                    else:
-                        ordered_fields[field] = [item]
-
-                header = []
-                for fields in ordered_fields.values():
-                    for field in fields:
-                        header.append(field)
+                header = order_header(headers)
 
             # Return your "table", with the headers as the first row.
             if labels:
@@ -60,3 +46,26 @@ class OrderedCsvRenderer(
 
         else:
             return []
+
+
+def order_header(headers: Iterable[str]) -> List[str]:
+    """
+    Orders the flattened keys of items into a header, keeping keys nested under the same field together in the
+    order the fields were first seen.
+    """
+    unique_fields = list(unique_everseen(headers))
+
+    ordered_fields: Dict[str, Any] = OrderedDict()
+    for item in unique_fields:
+        field = item.split(".")
+        field = field[0]
+        if field in ordered_fields:
+            ordered_fields[field].append(item)
+        else:
+            ordered_fields[field] = [item]
+
+    header = []
+    for fields in ordered_fields.values():
+        for field in fields:
+            header.append(field)
+    return header
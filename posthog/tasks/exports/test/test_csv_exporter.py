@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
@@ -17,7 +17,7 @@ from posthog.storage import object_storage
 from posthog.storage.object_storage import ObjectStorageError
 from posthog.tasks.exports import csv_exporter
 from posthog.tasks.exports.csv_exporter import UnexpectedEmptyJsonResponse, add_query_params
-from posthog.test.base import APIBaseTest
+from posthog.test.base import APIBaseTest, ClickhouseTestMixin, _create_event, _create_person
 from posthog.utils import absolute_uri
 
 TEST_BUCKET = "Test-Exports"
@@ -260,3 +260,92 @@ class TestCSVExporter(APIBaseTest):
         first_split_parts = url.split("?")
         assert len(first_split_parts) == 2
         return {bits[0]: bits[1] for bits in [param.split("=") for param in first_split_parts[1].split("&")]}
+
+
+class TestCSVEventsExporter(ClickhouseTestMixin, APIBaseTest):
+    def setUp(self):
+        super().setUp()
+        _create_person(team=self.team, distinct_ids=["user1"], properties={"email": "user1@posthog.com"})
+        _create_event(
+            team=self.team,
+            event="$pageview",
+            distinct_id="user1",
+            properties={"$browser": "Safari"},
+            timestamp="2022-07-06T19:37:43Z",
+        )
+        _create_event(
+            team=self.team,
+            event="$pageview",
+            distinct_id="user2",
+            properties={"$browser": "Chrome", "$os": "Mac OS X"},
+            timestamp="2022-07-06T19:37:44Z",
+        )
+        _create_event(
+            team=self.team, event="signed_up", distinct_id="user1", properties={}, timestamp="2022-07-06T19:37:45Z"
+        )
+
+    def _create_asset(self, columns: Optional[List[str]] = None, max_limit: int = 10) -> ExportedAsset:
+        asset = ExportedAsset(
+            team=self.team,
+            export_format=ExportedAsset.ExportFormat.CSV,
+            export_context={
+                "path": f"/api/projects/{self.team.id}/events?event=%24pageview&limit=1&after=2022-07-01",
+                "max_limit": max_limit,
+                **({"columns": columns} if columns else {}),
+            },
+        )
+        asset.save()
+        return asset
+
+    @patch("posthog.tasks.exports.csv_exporter.requests.request")
+    def test_exports_events_without_calling_the_api(self, patched_request) -> None:
+        exported_asset = self._create_asset(["distinct_id", "event", "properties.$browser", "person.properties.email"])
+
+        with self.settings(OBJECT_STORAGE_ENABLED=False):
+            csv_exporter.export_csv(exported_asset)
+
+        patched_request.assert_not_called()
+        assert (
+            exported_asset.content
+            == b"distinct_id,event,properties.$browser,person.properties.email\r\nuser2,$pageview,Chrome,\r\nuser1,$pageview,Safari,user1@posthog.com\r\n"
+        )
+        assert exported_asset.export_progress == {"rows_exported": 2, "completion": 1.0}
+
+    def test_exports_all_columns_of_events_when_none_are_given(self) -> None:
+        exported_asset = self._create_asset()
+
+        with self.settings(OBJECT_STORAGE_ENABLED=False):
+            csv_exporter.export_csv(exported_asset)
+
+        header, *rows = exported_asset.content.decode("utf-8").splitlines()
+        assert header == (
+            "id,distinct_id,properties.$browser,properties.$os,event,timestamp,"
+            "person,person.is_identified,person.distinct_ids.0,person.properties.email,elements_chain"
+        )
+        assert len(rows) == 2
+
+    def test_caps_events_at_max_limit_when_object_storage_is_disabled(self) -> None:
+        exported_asset = self._create_asset(["distinct_id"], max_limit=1)
+
+        with self.settings(OBJECT_STORAGE_ENABLED=False):
+            csv_exporter.export_csv(exported_asset, max_limit=1)
+
+        assert exported_asset.content == b"distinct_id\r\nuser2\r\n"
+
+    @patch("posthog.models.exported_asset.UUIDT")
+    def test_streams_events_to_object_storage(self, mocked_uuidt) -> None:
+        exported_asset = self._create_asset(["distinct_id", "properties.$os"], max_limit=1)
+        mocked_uuidt.return_value = "a-guid"
+
+        with self.settings(OBJECT_STORAGE_ENABLED=True, OBJECT_STORAGE_EXPORTS_FOLDER=TEST_BUCKET):
+            csv_exporter.export_csv(exported_asset, max_limit=1)
+
+            assert (
+                exported_asset.content_location
+                == f"/{TEST_BUCKET}/csv/team-{self.team.id}/task-{exported_asset.id}/a-guid"
+            )
+            assert (
+                object_storage.read(exported_asset.content_location)
+                == "distinct_id,properties.$os\r\nuser2,Mac OS X\r\nuser1,\r\n"
+            )
+            assert exported_asset.content is None
@@ -1,14 +1,17 @@
 import random
 from datetime import timedelta
 from typing import Dict, List
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import MagicMock, patch
 
 from django.test.utils import CaptureQueriesContext
 from freezegun import freeze_time
 
+from posthog.client import sync_execute
 from posthog.models import EventDefinition, EventProperty, Insight, Organization, PropertyDefinition, Team
+from posthog.models.event.sql import TRUNCATE_EVENT_VOLUME_DAILY_TABLE_SQL
 from posthog.tasks.calculate_event_property_usage import (
     calculate_event_property_usage,
+    calculate_event_property_usage_for_shard,
     calculate_event_property_usage_for_team,
 )
 from posthog.test.base import BaseTest, ClickhouseTestMixin
@@ -92,14 +95,14 @@ class TestCalculateEventPropertyUsage(ClickhouseTestMixin, BaseTest):
         team = Team.objects.create(organization=org)
         team_two = Team.objects.create(organization=org)
 
+        def calculated_team_ids() -> List[int]:
+            return [call.kwargs["team_id"] for call in patched_calculate_for_team.call_args_list]
+
         with freeze_time("12th December 2006 13:45") as frozen_datetime:
             calculate_event_property_usage()
 
             # mock will have had three calls, one for the autocreated team from the test class, one for `team`, and one for `team_two`
-            self.assertCountEqual(
-                patched_calculate_for_team.call_args_list,
-                [call(team_id=self.team.id), call(team_id=team.id), call(team_id=team_two.id)],
-            )
+            self.assertCountEqual(calculated_team_ids(), [self.team.id, team.id, team_two.id])
             patched_calculate_for_team.reset_mock()
 
             team_created_after_first_run = Team.objects.create(organization=org)
@@ -107,37 +110,77 @@ class TestCalculateEventPropertyUsage(ClickhouseTestMixin, BaseTest):
             calculate_event_property_usage()  # new team isn't in recency check and will run
 
             # mock will only have had one call, for `team_created_after_first_run`
-            self.assertCountEqual(
-                patched_calculate_for_team.call_args_list, [call(team_id=team_created_after_first_run.id)]
-            )
+            self.assertCountEqual(calculated_team_ids(), [team_created_after_first_run.id])
             patched_calculate_for_team.reset_mock()
 
             frozen_datetime.tick(delta=timedelta(days=1, minutes=1))
 
             calculate_event_property_usage()  # a day has passed all teams will run
             self.assertCountEqual(
-                patched_calculate_for_team.call_args_list,
-                [
-                    call(team_id=self.team.id),
-                    call(team_id=team.id),
-                    call(team_id=team_two.id),
-                    call(team_id=team_created_after_first_run.id),
-                ],
+                calculated_team_ids(), [self.team.id, team.id, team_two.id, team_created_after_first_run.id]
             )
 
+    @patch("posthog.tasks.calculate_event_property_usage.calculate_event_property_usage_for_team")
+    def test_teams_are_split_between_shards(self, patched_calculate_for_team: MagicMock) -> None:
+        teams = [Team.objects.create(organization=self.organization) for _ in range(3)]
+
+        calculate_event_property_usage_for_shard(teams[1].pk % 2, 2)
+
+        calculated_team_ids = {call.kwargs["team_id"] for call in patched_calculate_for_team.call_args_list}
+        self.assertIn(teams[1].pk, calculated_team_ids)
+        self.assertNotIn(teams[0].pk, calculated_team_ids)
+        self.assertNotIn(teams[2].pk, calculated_team_ids)
+
+    @patch("posthog.tasks.calculate_event_property_usage.calculate_event_property_usage_for_large_team")
+    def test_teams_with_large_taxonomies_get_tasks_of_their_own(
+        self, patched_calculate_for_large_team: MagicMock
+    ) -> None:
+        EventDefinition.objects.create(team=self.team, name="$pageview")
+        EventDefinition.objects.create(team=self.team, name="$pageleave")
+
+        with self.settings(EVENT_PROPERTY_USAGE_LARGE_TAXONOMY_SIZE=1):
+            calculate_event_property_usage_for_shard(0, 1)
+
+        patched_calculate_for_large_team.delay.assert_called_once_with(self.team.pk)
+        self.assertEqual(EventDefinition.objects.get(team=self.team, name="$pageview").volume_30_day, None)
+
+    def test_volumes_are_summed_from_daily_volumes(self) -> None:
+        sync_execute(TRUNCATE_EVENT_VOLUME_DAILY_TABLE_SQL)
+        EventDefinition.objects.create(team=self.team, name="$pageview")
+        create_event(event="$pageview", team=self.team, distinct_id="user1", timestamp="2021-01-01T12:00:00Z")
+        create_event(event="$pageview", team=self.team, distinct_id="user1", timestamp="2021-01-03T12:00:00Z")
+        create_event(event="$pageview", team=self.team, distinct_id="user1", timestamp="2021-01-04T11:00:00Z")
+
+        with freeze_time("2021-01-04T12:00:00Z"):
+            calculate_event_property_usage()
+
+        pageview = EventDefinition.objects.get(team=self.team, name="$pageview")
+        self.assertEqual(pageview.volume_30_day, 3)
+        self.assertEqual(pageview.last_seen_at.isoformat(), "2021-01-04T11:00:00+00:00")
+
+        # Only the latest day and those since are read again, so events added to days before aren't counted
+        create_event(event="$pageview", team=self.team, distinct_id="user1", timestamp="2021-01-03T13:00:00Z")
+        create_event(event="$pageview", team=self.team, distinct_id="user1", timestamp="2021-01-04T13:00:00Z")
+        create_event(event="$pageview", team=self.team, distinct_id="user1", timestamp="2021-01-05T12:00:00Z")
+
+        with freeze_time("2021-01-05T14:00:00Z"):
+            calculate_event_property_usage()
+
+        self.assertEqual(EventDefinition.objects.get(team=self.team, name="$pageview").volume_30_day, 5)
+
     def test_event_and_property_definition_with_empty_name_is_safe(self) -> None:
         empty_name_event: EventDefinition = EventDefinition.objects.create(team=self.team, name="")
         empty_name_property: PropertyDefinition = PropertyDefinition.objects.create(team=self.team, name="")
 
-        create_event(
-            distinct_id="test",
-            team=self.team,
-            event="",
-            properties={empty_name_property.name: "running on empty"},
-        )
-        flush_persons_and_events()
-
         with freeze_time("2020-10-01"):
+            create_event(
+                distinct_id="test",
+                team=self.team,
+                event="",
+                properties={empty_name_property.name: "running on empty"},
+            )
+            flush_persons_and_events()
+
             Insight.objects.create(
                 team=self.team,
                 filters={
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.utils.timezone import now
+from freezegun import freeze_time
+
+from posthog.client import sync_execute
+from posthog.models.session_recording_event.sql import SESSION_RECORDING_METADATA_TABLE
+from posthog.queries.session_recordings.session_recording_events import SessionRecordingEvents
+from posthog.session_recordings.test.test_factory import create_chunked_snapshots
+from posthog.tasks.calculate_recording_metadata import calculate_idle_recordings_metadata
+from posthog.test.base import APIBaseTest, ClickhouseTestMixin
+
+
+class TestCalculateRecordingMetadata(ClickhouseTestMixin, APIBaseTest):
+    def _create_recording(self, session_id: str, minutes_ago: int) -> None:
+        for window_id, source in [("1", 2), ("2", 5)]:
+            create_chunked_snapshots(
+                team_id=self.team.pk,
+                snapshot_count=3,
+                distinct_id="user",
+                session_id=session_id,
+                timestamp=now() - timedelta(minutes=minutes_ago),
+                window_id=window_id,
+                has_full_snapshot=False,
+                source=source,
+            )
+
+    def _stored_session_ids(self, calculation_failed: bool = False):
+        return [
+            session_id
+            for (session_id,) in sync_execute(
+                f"""
+                SELECT session_id FROM {SESSION_RECORDING_METADATA_TABLE} FINAL
+                WHERE team_id = %(team_id)s AND calculation_failed = %(calculation_failed)s
+                """,
+                {"team_id": self.team.pk, "calculation_failed": int(calculation_failed)},
+            )
+        ]
+
+    @freeze_time("2023-02-01T12:00:00Z")
+    def test_stores_metadata_of_idle_recordings(self):
+        self._create_recording("idle", minutes_ago=45)
+        self._create_recording("in_progress", minutes_ago=5)
+
+        calculate_idle_recordings_metadata()
+
+        self.assertEqual(self._stored_session_ids(), ["idle"])
+        recording = SessionRecordingEvents(session_recording_id="idle", team=self.team)
+        with patch.object(SessionRecordingEvents, "calculate_metadata") as calculate_metadata:
+            stored_metadata = recording.get_metadata()
+        calculate_metadata.assert_not_called()
+        self.assertEqual(stored_metadata, recording.calculate_metadata())
+
+    @freeze_time("2023-02-03T12:00:00Z")
+    def test_calculates_recordings_again_once_idle_again(self):
+        self._create_recording("recording", minutes_ago=90)
+        calculate_idle_recordings_metadata()
+
+        with patch.object(SessionRecordingEvents, "calculate_metadata") as calculate_metadata:
+            calculate_idle_recordings_metadata()
+        calculate_metadata.assert_not_called()
+
+        self._create_recording("recording", minutes_ago=60)
+        calculate_idle_recordings_metadata()
+
+        metadata = SessionRecordingEvents(session_recording_id="recording", team=self.team).get_metadata()
+        assert metadata is not None
+        self.assertEqual(metadata["end_time"], now() - timedelta(minutes=60) + timedelta(seconds=2))
+        self.assertEqual(metadata["click_count"], 6)
+        self.assertEqual(self._stored_session_ids(), ["recording"])
+
+    @freeze_time("2023-02-03T12:00:00Z")
+    def test_recalculates_outdated_metadata_on_read(self):
+        self._create_recording("recording", minutes_ago=90)
+        calculate_idle_recordings_metadata()
+
+        # Resumed, but not idle again yet
+        self._create_recording("recording", minutes_ago=5)
+
+        recording = SessionRecordingEvents(session_recording_id="recording", team=self.team)
+        metadata = recording.get_metadata()
+        assert metadata is not None
+        self.assertEqual(metadata["end_time"], now() - timedelta(minutes=5) + timedelta(seconds=2))
+        self.assertEqual(metadata, recording.calculate_metadata())
+
+    @freeze_time("2023-02-03T12:00:00Z")
+    def test_skips_recordings_that_failed_until_they_receive_new_events(self):
+        self._create_recording("broken", minutes_ago=90)
+
+        with patch.object(SessionRecordingEvents, "calculate_metadata", side_effect=Exception("broken")):
+            self.assertEqual(calculate_idle_recordings_metadata(), 0)
+        self.assertEqual(self._stored_session_ids(calculation_failed=True), ["broken"])
+
+        with patch.object(SessionRecordingEvents, "calculate_metadata") as calculate_metadata:
+            calculate_idle_recordings_metadata()
+        calculate_metadata.assert_not_called()
+
+        # Failed rows are never served
+        metadata = SessionRecordingEvents(session_recording_id="broken", team=self.team).get_metadata()
+        assert metadata is not None
+        self.assertEqual(metadata["click_count"], 3)
+
+        self._create_recording("broken", minutes_ago=60)
+        self.assertEqual(calculate_idle_recordings_metadata(), 1)
+        self.assertEqual(self._stored_session_ids(), ["broken"])
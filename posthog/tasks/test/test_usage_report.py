@@ -1,9 +1,13 @@
-from typing import Any, Dict, List
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, cast
 from unittest.mock import ANY, MagicMock, Mock, call, patch
 from uuid import uuid4
 
 import structlog
 from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from freezegun import freeze_time
 
@@ -11,7 +15,7 @@ from ee.api.test.base import LicensedTestMixin
 from ee.billing.billing_manager import build_billing_token
 from ee.models.license import License
 from ee.settings import BILLING_SERVICE_URL
-from posthog.models import Organization, Plugin, Team
+from posthog.models import Organization, OrganizationMembership, Plugin, Team
 from posthog.models.dashboard import Dashboard
 from posthog.models.feature_flag import FeatureFlag
 from posthog.models.group.util import create_group
@@ -19,7 +23,7 @@ from posthog.models.group_type_mapping import GroupTypeMapping
 from posthog.models.plugin import PluginConfig
 from posthog.models.sharing_configuration import SharingConfiguration
 from posthog.session_recordings.test.test_factory import create_snapshot
-from posthog.tasks.usage_report import send_all_org_usage_reports
+from posthog.tasks.usage_report import _get_org_reports, convert_team_usage_rows_to_dict, send_all_org_usage_reports
 from posthog.test.base import (
     APIBaseTest,
     ClickhouseDestroyTablesMixin,
@@ -585,3 +589,76 @@ class SendUsageNoLicenseTest(APIBaseTest):
         send_all_org_usage_reports()
 
         mock_post.assert_not_called()
+
+
+class UsageReportScaleTest(APIBaseTest):
+    def _create_organizations(self, count: int, teams_per_organization: int) -> None:
+        organizations = Organization.objects.bulk_create([Organization(name=f"Org {index}") for index in range(count)])
+        Team.objects.bulk_create(
+            [
+                Team(organization=organization, api_token=f"phc_scale_{organization.id}_{index}")
+                for organization in organizations
+                for index in range(teams_per_organization)
+            ]
+        )
+        OrganizationMembership.objects.bulk_create(
+            [OrganizationMembership(organization=organization, user=self.user) for organization in organizations]
+        )
+
+    def test_queries_do_not_grow_with_organizations(self) -> None:
+        self._create_organizations(10, teams_per_organization=3)
+        with CaptureQueriesContext(connection) as few_organizations_queries:
+            send_all_org_usage_reports(dry_run=True)
+
+        self._create_organizations(200, teams_per_organization=3)
+        with CaptureQueriesContext(connection) as many_organizations_queries:
+            reports = send_all_org_usage_reports(dry_run=True)
+
+        self.assertEqual(len(reports), 211)
+        self.assertEqual(len(many_organizations_queries), len(few_organizations_queries))
+        self.assertEqual({report["organization_user_count"] for report in reports}, {1})
+
+    def test_org_reports_of_synthetic_instance(self) -> None:
+        team_count, teams_per_organization = 20_000, 4
+        organizations = [
+            SimpleNamespace(id=uuid4(), name=f"Org {index}", created_at=now())
+            for index in range(team_count // teams_per_organization)
+        ]
+        teams = [
+            SimpleNamespace(id=team_id, organization=organizations[team_id // teams_per_organization])
+            for team_id in range(team_count)
+        ]
+        counter_keys = [
+            "teams_with_event_count_lifetime",
+            "teams_with_event_count_in_period",
+            "teams_with_event_count_in_month",
+            "teams_with_event_count_with_groups_in_period",
+            "teams_with_recording_count_in_period",
+            "teams_with_recording_count_total",
+            "teams_with_group_types_total",
+            "teams_with_dashboard_count",
+            "teams_with_dashboard_template_count",
+            "teams_with_dashboard_shared_count",
+            "teams_with_dashboard_tagged_count",
+            "teams_with_ff_count",
+            "teams_with_ff_active_count",
+        ]
+        # Every other team has events, as (team_id, count) rows from ClickHouse or {team_id, total} rows from Postgres
+        all_data = {
+            key: convert_team_usage_rows_to_dict(
+                [(team_id, 2) if index < 6 else {"team_id": team_id, "total": 2} for team_id in range(0, team_count, 2)]
+            )
+            for index, key in enumerate(counter_keys)
+        }
+
+        start_time = perf_counter()
+        org_reports = _get_org_reports(cast(Any, teams), all_data, {}, "2022-01-10")
+        logger.info("usage_report_synthetic_instance", teams=team_count, seconds=perf_counter() - start_time)
+
+        self.assertEqual(len(org_reports), len(organizations))
+        org_report = org_reports[str(organizations[0].id)]
+        self.assertEqual(org_report.team_count, teams_per_organization)
+        self.assertEqual(org_report.event_count_in_period, 4)
+        self.assertEqual(org_report.ff_active_count, 4)
+        self.assertEqual(org_report.teams["1"].event_count_in_period, 0)
+        self.assertEqual(sum(report.dashboard_count for report in org_reports.values()), team_count)
@@ -17,6 +17,7 @@ from typing import (
 import dateutil
 import requests
 import structlog
+from celery import Signature, group
 from django.conf import settings
 from django.db import connection
 from django.db.models import Count, Q
@@ -193,8 +194,11 @@ def get_instance_metadata(period: Tuple[datetime, datetime]) -> InstanceMetadata
     return metadata
 
 
-def get_org_user_count(organization_id: str) -> int:
-    return OrganizationMembership.objects.filter(organization_id=organization_id).count()
+def get_org_user_counts() -> Dict[str, int]:
+    return {
+        str(row["organization_id"]): row["total"]
+        for row in OrganizationMembership.objects.values("organization_id").annotate(total=Count("id")).order_by()
+    }
 
 
 def get_org_owner_or_first_user(organization_id: str) -> Optional[User]:
@@ -375,14 +379,15 @@ def get_teams_with_recording_count_total() -> List[Tuple[int, int]]:
     return result
 
 
-def find_count_for_team_in_rows(team_id: int, rows: list) -> int:
+def convert_team_usage_rows_to_dict(rows: List[Union[dict, Tuple[int, int]]]) -> Dict[int, int]:
+    "Indexes rows of per-team counts, from ClickHouse as (team_id, count) or from Postgres as {team_id, total}"
+    team_counts: Dict[int, int] = {}
     for row in rows:
-        if "team_id" in row:
-            if row["team_id"] == team_id:
-                return row["total"]
-        elif row[0] == team_id:
-            return row[1]
-    return 0
+        if isinstance(row, dict):
+            team_counts[row["team_id"]] = row["total"]
+        else:
+            team_counts[row[0]] = row[1]
+    return team_counts
 
 
 @app.task(ignore_result=True, retries=0)
@@ -423,7 +428,7 @@ def send_all_org_usage_reports(
     instance_metadata = get_instance_metadata(period)
 
     # Clickhouse is good at counting things so we count across all teams rather than doing it one by one
-    all_data = dict(
+    all_rows = dict(
         teams_with_event_count_lifetime=get_teams_with_event_count_lifetime(),
         teams_with_event_count_in_period=get_teams_with_event_count_in_period(period_start, period_end),
         teams_with_event_count_in_month=get_teams_with_event_count_in_period(period_start.replace(day=1), period_end),
@@ -464,48 +469,85 @@ def send_all_org_usage_reports(
         ),
     )
 
+    all_data = {key: convert_team_usage_rows_to_dict(rows) for key, rows in all_rows.items()}
+
     teams: Sequence[Team] = list(
-        Team.objects.select_related("organization").exclude(
-            Q(organization__for_internal_metrics=True) | Q(is_demo=True)
-        )
+        Team.objects.select_related("organization")
+        .exclude(Q(organization__for_internal_metrics=True) | Q(is_demo=True))
+        .only("id", "organization__id", "organization__name", "organization__created_at")
     )
 
+    org_reports = _get_org_reports(teams, all_data, get_org_user_counts(), period_start.strftime("%Y-%m-%d"))
+
+    all_reports = []
+    pending_tasks: List[Signature] = []
+
+    for org_report in org_reports.values():
+        org_id = org_report.organization_id
+
+        if only_organization_id and only_organization_id != org_id:
+            continue
+
+        full_report = FullUsageReport(
+            **dataclasses.asdict(org_report),
+            **dataclasses.asdict(instance_metadata),
+        )
+        full_report_dict = dataclasses.asdict(full_report)
+        all_reports.append(full_report_dict)
+
+        if dry_run:
+            continue
+
+        # First capture the events to PostHog
+        if not skip_capture_event:
+            pending_tasks.append(capture_report.si(capture_event_name, org_id, full_report_dict, at_date))
+
+        # Then capture the events to Billing
+        if has_non_zero_usage(full_report):
+            pending_tasks.append(send_report_to_billing_service.si(org_id, full_report_dict))
+
+        if len(pending_tasks) >= settings.USAGE_REPORT_BATCH_SIZE:
+            group(pending_tasks).apply_async()
+            pending_tasks = []
+
+    if pending_tasks:
+        group(pending_tasks).apply_async()
+    return all_reports
+
+
+def _get_org_reports(
+    teams: Sequence[Team], all_data: Dict[str, Dict[int, int]], org_user_counts: Dict[str, int], date: str
+) -> Dict[str, OrgReport]:
     org_reports: Dict[str, OrgReport] = {}
 
     for team in teams:
         team_report = UsageReportCounters(
-            event_count_lifetime=find_count_for_team_in_rows(team.id, all_data["teams_with_event_count_lifetime"]),
-            event_count_in_period=find_count_for_team_in_rows(team.id, all_data["teams_with_event_count_in_period"]),
-            event_count_in_month=find_count_for_team_in_rows(team.id, all_data["teams_with_event_count_in_month"]),
-            event_count_with_groups_in_period=find_count_for_team_in_rows(
-                team.id, all_data["teams_with_event_count_with_groups_in_period"]
-            ),
-            # event_count_by_lib: Difind_count_for_team_in_rows(team.id, all_data["teams_with_#"]),
-            # event_count_by_name: Difind_count_for_team_in_rows(team.id, all_data["teams_with_#"]),
-            recording_count_in_period=find_count_for_team_in_rows(
-                team.id, all_data["teams_with_recording_count_in_period"]
-            ),
-            recording_count_total=find_count_for_team_in_rows(team.id, all_data["teams_with_recording_count_total"]),
-            group_types_total=find_count_for_team_in_rows(team.id, all_data["teams_with_group_types_total"]),
-            dashboard_count=find_count_for_team_in_rows(team.id, all_data["teams_with_dashboard_count"]),
-            dashboard_template_count=find_count_for_team_in_rows(
-                team.id, all_data["teams_with_dashboard_template_count"]
-            ),
-            dashboard_shared_count=find_count_for_team_in_rows(team.id, all_data["teams_with_dashboard_shared_count"]),
-            dashboard_tagged_count=find_count_for_team_in_rows(team.id, all_data["teams_with_dashboard_tagged_count"]),
-            ff_count=find_count_for_team_in_rows(team.id, all_data["teams_with_ff_count"]),
-            ff_active_count=find_count_for_team_in_rows(team.id, all_data["teams_with_ff_active_count"]),
+            event_count_lifetime=all_data["teams_with_event_count_lifetime"].get(team.id, 0),
+            event_count_in_period=all_data["teams_with_event_count_in_period"].get(team.id, 0),
+            event_count_in_month=all_data["teams_with_event_count_in_month"].get(team.id, 0),
+            event_count_with_groups_in_period=all_data["teams_with_event_count_with_groups_in_period"].get(team.id, 0),
+            # event_count_by_lib: all_data["teams_with_#"].get(team.id, 0),
+            # event_count_by_name: all_data["teams_with_#"].get(team.id, 0),
+            recording_count_in_period=all_data["teams_with_recording_count_in_period"].get(team.id, 0),
+            recording_count_total=all_data["teams_with_recording_count_total"].get(team.id, 0),
+            group_types_total=all_data["teams_with_group_types_total"].get(team.id, 0),
+            dashboard_count=all_data["teams_with_dashboard_count"].get(team.id, 0),
+            dashboard_template_count=all_data["teams_with_dashboard_template_count"].get(team.id, 0),
+            dashboard_shared_count=all_data["teams_with_dashboard_shared_count"].get(team.id, 0),
+            dashboard_tagged_count=all_data["teams_with_dashboard_tagged_count"].get(team.id, 0),
+            ff_count=all_data["teams_with_ff_count"].get(team.id, 0),
+            ff_active_count=all_data["teams_with_ff_active_count"].get(team.id, 0),
         )
 
         org_id = str(team.organization.id)
 
         if org_id not in org_reports:
             org_report = OrgReport(
-                date=period_start.strftime("%Y-%m-%d"),
+                date=date,
                 organization_id=org_id,
                 organization_name=team.organization.name,
                 organization_created_at=team.organization.created_at.isoformat(),
-                organization_user_count=get_org_user_count(org_id),
+                organization_user_count=org_user_counts.get(org_id, 0),
                 team_count=1,
                 teams={str(team.id): team_report},
                 **dataclasses.asdict(team_report),  # Clone the team report as the basis
@@ -518,36 +560,6 @@ def send_all_org_usage_reports(
 
             # Iterate on all fields of the UsageReportCounters and add the values from the team report to the org report
             for field in dataclasses.fields(UsageReportCounters):
-                if hasattr(team_report, field.name):
-                    setattr(
-                        org_report,
-                        field.name,
-                        getattr(org_report, field.name) + getattr(team_report, field.name),
-                    )
-
-    all_reports = []
-
-    for org_report in org_reports.values():
-        org_id = org_report.organization_id
-
-        if only_organization_id and only_organization_id != org_id:
-            continue
-
-        full_report = FullUsageReport(
-            **dataclasses.asdict(org_report),
-            **dataclasses.asdict(instance_metadata),
-        )
-        full_report_dict = dataclasses.asdict(full_report)
-        all_reports.append(full_report_dict)
-
-        if dry_run:
-            continue
-
-        # First capture the events to PostHog
-        if not skip_capture_event:
-            capture_report.delay(capture_event_name, org_id, full_report_dict, at_date)
+                setattr(org_report, field.name, getattr(org_report, field.name) + getattr(team_report, field.name))
 
-        # Then capture the events to Billing
-        if has_non_zero_usage(full_report):
-            send_report_to_billing_service.delay(org_id, full_report_dict)
-    return all_reports
+    return org_reports
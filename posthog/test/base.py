@@ -3,7 +3,7 @@ import inspect
 import re
 import threading
 import uuid
-from contextlib import contextmanager
+from contextlib import ExitStack, contextmanager
 from functools import wraps
 from typing import Any, Dict, List, Optional, Tuple, Union
 from unittest.mock import patch
@@ -18,7 +18,7 @@ from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase as DRFTestCase
 
 from posthog.clickhouse.client import sync_execute
-from posthog.clickhouse.client.connection import ch_pool
+from posthog.clickhouse.client.connection import Workload, ch_pool, get_pool
 from posthog.clickhouse.plugin_log_entries import TRUNCATE_PLUGIN_LOG_ENTRIES_TABLE_SQL
 from posthog.cloud_utils import TEST_clear_cloud_cache
 from posthog.models import Dashboard, DashboardTile, Insight, Organization, Team, User
@@ -572,25 +572,36 @@ class ClickhouseTestMixin(QueryMatchingTest):
     @contextmanager
     def capture_queries(self, query_prefixes: Union[str, Tuple[str, str]]):
         queries = []
-        original_get_client = ch_pool.get_client
 
-        # Spy on the `clichhouse_driver.Client.execute` method. This is a bit of
+        # Spy on the `clichhouse_driver.Client.execute` and `execute_iter` methods. This is a bit of
         # a roundabout way to handle this, but it seems tricky to spy on the
         # unbound class method `Client.execute` directly easily
-        @contextmanager
-        def get_client():
-            with original_get_client() as client:
-                original_client_execute = client.execute
+        def spy_on_pool(pool):
+            original_get_client = pool.get_client
 
-                def execute_wrapper(query, *args, **kwargs):
-                    if sqlparse.format(query, strip_comments=True).strip().startswith(query_prefixes):
-                        queries.append(query)
-                    return original_client_execute(query, *args, **kwargs)
+            @contextmanager
+            def get_client():
+                with original_get_client() as client:
 
-                with patch.object(client, "execute", wraps=execute_wrapper) as _:
-                    yield client
+                    def spy_on(original_method):
+                        def wrapper(query, *args, **kwargs):
+                            if sqlparse.format(query, strip_comments=True).strip().startswith(query_prefixes):
+                                queries.append(query)
+                            return original_method(query, *args, **kwargs)
 
-        with patch("posthog.clickhouse.client.connection.ch_pool.get_client", wraps=get_client) as _:
+                        return wrapper
+
+                    with patch.object(client, "execute", wraps=spy_on(client.execute)) as _, patch.object(
+                        client, "execute_iter", wraps=spy_on(client.execute_iter)
+                    ) as _:
+                        yield client
+
+            return patch.object(pool, "get_client", wraps=get_client)
+
+        with ExitStack() as stack:
+            # Every workload has its own pool
+            for pool in {ch_pool, get_pool(Workload.OFFLINE)}:
+                stack.enter_context(spy_on_pool(pool))
             yield queries
 
 
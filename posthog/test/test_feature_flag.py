@@ -1,23 +1,32 @@
 import concurrent.futures
 from typing import cast
+from unittest.mock import ANY, patch
 
 from django.core.cache import cache
 from django.db import connection
-from django.test import TransactionTestCase
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
-from posthog.models import Cohort, FeatureFlag, GroupTypeMapping, Person
+from posthog.api.test.test_feature_flag import QueryTimeoutWrapper
+from posthog.models import Cohort, FeatureFlag, GroupTypeMapping, Person, PersonDistinctId
 from posthog.models.feature_flag import get_feature_flags_for_team_in_cache
+from posthog.models.feature_flag.feature_flag import get_flags_evaluation_plan_for_team_in_cache
+from posthog.models.feature_flag.flag_evaluation_plan import clear_team_flags_evaluation_plans
 from posthog.models.feature_flag.flag_matching import (
     FeatureFlagHashKeyOverride,
     FeatureFlagMatch,
     FeatureFlagMatcher,
     FeatureFlagMatchReason,
+    FlagsEvaluationRequest,
     FlagsMatcherCache,
     get_all_feature_flags,
+    get_all_feature_flags_for_distinct_ids,
+    get_hash_key_overrides,
     hash_key_overrides,
     set_feature_flag_hash_key_overrides,
 )
+from posthog.models.feature_flag.person_caching import get_hash_key_overrides_from_cache, get_person_id_from_cache
 from posthog.models.group import Group
 from posthog.models.organization import Organization
 from posthog.models.team import Team
@@ -532,6 +541,85 @@ class TestModelCache(BaseTest):
         self.assertEqual(0, len(cached_flags))
 
 
+class TestFlagsEvaluationPlan(BaseTest):
+    def setUp(self):
+        cache.clear()
+        clear_team_flags_evaluation_plans()
+        return super().setUp()
+
+    def test_plan_is_reused_until_flags_change(self):
+        flag = FeatureFlag.objects.create(
+            team=self.team,
+            key="beta-feature",
+            created_by=self.user,
+            filters={
+                "groups": [
+                    {"properties": [{"key": "email", "value": "a@b.com", "type": "person"}], "rollout_percentage": 50}
+                ],
+                "multivariate": {
+                    "variants": [
+                        {"key": "first", "rollout_percentage": 25},
+                        {"key": "second", "rollout_percentage": 75},
+                    ]
+                },
+            },
+        )
+
+        plan = get_flags_evaluation_plan_for_team_in_cache(self.team.pk)
+        assert plan is not None
+        flag_plan = plan.for_flag(plan.feature_flags[0])
+        assert flag_plan is not None
+        self.assertEqual([prop.key for prop in flag_plan.condition_properties[0]], ["email"])
+        self.assertEqual(
+            flag_plan.variant_lookup_table,
+            [
+                {"value_min": 0, "value_max": 0.25, "key": "first"},
+                {"value_min": 0.25, "value_max": 1.0, "key": "second"},
+            ],
+        )
+        # plans never apply to flag instances they weren't compiled for
+        self.assertIsNone(plan.for_flag(flag))
+
+        with patch("posthog.models.feature_flag.flag_evaluation_plan.Filter") as mock_filter:
+            same_plan = get_flags_evaluation_plan_for_team_in_cache(self.team.pk)
+        assert same_plan is not None
+        mock_filter.assert_not_called()
+        # every caller gets its own flag instances, sharing the parsed conditions
+        self.assertIsNot(same_plan.feature_flags[0], plan.feature_flags[0])
+        self.assertIs(same_plan.for_flag(same_plan.feature_flags[0]), flag_plan)
+        self.assertIsNone(same_plan.for_flag(plan.feature_flags[0]))
+
+        flag.filters = {"groups": [{"properties": [], "rollout_percentage": 100}]}
+        flag.save()
+
+        new_plan = get_flags_evaluation_plan_for_team_in_cache(self.team.pk)
+        assert new_plan is not None
+        new_flag_plan = new_plan.for_flag(new_plan.feature_flags[0])
+        assert new_flag_plan is not None
+        self.assertIsNot(new_flag_plan, flag_plan)
+        self.assertEqual(new_flag_plan.condition_properties, [[]])
+
+    def test_matcher_with_plan_skips_filter_parsing(self):
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com"})
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="beta-feature",
+            created_by=self.user,
+            filters={"groups": [{"properties": [{"key": "email", "value": "tim@posthog.com", "type": "person"}]}]},
+        )
+        plan = get_flags_evaluation_plan_for_team_in_cache(self.team.pk)
+        assert plan is not None
+
+        with patch("posthog.models.feature_flag.flag_matching.Filter") as mock_filter:
+            flag_values, _, _, errors = FeatureFlagMatcher(
+                plan.feature_flags, "example_id", evaluation_plan=plan
+            ).get_matches()
+
+        mock_filter.assert_not_called()
+        self.assertEqual(flag_values, {"beta-feature": True})
+        self.assertFalse(errors)
+
+
 class TestFeatureFlagMatcher(BaseTest, QueryMatchingTest):
     maxDiff = None
 
@@ -1883,6 +1971,81 @@ class TestFeatureFlagHashKeyOverrides(BaseTest, QueryMatchingTest):
 
         self.assertEqual(payloads, {})
 
+    def test_entire_flow_with_existing_hash_key_overrides_reads_them_once(self):
+        flags = get_all_feature_flags(self.team.pk, "example_id", {}, "other_id")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_all_feature_flags(self.team.pk, "example_id", {}, "other_id"), flags)
+
+        self.assertEqual(
+            len([query for query in queries if "posthog_featureflaghashkeyoverride" in query["sql"]]),
+            1,
+        )
+
+    def test_overrides_are_not_kept_across_requests(self):
+        get_all_feature_flags(self.team.pk, "example_id", {}, "other_id")
+
+        # e.g. a person merge moved other overrides onto this person
+        FeatureFlagHashKeyOverride.objects.filter(team_id=self.team.pk, person_id=self.person.id).update(
+            hash_key="example_id"
+        )
+
+        # "example_id" hashes to the first variant, see `test_entire_flow_with_hash_key_override`
+        flags, *_ = get_all_feature_flags(self.team.pk, "example_id", {}, "other_id")
+        self.assertEqual(flags["multivariate-flag"], "first-variant")
+
+    @override_settings(DECIDE_PERSON_CACHE_TTL_SECONDS=60)
+    @patch("posthog.models.feature_flag.flag_matching.statsd")
+    def test_entire_flow_with_person_cache(self, mock_statsd):
+        cache.clear()
+        flags = get_all_feature_flags(self.team.pk, "example_id", {}, "other_id")
+        mock_statsd.timing.assert_called_with(
+            "feature_flag_experience_continuity_latency", ANY, tags={"person_source": "postgres"}
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_all_feature_flags(self.team.pk, "example_id", {}, "other_id"), flags)
+            self.assertEqual(get_all_feature_flags(self.team.pk, "example_id", {}), flags)
+
+        for query in queries:
+            self.assertNotIn('FROM "posthog_persondistinctid"', query["sql"])
+            self.assertNotIn("posthog_featureflaghashkeyoverride", query["sql"])
+        mock_statsd.timing.assert_called_with(
+            "feature_flag_experience_continuity_latency", ANY, tags={"person_source": "cache"}
+        )
+        self.assertEqual(
+            get_hash_key_overrides_from_cache(self.team.pk, self.person.id),
+            {"beta-feature": "other_id", "multivariate-flag": "other_id"},
+        )
+
+    @override_settings(DECIDE_PERSON_CACHE_TTL_SECONDS=60)
+    def test_person_cache_is_invalidated_when_distinct_ids_or_overrides_change(self):
+        cache.clear()
+        get_all_feature_flags(self.team.pk, "example_id", {}, "other_id")
+        self.assertEqual(get_person_id_from_cache(self.team.pk, "example_id"), self.person.id)
+
+        override = FeatureFlagHashKeyOverride.objects.get(
+            team_id=self.team.pk, person_id=self.person.id, feature_flag_key="multivariate-flag"
+        )
+        override.hash_key = "example_id"
+        override.save()
+        self.assertIsNone(get_hash_key_overrides_from_cache(self.team.pk, self.person.id))
+        self.assertEqual(get_hash_key_overrides(self.team.pk, self.person.id)["multivariate-flag"], "example_id")
+
+        # e.g. the person is split, moving the distinct_id to a new person
+        new_person = Person.objects.create(team=self.team)
+        person_distinct_id = PersonDistinctId.objects.get(team_id=self.team.pk, distinct_id="example_id")
+        person_distinct_id.person = new_person
+        person_distinct_id.save()
+        self.assertIsNone(get_person_id_from_cache(self.team.pk, "example_id"))
+
+        # "example_id" hashes to the first variant, see `test_entire_flow_with_hash_key_override`
+        flags, *_ = get_all_feature_flags(self.team.pk, "example_id", {})
+        self.assertEqual(flags["multivariate-flag"], "first-variant")
+        self.assertEqual(get_person_id_from_cache(self.team.pk, "example_id"), new_person.id)
+        # persons without overrides may be about to get them, so that isn't cached
+        self.assertIsNone(get_hash_key_overrides_from_cache(self.team.pk, new_person.id))
+
 
 class TestHashKeyOverridesRaceConditions(TransactionTestCase):
     def test_hash_key_overrides_with_race_conditions(self):
@@ -1943,6 +2106,282 @@ class TestHashKeyOverridesRaceConditions(TransactionTestCase):
                 # the failure mode is when this raises an `IntegrityError` because the hash key override was racy
 
 
+PARITY_PERSON_PROPERTIES = [
+    {},
+    {"email": "tim@posthog.com", "age": 30, "plan": "free", "beta": True},
+    {"email": "TIM@PostHog.com", "age": "30", "plan": None, "beta": "true"},
+    {"email": "someone@example.com", "age": 30.5, "plan": ["free", "paid"], "beta": False},
+    {"email": 42, "age": None, "signup": "2022-01-05", "nested": {"a": 1}},
+    {"age": 18, "plan": "paid", "signup": None},
+]
+
+PARITY_PROPERTY_FILTERS = [
+    {"key": "email", "value": "tim@posthog.com", "type": "person"},
+    {"key": "email", "value": ["tim@posthog.com", "someone@example.com"], "type": "person"},
+    {"key": "email", "value": "tim@posthog.com", "operator": "is_not", "type": "person"},
+    {"key": "email", "value": "posthog", "operator": "icontains", "type": "person"},
+    {"key": "email", "value": "POSTHOG", "operator": "not_icontains", "type": "person"},
+    {"key": "email", "value": "4", "operator": "icontains", "type": "person"},
+    {"key": "email", "value": "", "operator": "is_set", "type": "person"},
+    {"key": "plan", "value": "", "operator": "is_set", "type": "person"},
+    {"key": "plan", "value": "", "operator": "is_not_set", "type": "person"},
+    {"key": "plan", "value": "free", "type": "person"},
+    {"key": "plan", "value": "free", "operator": "is_not", "type": "person"},
+    {"key": "age", "value": "30", "type": "person"},
+    {"key": "age", "value": 30, "type": "person"},
+    {"key": "age", "value": 20, "operator": "gt", "type": "person"},
+    {"key": "age", "value": 30, "operator": "gte", "type": "person"},
+    {"key": "age", "value": 30, "operator": "lt", "type": "person"},
+    {"key": "age", "value": 18, "operator": "lte", "type": "person"},
+    {"key": "beta", "value": "true", "type": "person"},
+    {"key": "beta", "value": ["true"], "operator": "is_not", "type": "person"},
+    {"key": "signup", "value": "", "operator": "is_not_set", "type": "person"},
+    {"key": "email", "value": "tim@posthog.com", "type": "person", "negation": True},
+]
+
+
+class TestFeatureFlagLocalEvaluation(BaseTest):
+    """
+    Parity between evaluating flag conditions in Postgres and evaluating them in Python from a snapshot of the
+    person's properties.
+    """
+
+    def _get_matches(self, feature_flags, distinct_id, local_evaluation: bool, **kwargs):
+        with override_settings(DECIDE_LOCAL_FLAG_EVALUATION_ENABLED=local_evaluation):
+            return FeatureFlagMatcher(feature_flags, distinct_id, **kwargs).get_matches()
+
+    def test_local_evaluation_matches_postgres(self):
+        feature_flags = [
+            FeatureFlag.objects.create(
+                team=self.team,
+                key=f"flag-{index}",
+                created_by=self.user,
+                filters={"groups": [{"properties": [property_filter]}]},
+            )
+            for index, property_filter in enumerate(PARITY_PROPERTY_FILTERS)
+        ]
+        for index, properties in enumerate(PARITY_PERSON_PROPERTIES):
+            Person.objects.create(team=self.team, distinct_ids=[f"person-{index}"], properties=properties)
+
+        for distinct_id in [f"person-{index}" for index in range(len(PARITY_PERSON_PROPERTIES))] + ["no-person"]:
+            with patch("posthog.models.feature_flag.flag_matching.statsd") as mock_statsd:
+                local_matches = self._get_matches(feature_flags, distinct_id, local_evaluation=True)
+            mock_statsd.incr.assert_not_called()  # no fallback to Postgres
+
+            self.assertEqual(
+                local_matches, self._get_matches(feature_flags, distinct_id, local_evaluation=False), distinct_id
+            )
+
+    def test_local_evaluation_matches_postgres_with_overrides_and_groups(self):
+        GroupTypeMapping.objects.create(team=self.team, group_type="organization", group_type_index=0)
+        Group.objects.create(
+            team=self.team,
+            group_type_index=0,
+            group_key="posthog",
+            group_properties={"name": "PostHog", "employees": 50},
+            version=0,
+        )
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com"})
+        feature_flags = [
+            FeatureFlag.objects.create(
+                team=self.team,
+                key="person-flag",
+                created_by=self.user,
+                filters={
+                    "groups": [
+                        {
+                            "properties": [
+                                {"key": "email", "value": "posthog", "operator": "icontains", "type": "person"}
+                            ]
+                        }
+                    ]
+                },
+            ),
+            FeatureFlag.objects.create(
+                team=self.team,
+                key="group-flag",
+                created_by=self.user,
+                filters={
+                    "aggregation_group_type_index": 0,
+                    "groups": [
+                        {
+                            "properties": [
+                                {
+                                    "key": "employees",
+                                    "value": 10,
+                                    "operator": "gt",
+                                    "type": "group",
+                                    "group_type_index": 0,
+                                }
+                            ]
+                        }
+                    ],
+                },
+            ),
+        ]
+
+        for kwargs in [
+            {"groups": {"organization": "posthog"}},
+            {"groups": {"organization": "does-not-exist"}},
+            {"groups": {}},
+            {"groups": {"organization": "posthog"}, "property_value_overrides": {"email": "tim@example.com"}},
+            {
+                "groups": {"organization": "posthog"},
+                "group_property_value_overrides": {"organization": {"employees": 5}},
+            },
+        ]:
+            self.assertEqual(
+                self._get_matches(feature_flags, "example_id", local_evaluation=True, **kwargs),
+                self._get_matches(feature_flags, "example_id", local_evaluation=False, **kwargs),
+                kwargs,
+            )
+
+    def test_falls_back_to_postgres_when_not_locally_evaluable(self):
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com"})
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team,
+            key="regex-flag",
+            created_by=self.user,
+            filters={
+                "groups": [{"properties": [{"key": "email", "value": "^tim@", "operator": "regex", "type": "person"}]}]
+            },
+        )
+
+        with patch("posthog.models.feature_flag.flag_matching.statsd") as mock_statsd:
+            flag_values, _, _, _ = self._get_matches([feature_flag], "example_id", local_evaluation=True)
+
+        mock_statsd.incr.assert_called_once_with("feature_flag_local_evaluation_fallback")
+        self.assertEqual(flag_values, {"regex-flag": True})
+
+    def test_benchmark_many_flags_fetch_person_properties_once(self):
+        Person.objects.create(
+            team=self.team, distinct_ids=["example_id"], properties={f"prop_{index}": index for index in range(50)}
+        )
+        feature_flags = [
+            FeatureFlag.objects.create(
+                team=self.team,
+                key=f"flag-{index}",
+                created_by=self.user,
+                filters={
+                    "groups": [
+                        {
+                            "properties": [
+                                {"key": f"prop_{index % 50}", "value": index % 7, "operator": "gte", "type": "person"}
+                            ]
+                        },
+                        {"properties": [{"key": f"prop_{index % 30}", "value": "1", "type": "person"}]},
+                    ]
+                },
+            )
+            for index in range(250)
+        ]
+        FlagsMatcherCache(self.team.pk).group_types_to_indexes  # warm up, not part of the comparison
+
+        # savepoint, statement timeout, person properties, savepoint release
+        with self.assertNumQueries(4):
+            local_matches = self._get_matches(
+                feature_flags, "example_id", local_evaluation=True, cache=FlagsMatcherCache(self.team.pk)
+            )
+        self.assertEqual(local_matches, self._get_matches(feature_flags, "example_id", local_evaluation=False))
+
+
+class TestGetAllFeatureFlagsForDistinctIds(BaseTest):
+    def setUp(self):
+        super().setUp()
+        GroupTypeMapping.objects.create(team=self.team, group_type="organization", group_type_index=0)
+        Group.objects.create(
+            team=self.team, group_type_index=0, group_key="big", group_properties={"employees": 500}, version=0
+        )
+        Group.objects.create(
+            team=self.team, group_type_index=0, group_key="small", group_properties={"employees": 5}, version=0
+        )
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="person-flag",
+            created_by=self.user,
+            filters={"groups": [{"properties": [{"key": "plan", "value": "paid", "type": "person"}]}]},
+        )
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="group-flag",
+            created_by=self.user,
+            filters={
+                "aggregation_group_type_index": 0,
+                "groups": [
+                    {
+                        "properties": [
+                            {"key": "employees", "value": 100, "operator": "gt", "type": "group", "group_type_index": 0}
+                        ]
+                    }
+                ],
+            },
+        )
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="continuity-flag",
+            created_by=self.user,
+            ensure_experience_continuity=True,
+            filters={"groups": [{"rollout_percentage": 50}]},
+        )
+
+    def _create_persons(self, count: int):
+        for index in range(count):
+            person = Person.objects.create(
+                team=self.team,
+                distinct_ids=[f"person-{index}"],
+                properties={"plan": "paid" if index % 2 else "free"},
+            )
+            if index % 3 == 0:
+                set_feature_flag_hash_key_overrides(
+                    list(FeatureFlag.objects.filter(team=self.team)), self.team.pk, person.pk, f"anon-{index}"
+                )
+
+    def _requests(self, count: int):
+        return [
+            FlagsEvaluationRequest(
+                distinct_id=f"person-{index}", groups={"organization": "big" if index % 2 else "small"}
+            )
+            for index in range(count)
+        ] + [FlagsEvaluationRequest(distinct_id="no-person", property_value_overrides={"plan": "paid"})]
+
+    def test_matches_get_all_feature_flags(self):
+        self._create_persons(10)
+        requests = self._requests(10)
+
+        results = get_all_feature_flags_for_distinct_ids(self.team.pk, requests)
+
+        self.assertEqual(len(results), len(requests))
+        for request, result in zip(requests, results):
+            self.assertEqual(
+                result,
+                get_all_feature_flags(
+                    self.team.pk,
+                    request.distinct_id,
+                    request.groups,
+                    property_value_overrides=request.property_value_overrides,
+                ),
+                request.distinct_id,
+            )
+
+    def test_number_of_queries_does_not_depend_on_number_of_requests(self):
+        self._create_persons(20)
+
+        with CaptureQueriesContext(connection) as few_requests_queries:
+            get_all_feature_flags_for_distinct_ids(self.team.pk, self._requests(2))
+        with CaptureQueriesContext(connection) as many_requests_queries:
+            get_all_feature_flags_for_distinct_ids(self.team.pk, self._requests(20))
+
+        self.assertEqual(len(few_requests_queries), len(many_requests_queries))
+
+    def test_database_down(self):
+        self._create_persons(2)
+
+        with connection.execute_wrapper(QueryTimeoutWrapper()):
+            results = get_all_feature_flags_for_distinct_ids(self.team.pk, self._requests(2))
+
+        self.assertTrue(all(errors for _, _, _, errors in results))
+
+
 class TestFeatureFlagMatcherConsistency(BaseTest):
     # These tests are common between all libraries doing local evaluation of feature flags.
     # This ensures there are no mismatches between implementations.
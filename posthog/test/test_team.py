@@ -1,11 +1,12 @@
 from unittest import mock
 
 from django.core.cache import cache
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from posthog.models import Dashboard, DashboardTile, Organization, PluginConfig, Team, User
 from posthog.models.instance_setting import override_instance_config
 from posthog.models.team import get_team_in_cache, util
+from posthog.models.team.team_caching import local_ingestion_context_cache, local_team_cache
 from posthog.plugins.test.mock import mocked_plugin_requests_get
 
 from .base import BaseTest
@@ -56,6 +57,60 @@ class TestModelCache(TestCase):
         assert cached_team is None
 
 
+@override_settings(TEAM_LOCAL_CACHE_TTL_SECONDS=30, TEAM_LOCAL_CACHE_NEGATIVE_TTL_SECONDS=30)
+@mock.patch("posthog.models.team.team_caching.ensure_team_cache_invalidation_listener")
+class TestLocalTeamCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        local_team_cache.clear()
+        local_ingestion_context_cache.clear()
+        self.organization = Organization.objects.create(name="org name")
+
+    def test_team_is_served_from_local_cache(self, _listener):
+        team = Team.objects.create(organization=self.organization, api_token="local_token")
+        self.assertEqual(Team.objects.get_team_from_cache_or_token("local_token").id, team.id)  # type: ignore
+
+        cache.clear()
+        with self.assertNumQueries(0):
+            cached_team = Team.objects.get_team_from_cache_or_token("local_token")
+        assert cached_team is not None
+        self.assertEqual(cached_team.id, team.id)
+        self.assertEqual(cached_team.name, "Default Project")
+
+    def test_invalid_tokens_are_negatively_cached(self, _listener):
+        self.assertIsNone(Team.objects.get_team_from_cache_or_token("invalid_token"))
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(Team.objects.get_team_from_cache_or_token("invalid_token"))
+
+    def test_saving_and_deleting_team_invalidates_local_cache(self, _listener):
+        self.assertIsNone(Team.objects.get_team_from_cache_or_token("local_token"))
+
+        team = Team.objects.create(organization=self.organization, api_token="local_token")
+        self.assertEqual(Team.objects.get_team_from_cache_or_token("local_token").id, team.id)  # type: ignore
+
+        team.name = "New name"
+        team.save()
+        self.assertEqual(Team.objects.get_team_from_cache_or_token("local_token").name, "New name")  # type: ignore
+
+        team.delete()
+        self.assertIsNone(Team.objects.get_team_from_cache_or_token("local_token"))
+
+    @mock.patch("posthog.models.team.team_caching._publish_team_cache_invalidation")
+    def test_refilling_redis_does_not_invalidate_local_caches(self, patched_publish, _listener):
+        Team.objects.create(organization=self.organization, api_token="local_token")
+        patched_publish.assert_called_once_with("local_token")
+        patched_publish.reset_mock()
+
+        cache.clear()
+        local_team_cache.clear()
+        self.assertIsNotNone(Team.objects.get_team_from_cache_or_token("local_token"))
+
+        patched_publish.assert_not_called()
+        self.assertIsNotNone(get_team_in_cache("local_token"))
+
+
 class TestTeam(BaseTest):
     def test_team_has_expected_defaults(self):
         team: Team = Team.objects.create(name="New Team", organization=self.organization)
@@ -15,8 +15,10 @@ from posthog.models import EventDefinition
 from posthog.settings.utils import get_from_env
 from posthog.test.base import BaseTest
 from posthog.utils import (
+    JSONArrayStream,
     PotentialSecurityProblemException,
     absolute_uri,
+    decompress,
     format_query_params_absolute_url,
     get_available_timezones_with_offsets,
     get_compare_period_dates,
@@ -303,6 +305,41 @@ class TestLoadDataFromRequest(TestCase):
         self.assertEqual({"what is it": "the decompressed value"}, data)
 
 
+class TestDecompressStreamBatch(TestCase):
+    def test_batch_is_decoded_lazily(self):
+        data = decompress(
+            b'{"api_key": "token", "batch": [{"event": "a ]}[", "n": NaN}, {"event": "b"}], "sent_at": "now"}',
+            "",
+            stream_batch=True,
+        )
+
+        self.assertEqual(data["api_key"], "token")
+        self.assertEqual(data["sent_at"], "now")
+        self.assertIsInstance(data["batch"], JSONArrayStream)
+        self.assertTrue(data["batch"])
+        self.assertEqual(list(data["batch"]), [{"event": "a ]}[", "n": None}, {"event": "b"}])
+
+    def test_empty_batch_is_falsy(self):
+        data = decompress(b'{"batch": [ ]}', "", stream_batch=True)
+
+        self.assertFalse(data["batch"])
+        self.assertEqual(list(data["batch"]), [])
+
+    def test_payloads_without_batch_are_parsed_as_usual(self):
+        self.assertEqual(decompress(b'[{"event": "a"}]', "", stream_batch=True), [{"event": "a"}])
+        self.assertEqual(decompress(b'{"event": "a"}', "", stream_batch=True), {"event": "a"})
+
+    def test_invalid_json_outside_the_batch_raises(self):
+        with self.assertRaises(RequestParsingError):
+            decompress(b'{"batch": [{"event": "a"}], "api_key": }', "", stream_batch=True)
+
+    def test_invalid_json_inside_the_batch_raises_while_iterating(self):
+        data = decompress(b'{"batch": [{"event": "a"} {"event": "b"}]}', "", stream_batch=True)
+
+        with self.assertRaises(ValueError):
+            list(data["batch"])
+
+
 class TestShouldRefresh(TestCase):
     def test_refresh_requested_by_client_with_refresh_true(self):
         request = HttpRequest()
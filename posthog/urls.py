@@ -154,6 +154,7 @@ urlpatterns = [
     # ingestion
     # NOTE: When adding paths here that should be public make sure to update ALWAYS_ALLOWED_ENDPOINTS in middleware.py
     opt_slash_path("decide", decide.get_decide),
+    opt_slash_path("decide/batch", decide.get_decide_batch),
     opt_slash_path("e", capture.get_event),
     opt_slash_path("engage", capture.get_event),
     opt_slash_path("track", capture.get_event),
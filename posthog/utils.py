@@ -20,6 +20,7 @@ from typing import (
     Any,
     Dict,
     Generator,
+    Iterator,
     List,
     Mapping,
     Optional,
@@ -588,7 +589,122 @@ def base64_decode(data):
     return data.decode("utf8", "surrogatepass").encode("utf-16", "surrogatepass")
 
 
-def decompress(data: Any, compression: str):
+def _looks_like_json(data: Any) -> bool:
+    """Cheap check on the first non-whitespace character, so plain JSON payloads skip the base64 attempt."""
+    if isinstance(data, (bytes, bytearray)):
+        stripped = data[:64].lstrip()
+        return stripped[:1] in (b"{", b"[")
+    if isinstance(data, str):
+        return data[:64].lstrip()[:1] in ("{", "[")
+    return False
+
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Matches either a full JSON string (so brackets inside strings are ignored) or a single bracket
+_JSON_STRING_OR_BRACKET = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]', re.DOTALL)
+
+
+def _skip_json_whitespace(text: str, idx: int) -> int:
+    return _JSON_WHITESPACE.match(text, idx).end()  # type: ignore
+
+
+def _find_json_container_end(text: str, start: int) -> int:
+    """Return the index just past the array/object starting at `start`, without building any Python objects."""
+    depth = 0
+    for match in _JSON_STRING_OR_BRACKET.finditer(text, start):
+        token = match.group()
+        if token in ("[", "{"):
+            depth += 1
+        elif token in ("]", "}"):
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    raise json.JSONDecodeError("Unterminated array", text, start)
+
+
+class JSONArrayStream:
+    """
+    A JSON array inside an already decompressed payload, decoded one item at a time while iterating.
+
+    Used for the `batch` key of /batch and /capture payloads, so that only a single event is held as Python
+    objects at any given time instead of the whole batch.
+    """
+
+    def __init__(self, text: str, start: int, end: int, decoder: json.JSONDecoder):
+        self._text = text
+        self._start = start
+        self._end = end
+        self._decoder = decoder
+
+    def __bool__(self) -> bool:
+        return self._text[_skip_json_whitespace(self._text, self._start + 1)] != "]"
+
+    def __iter__(self) -> Iterator[Any]:
+        text, decoder = self._text, self._decoder
+        idx = _skip_json_whitespace(text, self._start + 1)
+        if text[idx] == "]":
+            return
+        while True:
+            item, idx = decoder.raw_decode(text, idx)
+            yield item
+            idx = _skip_json_whitespace(text, idx)
+            if text[idx] == "]":
+                return
+            if text[idx] != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+            idx = _skip_json_whitespace(text, idx + 1)
+
+    def __repr__(self) -> str:
+        return f"<JSONArrayStream of {self._end - self._start} chars>"
+
+
+def _loads_with_streamed_batch(data: Union[str, bytes], decoder: json.JSONDecoder) -> Any:
+    """
+    Like `json.loads`, but when the payload is an object with a `batch` array, that array is returned as a
+    `JSONArrayStream` instead of a list. All other top-level keys (api_key, sent_at, ...) are decoded eagerly.
+    """
+    text = data if isinstance(data, str) else data.decode(json.detect_encoding(data), "surrogatepass")
+
+    idx = _skip_json_whitespace(text, 0)
+    if text[idx : idx + 1] != "{":
+        return decoder.decode(text)
+
+    result: Dict[str, Any] = {}
+    try:
+        idx = _skip_json_whitespace(text, idx + 1)
+        if text[idx] != "}":
+            while True:
+                key, idx = decoder.raw_decode(text, idx)
+                if not isinstance(key, str):
+                    raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, idx)
+                idx = _skip_json_whitespace(text, idx)
+                if text[idx] != ":":
+                    raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+                idx = _skip_json_whitespace(text, idx + 1)
+
+                if key == "batch" and text[idx] == "[":
+                    end = _find_json_container_end(text, idx)
+                    result[key] = JSONArrayStream(text, idx, end, decoder)
+                    idx = end
+                else:
+                    result[key], idx = decoder.raw_decode(text, idx)
+
+                idx = _skip_json_whitespace(text, idx)
+                if text[idx] == "}":
+                    break
+                if text[idx] != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+                idx = _skip_json_whitespace(text, idx + 1)
+    except IndexError:
+        raise json.JSONDecodeError("Unexpected end of data", text, len(text))
+
+    idx = _skip_json_whitespace(text, idx + 1)
+    if idx != len(text):
+        raise json.JSONDecodeError("Extra data", text, idx)
+    return result
+
+
+def decompress(data: Any, compression: str, stream_batch: bool = False):
     if not data:
         return None
 
@@ -615,24 +731,29 @@ def decompress(data: Any, compression: str):
 
         data = data.encode("utf-16", "surrogatepass").decode("utf-16")
 
-    base64_decoded = None
-    try:
-        base64_decoded = base64_decode(data)
-    except Exception:
-        pass
+    # Skip the base64 round trip for payloads that are already JSON, it copies the whole body for nothing
+    if not _looks_like_json(data):
+        base64_decoded = None
+        try:
+            base64_decoded = base64_decode(data)
+        except Exception:
+            pass
 
-    if base64_decoded:
-        data = base64_decoded
+        if base64_decoded:
+            data = base64_decoded
 
     try:
         # parse_constant gets called in case of NaN, Infinity etc
         # default behaviour is to put those into the DB directly
         # but we just want it to return None
-        data = json.loads(data, parse_constant=lambda x: None)
+        if stream_batch:
+            data = _loads_with_streamed_batch(data, json.JSONDecoder(parse_constant=lambda x: None))
+        else:
+            data = json.loads(data, parse_constant=lambda x: None)
     except (json.JSONDecodeError, UnicodeDecodeError) as error_main:
         if compression == "":
             try:
-                return decompress(data, "gzip")
+                return decompress(data, "gzip", stream_batch=stream_batch)
             except Exception as inner:
                 # re-trying with compression set didn't succeed, throw original error
                 raise RequestParsingError("Invalid JSON: %s" % (str(error_main))) from inner
@@ -644,7 +765,12 @@ def decompress(data: Any, compression: str):
 
 
 # Used by non-DRF endpoints from capture.py and decide.py (/decide, /batch, /capture, etc)
-def load_data_from_request(request):
+def load_data_from_request(request, stream_batch: bool = False):
+    """
+    Loads and decompresses the request payload.
+
+    With `stream_batch`, a top-level `batch` array is returned as a lazily decoded `JSONArrayStream`.
+    """
     if request.method == "POST":
         if request.content_type in ["", "text/plain", "application/json"]:
             data = request.body
@@ -666,7 +792,7 @@ def load_data_from_request(request):
         request.GET.get("compression") or request.POST.get("compression") or request.headers.get("content-encoding", "")
     ).lower()
 
-    return decompress(data, compression)
+    return decompress(data, compression, stream_batch=stream_batch)
 
 
 class SingletonDecorator:
@@ -927,8 +1053,12 @@ def get_daterange(
 
 
 def get_safe_cache(cache_key: str):
+    from posthog.caching.insight_result_codec import decode_insight_result, is_encoded_insight_result
+
     try:
         cached_result = cache.get(cache_key)  # cache.get is safe in most cases
+        if is_encoded_insight_result(cached_result):
+            return decode_insight_result(cached_result)
         return cached_result
     except Exception:  # if it errors out, the cache is probably corrupted
         try: